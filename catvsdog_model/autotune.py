@@ -0,0 +1,329 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import csv
+import fcntl
+import json
+import os
+import subprocess
+import time
+import typing as t
+
+import numpy as np
+import tensorflow as tf
+
+from catvsdog_model import __version__ as _version
+from catvsdog_model.config.core import config
+
+PROFILE_FORMAT_VERSION = 1
+DEFAULT_PROFILE_DIR = Path(os.environ.get("RUNTIME_PROFILE_DIR", root / "catvsdog_model_api" / "runtime_profiles"))
+DEFAULT_BATCH_SIZES = (1, 8, 16, 32, 64)
+# The API keeps state in its process (the embedding index, shadow comparison
+# counts, Prometheus metrics) that several uvicorn workers would each hold a
+# diverging copy of, so it is served by one worker until that state is shared
+MAX_SERVING_WORKERS = 1
+
+
+def _cgroup_quota(cgroup_root: Path) -> t.Optional[float]:
+    # cgroup v2: "max 100000" or "<quota> <period>"
+    try:
+        quota, period = (Path(cgroup_root) / "cpu.max").read_text().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    # cgroup v1: a quota of -1 means no limit
+    for directory in ("cpu", "cpu,cpuacct"):
+        try:
+            quota = int((Path(cgroup_root) / directory / "cpu.cfs_quota_us").read_text())
+            period = int((Path(cgroup_root) / directory / "cpu.cfs_period_us").read_text())
+            return None if quota <= 0 else quota / period
+        except (OSError, ValueError):
+            continue
+    return None
+
+
+def available_cpus(cgroup_root: Path = Path("/sys/fs/cgroup")) -> float:
+    """CPUs this process may use: its cgroup CPU quota (a container or pod CPU limit) if set, else its affinity."""
+
+    affinity = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    quota = _cgroup_quota(cgroup_root)
+    return round(min(quota, affinity) if quota else float(affinity), 2)
+
+
+def serving_model_file() -> str:
+    return f"{config.app_cfg.model_save_file}{_version}"
+
+
+def profile_path(directory: Path = DEFAULT_PROFILE_DIR, *, cpus: t.Optional[float] = None,
+                 model: t.Optional[str] = None) -> Path:
+    """Where the profile for this CPU limit and model (by default the ones in use now) is kept in `directory`."""
+
+    cpus = available_cpus() if cpus is None else cpus
+    model = serving_model_file() if model is None else model
+    return Path(directory) / f"profile-{cpus:g}cpu-{model}.json"
+
+
+def sweep_configs(cpus: float, *, workers: t.Optional[t.Sequence[int]] = None,
+                  intra_op_threads: t.Optional[t.Sequence[int]] = None,
+                  inter_op_threads: t.Sequence[int] = (1, 2),
+                  max_workers: int = MAX_SERVING_WORKERS) -> t.List[dict]:
+    """
+    Worker and thread pool combinations to measure, with at most `max_workers`
+    workers. By default each divides the whole CPU budget between workers, as
+    workers x intra-op threads; given explicitly, every combination within the
+    budget is kept.
+    """
+    budget = max(1, int(cpus))
+    divisors = [n for n in range(1, budget + 1) if budget % n == 0]
+    configs = []
+    for num_workers in workers or divisors:
+        if num_workers > max_workers:
+            continue
+        for intra in intra_op_threads or [max(1, budget // num_workers)]:
+            if num_workers * intra > budget:
+                continue
+            for inter in inter_op_threads:
+                configs.append({"workers": num_workers, "intra_op_threads": intra, "inter_op_threads": inter})
+    return configs
+
+
+def choose_profile(results: t.Sequence[dict], *, max_p99_ms: float) -> dict:
+    """The highest-throughput result within the p99 latency budget, or the lowest-p99 one if none is."""
+
+    if not results:
+        raise ValueError("No results to choose from")
+    within = [result for result in results if result["p99_ms"] <= max_p99_ms]
+    if within:
+        return max(within, key = lambda result: result["throughput_images_per_second"])
+    return min(results, key = lambda result: result["p99_ms"])
+
+
+def save_profile(profile: dict, path: Path) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents = True, exist_ok = True)
+    with open(path.with_suffix(".tmp"), "w") as f:
+        json.dump(profile, f, indent = 2)
+    os.replace(path.with_suffix(".tmp"), path)
+
+
+def load_profile(path: Path) -> t.Optional[dict]:
+    """The saved profile, or None if there is none or it cannot be read."""
+
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(profile, dict) or profile.get("version") != PROFILE_FORMAT_VERSION:
+        return None
+    return profile
+
+
+def profile_is_current(profile: t.Optional[dict], *, cpus: t.Optional[float] = None,
+                       model: t.Optional[str] = None) -> bool:
+    """Whether `profile` was tuned for this CPU limit and model (by default the ones in use now)."""
+
+    if profile is None:
+        return False
+    cpus = available_cpus() if cpus is None else cpus
+    model = serving_model_file() if model is None else model
+    machine = profile.get("machine", {})
+    return abs(machine.get("cpus", -1) - cpus) < 0.01 and machine.get("model") == model
+
+
+def apply_profile_threads(profile: dict) -> None:
+    """
+    Size the TensorFlow thread pools from `profile`. Must run before
+    TensorFlow executes its first operation; TF_NUM_INTRAOP_THREADS and
+    TF_NUM_INTEROP_THREADS set in the environment win over the profile.
+    """
+    try:
+        if "TF_NUM_INTRAOP_THREADS" not in os.environ:
+            tf.config.threading.set_intra_op_parallelism_threads(profile["intra_op_threads"])
+        if "TF_NUM_INTEROP_THREADS" not in os.environ:
+            tf.config.threading.set_inter_op_parallelism_threads(profile["inter_op_threads"])
+    except RuntimeError as e:
+        print(f"Could not apply the runtime profile thread settings: {e}")
+
+
+def _send(message: t.Any) -> None:
+    print(json.dumps(message), flush = True)
+
+
+def _receive(process: subprocess.Popen) -> t.Any:
+    # Skip anything else the model libraries write to stdout
+    for line in process.stdout:
+        if line.startswith(("{", '"')):
+            return json.loads(line)
+    raise RuntimeError(f"Measurement process exited with code {process.wait()}")
+
+
+def measure(setup: str) -> None:
+    """
+    Measurement process: one simulated API worker. It loads the model with
+    the given thread pools, then for each batch size waits for a start line on
+    stdin and scores synthetic batches back to back for `duration` seconds,
+    as an API worker scores one request after another.
+    """
+    from catvsdog_model.processing.data_manager import load_model
+
+    setup = json.loads(setup)
+    apply_profile_threads(setup)
+    model = load_model(file_name = setup["model"])
+    rng = np.random.default_rng(os.getpid())
+    height, width = config.model_cfg.image_size
+    batches = {size: (rng.random((size, height, width, 3), dtype = np.float32) * 255)
+               for size in setup["batch_sizes"]}
+    for size, batch in batches.items():
+        model.predict(batch, verbose = 0, batch_size = size)
+    _send("ready")
+
+    for size, batch in batches.items():
+        if not sys.stdin.readline():
+            return
+        latencies, start = [], time.perf_counter()
+        while time.perf_counter() - start < setup["duration"]:
+            request_start = time.perf_counter()
+            model.predict(batch, verbose = 0, batch_size = size)
+            latencies.append((time.perf_counter() - request_start) * 1000)
+        _send({"batch_size": size, "images": size * len(latencies),
+               "seconds": time.perf_counter() - start, "latencies_ms": latencies})
+
+
+def run_config(setup: dict, *, model: str, batch_sizes: t.Sequence[int], duration: float) -> t.List[dict]:
+    """Throughput and latency of one worker and thread pool setup at each batch size, workers loaded together."""
+
+    message = json.dumps({**setup, "model": model, "batch_sizes": list(batch_sizes), "duration": duration})
+    processes = [subprocess.Popen([sys.executable, str(file), "--measure", message],
+                                  stdin = subprocess.PIPE, stdout = subprocess.PIPE, text = True)
+                 for _ in range(setup["workers"])]
+    results = []
+    try:
+        for process in processes:
+            _receive(process)
+        for batch_size in batch_sizes:
+            # All workers start each batch size together, so they compete for the CPUs as in serving
+            for process in processes:
+                process.stdin.write("start\n")
+                process.stdin.flush()
+            samples = [_receive(process) for process in processes]
+            latencies = np.concatenate([sample["latencies_ms"] for sample in samples])
+            results.append({**setup, "batch_size": batch_size,
+                            "throughput_images_per_second": sum(s["images"] / s["seconds"] for s in samples),
+                            "p50_ms": float(np.percentile(latencies, 50)),
+                            "p99_ms": float(np.percentile(latencies, 99)),
+                            "requests": len(latencies)})
+    except BaseException:
+        for process in processes:
+            process.kill()
+        raise
+    finally:
+        for process in processes:
+            process.stdin.close()
+            process.wait()
+    return results
+
+
+def tune(*, output: t.Optional[Path] = None, workers: t.Optional[t.Sequence[int]] = None,
+         intra_op_threads: t.Optional[t.Sequence[int]] = None, inter_op_threads: t.Sequence[int] = (1, 2),
+         batch_sizes: t.Sequence[int] = DEFAULT_BATCH_SIZES, duration: float = 3.0,
+         max_p99_ms: float = 500.0) -> dict:
+    """
+    Measure every sweep configuration against the serving model on this
+    machine, save all results to metrics/autotune_results.csv and the best
+    one as the runtime profile at `output` (by default its `profile_path`).
+    """
+    cpus = available_cpus()
+    model = serving_model_file()
+    output = output or profile_path(cpus = cpus, model = model)
+    configs = sweep_configs(cpus, workers = workers, intra_op_threads = intra_op_threads,
+                            inter_op_threads = inter_op_threads)
+    print(f"Tuning {model} for {cpus} CPUs: {len(configs)} worker and thread setups, "
+          f"batch sizes {list(batch_sizes)}, {duration}s each")
+
+    results = []
+    for setup in configs:
+        for result in run_config(setup, model = model, batch_sizes = batch_sizes, duration = duration):
+            results.append(result)
+            print(f"   workers={result['workers']} intra={result['intra_op_threads']} "
+                  f"inter={result['inter_op_threads']} batch={result['batch_size']}: "
+                  f"{result['throughput_images_per_second']:.1f} img/s, p99 {result['p99_ms']:.1f} ms")
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok = True)
+    with open(metrics_dir / "autotune_results.csv", "w", newline = "") as f:
+        writer = csv.DictWriter(f, fieldnames = list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+    best = choose_profile(results, max_p99_ms = max_p99_ms)
+    profile = {"version": PROFILE_FORMAT_VERSION,
+               "created_at": time.time(),
+               "machine": {"cpus": cpus, "cpu_count": os.cpu_count(), "model": model,
+                           "tensorflow": tf.__version__},
+               "max_p99_ms": max_p99_ms,
+               **{key: best[key] for key in ("workers", "intra_op_threads", "inter_op_threads", "batch_size",
+                                             "throughput_images_per_second", "p50_ms", "p99_ms")}}
+    save_profile(profile, output)
+    print(f"✓ Saved runtime profile to {output}: {best['workers']} workers x {best['intra_op_threads']} "
+          f"intra-op threads, batch size {best['batch_size']}")
+    return profile
+
+
+def ensure_profile(directory: Path = DEFAULT_PROFILE_DIR, **tune_kwargs) -> dict:
+    """
+    The profile for this CPU limit and model from `directory`, tuned and saved
+    there first if it has none. `directory` may be shared between pods: one
+    tunes while the others wait for its profile instead of measuring too.
+    """
+    path = profile_path(directory)
+    profile = load_profile(path)
+    if profile_is_current(profile):
+        return profile
+
+    Path(directory).mkdir(parents = True, exist_ok = True)
+    with open(Path(directory) / ".tune.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Another process may have tuned it while this one waited
+        profile = load_profile(path)
+        if profile_is_current(profile):
+            return profile
+        return tune(output = path, **tune_kwargs)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def int_list(value):
+        return [int(item) for item in value.split(",")]
+
+    parser = argparse.ArgumentParser(description = "Tune API workers, TensorFlow thread pools and batch size")
+    parser.add_argument("--profile-dir", type = Path, default = DEFAULT_PROFILE_DIR,
+                        help = "directory of runtime profiles, one per CPU limit and model")
+    parser.add_argument("--output", type = Path, default = None,
+                        help = "runtime profile to write instead of the one for this CPU limit and model")
+    parser.add_argument("--if-missing", action = "store_true",
+                        help = "only tune if --profile-dir has no profile for this CPU limit and model")
+    parser.add_argument("--workers", type = int_list,
+                        help = f"worker counts to try, at most {MAX_SERVING_WORKERS}")
+    parser.add_argument("--intra-op-threads", type = int_list, help = "intra-op thread counts to try")
+    parser.add_argument("--inter-op-threads", type = int_list, default = [1, 2], help = "inter-op thread counts to try")
+    parser.add_argument("--batch-sizes", type = int_list, default = list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--duration", type = float, default = 3.0, help = "seconds of load per measurement")
+    parser.add_argument("--max-p99-ms", type = float, default = 500.0, help = "p99 latency budget per request")
+    parser.add_argument("--measure", default = None, help = argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    tune_kwargs = dict(workers = args.workers, intra_op_threads = args.intra_op_threads,
+                       inter_op_threads = args.inter_op_threads, batch_sizes = args.batch_sizes,
+                       duration = args.duration, max_p99_ms = args.max_p99_ms)
+    if args.measure:
+        measure(args.measure)
+    elif args.if_missing:
+        ensure_profile(args.profile_dir, **tune_kwargs)
+        print(f"✓ Runtime profile {profile_path(args.profile_dir)} is current")
+    else:
+        tune(output = args.output or profile_path(args.profile_dir), **tune_kwargs)
@@ -0,0 +1,115 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import time
+import typing as t
+
+import numpy as np
+from tensorflow import keras
+
+from catvsdog_model.config.core import config
+from catvsdog_model.latency import keras_predictor
+
+
+def confidence(probabilities: np.ndarray) -> np.ndarray:
+    """Confidence of sigmoid outputs in the predicted class, between 0.5 and 1."""
+
+    probabilities = np.asarray(probabilities)
+    return np.maximum(probabilities, 1 - probabilities)
+
+
+def build_first_stage(*, augment: bool = config.model_cfg.augmentation_placement == "model") -> keras.Model:
+    """The tiny first-stage model configured under `cascade` in config.yml."""
+
+    # Imported here: catvsdog_model.model builds the full classifier on import,
+    # which serving (predict.py imports this module) does not need
+    from catvsdog_model.model import create_model
+
+    cascade_cfg = config.model_cfg.cascade
+    return create_model(input_shape = config.model_cfg.input_shape,
+                        optimizer = config.model_cfg.optimizer,
+                        loss = config.model_cfg.loss,
+                        metrics = [config.model_cfg.accuracy_metric],
+                        augment = augment,
+                        architecture = cascade_cfg.architecture,
+                        head = cascade_cfg.head,
+                        width_multiplier = cascade_cfg.width_multiplier,
+                        depth_multiplier = cascade_cfg.depth_multiplier)
+
+
+class CascadeClassifier:
+    """
+    Two-stage inference: every image goes through `first_stage`, and only the
+    images it scores with a confidence below `threshold` are sent, as one
+    smaller batch, to `full`. Running counts give the escalation rate.
+    """
+
+    def __init__(self, first_stage: keras.Model, full: keras.Model, *, threshold: float):
+        if not 0.5 <= threshold <= 1:
+            raise ValueError(f"threshold must be between 0.5 and 1, got {threshold}")
+        self.threshold = threshold
+        self._first_stage = keras_predictor(first_stage)
+        self._full = keras_predictor(full)
+        self.images = 0
+        self.escalations = 0
+
+    def predict(self, images: np.ndarray, *, batch_size: t.Optional[int] = None) -> t.Dict[str, t.Any]:
+        """
+        Probabilities of the answering stage for each image, which images were
+        escalated, and the time spent in each stage in milliseconds. With
+        `batch_size`, images go through the cascade at most that many at a time.
+        """
+        images = np.asarray(images, dtype = np.float32)
+        if batch_size and len(images) > batch_size:
+            parts = [self.predict(images[i:i + batch_size]) for i in range(0, len(images), batch_size)]
+            return {"probabilities": np.concatenate([part["probabilities"] for part in parts]),
+                    "escalated": np.concatenate([part["escalated"] for part in parts]),
+                    "latency_ms": {stage: sum(part["latency_ms"][stage] for part in parts)
+                                   for stage in ("first", "full")}}
+
+        start = time.perf_counter()
+        probabilities = self._first_stage(images).reshape(-1)
+        first_ms = (time.perf_counter() - start) * 1000
+
+        escalated = confidence(probabilities) < self.threshold
+        full_ms = 0.0
+        if escalated.any():
+            start = time.perf_counter()
+            probabilities[escalated] = self._full(images[escalated]).reshape(-1)
+            full_ms = (time.perf_counter() - start) * 1000
+
+        self.images += len(images)
+        self.escalations += int(escalated.sum())
+        return {"probabilities": probabilities,
+                "escalated": escalated,
+                "latency_ms": {"first": first_ms, "full": full_ms}}
+
+    @property
+    def escalation_rate(self) -> float:
+        return self.escalations / self.images if self.images else 0.0
+
+
+def sweep_thresholds(labels: np.ndarray, first_probabilities: np.ndarray, full_probabilities: np.ndarray,
+                     thresholds: t.Sequence[float]) -> t.List[dict]:
+    """
+    Escalation rate and accuracy of the cascade at each threshold, from the
+    predictions of both stages on the same labelled examples.
+    """
+    labels = np.asarray(labels).reshape(-1)
+    first = np.asarray(first_probabilities).reshape(-1)
+    full = np.asarray(full_probabilities).reshape(-1)
+    full_accuracy = float(np.mean((full > 0.5) == labels))
+
+    results = []
+    for threshold in thresholds:
+        escalated = confidence(first) < threshold
+        cascade = np.where(escalated, full, first)
+        accuracy = float(np.mean((cascade > 0.5) == labels))
+        results.append({"threshold": float(threshold),
+                        "escalation_rate": float(escalated.mean()),
+                        "accuracy": accuracy,
+                        "accuracy_drop": full_accuracy - accuracy})
+    return results
@@ -0,0 +1,236 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import json
+import os
+import pickle
+import shutil
+import typing as t
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model import __version__ as _version
+from catvsdog_model.config.core import CHECKPOINT_DIR
+
+WEIGHTS_FILE = "state.weights.h5"
+METADATA_FILE = "state.json"
+RNG_FILE = "rng_state.pkl"
+# Attributes of monitoring callbacks (ModelCheckpoint, EarlyStopping and the
+# like) that must survive a restart for them to carry on where they stopped
+CALLBACK_STATE = ("best", "wait", "best_epoch")
+
+
+class TrainingState(t.NamedTuple):
+    """Where an interrupted run stopped: epochs completed and batches seen in the next one."""
+
+    epoch: int
+    batch: int
+
+
+def _run_id(fine_tune_from: t.Optional[str]) -> dict:
+    return {"version": _version, "fine_tune_from": fine_tune_from or ""}
+
+
+def _seed_states(model: keras.Model) -> t.List[keras.Variable]:
+    # The SeedGenerator states of the model's random layers (augmentation,
+    # dropout): non-trainable variables that save_weights leaves out
+    weights = {id(variable) for variable in model.weights}
+    return [variable for variable in model.non_trainable_variables if id(variable) not in weights]
+
+
+def _capture_rng_state(model: keras.Model) -> dict:
+    return {"seed_generators": [np.asarray(variable.numpy()) for variable in _seed_states(model)]}
+
+
+def _restore_rng_state(model: keras.Model, rng_state: dict) -> None:
+    states = rng_state.get("seed_generators", [])
+    variables = _seed_states(model)
+    if len(states) != len(variables):
+        print("Ignoring saved random layer state: it does not match the model")
+        return
+    for variable, state in zip(variables, states):
+        variable.assign(state)
+
+
+def _callback_key(index: int, callback: keras.callbacks.Callback) -> str:
+    return f"{index}:{type(callback).__name__}"
+
+
+def _capture_callback_state(callbacks: t.Sequence[keras.callbacks.Callback]) -> dict:
+    state = {}
+    for index, callback in enumerate(callbacks):
+        if not hasattr(callback, "best"):
+            continue
+        values = {name: getattr(callback, name) for name in CALLBACK_STATE if hasattr(callback, name)}
+        state[_callback_key(index, callback)] = {
+            name: None if value is None else float(value) if name == "best" else int(value)
+            for name, value in values.items()}
+    return state
+
+
+def _restore_callback_state(callbacks: t.Sequence[keras.callbacks.Callback], state: dict) -> None:
+    for index, callback in enumerate(callbacks):
+        for name, value in state.get(_callback_key(index, callback), {}).items():
+            setattr(callback, name, value)
+
+
+class TrainingStateCheckpoint(keras.callbacks.Callback):
+    """
+    Save the full training state (weights, optimizer slots and iteration count,
+    epoch/batch position and the seed state of the model's random layers) into
+    `checkpoint_dir`, at the end of every epoch and optionally every
+    `save_every_n_batches` batches. The dataset shuffle and augmentation done in
+    the input pipeline are not part of it.
+    The best monitored value (and EarlyStopping's patience count) of each of
+    `callbacks` is saved too, and `callback_state` is put back into them when
+    training begins, so a resumed run only replaces a checkpoint it improves on.
+    It must come after `callbacks` in the list passed to fit, as EarlyStopping
+    resets its count in its own `on_train_begin`.
+    Files are written next to the target and renamed into place, so a pod killed
+    mid-write leaves the previous state intact.
+    """
+
+    def __init__(self, checkpoint_dir: Path = CHECKPOINT_DIR, *, save_every_n_batches: int = 0,
+                 batch_offset: int = 0, fine_tune_from: t.Optional[str] = None, is_chief: bool = True,
+                 callbacks: t.Sequence[keras.callbacks.Callback] = (), callback_state: t.Optional[dict] = None):
+        super().__init__()
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.save_every_n_batches = save_every_n_batches
+        self.batch_offset = batch_offset
+        self.fine_tune_from = fine_tune_from
+        self.is_chief = is_chief
+        self.callbacks = list(callbacks)
+        self.callback_state = callback_state or {}
+        self._epoch = 0
+
+    def on_train_begin(self, logs=None):
+        _restore_callback_state(self.callbacks, self.callback_state)
+
+    def on_train_end(self, logs=None):
+        # Carried into the next fit call on the same callbacks
+        self.callback_state = _capture_callback_state(self.callbacks)
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch = epoch
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self.save_every_n_batches and (batch + 1) % self.save_every_n_batches == 0:
+            self.save(TrainingState(epoch = self._epoch, batch = self.batch_offset + batch + 1))
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Batch offsets from a resumed epoch only apply to that epoch
+        self.batch_offset = 0
+        self.save(TrainingState(epoch = epoch + 1, batch = 0))
+
+    def save(self, state: TrainingState) -> None:
+        if not self.is_chief:
+            return
+
+        self.checkpoint_dir.mkdir(parents = True, exist_ok = True)
+        tmp_weights = self.checkpoint_dir / f"tmp.{WEIGHTS_FILE}"
+        self.model.save_weights(tmp_weights, overwrite = True)
+
+        tmp_rng = self.checkpoint_dir / f"{RNG_FILE}.tmp"
+        with open(tmp_rng, "wb") as f:
+            pickle.dump(_capture_rng_state(self.model), f)
+
+        tmp_metadata = self.checkpoint_dir / f"{METADATA_FILE}.tmp"
+        with open(tmp_metadata, "w") as f:
+            json.dump({**state._asdict(), **_run_id(self.fine_tune_from),
+                       "callbacks": _capture_callback_state(self.callbacks)}, f, indent = 2)
+
+        # The metadata file goes last, it marks the checkpoint as complete
+        os.replace(tmp_weights, self.checkpoint_dir / WEIGHTS_FILE)
+        os.replace(tmp_rng, self.checkpoint_dir / RNG_FILE)
+        os.replace(tmp_metadata, self.checkpoint_dir / METADATA_FILE)
+
+
+def restore_training_state(model: keras.Model, checkpoint_dir: Path = CHECKPOINT_DIR, *,
+                           fine_tune_from: t.Optional[str] = None) -> t.Optional[TrainingState]:
+    """
+    Restore a checkpoint written by `TrainingStateCheckpoint` into a compiled model.
+    Returns None when there is nothing to resume, including checkpoints left by a
+    different package version or training mode.
+    """
+    metadata_path = Path(checkpoint_dir) / METADATA_FILE
+    if not metadata_path.is_file():
+        return None
+
+    with open(metadata_path) as f:
+        metadata = json.load(f)
+    if {key: metadata.get(key) for key in ("version", "fine_tune_from")} != _run_id(fine_tune_from):
+        print(f"Ignoring training state in {checkpoint_dir}: it belongs to a different run")
+        return None
+
+    if model.optimizer is not None and not model.optimizer.built:
+        model.optimizer.build(model.trainable_variables)
+    model.load_weights(Path(checkpoint_dir) / WEIGHTS_FILE)
+
+    rng_path = Path(checkpoint_dir) / RNG_FILE
+    if rng_path.is_file():
+        with open(rng_path, "rb") as f:
+            _restore_rng_state(model, pickle.load(f))
+
+    return TrainingState(epoch = metadata["epoch"], batch = metadata["batch"])
+
+
+def load_callback_state(checkpoint_dir: Path = CHECKPOINT_DIR) -> dict:
+    """The callback state saved with the training-state checkpoint, for `TrainingStateCheckpoint`."""
+
+    try:
+        with open(Path(checkpoint_dir) / METADATA_FILE) as f:
+            return json.load(f).get("callbacks", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def clear_training_state(checkpoint_dir: Path = CHECKPOINT_DIR) -> None:
+    """Remove the training-state checkpoint once a run has completed."""
+
+    shutil.rmtree(checkpoint_dir, ignore_errors = True)
+
+
+def fit_with_resume(model: keras.Model, train_data: tf.data.Dataset, *, epochs: int,
+                    callbacks: t.Optional[t.List[keras.callbacks.Callback]] = None,
+                    fit_fn: t.Optional[t.Callable[..., keras.callbacks.History]] = None,
+                    checkpoint_dir: Path = CHECKPOINT_DIR, save_every_n_batches: int = 0,
+                    fine_tune_from: t.Optional[str] = None, is_chief: bool = True,
+                    **fit_kwargs) -> t.Optional[keras.callbacks.History]:
+    """
+    Run `fit_fn` (defaults to `model.fit`), resuming from the last training-state
+    checkpoint if one exists.
+    A run stopped mid-epoch first finishes that epoch on the batches it had not
+    reached yet. The training set reshuffles every epoch, so those are the right
+    number of batches but not necessarily the same samples.
+    """
+    fit_fn = fit_fn or model.fit
+    callbacks = list(callbacks or [])
+    state = restore_training_state(model, checkpoint_dir, fine_tune_from = fine_tune_from)
+    initial_epoch, skip_batches = state if state else (0, 0)
+    if state:
+        print(f"Resuming training at epoch {initial_epoch + 1}, batch {skip_batches}")
+
+    checkpoint = TrainingStateCheckpoint(checkpoint_dir, save_every_n_batches = save_every_n_batches,
+                                         fine_tune_from = fine_tune_from, is_chief = is_chief,
+                                         callbacks = callbacks,
+                                         callback_state = load_callback_state(checkpoint_dir) if state else None)
+    history = None
+    if skip_batches and initial_epoch < epochs:
+        checkpoint.batch_offset = skip_batches
+        history = fit_fn(train_data.skip(skip_batches), initial_epoch = initial_epoch,
+                         epochs = initial_epoch + 1, callbacks = callbacks + [checkpoint], **fit_kwargs)
+        initial_epoch += 1
+
+    if initial_epoch < epochs:
+        history = fit_fn(train_data, initial_epoch = initial_epoch, epochs = epochs,
+                         callbacks = callbacks + [checkpoint], **fit_kwargs)
+
+    if is_chief:
+        clear_training_state(checkpoint_dir)
+
+    return history
@@ -6,7 +6,7 @@ parent, root = file.parent, file.parents[1]
 sys.path.append(str(root))
 
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 from strictyaml import YAML, load
@@ -21,6 +21,7 @@ CONFIG_FILE_PATH = PACKAGE_ROOT / "config.yml"
 
 DATASET_DIR = PACKAGE_ROOT / "datasets/data"
 TRAINED_MODEL_DIR = PACKAGE_ROOT / "trained_models"
+CHECKPOINT_DIR = PACKAGE_ROOT / "checkpoints"
 
 
 class AppConfig(BaseModel):
@@ -34,6 +35,61 @@ class AppConfig(BaseModel):
     test_path: str
     model_name: str
     model_save_file: str
+    student_save_file: str
+    cascade_save_file: str
+
+
+class AugmentationPolicy(BaseModel):
+    """
+    Random transformations applied to training images.
+    A zero factor (or no flip mode) disables that transformation.
+    """
+
+    flip: Optional[str] = None
+    rotation: float = 0.0
+    zoom: float = 0.0
+    contrast: float = 0.0
+    translation: float = 0.0
+
+
+class DistillationConfig(BaseModel):
+    """
+    Student architecture and loss weighting for knowledge distillation.
+    """
+
+    architecture: str
+    head: str
+    width_multiplier: float
+    depth_multiplier: float
+    temperature: float
+    alpha: float
+    epochs: int
+
+
+class CascadeConfig(BaseModel):
+    """
+    First-stage architecture and escalation threshold for cascade inference.
+    """
+
+    enabled: bool
+    threshold: float
+    architecture: str
+    head: str
+    width_multiplier: float
+    depth_multiplier: float
+    epochs: int
+
+
+class ShadowConfig(BaseModel):
+    """
+    Candidate model, sampling and load shedding for shadow inference.
+    """
+
+    enabled: bool
+    candidate_version: str
+    fraction: float
+    max_pending: int
+    max_primary_in_flight: int
 
 
 class ModelConfig(BaseModel):
@@ -48,10 +104,20 @@ class ModelConfig(BaseModel):
     rotation: float
     zoom: float
     flip: str
+    augmentation_placement: str
+    augmentation_policy: str
+    augmentation_policies: Dict[str, AugmentationPolicy]
 
     random_state: int
     input_shape: List[int]
+    architecture: str
+    head: str
+    width_multiplier: float
+    depth_multiplier: float
     epochs: int
+    distillation: DistillationConfig
+    cascade: CascadeConfig
+    shadow: ShadowConfig
     optimizer: str
     loss: str
     accuracy_metric: str
@@ -59,6 +125,10 @@ class ModelConfig(BaseModel):
     earlystop: int
     monitor: str
     save_best_only: bool
+    async_checkpoint: bool
+    checkpoint_max_pending: int
+    checkpoint_compression_level: int
+    checkpoint_every_n_batches: int
     label_mappings: Dict[int, str]
 
 
@@ -0,0 +1,117 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import os
+import typing as t
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.config.core import config
+from catvsdog_model.evaluation import evaluate_streaming
+from catvsdog_model.latency import keras_predictor, measure_latency
+from catvsdog_model.model import create_model
+from catvsdog_model.processing.data_manager import save_fast_artifact
+
+
+def _soften(probabilities, temperature):
+    # Sigmoid outputs back to logits, then rescaled by the temperature
+    probabilities = tf.clip_by_value(probabilities, keras.backend.epsilon(), 1 - keras.backend.epsilon())
+    return tf.sigmoid((tf.math.log(probabilities) - tf.math.log1p(-probabilities)) / temperature)
+
+
+class Distiller(keras.Model):
+    """
+    Train `student` against both the hard labels and the temperature-softened
+    predictions of a frozen `teacher`:
+    loss = alpha * BCE(labels, student) + (1 - alpha) * T^2 * BCE(teacher_T, student_T).
+    Calling the distiller runs the student only, so compiled metrics and
+    validation describe the model that will be served.
+    """
+
+    def __init__(self, student: keras.Model, teacher: keras.Model, *,
+                 temperature: float = 4.0, alpha: float = 0.1, **kwargs):
+        super().__init__(**kwargs)
+        self.student = student
+        self.teacher = teacher
+        self.teacher.trainable = False
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def call(self, x, training = False):
+        return self.student(x, training = training)
+
+    def compute_loss(self, x = None, y = None, y_pred = None, sample_weight = None, training = True):
+        labels = tf.reshape(tf.cast(y, y_pred.dtype), tf.shape(y_pred))
+        teacher_pred = self.teacher(x, training = False)
+
+        student_loss = keras.losses.binary_crossentropy(labels, y_pred)
+        distillation_loss = keras.losses.binary_crossentropy(_soften(teacher_pred, self.temperature),
+                                                             _soften(y_pred, self.temperature))
+        loss = self.alpha * student_loss + (1 - self.alpha) * self.temperature ** 2 * distillation_loss
+        return tf.reduce_mean(loss)
+
+
+class StudentCheckpoint(keras.callbacks.Callback):
+    """
+    Save the student of a `Distiller` as a standalone servable model, like
+    ModelCheckpoint, and with `write_fast_artifact` its fast-loading artifact.
+    The `.keras` file is written to a temporary name and renamed into place,
+    so a crash mid-save never leaves a half-written model at `filepath`.
+    """
+
+    def __init__(self, filepath: Path, *, monitor: str = "val_loss", save_best_only: bool = True,
+                 write_fast_artifact: bool = True):
+        super().__init__()
+        self.filepath = Path(filepath)
+        self.monitor = monitor
+        self.save_best_only = save_best_only
+        self.write_fast_artifact = write_fast_artifact
+        self.best = np.inf if "loss" in monitor else -np.inf
+
+    def on_epoch_end(self, epoch, logs = None):
+        current = (logs or {}).get(self.monitor)
+        if self.save_best_only and current is not None:
+            improved = current < self.best if "loss" in self.monitor else current > self.best
+            if not improved:
+                return
+            self.best = current
+        # Keras only saves to paths ending in .keras
+        tmp_path = self.filepath.with_name(self.filepath.name.removesuffix(".keras") + ".tmp.keras")
+        self.model.student.save(tmp_path)
+        os.replace(tmp_path, self.filepath)
+        if self.write_fast_artifact:
+            save_fast_artifact(self.model.student, self.filepath)
+
+
+def build_student(*, augment: bool = config.model_cfg.augmentation_placement == "model") -> keras.Model:
+    """The compact model configured under `distillation` in config.yml."""
+
+    student_cfg = config.model_cfg.distillation
+    return create_model(input_shape = config.model_cfg.input_shape,
+                        optimizer = config.model_cfg.optimizer,
+                        loss = config.model_cfg.loss,
+                        metrics = [config.model_cfg.accuracy_metric],
+                        augment = augment,
+                        architecture = student_cfg.architecture,
+                        head = student_cfg.head,
+                        width_multiplier = student_cfg.width_multiplier,
+                        depth_multiplier = student_cfg.depth_multiplier)
+
+
+def compare_models(models: t.Dict[str, keras.Model], dataset: tf.data.Dataset, *, runs: int = 50) -> dict:
+    """Parameter count, test loss/accuracy and batch-1 CPU latency of each model."""
+
+    sample = np.random.uniform(0, 255, size = (1, *config.model_cfg.input_shape)).astype(np.float32)
+    report = {}
+    for name, model in models.items():
+        metrics = evaluate_streaming(model, dataset)
+        report[name] = {"parameters": int(model.count_params()),
+                        "test_loss": metrics.loss,
+                        "test_accuracy": metrics.accuracy,
+                        "latency_ms": measure_latency(keras_predictor(model), sample, runs = runs)}
+    return report
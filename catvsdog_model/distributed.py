@@ -0,0 +1,198 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import json
+import os
+import subprocess
+import typing as t
+
+import tensorflow as tf
+from tensorflow import keras
+
+
+STRATEGIES = ("default", "mirrored", "multi_worker_mirrored")
+
+
+def get_strategy(name: str = "default") -> tf.distribute.Strategy:
+    """
+    Build the distribution strategy selected in params.yaml.
+    A multi-worker strategy has to be created before any other TensorFlow op runs,
+    so call this before building the model or the datasets.
+    """
+    if name == "default":
+        return tf.distribute.get_strategy()
+    if name == "mirrored":
+        return tf.distribute.MirroredStrategy()
+    if name == "multi_worker_mirrored":
+        return tf.distribute.MultiWorkerMirroredStrategy()
+
+    raise ValueError(f"Unknown distribution strategy {name!r}, expected one of {STRATEGIES}")
+
+
+def is_chief(strategy: t.Optional[tf.distribute.Strategy] = None) -> bool:
+    """Return True for the single worker that writes checkpoints and metrics."""
+
+    resolver = getattr(strategy, "cluster_resolver", None)
+    if resolver is None or not resolver.task_type:
+        return True
+
+    task_type, task_id = resolver.task_type, resolver.task_id
+    if task_type == "chief":
+        return True
+    # Without an explicit chief, worker 0 takes on the chief's duties
+    return task_type == "worker" and task_id == 0 and "chief" not in resolver.cluster_spec().as_dict()
+
+
+def global_batch_size(batch_size: int, strategy: tf.distribute.Strategy) -> int:
+    """Scale the per-replica batch size to the batch size fed to `fit`."""
+
+    return batch_size * strategy.num_replicas_in_sync
+
+
+def shard_dataset(dataset: tf.data.Dataset) -> tf.data.Dataset:
+    """
+    Shard a dataset by element across workers.
+    `image_dataset_from_directory` builds its pipeline from in-memory file lists,
+    so file-based auto-sharding cannot be used.
+    """
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+    return dataset.with_options(options)
+
+
+def _make_steps(model: keras.Model, strategy: tf.distribute.Strategy):
+    """Build the distributed train and test steps, each returning summed loss, correct and count."""
+
+    loss_fn = keras.losses.get(model.loss)
+
+    def batch_stats(y, y_pred):
+        y = tf.reshape(tf.cast(y, y_pred.dtype), tf.shape(y_pred))
+        per_example_loss = tf.reshape(loss_fn(y, y_pred), [-1])
+        correct = tf.cast(tf.equal(tf.cast(y_pred > 0.5, y.dtype), y), tf.float32)
+        return per_example_loss, tf.reduce_sum(correct), tf.cast(tf.shape(y)[0], tf.float32)
+
+    def train_replica_step(x, y):
+        with tf.GradientTape() as tape:
+            y_pred = model(x, training = True)
+            per_example_loss, correct, count = batch_stats(y, y_pred)
+            loss = tf.nn.compute_average_loss(per_example_loss)
+        gradients = tape.gradient(loss, model.trainable_variables)
+        model.optimizer.apply_gradients(zip(gradients, model.trainable_variables))
+        return tf.reduce_sum(per_example_loss), correct, count
+
+    def test_replica_step(x, y):
+        per_example_loss, correct, count = batch_stats(y, model(x, training = False))
+        return tf.reduce_sum(per_example_loss), correct, count
+
+    def reduce_sum(per_replica):
+        return [strategy.reduce(tf.distribute.ReduceOp.SUM, value, axis = None) for value in per_replica]
+
+    @tf.function
+    def train_step(x, y):
+        return reduce_sum(strategy.run(train_replica_step, args = (x, y)))
+
+    @tf.function
+    def test_step(x, y):
+        return reduce_sum(strategy.run(test_replica_step, args = (x, y)))
+
+    return train_step, test_step
+
+
+def _run_epoch(step_fn, dataset, callbacks = None, prefix = "") -> t.Dict[str, float]:
+    loss_sum, correct, count = 0.0, 0.0, 0.0
+    for step, (x, y) in enumerate(dataset):
+        if callbacks is not None:
+            callbacks.on_train_batch_begin(step)
+        batch_loss, batch_correct, batch_count = step_fn(x, y)
+        loss_sum += float(batch_loss)
+        correct += float(batch_correct)
+        count += float(batch_count)
+        if callbacks is not None:
+            callbacks.on_train_batch_end(step, {"loss": loss_sum / count, "accuracy": correct / count})
+
+    return {f"{prefix}loss": loss_sum / max(count, 1.0), f"{prefix}accuracy": correct / max(count, 1.0)}
+
+
+def fit_distributed(model: keras.Model, strategy: tf.distribute.Strategy, train_data: tf.data.Dataset, *,
+                    epochs: int, initial_epoch: int = 0, validation_data: t.Optional[tf.data.Dataset] = None,
+                    callbacks: t.Optional[t.List[keras.callbacks.Callback]] = None,
+                    verbose: int = 1) -> keras.callbacks.History:
+    """
+    Data-parallel replacement for `model.fit` under a non-default strategy.
+    Keras' own `fit` cannot hand distributed batches to a multi-worker strategy,
+    so the loop runs the replica steps itself and drives the usual Keras callbacks
+    (checkpointing, early stopping, metrics) with the same per-epoch logs.
+    """
+    with strategy.scope():
+        model.optimizer.build(model.trainable_variables)
+    train_step, test_step = _make_steps(model, strategy)
+    dist_train = strategy.experimental_distribute_dataset(train_data)
+    dist_val = strategy.experimental_distribute_dataset(validation_data) if validation_data is not None else None
+
+    # Steps each worker runs, after sharding and rebatching; unknown sizes run until the data is exhausted
+    steps = int(getattr(dist_train, "cardinality", tf.data.UNKNOWN_CARDINALITY))
+    callback_list = keras.callbacks.CallbackList(callbacks, add_history = True, add_progbar = verbose != 0,
+                                                 model = model, epochs = epochs, verbose = verbose,
+                                                 steps = steps if steps >= 0 else None)
+    model.stop_training = False
+    logs = {}
+    callback_list.on_train_begin()
+    for epoch in range(initial_epoch, epochs):
+        callback_list.on_epoch_begin(epoch)
+        logs = _run_epoch(train_step, dist_train, callback_list)
+        if dist_val is not None:
+            logs.update(_run_epoch(test_step, dist_val, prefix = "val_"))
+        callback_list.on_epoch_end(epoch, logs)
+        if model.stop_training:
+            break
+    callback_list.on_train_end(logs)
+
+    return model.history
+
+
+def evaluate_distributed(model: keras.Model, strategy: tf.distribute.Strategy,
+                         dataset: tf.data.Dataset) -> t.Tuple[float, float]:
+    """Counterpart of `model.evaluate` for `fit_distributed`, returning (loss, accuracy)."""
+
+    _, test_step = _make_steps(model, strategy)
+    logs = _run_epoch(test_step, strategy.experimental_distribute_dataset(dataset))
+    return logs["loss"], logs["accuracy"]
+
+
+def build_tf_config(num_workers: int, index: int, base_port: int = 23456) -> str:
+    """TF_CONFIG for worker `index` of a cluster running entirely on localhost."""
+
+    workers = [f"localhost:{base_port + i}" for i in range(num_workers)]
+    return json.dumps({"cluster": {"worker": workers},
+                       "task": {"type": "worker", "index": index}})
+
+
+def launch_local_workers(*, command: t.List[str], num_workers: int, base_port: int = 23456) -> int:
+    """
+    Run `command` once per worker on localhost, each with its own TF_CONFIG.
+    Returns the first non-zero exit code, or 0 when every worker succeeded.
+    """
+    processes = []
+    for index in range(num_workers):
+        env = dict(os.environ, TF_CONFIG = build_tf_config(num_workers, index, base_port))
+        processes.append(subprocess.Popen(command, env = env))
+
+    return_codes = [process.wait() for process in processes]
+    return next((code for code in return_codes if code != 0), 0)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Launch a multi-worker training command on localhost")
+    parser.add_argument("--num-workers", type = int, default = 2)
+    parser.add_argument("--base-port", type = int, default = 23456)
+    parser.add_argument("command", nargs = argparse.REMAINDER)
+    args = parser.parse_args()
+    command = args.command[1:] if args.command[:1] == ["--"] else args.command
+
+    sys.exit(launch_local_workers(command = command, num_workers = args.num_workers,
+                                  base_port = args.base_port))
@@ -0,0 +1,237 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import json
+import os
+import typing as t
+
+import numpy as np
+from tensorflow import keras
+
+INDEX_FORMAT_VERSION = 1
+
+
+def embedding_model(model: keras.Model, *, with_predictions: bool = False) -> keras.Model:
+    """
+    A model returning the image embedding of `model`: the features entering
+    its classification head (the Flatten or global pooling output), before
+    dropout. With `with_predictions`, it returns [embeddings, predictions]
+    from the same forward pass.
+    """
+    head = model.layers[-1]
+    if not isinstance(head, keras.layers.Dense):
+        raise ValueError(f"Expected the model to end with a Dense layer, got {type(head).__name__}")
+    features = head.input
+    # Dropout is the identity at inference, so its input is the same embedding
+    if isinstance(model.layers[-2], keras.layers.Dropout):
+        features = model.layers[-2].input
+    outputs = [features, model.output] if with_predictions else features
+    return keras.Model(inputs = model.inputs, outputs = outputs)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Rows scaled to unit length, so inner products are cosine similarities."""
+
+    vectors = np.asarray(vectors, dtype = np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis = -1, keepdims = True), 1e-12)
+
+
+def _kmeans(vectors: np.ndarray, k: int, *, iterations: int, seed: int) -> np.ndarray:
+    # Spherical k-means: centroids are renormalized means of their members
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size = k, replace = False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis = 1)
+        for cluster in range(k):
+            members = vectors[assignment == cluster]
+            # An empty cluster is restarted on a random vector
+            centroids[cluster] = members.mean(axis = 0) if len(members) else vectors[rng.integers(len(vectors))]
+        centroids = normalize(centroids)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest neighbour index over cosine similarity.
+
+    `build` clusters the vectors with k-means into `nlist` lists and stores
+    them grouped by list, so a query only scores the vectors of its `nprobe`
+    nearest lists. Before it is built, or with fewer vectors than lists, the
+    index searches all vectors exactly. Vectors added later are assigned to
+    their nearest list without reclustering: they go to that list's tail
+    buffer, searched along with it, and are merged into the grouped arrays
+    once more than `max_tail` are buffered or the index is saved.
+
+    `save` writes plain .npy files, which `load` memory-maps.
+    """
+
+    def __init__(self, dim: int, *, nlist: int = 64, nprobe: int = 8, max_tail: int = 4096):
+        if nlist < 1 or not 1 <= nprobe <= nlist:
+            raise ValueError(f"Expected 1 <= nprobe <= nlist, got nprobe={nprobe}, nlist={nlist}")
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.max_tail = max_tail
+        self.centroids = np.zeros((0, dim), dtype = np.float32)
+        self.vectors = np.zeros((0, dim), dtype = np.float32)
+        self.ids = np.zeros(0, dtype = np.int64)
+        # Vectors of list i are vectors[offsets[i]:offsets[i + 1]]
+        self.offsets = np.zeros(1, dtype = np.int64)
+        # Vectors added since the last merge, as (vectors, ids) chunks per list
+        self._tail: t.Dict[int, t.List[t.Tuple[np.ndarray, np.ndarray]]] = {}
+        self._tail_size = 0
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self.ids) + self._tail_size
+
+    @property
+    def is_trained(self) -> bool:
+        return len(self.centroids) > 0
+
+    def _check(self, vectors: np.ndarray, ids: t.Optional[np.ndarray]) -> t.Tuple[np.ndarray, np.ndarray]:
+        vectors = np.asarray(vectors, dtype = np.float32).reshape(-1, self.dim)
+        if ids is None:
+            ids = np.arange(self._next_id, self._next_id + len(vectors), dtype = np.int64)
+        ids = np.asarray(ids, dtype = np.int64).reshape(-1)
+        if len(ids) != len(vectors):
+            raise ValueError(f"Got {len(vectors)} vectors and {len(ids)} ids")
+        return normalize(vectors), ids
+
+    def _store(self, vectors: np.ndarray, ids: np.ndarray, assignment: np.ndarray) -> None:
+        order = np.argsort(assignment, kind = "stable")
+        self.vectors, self.ids = vectors[order], ids[order]
+        counts = np.bincount(assignment, minlength = max(len(self.centroids), 1))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        if len(ids):
+            self._next_id = max(self._next_id, int(ids.max()) + 1)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if not self.is_trained:
+            return np.zeros(len(vectors), dtype = np.int64)
+        return np.argmax(vectors @ self.centroids.T, axis = 1)
+
+    def _assignments(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+
+    def _list(self, i: int) -> t.List[t.Tuple[np.ndarray, np.ndarray]]:
+        # The grouped vectors of list i, then its tail chunks
+        chunks = list(self._tail.get(i, []))
+        if i + 1 < len(self.offsets):
+            start, end = self.offsets[i], self.offsets[i + 1]
+            chunks.insert(0, (self.vectors[start:end], self.ids[start:end]))
+        return chunks
+
+    def _tail_ids(self) -> np.ndarray:
+        chunks = [ids for list_chunks in self._tail.values() for _, ids in list_chunks]
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype = np.int64)
+
+    def merge(self) -> None:
+        """Merge the tail buffers into the grouped arrays."""
+
+        if not self._tail_size:
+            return
+        tail = [(i, vectors, ids) for i, list_chunks in self._tail.items() for vectors, ids in list_chunks]
+        self._store(np.concatenate([np.asarray(self.vectors)] + [vectors for _, vectors, _ in tail]),
+                    np.concatenate([np.asarray(self.ids)] + [ids for _, _, ids in tail]),
+                    np.concatenate([self._assignments()] + [np.full(len(ids), i, dtype = np.int64)
+                                                            for i, _, ids in tail]))
+        self._tail, self._tail_size = {}, 0
+
+    def build(self, vectors: t.Optional[np.ndarray] = None, ids: t.Optional[np.ndarray] = None, *,
+              iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        """Bulk build: cluster the stored vectors, plus `vectors` if given, into `nlist` lists."""
+
+        self.merge()
+        vectors, ids = self._check(vectors if vectors is not None else [], ids)
+        vectors = np.concatenate([np.asarray(self.vectors), vectors])
+        ids = np.concatenate([np.asarray(self.ids), ids])
+        if len(np.unique(ids)) != len(ids):
+            raise ValueError("Vector ids must be unique")
+        if len(vectors) >= self.nlist:
+            self.centroids = _kmeans(vectors, self.nlist, iterations = iterations, seed = seed)
+        else:
+            self.centroids = np.zeros((0, self.dim), dtype = np.float32)
+        self._store(vectors, ids, self._assign(vectors))
+        return self
+
+    def add(self, vectors: np.ndarray, ids: t.Optional[np.ndarray] = None) -> np.ndarray:
+        """Add vectors to their nearest lists; returns their ids, numbered after the largest id by default."""
+
+        given_ids = ids is not None
+        vectors, ids = self._check(vectors, ids)
+        # Numbered ids are new by construction, only given ones are checked against the index
+        if given_ids and (len(np.unique(ids)) != len(ids) or np.isin(ids, self.ids).any()
+                          or np.isin(ids, self._tail_ids()).any()):
+            raise ValueError("Vector ids must be unique")
+        assignment = self._assign(vectors)
+        for i in np.unique(assignment):
+            members = assignment == i
+            self._tail.setdefault(int(i), []).append((vectors[members], ids[members]))
+        self._tail_size += len(ids)
+        if len(ids):
+            self._next_id = max(self._next_id, int(ids.max()) + 1)
+        if self._tail_size > self.max_tail:
+            self.merge()
+        return ids
+
+    def search(self, queries: np.ndarray, k: int = 5) -> t.Tuple[np.ndarray, np.ndarray]:
+        """
+        Ids and cosine similarities of the `k` nearest vectors of each query,
+        best first. Missing neighbours have id -1 and similarity -inf.
+        """
+        queries = normalize(np.asarray(queries, dtype = np.float32).reshape(-1, self.dim))
+        result_ids = np.full((len(queries), k), -1, dtype = np.int64)
+        result_scores = np.full((len(queries), k), -np.inf, dtype = np.float32)
+
+        if self.is_trained:
+            probes = np.argsort(-(queries @ self.centroids.T), axis = 1)[:, :self.nprobe]
+        else:
+            probes = np.zeros((len(queries), 1), dtype = np.int64)
+
+        for row, (query, lists) in enumerate(zip(queries, probes)):
+            chunks = [chunk for i in lists for chunk in self._list(int(i))]
+            if not sum(len(ids) for _, ids in chunks):
+                continue
+            candidates = np.concatenate([ids for _, ids in chunks])
+            scores = np.concatenate([vectors for vectors, _ in chunks]) @ query
+            top = min(k, len(candidates))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            result_ids[row, :top] = candidates[best]
+            result_scores[row, :top] = scores[best]
+        return result_ids, result_scores
+
+    def save(self, directory: Path) -> None:
+        """Merge the tail buffers and write the index to `directory`."""
+
+        self.merge()
+        directory = Path(directory)
+        directory.mkdir(parents = True, exist_ok = True)
+        # Write then rename, so an index memory-mapped from these files keeps reading the old ones
+        for name in ("centroids", "vectors", "ids", "offsets"):
+            with open(directory / f"{name}.npy.tmp", "wb") as f:
+                np.save(f, np.asarray(getattr(self, name)))
+            os.replace(directory / f"{name}.npy.tmp", directory / f"{name}.npy")
+        with open(directory / "index.json.tmp", "w") as f:
+            json.dump({"version": INDEX_FORMAT_VERSION, "dim": self.dim, "nlist": self.nlist,
+                       "nprobe": self.nprobe}, f)
+        os.replace(directory / "index.json.tmp", directory / "index.json")
+
+    @classmethod
+    def load(cls, directory: Path, *, mmap: bool = True, max_tail: int = 4096) -> "IVFIndex":
+        """Load a saved index, memory-mapping its arrays unless `mmap` is False."""
+
+        directory = Path(directory)
+        with open(directory / "index.json") as f:
+            meta = json.load(f)
+        if meta["version"] != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version {meta['version']}")
+        index = cls(meta["dim"], nlist = meta["nlist"], nprobe = meta["nprobe"], max_tail = max_tail)
+        for name in ("centroids", "vectors", "ids", "offsets"):
+            setattr(index, name, np.load(directory / f"{name}.npy", mmap_mode = "r" if mmap else None))
+        index._next_id = int(index.ids.max()) + 1 if len(index.ids) else 0
+        return index
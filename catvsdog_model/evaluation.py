@@ -0,0 +1,335 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import hashlib
+import json
+import multiprocessing
+import os
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.processing.manifest import iter_image_files
+
+# keras.backend.epsilon(), used by binary_crossentropy to clip probabilities
+EPSILON = 1e-7
+
+
+class StreamingMetrics:
+    """
+    Running binary classification statistics: summed log loss and a confusion
+    matrix. Memory does not depend on how many examples were seen, and partial
+    results from shards combine with `merge`.
+    """
+
+    def __init__(self, num_classes: int = 2, threshold: float = 0.5):
+        self.num_classes = num_classes
+        self.threshold = threshold
+        self.loss_sum = 0.0
+        self.confusion = np.zeros((num_classes, num_classes), dtype = np.int64)
+
+    def update(self, y_true: np.ndarray, y_prob: np.ndarray) -> None:
+        y_true = np.asarray(y_true).reshape(-1).astype(np.int64)
+        y_prob = np.clip(np.asarray(y_prob, dtype = np.float64).reshape(-1), EPSILON, 1 - EPSILON)
+
+        self.loss_sum += float(-np.sum(y_true * np.log(y_prob) + (1 - y_true) * np.log(1 - y_prob)))
+        y_pred = (y_prob > self.threshold).astype(np.int64)
+        self.confusion += np.bincount(y_true * self.num_classes + y_pred,
+                                      minlength = self.num_classes ** 2).reshape(self.num_classes, -1)
+
+    def merge(self, other: "StreamingMetrics") -> "StreamingMetrics":
+        self.loss_sum += other.loss_sum
+        self.confusion += other.confusion
+        return self
+
+    @property
+    def total(self) -> int:
+        return int(self.confusion.sum())
+
+    @property
+    def correct(self) -> int:
+        return int(np.trace(self.confusion))
+
+    @property
+    def loss(self) -> float:
+        return self.loss_sum / self.total if self.total else float("nan")
+
+    @property
+    def accuracy(self) -> float:
+        return self.correct / self.total if self.total else float("nan")
+
+    def classification_report(self, class_names: t.Sequence[str]) -> dict:
+        """Per-class precision/recall/F1 plus averages, laid out like sklearn's `output_dict`."""
+
+        true_positives = np.diag(self.confusion).astype(np.float64)
+        support = self.confusion.sum(axis = 1)
+        predicted = self.confusion.sum(axis = 0)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            precision = np.nan_to_num(true_positives / predicted)
+            recall = np.nan_to_num(true_positives / support)
+            f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+
+        report = {name: {"precision": float(precision[i]), "recall": float(recall[i]),
+                         "f1-score": float(f1[i]), "support": int(support[i])}
+                  for i, name in enumerate(class_names)}
+        report["accuracy"] = self.accuracy
+        weights = support / max(self.total, 1)
+        for average, w in [("macro avg", np.full(self.num_classes, 1 / self.num_classes)),
+                           ("weighted avg", weights)]:
+            report[average] = {"precision": float(precision @ w), "recall": float(recall @ w),
+                               "f1-score": float(f1 @ w), "support": self.total}
+        return report
+
+    def to_dict(self) -> dict:
+        return {"num_classes": self.num_classes, "threshold": self.threshold,
+                "loss_sum": self.loss_sum, "confusion": self.confusion.tolist()}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "StreamingMetrics":
+        metrics = cls(state["num_classes"], state["threshold"])
+        metrics.loss_sum = state["loss_sum"]
+        metrics.confusion = np.asarray(state["confusion"], dtype = np.int64)
+        return metrics
+
+
+def list_labelled_files(directory: Path, exclude: t.Collection[str] = ()) -> t.Tuple[t.List[str], t.List[int], t.List[str]]:
+    """
+    Image files of a `<class>/<image>` directory with integer labels, in the
+    order `image_dataset_from_directory(shuffle = False)` would yield them.
+    Files whose real path is in `exclude` (see `load_quarantined`) are left out.
+    """
+    class_names = sorted(entry.name for entry in Path(directory).iterdir() if entry.is_dir())
+    paths, labels = [], []
+    for label, class_name in enumerate(class_names):
+        class_paths = sorted(entry.path for entry in iter_image_files(Path(directory) / class_name)
+                             if not exclude or os.path.realpath(entry.path) not in exclude)
+        paths += class_paths
+        labels += [label] * len(class_paths)
+    return paths, labels, class_names
+
+
+def load_eval_dataset(paths: t.Sequence[str], labels: t.Sequence[int], *, image_size: t.Tuple[int, int],
+                      batch_size: int, shuffle: bool = False) -> tf.data.Dataset:
+    """
+    Decode and resize images exactly like `image_dataset_from_directory`.
+    With `shuffle` the files are reshuffled every epoch.
+    """
+
+    def load_image(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels = 3, expand_animations = False)
+        image = tf.image.resize(image, image_size, method = "bilinear")
+        image.set_shape((*image_size, 3))
+        return image, label
+
+    dataset = tf.data.Dataset.from_tensor_slices((list(paths), np.asarray(labels, dtype = np.int32)))
+    if shuffle:
+        dataset = dataset.shuffle(max(1, len(paths)), reshuffle_each_iteration = True)
+    return (dataset.map(load_image, num_parallel_calls = tf.data.AUTOTUNE)
+            .batch(batch_size)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+def iter_predictions(model: keras.Model, dataset: tf.data.Dataset) -> t.Iterator[t.Tuple[np.ndarray, np.ndarray]]:
+    """Yield (labels, probabilities) batch by batch from a single pass over `dataset`."""
+
+    predict = tf.function(lambda images: model(images, training = False), reduce_retracing = True)
+    for images, labels in dataset:
+        yield labels.numpy(), predict(images).numpy().reshape(-1)
+
+
+def predict_probabilities(model: keras.Model, dataset: tf.data.Dataset) -> np.ndarray:
+    """Probabilities for every example of `dataset`, in order."""
+
+    batches = [probabilities for _, probabilities in iter_predictions(model, dataset)]
+    return np.concatenate(batches) if batches else np.empty(0, dtype = np.float32)
+
+
+def evaluate_streaming(model: keras.Model, dataset: tf.data.Dataset, *,
+                       num_classes: int = 2) -> StreamingMetrics:
+    """Loss, accuracy and confusion matrix of `model` in one pass over `dataset`."""
+
+    metrics = StreamingMetrics(num_classes)
+    for labels, probabilities in iter_predictions(model, dataset):
+        metrics.update(labels, probabilities)
+    return metrics
+
+
+def _evaluate_shard(model_path: str, paths: t.List[str], labels: t.List[int],
+                    image_size: t.Tuple[int, int], batch_size: int, num_classes: int) -> dict:
+    model = keras.models.load_model(model_path)
+    dataset = load_eval_dataset(paths, labels, image_size = image_size, batch_size = batch_size)
+    return evaluate_streaming(model, dataset, num_classes = num_classes).to_dict()
+
+
+def _evaluate_and_predict_shard(model_path: str, paths: t.List[str], labels: t.List[int],
+                                image_size: t.Tuple[int, int], batch_size: int,
+                                num_classes: int) -> t.Tuple[dict, np.ndarray]:
+    model = keras.models.load_model(model_path)
+    dataset = load_eval_dataset(paths, labels, image_size = image_size, batch_size = batch_size)
+    metrics, batches = StreamingMetrics(num_classes), []
+    for batch_labels, probabilities in iter_predictions(model, dataset):
+        metrics.update(batch_labels, probabilities)
+        batches.append(probabilities.astype(np.float32))
+    return metrics.to_dict(), np.concatenate(batches) if batches else np.empty(0, np.float32)
+
+
+def _shard_bounds(num_items: int, num_shards: int) -> t.List[t.Tuple[int, int]]:
+    bounds = np.linspace(0, num_items, num_shards + 1).astype(int)
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def evaluate_sharded(model_path: Path, paths: t.Sequence[str], labels: t.Sequence[int], *,
+                     image_size: t.Tuple[int, int], batch_size: int, num_shards: int,
+                     num_classes: int = 2) -> StreamingMetrics:
+    """
+    Split the files into `num_shards` contiguous shards, evaluate each in its own
+    process and merge the partial statistics.
+    """
+    # TensorFlow is not fork-safe, workers start from a fresh interpreter
+    with ProcessPoolExecutor(max_workers = num_shards, mp_context = multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(_evaluate_shard, str(model_path), list(paths[start:end]), list(labels[start:end]),
+                               tuple(image_size), batch_size, num_classes)
+                   for start, end in _shard_bounds(len(paths), num_shards)]
+        metrics = StreamingMetrics(num_classes)
+        for future in futures:
+            metrics.merge(StreamingMetrics.from_dict(future.result()))
+    return metrics
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def evaluation_fingerprint(model_path: Path, preprocessing: dict) -> str:
+    """
+    Identify the predictions of a saved model under given preprocessing.
+    The whole model file is hashed, so re-saving identical weights is a miss
+    rather than ever reusing predictions of different weights.
+    """
+    digest = hashlib.sha256(file_sha256(model_path).encode())
+    digest.update(json.dumps(preprocessing, sort_keys = True).encode())
+    return digest.hexdigest()[:16]
+
+
+def content_hashes(paths: t.Sequence[str], manifest: t.Optional[t.Dict[str, dict]] = None) -> t.List[str]:
+    """
+    sha256 of every file, taken from the dataset manifest when its size and
+    mtime still match and computed otherwise.
+    """
+    manifest = manifest or {}
+    hashes = []
+    for path in paths:
+        record = manifest.get(Path(path).as_posix())
+        if record:
+            stat = os.stat(path)
+            if (record["size"], record["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                hashes.append(record["sha256"])
+                continue
+        hashes.append(file_sha256(path))
+    return hashes
+
+
+class PredictionCache:
+    """
+    Per-example probabilities of one model/preprocessing fingerprint, keyed by
+    image content hash and stored as `<cache_dir>/<fingerprint>.npz`.
+    Renamed or relabelled files still hit, since labels are never cached.
+    """
+
+    def __init__(self, cache_dir: Path, fingerprint: str):
+        self.path = Path(cache_dir) / f"{fingerprint}.npz"
+        self._probabilities = {}
+        if self.path.is_file():
+            with np.load(self.path) as data:
+                self._probabilities = dict(zip(data["hashes"].tolist(), data["probabilities"].tolist()))
+
+    def __len__(self) -> int:
+        return len(self._probabilities)
+
+    def __contains__(self, content_hash: str) -> bool:
+        return content_hash in self._probabilities
+
+    def missing(self, hashes: t.Sequence[str]) -> t.List[int]:
+        """Positions in `hashes` without a cached prediction."""
+
+        return [i for i, content_hash in enumerate(hashes) if content_hash not in self._probabilities]
+
+    def update(self, hashes: t.Sequence[str], probabilities: t.Sequence[float]) -> None:
+        self._probabilities.update(zip(hashes, np.asarray(probabilities, dtype = np.float64).tolist()))
+
+    def lookup(self, hashes: t.Sequence[str]) -> np.ndarray:
+        return np.array([self._probabilities[content_hash] for content_hash in hashes], dtype = np.float64)
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, hashes = np.array(list(self._probabilities), dtype = "U64"),
+                     probabilities = np.array(list(self._probabilities.values()), dtype = np.float32))
+        os.replace(tmp_path, self.path)
+
+
+def _cached_metrics(labels: t.Sequence[int], hashes: t.Sequence[str], cache: PredictionCache, *,
+                    batch_size: int, num_classes: int) -> t.Tuple[StreamingMetrics, t.List[int]]:
+    # Metrics of the cached examples, a batch at a time, and the positions of the others
+    metrics, missing, batch = StreamingMetrics(num_classes), [], []
+    labels = np.asarray(labels)
+    for position, content_hash in enumerate(hashes):
+        if content_hash in cache:
+            batch.append(position)
+        else:
+            missing.append(position)
+        if len(batch) == batch_size or (batch and position == len(hashes) - 1):
+            metrics.update(labels[batch], cache.lookup([hashes[i] for i in batch]))
+            batch = []
+    return metrics, missing
+
+
+def evaluate_cached(model: keras.Model, paths: t.Sequence[str], labels: t.Sequence[int],
+                    hashes: t.Sequence[str], cache: PredictionCache, *, image_size: t.Tuple[int, int],
+                    batch_size: int, num_classes: int = 2) -> StreamingMetrics:
+    """
+    Like `evaluate_streaming`, taking the probabilities of examples whose
+    content hash is in `cache` from it and predicting only the others. Both go
+    into the metrics, and new predictions into `cache`, one batch at a time.
+    """
+    metrics, missing = _cached_metrics(labels, hashes, cache, batch_size = batch_size, num_classes = num_classes)
+    if not missing:
+        return metrics
+    dataset = load_eval_dataset([paths[i] for i in missing], [labels[i] for i in missing],
+                                image_size = image_size, batch_size = batch_size)
+    done = 0
+    for batch_labels, probabilities in iter_predictions(model, dataset):
+        cache.update([hashes[i] for i in missing[done:done + len(probabilities)]], probabilities)
+        metrics.update(batch_labels, probabilities)
+        done += len(probabilities)
+    return metrics
+
+
+def evaluate_cached_sharded(model_path: Path, paths: t.Sequence[str], labels: t.Sequence[int],
+                            hashes: t.Sequence[str], cache: PredictionCache, *, image_size: t.Tuple[int, int],
+                            batch_size: int, num_shards: int, num_classes: int = 2) -> StreamingMetrics:
+    """`evaluate_cached`, with the uncached examples split across `num_shards` processes."""
+
+    metrics, missing = _cached_metrics(labels, hashes, cache, batch_size = batch_size, num_classes = num_classes)
+    with ProcessPoolExecutor(max_workers = num_shards, mp_context = multiprocessing.get_context("spawn")) as pool:
+        shards = _shard_bounds(len(missing), num_shards)
+        futures = [pool.submit(_evaluate_and_predict_shard, str(model_path),
+                               [paths[i] for i in missing[start:end]], [labels[i] for i in missing[start:end]],
+                               tuple(image_size), batch_size, num_classes)
+                   for start, end in shards]
+        for (start, end), future in zip(shards, futures):
+            shard_metrics, probabilities = future.result()
+            metrics.merge(StreamingMetrics.from_dict(shard_metrics))
+            cache.update([hashes[i] for i in missing[start:end]], probabilities)
+    return metrics
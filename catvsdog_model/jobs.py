@@ -0,0 +1,382 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import fcntl
+import io
+import json
+import os
+import socket
+import sqlite3
+import tarfile
+import threading
+import time
+import typing as t
+import uuid
+import zipfile
+import zlib
+
+import numpy as np
+
+from catvsdog_model.processing.image_io import ImageRejected, decode_image
+
+JOB_STATUSES = ("queued", "running", "done")
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    total INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    idx INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    label TEXT,
+    confidence REAL,
+    error TEXT,
+    claimed_by TEXT,
+    claimed_at REAL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (status, job_id, idx);
+"""
+
+
+def read_manifest(data: bytes) -> t.List[str]:
+    """Image paths from a JSON list (or {"images": [...]}) or a text file with one path per line."""
+
+    text = data.decode("utf-8")
+    try:
+        paths = json.loads(text)
+    except json.JSONDecodeError:
+        return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+    if isinstance(paths, dict):
+        paths = paths.get("images", [])
+    if not isinstance(paths, list) or not all(isinstance(path, str) for path in paths):
+        raise ValueError("A JSON manifest must be a list of image paths")
+    return paths
+
+
+def resolve_sources(paths: t.Sequence[str], root: Path) -> t.List[str]:
+    """
+    Manifest paths resolved against `root`, relative paths from it. A path
+    that resolves outside `root`, through `..` or a symbolic link, rejects the
+    manifest. Paths are not checked for existence, so a rejection says nothing
+    about the files on the server.
+    """
+    root = Path(root).resolve()
+    sources = []
+    for number, path in enumerate(paths, start = 1):
+        source = (root / path).resolve()
+        if not source.is_relative_to(root):
+            raise ValueError(f"Manifest path {number} is outside the job source directory")
+        sources.append(str(source))
+    return sources
+
+
+def _copy_member(source: t.BinaryIO, path: Path, *, name: str, max_bytes: int) -> None:
+    # Declared sizes are checked before extracting; this also stops members that decompress past them
+    copied = 0
+    with open(path, "wb") as f:
+        while chunk := source.read(1 << 20):
+            copied += len(chunk)
+            if copied > max_bytes:
+                raise ValueError(f"Archive member {name} is over the limit of {max_bytes} bytes")
+            f.write(chunk)
+
+
+def extract_archive(archive_file: t.Union[bytes, t.BinaryIO], destination: Path, *, max_images: int,
+                    max_member_bytes: int) -> t.List[str]:
+    """
+    Extract the images of a zip or tar archive, given as a seekable binary
+    file or bytes, into `destination`, flattening directories, and return
+    their paths in archive order. Members are streamed to disk one at a
+    time; the archive is rejected if one is larger than `max_member_bytes`.
+    Other members, and members with unsafe names, are skipped.
+    """
+    destination = Path(destination)
+    destination.mkdir(parents = True, exist_ok = True)
+    if isinstance(archive_file, (bytes, bytearray)):
+        archive_file = io.BytesIO(archive_file)
+
+    archive_file.seek(0)
+    if zipfile.is_zipfile(archive_file):
+        archive = zipfile.ZipFile(archive_file)
+        members = [(info.filename, info.file_size, lambda info = info: archive.open(info))
+                   for info in archive.infolist() if not info.is_dir()]
+    else:
+        archive_file.seek(0)
+        try:
+            archive = tarfile.open(fileobj = archive_file)
+        except tarfile.TarError:
+            raise ValueError("Expected a zip or tar archive")
+        members = [(info.name, info.size, lambda info = info: archive.extractfile(info))
+                   for info in archive.getmembers() if info.isfile()]
+
+    paths = []
+    for name, size, open_member in members:
+        if Path(name).suffix.lower() not in IMAGE_SUFFIXES or ".." in Path(name).parts:
+            continue
+        if len(paths) == max_images:
+            raise ValueError(f"Archive has more than {max_images} images")
+        if size > max_member_bytes:
+            raise ValueError(f"Archive member {name} is over the limit of {max_member_bytes} bytes")
+        path = destination / f"{len(paths):06d}{Path(name).suffix.lower()}"
+        try:
+            with open_member() as source:
+                _copy_member(source, path, name = name, max_bytes = max_member_bytes)
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError, zlib.error) as e:
+            raise ValueError(f"Archive member {name} is corrupt: {e}")
+        paths.append(str(path))
+    return paths
+
+
+class JobStore:
+    """
+    Jobs and per-image results in a SQLite database, so they survive restarts.
+    Images are claimed by workers in batches, under a lease of `lease_seconds`
+    held by this store's owner id. Claims whose lease ran out, such as those
+    of a process that stopped, are released on the next claim, so jobs resume
+    where they stopped. Results are only recorded for images the owner still
+    holds, so an image is never counted twice.
+    """
+
+    def __init__(self, path: Path, *, lease_seconds: float = 600.0):
+        Path(path).parent.mkdir(parents = True, exist_ok = True)
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._db = sqlite3.connect(str(path), check_same_thread = False, isolation_level = None)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.executescript(_SCHEMA)
+            # Databases created before claims had leases
+            columns = {row["name"] for row in self._db.execute("PRAGMA table_info(items)")}
+            for column, kind in (("claimed_by", "TEXT"), ("claimed_at", "REAL")):
+                if column not in columns:
+                    self._db.execute(f"ALTER TABLE items ADD COLUMN {column} {kind}")
+
+    def create_job(self, sources: t.Sequence[str]) -> str:
+        """Queue a job over image `sources` and return its id."""
+
+        if not sources:
+            raise ValueError("A job needs at least one image")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("INSERT INTO jobs (id, status, created_at, updated_at, total) VALUES (?, 'queued', ?, ?, ?)",
+                             (job_id, now, now, len(sources)))
+            self._db.executemany("INSERT INTO items (job_id, idx, source) VALUES (?, ?, ?)",
+                                 [(job_id, index, str(source)) for index, source in enumerate(sources)])
+            self._db.execute("COMMIT")
+        return job_id
+
+    def claim(self, limit: int) -> t.Tuple[t.Optional[str], t.List[t.Tuple[int, str]]]:
+        """Claim up to `limit` pending images of the oldest unfinished job."""
+
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("UPDATE items SET status = 'pending', claimed_by = NULL, claimed_at = NULL "
+                             "WHERE status = 'claimed' AND (claimed_at IS NULL OR claimed_at < ?)",
+                             (now - self.lease_seconds,))
+            row = self._db.execute("SELECT items.job_id FROM items JOIN jobs ON jobs.id = items.job_id "
+                                   "WHERE items.status = 'pending' ORDER BY jobs.created_at LIMIT 1").fetchone()
+            if row is None:
+                self._db.execute("COMMIT")
+                return None, []
+            job_id = row["job_id"]
+            items = self._db.execute("SELECT idx, source FROM items WHERE job_id = ? AND status = 'pending' "
+                                     "ORDER BY idx LIMIT ?", (job_id, limit)).fetchall()
+            self._db.executemany("UPDATE items SET status = 'claimed', claimed_by = ?, claimed_at = ? "
+                                 "WHERE job_id = ? AND idx = ?",
+                                 [(self.owner, now, job_id, item["idx"]) for item in items])
+            self._db.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'queued'",
+                             (now, job_id))
+            self._db.execute("COMMIT")
+        return job_id, [(item["idx"], item["source"]) for item in items]
+
+    def record(self, job_id: str, results: t.Sequence[t.Tuple[int, str, float]],
+               failures: t.Sequence[t.Tuple[int, str]] = ()) -> None:
+        """
+        Store the results of a batch claimed by this store, and finish the job
+        when no image is left. Images whose claim was lost to an expired lease
+        are skipped; they are scored again by their new claimant.
+        """
+        owned = "WHERE job_id = ? AND idx = ? AND status = 'claimed' AND claimed_by = ?"
+        with self._lock:
+            self._db.execute("BEGIN")
+            done = self._db.executemany(f"UPDATE items SET status = 'done', label = ?, confidence = ? {owned}",
+                                        [(label, float(confidence), job_id, index, self.owner)
+                                         for index, label, confidence in results]).rowcount if results else 0
+            failed = self._db.executemany(f"UPDATE items SET status = 'failed', error = ? {owned}",
+                                          [(error, job_id, index, self.owner)
+                                           for index, error in failures]).rowcount if failures else 0
+            remaining = self._db.execute("SELECT COUNT(*) FROM items WHERE job_id = ? AND status IN ('pending', 'claimed')",
+                                         (job_id,)).fetchone()[0]
+            self._db.execute("UPDATE jobs SET done = done + ?, failed = failed + ?, updated_at = ?, "
+                             "status = CASE WHEN ? = 0 THEN 'done' ELSE status END WHERE id = ?",
+                             (done, failed, time.time(), remaining, job_id))
+            self._db.execute("COMMIT")
+
+    def get_job(self, job_id: str) -> t.Optional[dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def results(self, job_id: str) -> t.List[dict]:
+        """Per-image results of a job, in submission order."""
+
+        with self._lock:
+            rows = self._db.execute("SELECT idx, source, status, label, confidence, error FROM items "
+                                    "WHERE job_id = ? ORDER BY idx", (job_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def backlog(self) -> t.Dict[str, int]:
+        """Unfinished jobs, and images still to score."""
+
+        with self._lock:
+            jobs = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status != 'done'").fetchone()[0]
+            images = self._db.execute("SELECT COUNT(*) FROM items WHERE status IN ('pending', 'claimed')").fetchone()[0]
+        return {"jobs": jobs, "images": images}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class JobWorker:
+    """
+    Worker threads scoring job images in batches of `batch_size`, off the
+    request path. `predict` maps a (batch, height, width, 3) array to
+    (label, confidence) pairs. `on_batch` is called on the worker thread after
+    every batch with its size, failures and duration.
+
+    With `lock_path`, only the process holding an exclusive lock on that file
+    runs worker threads, so several API worker processes sharing a store
+    score jobs from one pool. The others keep trying for the lock and take
+    over when its holder exits.
+    """
+
+    def __init__(self, store: JobStore, predict: t.Callable[[np.ndarray], t.Sequence[t.Tuple[str, float]]], *,
+                 image_size: t.Tuple[int, int], batch_size: int = 64, num_workers: int = 1,
+                 poll_interval: float = 1.0, on_batch: t.Optional[t.Callable[[dict], None]] = None,
+                 lock_path: t.Optional[Path] = None):
+        self.store = store
+        self.predict = predict
+        self.image_size = tuple(image_size)
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.on_batch = on_batch
+        self.lock_path = Path(lock_path) if lock_path is not None else None
+        self._stop = threading.Event()
+        self._threads = []
+        self._waiter = None
+        self._lock_file = None
+
+    @property
+    def is_active(self) -> bool:
+        """Whether this process runs the worker threads."""
+
+        return bool(self._threads)
+
+    def run_batch(self) -> int:
+        """Claim and score one batch; returns the number of images processed."""
+
+        job_id, items = self.store.claim(self.batch_size)
+        if not items:
+            return 0
+        start = time.perf_counter()
+        images, indices, failures = [], [], []
+        for index, source in items:
+            try:
+                images.append(decode_image(Path(source).read_bytes(), image_size = self.image_size))
+                indices.append(index)
+            except OSError as e:
+                failures.append((index, f"Could not read the image: {e.strerror or 'read error'}"))
+            except ImageRejected as e:
+                failures.append((index, str(e)))
+
+        results = []
+        if images:
+            try:
+                predictions = self.predict(np.concatenate(images))
+                results = [(index, label, float(np.asarray(confidence).reshape(-1)[0]))
+                           for index, (label, confidence) in zip(indices, predictions)]
+            except Exception as e:
+                failures.extend((index, f"Prediction failed: {e}") for index in indices)
+        self.store.record(job_id, results, failures)
+
+        if self.on_batch is not None:
+            self.on_batch({"job_id": job_id, "images": len(results), "failed": len(failures),
+                           "seconds": time.perf_counter() - start})
+        return len(items)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.run_batch()
+            except Exception as e:
+                print(f"Job worker error: {e}")
+                processed = 0
+            if not processed:
+                self._stop.wait(self.poll_interval)
+
+    def _acquire(self) -> bool:
+        self.lock_path.parent.mkdir(parents = True, exist_ok = True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _start_threads(self) -> None:
+        threads = [threading.Thread(target = self._run, name = f"job-worker-{i}", daemon = True)
+                   for i in range(self.num_workers)]
+        for thread in threads:
+            thread.start()
+        self._threads = threads
+
+    def _wait_for_lock(self) -> None:
+        while not self._stop.is_set():
+            if self._acquire():
+                self._start_threads()
+                return
+            self._stop.wait(self.poll_interval)
+
+    def start(self) -> None:
+        self._stop.clear()
+        if self.lock_path is None or self._acquire():
+            self._start_threads()
+        else:
+            self._waiter = threading.Thread(target = self._wait_for_lock, name = "job-worker-lock", daemon = True)
+            self._waiter.start()
+
+    def stop(self) -> None:
+        """Stop after the batches in progress; their images are recorded before the threads exit."""
+
+        self._stop.set()
+        if self._waiter is not None:
+            self._waiter.join()
+            self._waiter = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
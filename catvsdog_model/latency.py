@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import time
+import typing as t
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+
+def keras_predictor(model: keras.Model) -> t.Callable[[np.ndarray], np.ndarray]:
+    """A compiled inference function for `model`, without `predict`'s per-call overhead."""
+
+    forward = tf.function(lambda images: model(images, training = False), reduce_retracing = True)
+    return lambda images: forward(images).numpy()
+
+
+def measure_latency(predict: t.Callable[[np.ndarray], t.Any], inputs: np.ndarray, *,
+                    runs: int = 50, warmup: int = 2) -> t.Dict[str, float]:
+    """Median, 95th percentile and mean wall time of `predict(inputs)`, in milliseconds."""
+
+    for _ in range(warmup):
+        predict(inputs)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict(inputs)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {"p50_ms": float(np.median(timings)),
+            "p95_ms": float(np.percentile(timings, 95)),
+            "mean_ms": float(np.mean(timings))}
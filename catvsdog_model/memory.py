@@ -0,0 +1,166 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import itertools
+import os
+import tracemalloc
+import typing as t
+from collections import OrderedDict, deque
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.telemetry import process_rss_mb
+
+
+def process_memory() -> t.Dict[str, float]:
+    """Current and peak resident memory of this process, in MiB."""
+
+    fields = {"VmRSS": "rss_mb", "VmHWM": "peak_rss_mb", "RssAnon": "anonymous_mb", "RssFile": "file_backed_mb"}
+    report = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                name = line.split(":")[0]
+                if name in fields:
+                    report[fields[name]] = int(line.split()[1]) / 1024
+    except OSError:
+        report["rss_mb"] = process_rss_mb()
+    return report
+
+
+def tensorflow_memory() -> t.Dict[str, dict]:
+    """Allocator statistics of each TensorFlow device that reports them (GPUs; the CPU allocator does not)."""
+
+    report = {}
+    for device in tf.config.list_logical_devices():
+        try:
+            info = tf.config.experimental.get_memory_info(device.name)
+        except (ValueError, tf.errors.OpError):
+            continue
+        report[device.name] = {"current_mb": info["current"] / 2 ** 20, "peak_mb": info["peak"] / 2 ** 20}
+    return report
+
+
+def model_memory(model: keras.Model) -> t.Dict[str, float]:
+    """Parameter count and weight memory of a loaded model."""
+
+    weights = model.weights
+    return {"parameters": int(sum(np.prod(w.shape) for w in weights)),
+            "weights_mb": sum(np.prod(w.shape) * np.dtype(w.dtype).itemsize for w in weights) / 2 ** 20}
+
+
+def directory_size(path: Path) -> t.Dict[str, float]:
+    """Number of files and total size under a directory, e.g. uploads kept on local disk or tmpfs."""
+
+    files, size = 0, 0
+    for entry in Path(path).rglob("*"):
+        if entry.is_file():
+            files += 1
+            size += entry.stat().st_size
+    return {"files": files, "size_mb": size / 2 ** 20}
+
+
+def nbytes(obj: t.Any) -> int:
+    """Memory held by NumPy arrays in `obj`, a container of them, or an object whose attributes hold them."""
+
+    if isinstance(obj, np.ndarray):
+        # A memory-mapped array is backed by its file, not by the heap
+        return 0 if isinstance(obj, np.memmap) or isinstance(obj.base, np.memmap) else obj.nbytes
+    if isinstance(obj, dict):
+        return sum(nbytes(value) for value in obj.values())
+    if isinstance(obj, (list, tuple, deque)):
+        return sum(nbytes(value) for value in obj)
+    if hasattr(obj, "__dict__"):
+        return sum(nbytes(value) for value in vars(obj).values() if isinstance(value, (np.ndarray, dict, list, tuple)))
+    return 0
+
+
+def _statistics(stats: t.Sequence[t.Any], limit: int) -> t.List[dict]:
+    report = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        entry = {"location": f"{frame.filename}:{frame.lineno}", "size_kb": stat.size / 1024, "count": stat.count}
+        if hasattr(stat, "size_diff"):
+            entry.update({"size_diff_kb": stat.size_diff / 1024, "count_diff": stat.count_diff})
+        report.append(entry)
+    return report
+
+
+class HeapProfiler:
+    """
+    Python heap allocations traced with tracemalloc. Tracing starts when the
+    profiler is created, so create it only where it is wanted: every
+    allocation pays for it from then on. The first snapshot is the baseline
+    and is always kept; of the others, the last `keep` are kept for diffs.
+    """
+
+    def __init__(self, *, frames: int = 1, keep: int = 5):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.keep = keep
+        self.baseline: t.Optional[int] = None
+        self.snapshots = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def snapshot(self) -> int:
+        """Take and keep a snapshot; returns its id."""
+
+        snapshot_id = next(self._ids)
+        self.snapshots[snapshot_id] = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)])
+        if self.baseline is None:
+            self.baseline = snapshot_id
+        evictable = [kept for kept in self.snapshots if kept != self.baseline]
+        for kept in evictable[:max(0, len(evictable) - self.keep)]:
+            del self.snapshots[kept]
+        return snapshot_id
+
+    def report(self, *, limit: int = 20, diff_from: t.Optional[int] = None) -> dict:
+        """
+        Top allocation sites of a new snapshot, and with `diff_from` the sites
+        that grew most since that snapshot.
+        """
+        if diff_from is not None and diff_from not in self.snapshots:
+            raise KeyError(f"No snapshot {diff_from}, kept snapshots are {list(self.snapshots)}")
+        snapshot_id = self.snapshot()
+        current = self.snapshots[snapshot_id]
+        traced, peak = tracemalloc.get_traced_memory()
+        report = {"snapshot_id": snapshot_id,
+                  "snapshots": list(self.snapshots),
+                  "traced_mb": traced / 2 ** 20,
+                  "traced_peak_mb": peak / 2 ** 20,
+                  "top": _statistics(current.statistics("lineno"), limit)}
+        if diff_from is not None:
+            report["diff_from"] = diff_from
+            report["growth"] = _statistics(current.compare_to(self.snapshots[diff_from], "lineno"), limit)
+        return report
+
+    def stop(self) -> None:
+        tracemalloc.stop()
+        self.snapshots.clear()
+        self.baseline = None
+
+
+def memory_report(*, models: t.Optional[t.Mapping[str, keras.Model]] = None,
+                  caches: t.Optional[t.Mapping[str, t.Any]] = None,
+                  directories: t.Optional[t.Mapping[str, Path]] = None, heap: t.Optional[HeapProfiler] = None,
+                  limit: int = 20, diff_from: t.Optional[int] = None) -> dict:
+    """Process, TensorFlow, model, cache and directory memory, plus the heap report when a profiler is given."""
+
+    models, caches, directories = models or {}, caches or {}, directories or {}
+    report = {"pid": os.getpid(),
+              "process": process_memory(),
+              "tensorflow": tensorflow_memory(),
+              "models": {name: model_memory(model) for name, model in models.items() if model is not None},
+              "caches": {name: {"entries": len(cache) if hasattr(cache, "__len__") else None,
+                                "arrays_mb": nbytes(cache) / 2 ** 20}
+                         for name, cache in caches.items() if cache is not None},
+              "directories": {name: directory_size(path) for name, path in directories.items() if Path(path).exists()}}
+    if heap is not None:
+        report["heap"] = heap.report(limit = limit, diff_from = diff_from)
+    return report
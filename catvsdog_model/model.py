@@ -8,26 +8,103 @@ import tensorflow as tf
 from tensorflow import keras
 
 from catvsdog_model.config.core import config
-from catvsdog_model.processing.features import data_augmentation
+from catvsdog_model.processing.features import data_augmentation, get_augmentation_policy, get_data_augmented
+
+
+ARCHITECTURES = ("baseline", "inverted_residual")
+HEADS = ("flatten", "gap")
+
+# Filters of the five baseline conv stages
+BASELINE_FILTERS = (32, 64, 128, 256, 256)
+# Inverted residual stages: (expansion, filters, blocks, stride), after a stride-2 stem
+INVERTED_RESIDUAL_STAGES = ((1, 16, 1, 1), (6, 24, 2, 2), (6, 32, 3, 2), (6, 64, 3, 2), (6, 128, 2, 2))
+
+
+def _scale_filters(filters, width_multiplier, divisor = 8):
+    # Keep channel counts multiples of 8, never dropping more than 10% below the target
+    scaled = max(divisor, int(filters * width_multiplier + divisor / 2) // divisor * divisor)
+    return scaled + divisor if scaled < 0.9 * filters * width_multiplier else scaled
+
+
+def _scale_depth(blocks, depth_multiplier):
+    return max(1, round(blocks * depth_multiplier))
+
+
+def _baseline_backbone(x, width_multiplier, depth_multiplier):
+    for stage, filters in enumerate(BASELINE_FILTERS):
+        filters = _scale_filters(filters, width_multiplier)
+        x = keras.layers.Conv2D(filters=filters, kernel_size=3, activation="relu")(x)
+        # Extra layers keep the spatial size, so deeper variants end at the same resolution
+        for _ in range(_scale_depth(1, depth_multiplier) - 1):
+            x = keras.layers.Conv2D(filters=filters, kernel_size=3, padding="same", activation="relu")(x)
+        if stage < len(BASELINE_FILTERS) - 1:
+            x = keras.layers.MaxPooling2D(pool_size=2)(x)
+    return x
+
+
+def _inverted_residual_block(x, expansion, filters, stride):
+    in_filters = x.shape[-1]
+    shortcut = x
+    if expansion != 1:
+        x = keras.layers.Conv2D(filters=in_filters * expansion, kernel_size=1, use_bias=False)(x)
+        x = keras.layers.BatchNormalization()(x)
+        x = keras.layers.ReLU(max_value=6.0)(x)
+    x = keras.layers.DepthwiseConv2D(kernel_size=3, strides=stride, padding="same", use_bias=False)(x)
+    x = keras.layers.BatchNormalization()(x)
+    x = keras.layers.ReLU(max_value=6.0)(x)
+    # Linear bottleneck: no activation after the projection
+    x = keras.layers.Conv2D(filters=filters, kernel_size=1, use_bias=False)(x)
+    x = keras.layers.BatchNormalization()(x)
+    if stride == 1 and in_filters == filters:
+        x = keras.layers.Add()([shortcut, x])
+    return x
+
+
+def _inverted_residual_backbone(x, width_multiplier, depth_multiplier):
+    x = keras.layers.Conv2D(filters=_scale_filters(32, width_multiplier), kernel_size=3, strides=2,
+                            padding="same", use_bias=False)(x)
+    x = keras.layers.BatchNormalization()(x)
+    x = keras.layers.ReLU(max_value=6.0)(x)
+    for expansion, filters, blocks, stride in INVERTED_RESIDUAL_STAGES:
+        for block in range(_scale_depth(blocks, depth_multiplier)):
+            x = _inverted_residual_block(x, expansion, _scale_filters(filters, width_multiplier),
+                                         stride if block == 0 else 1)
+    return x
 
 
 # Create a function that returns a model
-def create_model(input_shape, optimizer, loss, metrics):
+# Augmentation layers are only built in when augmentation is not done in the input pipeline,
+# from the named augmentation policy or else the configured one
+def create_model(input_shape, optimizer, loss, metrics,
+                 augment = config.model_cfg.augmentation_placement == "model",
+                 architecture = config.model_cfg.architecture,
+                 head = config.model_cfg.head,
+                 width_multiplier = config.model_cfg.width_multiplier,
+                 depth_multiplier = config.model_cfg.depth_multiplier,
+                 augmentation_policy = None):
+
+    if architecture not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture {architecture!r}, expected one of {ARCHITECTURES}")
+    if head not in HEADS:
+        raise ValueError(f"Unknown head {head!r}, expected one of {HEADS}")
 
     inputs = keras.Input(shape=input_shape)
-    x = data_augmentation(inputs)
+    augmentation = data_augmentation
+    if augmentation_policy is not None:
+        augmentation = get_data_augmented(**get_augmentation_policy(augmentation_policy).model_dump())
+    x = augmentation(inputs) if augment and augmentation.layers else inputs
     x = keras.layers.Rescaling(1. / config.model_cfg.scaling_factor)(x)
-    x = keras.layers.Conv2D(filters=32, kernel_size=3, activation="relu")(x)
-    x = keras.layers.MaxPooling2D(pool_size=2)(x)
-    x = keras.layers.Conv2D(filters=64, kernel_size=3, activation="relu")(x)
-    x = keras.layers.MaxPooling2D(pool_size=2)(x)
-    x = keras.layers.Conv2D(filters=128, kernel_size=3, activation="relu")(x)
-    x = keras.layers.MaxPooling2D(pool_size=2)(x)
-    x = keras.layers.Conv2D(filters=256, kernel_size=3, activation="relu")(x)
-    x = keras.layers.MaxPooling2D(pool_size=2)(x)
-    x = keras.layers.Conv2D(filters=256, kernel_size=3, activation="relu")(x)
-    
-    x = keras.layers.Flatten()(x)
+    if architecture == "baseline":
+        x = _baseline_backbone(x, width_multiplier, depth_multiplier)
+    else:
+        x = _inverted_residual_backbone(x, width_multiplier, depth_multiplier)
+
+    # Flatten keeps every spatial position (about 12k features on 180x180 input),
+    # global average pooling one value per channel
+    if head == "flatten":
+        x = keras.layers.Flatten()(x)
+    else:
+        x = keras.layers.GlobalAveragePooling2D()(x)
     x = keras.layers.Dropout(0.5)(x)
     outputs = keras.layers.Dense(1, activation="sigmoid")(x)
 
@@ -5,23 +5,46 @@ parent, root = file.parent, file.parents[1]
 sys.path.append(str(root))
 
 from typing import Union
+import numpy as np
 import pandas as pd
 import tensorflow as tf
 
 from catvsdog_model import __version__ as _version
+from catvsdog_model.cascade import CascadeClassifier
 from catvsdog_model.config.core import config
 from catvsdog_model.processing.data_manager import load_model, load_test_dataset
+from catvsdog_model.shadow import ShadowRunner
 
 model_file_name = f"{config.app_cfg.model_save_file}{_version}"
 clf_model = load_model(file_name = model_file_name)
 
+# Cascade inference: the tiny first stage answers confident images on its own
+cascade = None
+if config.model_cfg.cascade.enabled:
+    first_stage = load_model(file_name = f"{config.app_cfg.cascade_save_file}{_version}")
+    cascade = CascadeClassifier(first_stage, clf_model, threshold = config.model_cfg.cascade.threshold)
 
-def make_prediction(*, input_data: Union[pd.DataFrame, dict, tf.Tensor]) -> dict:
-    """Make a prediction using a saved model """
+# Shadow inference: a candidate version scores sampled requests off the serving path
+shadow = None
+if config.model_cfg.shadow.enabled:
+    shadow_cfg = config.model_cfg.shadow
+    candidate = load_model(file_name = f"{config.app_cfg.model_save_file}{shadow_cfg.candidate_version}")
+    shadow = ShadowRunner(candidate,
+                          fraction = shadow_cfg.fraction,
+                          max_pending = shadow_cfg.max_pending,
+                          max_primary_in_flight = shadow_cfg.max_primary_in_flight)
+
+
+def make_prediction(*, input_data: Union[pd.DataFrame, dict, tf.Tensor], batch_size: Union[int, None] = None) -> dict:
+    """Make a prediction using a saved model, scoring at most `batch_size` images per model call"""
     
     results = {"predictions": None, "version": _version}
     
-    predictions = clf_model.predict(input_data, verbose = 0)
+    if cascade is not None:
+        cascade_result = cascade.predict(np.asarray(input_data), batch_size = batch_size)
+        predictions = cascade_result["probabilities"].reshape(-1, 1)
+    else:
+        predictions = clf_model.predict(input_data, verbose = 0, batch_size = batch_size)
 
     pred_labels = []
     for prediction in predictions:
@@ -29,11 +52,24 @@ def make_prediction(*, input_data: Union[pd.DataFrame, dict, tf.Tensor]) -> dict
         score = 0.5 + prediction if prediction <= 0.5 else prediction
         pred_labels.append((label, score))
         
-    results = {"predictions": pred_labels, "version": _version}
+    results = {"predictions": pred_labels, "version": _version,
+               "probabilities": np.asarray(predictions).reshape(-1)}
+    if cascade is not None:
+        # Which stage answered each image, and the time spent in each stage
+        results["stages"] = ["full" if escalated else "first" for escalated in cascade_result["escalated"]]
+        results["latency_ms"] = cascade_result["latency_ms"]
 
     return results
 
 
+def submit_shadow(*, input_data: Union[np.ndarray, tf.Tensor], results: dict, primary_in_flight: int = 0) -> Union[str, None]:
+    """Send a served request to the shadow candidate, returning its outcome, or None when shadow mode is off"""
+
+    if shadow is None:
+        return None
+    return shadow.submit(np.asarray(input_data), results["probabilities"], primary_in_flight = primary_in_flight)
+
+
 if __name__ == "__main__":
 
     test_data = load_test_dataset()
@@ -4,62 +4,358 @@ file = Path(__file__).resolve()
 parent, root = file.parent, file.parents[1]
 sys.path.append(str(root))
 
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
 import typing as t
+import zipfile
 from pathlib import Path
 
 import tensorflow as tf
+import numpy as np
 from tensorflow import keras
 from keras.utils import image_dataset_from_directory
 from catvsdog_model.config.core import config
+from catvsdog_model.processing.features import augment_dataset, get_augmentation_policy
+from catvsdog_model.evaluation import list_labelled_files, load_eval_dataset
 from catvsdog_model import __version__ as _version
 from catvsdog_model.config.core import DATASET_DIR, TRAINED_MODEL_DIR, config
 
-def load_train_dataset():
-    train_dataset = image_dataset_from_directory(directory = DATASET_DIR / config.app_cfg.train_path,
-                                                image_size = config.model_cfg.image_size,
-                                                batch_size = config.model_cfg.batch_size)    
+def _image_dataset(directory: Path, *, batch_size: t.Optional[int], exclude: t.Collection[str]) -> tf.data.Dataset:
+    # image_dataset_from_directory cannot skip files, so with quarantined images
+    # the file list is built here and decoded the same way
+    batch_size = batch_size or config.model_cfg.batch_size
+    if not exclude:
+        return image_dataset_from_directory(directory = directory, image_size = config.model_cfg.image_size,
+                                            batch_size = batch_size)
+    paths, labels, class_names = list_labelled_files(directory, exclude)
+    dataset = load_eval_dataset(paths, labels, image_size = tuple(config.model_cfg.image_size),
+                                batch_size = batch_size, shuffle = True)
+    dataset.class_names = class_names
+    return dataset
+
+
+def load_train_dataset(*, batch_size: t.Optional[int] = None, augmentation_policy: t.Optional[str] = None,
+                       exclude: t.Collection[str] = ()):
+    train_dataset = _image_dataset(DATASET_DIR / config.app_cfg.train_path, batch_size = batch_size, exclude = exclude)
+    if config.model_cfg.augmentation_placement == "pipeline":
+        train_dataset = augment_dataset(train_dataset, get_augmentation_policy(augmentation_policy))
     return train_dataset
 
 
-def load_validation_dataset():
-    validation_dataset = image_dataset_from_directory(directory = DATASET_DIR / config.app_cfg.validation_path,
-                                                    image_size = config.model_cfg.image_size,
-                                                    batch_size = config.model_cfg.batch_size)
+def load_validation_dataset(*, batch_size: t.Optional[int] = None, exclude: t.Collection[str] = ()):
+    validation_dataset = _image_dataset(DATASET_DIR / config.app_cfg.validation_path, batch_size = batch_size,
+                                        exclude = exclude)
     return validation_dataset
 
 
-def load_test_dataset():
-    test_dataset = image_dataset_from_directory(directory = DATASET_DIR / config.app_cfg.test_path,
-                                                image_size = config.model_cfg.image_size,
-                                                batch_size = config.model_cfg.batch_size)
+def load_test_dataset(*, batch_size: t.Optional[int] = None, exclude: t.Collection[str] = ()):
+    test_dataset = _image_dataset(DATASET_DIR / config.app_cfg.test_path, batch_size = batch_size, exclude = exclude)
     return test_dataset
 
 
+def checkpoint_callbacks(save_path: Path, *, write_fast_artifact: bool = True,
+                         async_checkpoint: t.Optional[bool] = None, monitor: t.Optional[str] = None,
+                         save_best_only: t.Optional[bool] = None) -> t.List[keras.callbacks.Callback]:
+    """
+    Callbacks saving the best model to `save_path` and, with
+    `write_fast_artifact`, its fast-loading artifact. With `async_checkpoint`
+    (config.yml's `async_checkpoint` by default) the files are written on a
+    background thread. `monitor` and `save_best_only` default to config.yml too.
+    """
+    monitor = monitor or config.model_cfg.monitor
+    save_best_only = config.model_cfg.save_best_only if save_best_only is None else save_best_only
+    if config.model_cfg.async_checkpoint if async_checkpoint is None else async_checkpoint:
+        return [AsyncModelCheckpoint(save_path,
+                                     monitor = monitor,
+                                     save_best_only = save_best_only,
+                                     max_pending = config.model_cfg.checkpoint_max_pending,
+                                     compression_level = config.model_cfg.checkpoint_compression_level,
+                                     write_fast_artifact = write_fast_artifact)]
+
+    callback_list = [keras.callbacks.ModelCheckpoint(filepath = save_path,
+                                                     save_best_only = save_best_only,
+                                                     monitor = monitor)]
+    if write_fast_artifact:
+        # Runs after ModelCheckpoint, so it sees the weights that were just saved
+        callback_list.append(FastArtifactCheckpoint(save_path))
+    return callback_list
+
+
 # Define a function to return a commmonly used callback_list
-def callbacks_and_save_model():
+# Checkpoint and early stopping settings default to config.yml; a patience of 0 disables early stopping
+def callbacks_and_save_model(*, is_chief: bool = True, async_checkpoint: t.Optional[bool] = None,
+                             monitor: t.Optional[str] = None, save_best_only: t.Optional[bool] = None,
+                             early_stopping_patience: t.Optional[int] = None):
     callback_list = []
     
     # Prepare versioned save file name
     save_file_name = f"{config.app_cfg.model_save_file}{_version}.keras"
-    save_path = TRAINED_MODEL_DIR / save_file_name
 
-    remove_old_model(files_to_keep = [save_file_name])
+    if is_chief:
+        save_path = TRAINED_MODEL_DIR / save_file_name
+        # The student and cascade first stage of this version and all fast-loading artifacts are kept alongside it
+        companions = [TRAINED_MODEL_DIR / f"{config.app_cfg.student_save_file}{_version}.keras",
+                      TRAINED_MODEL_DIR / f"{config.app_cfg.cascade_save_file}{_version}.keras"]
+        remove_old_model(files_to_keep = [save_file_name, *(path.name for path in companions),
+                                          *(path.name for model_path in [save_path, *companions]
+                                            for path in fast_artifact_paths(model_path))])
+    else:
+        # Under a multi-worker strategy every worker takes part in saving,
+        # but only the chief's copy is kept
+        save_path = Path(tempfile.mkdtemp()) / save_file_name
 
     # Default callback
-    callback_list.append(keras.callbacks.ModelCheckpoint(filepath = save_path,
-                                                         save_best_only = config.model_cfg.save_best_only,
-                                                         monitor = config.model_cfg.monitor))
+    callback_list.extend(checkpoint_callbacks(save_path, write_fast_artifact = is_chief,
+                                              async_checkpoint = async_checkpoint, monitor = monitor,
+                                              save_best_only = save_best_only))
 
-    if config.model_cfg.earlystop > 0:
-        callback_list.append(keras.callbacks.EarlyStopping(patience = config.model_cfg.earlystop))
+    patience = config.model_cfg.earlystop if early_stopping_patience is None else early_stopping_patience
+    if patience > 0:
+        callback_list.append(keras.callbacks.EarlyStopping(patience = patience))
 
     return callback_list
 
 
-def load_model(*, file_name: str) -> keras.models.Model:
-    """Load a persisted model."""
+# Fast-loading serving artifact: `<name>.fast.json` holds the model architecture and
+# the layout of `<name>.fast.bin`, the raw weights, each aligned to 64 bytes
+FAST_CONFIG_SUFFIX = ".fast.json"
+FAST_WEIGHTS_SUFFIX = ".fast.bin"
+FAST_FORMAT_VERSION = 1
+_WEIGHT_ALIGNMENT = 64
+
+
+def fast_artifact_paths(model_path: Path) -> t.Tuple[Path, Path]:
+    """Config and weight files of the fast artifact written next to a `.keras` file."""
+
+    model_path = Path(model_path)
+    stem = model_path.name.removesuffix(".keras")
+    return (model_path.with_name(stem + FAST_CONFIG_SUFFIX),
+            model_path.with_name(stem + FAST_WEIGHTS_SUFFIX))
+
+
+def _strip_augmentation(model: keras.Model) -> keras.Model:
+    # Random* layers are identities at inference; drop a Sequential of them right after the input
+    if len(model.layers) > 1 and isinstance(model.layers[1], keras.Sequential):
+        block = model.layers[1]
+        if all(layer.__class__.__name__.startswith("Random") for layer in block.layers):
+            return keras.Model(inputs = block.output, outputs = model.output, name = model.name)
+    return model
+
+
+def save_fast_artifact(model: keras.Model, model_path: Path) -> t.Tuple[Path, Path]:
+    """
+    Write the inference part of `model` as a fast-loading artifact next to
+    `model_path`. Augmentation layers and the optimizer state are left out,
+    the compile settings are kept. Both files are written to temporary names first, so readers
+    never see a half-written artifact.
+    """
+    config_path, weights_path = fast_artifact_paths(model_path)
+    serving_model = _strip_augmentation(model)
+
+    layout, offset = [], 0
+    weights = serving_model.get_weights()
+    for weight in weights:
+        offset = -(-offset // _WEIGHT_ALIGNMENT) * _WEIGHT_ALIGNMENT
+        layout.append({"dtype": weight.dtype.str, "shape": list(weight.shape), "offset": offset})
+        offset += weight.nbytes
+
+    blob = np.zeros(offset, dtype = np.uint8)
+    for weight, entry in zip(weights, layout):
+        blob[entry["offset"]:entry["offset"] + weight.nbytes] = np.ascontiguousarray(weight).view(np.uint8).reshape(-1)
+
+    tmp_weights = weights_path.with_name(weights_path.name + ".tmp")
+    blob.tofile(tmp_weights)
+    tmp_config = config_path.with_name(config_path.name + ".tmp")
+    tmp_config.write_text(json.dumps({"version": FAST_FORMAT_VERSION,
+                                      "model": json.loads(serving_model.to_json()),
+                                      "weights": layout}))
+    tmp_weights.replace(weights_path)
+    tmp_config.replace(config_path)
+    return config_path, weights_path
+
+
+def load_fast_artifact(model_path: Path) -> keras.models.Model:
+    """
+    Rebuild an inference model from the fast artifact of `model_path`,
+    copying the weights straight from a memory map of the weight blob.
+    """
+    config_path, weights_path = fast_artifact_paths(model_path)
+    spec = json.loads(config_path.read_text())
+    if spec["version"] != FAST_FORMAT_VERSION:
+        raise ValueError(f"Unsupported fast artifact version {spec['version']} in {config_path}")
+
+    model = keras.models.model_from_json(json.dumps(spec["model"]))
+    blob = np.memmap(weights_path, dtype = np.uint8, mode = "r")
+    weights = []
+    for entry in spec["weights"]:
+        dtype = np.dtype(entry["dtype"])
+        size = int(np.prod(entry["shape"], dtype = np.int64)) * dtype.itemsize
+        weights.append(blob[entry["offset"]:entry["offset"] + size].view(dtype).reshape(entry["shape"]))
+    model.set_weights(weights)
+    return model
+
+
+class FastArtifactCheckpoint(keras.callbacks.Callback):
+    """Write the fast-loading artifact whenever the `.keras` file at `model_path` was re-saved."""
+
+    def __init__(self, model_path: Path):
+        super().__init__()
+        self.model_path = Path(model_path)
+        self._saved_mtime = None
+
+    def on_epoch_end(self, epoch, logs = None):
+        if not self.model_path.exists():
+            return
+        mtime = self.model_path.stat().st_mtime_ns
+        if mtime != self._saved_mtime:
+            save_fast_artifact(self.model, self.model_path)
+            self._saved_mtime = mtime
+
+
+class AsyncModelCheckpoint(keras.callbacks.Callback):
+    """
+    Save the model to `filepath` like ModelCheckpoint, without blocking
+    training on the write.
+
+    On the training thread a save only copies the weights and optimizer state
+    into memory. A writer thread loads the copy into a clone of the model,
+    saves the `.keras` archive on local disk, writes it deflated at
+    `compression_level` (0 stores it) to a temporary file next to `filepath`
+    and renames it into place, then writes the fast-loading artifact. At most
+    `max_pending` snapshots wait to be written; training blocks only when that
+    many are waiting, and the writer skips to the newest one. All writes are
+    done when `on_train_end` returns, and a failed write is raised on the
+    training thread.
+    """
+
+    def __init__(self, filepath: Path, *, monitor: str = "val_loss", save_best_only: bool = True,
+                 max_pending: int = 2, compression_level: int = 1, write_fast_artifact: bool = True):
+        super().__init__()
+        self.filepath = Path(filepath)
+        self.monitor = monitor
+        self.save_best_only = save_best_only
+        self.max_pending = max_pending
+        self.compression_level = compression_level
+        self.write_fast_artifact = write_fast_artifact
+        self.best = np.inf if "loss" in monitor else -np.inf
+        self.stats = {"saves": 0, "written": 0, "superseded": 0, "blocked_seconds": 0.0, "write_seconds": 0.0}
+        self._queue = queue.Queue(maxsize = max_pending)
+        self._thread = None
+        self._error = None
+        self._copy = None
+
+    def on_train_begin(self, logs = None):
+        self._compile_config = self.model.get_compile_config() if self.model.optimizer is not None else None
+        self._local_dir = Path(tempfile.mkdtemp(prefix = "checkpoint-"))
+        self._thread = threading.Thread(target = self._run, name = "async-checkpoint", daemon = True)
+        self._thread.start()
+
+    def on_epoch_end(self, epoch, logs = None):
+        self._raise_error()
+        current = (logs or {}).get(self.monitor)
+        if self.save_best_only and current is not None:
+            improved = current < self.best if "loss" in self.monitor else current > self.best
+            if not improved:
+                return
+            self.best = current
+
+        start = time.perf_counter()
+        optimizer = self.model.optimizer
+        snapshot = (self.model.get_weights(),
+                    [variable.numpy() for variable in optimizer.variables] if optimizer is not None else [])
+        self._queue.put(snapshot)
+        self.stats["saves"] += 1
+        self.stats["blocked_seconds"] += time.perf_counter() - start
+
+    def on_train_end(self, logs = None):
+        start = time.perf_counter()
+        self._queue.put(None)
+        self._thread.join()
+        self.stats["blocked_seconds"] += time.perf_counter() - start
+        shutil.rmtree(self._local_dir, ignore_errors = True)
+        self._raise_error()
+        if self.stats["saves"]:
+            print(f"✓ Async checkpoints: {self.stats['written']} of {self.stats['saves']} saves written to "
+                  f"{self.filepath.name} in {self.stats['write_seconds']:.2f}s, training waited "
+                  f"{self.stats['blocked_seconds']:.2f}s ({self.time_saved:.2f}s saved)")
+
+    @property
+    def time_saved(self) -> float:
+        """Seconds of checkpoint writing kept off the training thread."""
+
+        return max(0.0, self.stats["write_seconds"] - self.stats["blocked_seconds"])
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError(f"Writing checkpoint {self.filepath} failed") from error
+
+    def _run(self) -> None:
+        while True:
+            snapshots = [self._queue.get()]
+            # Snapshots queued while the last one was written are superseded by the newest
+            while snapshots[-1] is not None and not self._queue.empty():
+                snapshots.append(self._queue.get())
+            finished = snapshots[-1] is None
+            snapshots = [snapshot for snapshot in snapshots if snapshot is not None]
+            if snapshots and self._error is None:
+                self.stats["superseded"] += len(snapshots) - 1
+                start = time.perf_counter()
+                try:
+                    self._write(*snapshots[-1])
+                    self.stats["written"] += 1
+                except Exception as e:
+                    self._error = e
+                self.stats["write_seconds"] += time.perf_counter() - start
+            if finished:
+                return
+
+    def _write(self, weights: t.List[np.ndarray], optimizer_state: t.List[np.ndarray]) -> None:
+        if self._copy is None:
+            self._copy = keras.models.clone_model(self.model)
+            if self._compile_config is not None:
+                self._copy.compile_from_config(self._compile_config)
+        self._copy.set_weights(weights)
+        if optimizer_state and len(optimizer_state) == len(self._copy.optimizer.variables):
+            for variable, value in zip(self._copy.optimizer.variables, optimizer_state):
+                variable.assign(value)
+
+        local_path = self._local_dir / self.filepath.name
+        self._copy.save(local_path)
+        self.filepath.parent.mkdir(parents = True, exist_ok = True)
+        tmp_path = self.filepath.with_name(self.filepath.name + ".tmp")
+        if self.compression_level > 0:
+            with zipfile.ZipFile(local_path) as source, \
+                    zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED, compresslevel = self.compression_level) as target:
+                for info in source.infolist():
+                    with source.open(info) as src, target.open(info.filename, "w") as dst:
+                        shutil.copyfileobj(src, dst, 1 << 20)
+        else:
+            shutil.copyfile(local_path, tmp_path)
+        os.replace(tmp_path, self.filepath)
+        if self.write_fast_artifact:
+            save_fast_artifact(self._copy, self.filepath)
+
+
+def load_model(*, file_name: str, fast: bool = True) -> keras.models.Model:
+    """
+    Load a persisted model.
+    With `fast`, the fast-loading artifact is used when it is present and not
+    older than the `.keras` file. It only holds the inference model, so code
+    that continues training passes `fast = False`.
+    """
 
     file_path = TRAINED_MODEL_DIR / f"{file_name}.keras"
+    config_path, weights_path = fast_artifact_paths(file_path)
+    if fast and config_path.exists() and weights_path.exists() and \
+            (not file_path.exists() or config_path.stat().st_mtime_ns >= file_path.stat().st_mtime_ns):
+        return load_fast_artifact(file_path)
+
     trained_model = keras.models.load_model(filepath = file_path)
     return trained_model
 
@@ -72,5 +368,5 @@ def remove_old_model(*, files_to_keep: t.List[str]) -> None:
     """
     do_not_delete = files_to_keep + ["__init__.py"]
     for model_file in TRAINED_MODEL_DIR.iterdir():
-        if model_file.name not in do_not_delete:
+        if model_file.is_file() and model_file.name not in do_not_delete:
             model_file.unlink()
@@ -0,0 +1,193 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import typing as t
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+# When near-duplicates span splits, the copy in the first split listed is kept,
+# so evaluation sets stay as stable as possible and training loses the leak
+SPLIT_PRIORITY = ("test", "validation", "train")
+
+_M1, _M2, _M4 = np.uint64(0x5555555555555555), np.uint64(0x3333333333333333), np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def dhash(path: str) -> int:
+    """
+    64-bit difference hash: the image is shrunk to 9x8 grayscale and each bit
+    records whether a pixel is brighter than its right neighbour.
+    Robust to rescaling, recompression and small brightness changes.
+    """
+    with Image.open(path) as img:
+        # Let the JPEG decoder downscale while decoding instead of decoding full size
+        img.draft("L", (64, 64))
+        pixels = np.asarray(img.convert("L").resize((9, 8), Image.BILINEAR), dtype = np.int16)
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def compute_hashes(paths: t.Sequence[str], *, workers: t.Optional[int] = None) -> t.List[int]:
+    """Perceptual hashes of `paths`, computed in a process pool."""
+
+    if not paths:
+        return []
+    with ProcessPoolExecutor(max_workers = workers) as pool:
+        return list(pool.map(dhash, paths, chunksize = max(1, min(256, len(paths) // 64))))
+
+
+def hamming_distance(hashes: np.ndarray, query: int) -> np.ndarray:
+    """Bit distance between every 64-bit hash in `hashes` and `query`."""
+
+    # Branch-free SWAR popcount, vectorised over the whole array
+    x = np.bitwise_xor(np.asarray(hashes, dtype = np.uint64), np.uint64(query))
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+
+class HammingIndex:
+    """
+    Multi-index hashing for radius search over 64-bit hashes.
+    Hashes are split into `max_distance + 1` disjoint bit ranges, each kept in a
+    sorted table. Two hashes within `max_distance` bits must agree exactly on at
+    least one range, so a query only verifies hashes sharing one of its chunks
+    instead of scanning the whole set.
+    """
+
+    def __init__(self, hashes: t.Sequence[int], max_distance: int):
+        if not 0 <= max_distance < HASH_BITS:
+            raise ValueError(f"max_distance must be between 0 and {HASH_BITS - 1}")
+        self.hashes = np.asarray(hashes, dtype = np.uint64)
+        self.max_distance = max_distance
+
+        bounds = np.linspace(0, HASH_BITS, max_distance + 2).astype(int)
+        self._ranges = list(zip(bounds[:-1], bounds[1:]))
+        self._tables = []
+        for low, high in self._ranges:
+            keys = self._chunk(self.hashes, low, high)
+            order = np.argsort(keys, kind = "stable")
+            self._tables.append((keys[order], order))
+
+    @staticmethod
+    def _chunk(hashes, low, high):
+        mask = np.uint64((1 << (high - low)) - 1)
+        return np.right_shift(hashes, np.uint64(low)) & mask
+
+    def query(self, query: int) -> np.ndarray:
+        """Indices of all hashes within `max_distance` bits of `query`."""
+
+        query = np.uint64(query)
+        candidates = []
+        for (low, high), (keys, order) in zip(self._ranges, self._tables):
+            key = self._chunk(query, low, high)
+            start, end = np.searchsorted(keys, key, side = "left"), np.searchsorted(keys, key, side = "right")
+            candidates.append(order[start:end])
+
+        candidates = np.unique(np.concatenate(candidates))
+        return candidates[hamming_distance(self.hashes[candidates], query) <= self.max_distance]
+
+    def pairs(self) -> np.ndarray:
+        """
+        All index pairs (i < j) within `max_distance` bits, as an (n, 2) array.
+        Each sorted table is swept with a growing offset; since equal keys are
+        adjacent, only positions still inside a run of equal keys stay active, so
+        the work is proportional to the candidate pairs rather than n squared.
+        """
+        found = [np.empty((0, 2), dtype = np.int64)]
+        for keys, order in self._tables:
+            active = np.arange(len(keys) - 1)
+            offset = 1
+            while active.size:
+                active = active[keys[active] == keys[active + offset]]
+                first, second = order[active], order[active + offset]
+                close = hamming_distance(self.hashes[first] ^ self.hashes[second], 0) <= self.max_distance
+                found.append(np.sort(np.stack([first[close], second[close]], axis = 1), axis = 1))
+                offset += 1
+                active = active[active + offset < len(keys)]
+
+        return np.unique(np.concatenate(found), axis = 0)
+
+
+def _find(parents: np.ndarray, i: int) -> int:
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def group_near_duplicates(hashes: t.Sequence[int], max_distance: int) -> t.List[t.List[int]]:
+    """
+    Connected groups (size > 1) of hashes within `max_distance` bits of each other.
+    Identical hashes are collapsed before searching, so large clusters of the
+    same image do not inflate the candidate lists.
+    """
+    unique, inverse = np.unique(np.asarray(hashes, dtype = np.uint64), return_inverse = True)
+    parents = np.arange(len(unique))
+
+    if max_distance:
+        for i, j in HammingIndex(unique, max_distance).pairs():
+            root_i, root_j = _find(parents, i), _find(parents, j)
+            if root_i != root_j:
+                parents[root_j] = root_i
+
+    groups = defaultdict(list)
+    for position, unique_index in enumerate(inverse):
+        groups[_find(parents, unique_index)].append(position)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def _keep_order(record: t.Tuple[str, dict]) -> tuple:
+    key, entry = record
+    split = entry["split"]
+    return (SPLIT_PRIORITY.index(split) if split in SPLIT_PRIORITY else len(SPLIT_PRIORITY), key)
+
+
+def find_duplicates(manifest: t.Dict[str, dict], *, max_distance: int, workers: t.Optional[int] = None,
+                    hash_cache: t.Optional[t.Dict[str, int]] = None) -> t.List[dict]:
+    """
+    Group exact and near-duplicate images of a dataset manifest.
+    Exact copies are grouped by content hash; one perceptual hash is computed per
+    distinct content, reusing `hash_cache` (sha256 -> hash, updated in place).
+    Every group names the image to keep and the duplicates to drop.
+    """
+    hash_cache = {} if hash_cache is None else hash_cache
+    by_content = defaultdict(list)
+    for key, entry in manifest.items():
+        if not entry.get("error"):
+            by_content[entry["sha256"]].append(key)
+
+    contents = list(by_content)
+    missing = [sha for sha in contents if sha not in hash_cache]
+    for sha, value in zip(missing, compute_hashes([by_content[sha][0] for sha in missing], workers = workers)):
+        hash_cache[sha] = value
+
+    near_groups = group_near_duplicates([hash_cache[sha] for sha in contents], max_distance)
+    # Exact copies whose perceptual hash has no neighbour still form a group
+    grouped = {i for members in near_groups for i in members}
+    near_groups += [[i] for i, sha in enumerate(contents) if len(by_content[sha]) > 1 and i not in grouped]
+
+    groups = []
+    for members in near_groups:
+        records = sorted(((key, manifest[key]) for i in members for key in by_content[contents[i]]),
+                         key = _keep_order)
+        groups.append(_describe_group(records))
+
+    return groups
+
+
+def _describe_group(records: t.List[t.Tuple[str, dict]]) -> dict:
+    splits = sorted({entry["split"] for _, entry in records})
+    return {"keep": records[0][0],
+            "drop": [key for key, _ in records[1:]],
+            "splits": splits,
+            "cross_split": len(splits) > 1}
@@ -1,15 +1,59 @@
+import typing as t
+
+import tensorflow as tf
 from tensorflow import keras
-from catvsdog_model.config.core import config
+from catvsdog_model.config.core import AugmentationPolicy, config
 
 # Performing the data augmentation as series of transformations
-def get_data_augmented(flip, rotation, zoom):
-    data_augmentation = keras.Sequential([keras.layers.RandomFlip(flip),
-                                          keras.layers.RandomRotation(rotation),
-                                          keras.layers.RandomZoom(zoom)])
+def get_data_augmented(flip, rotation, zoom, contrast = 0.0, translation = 0.0):
+    layers = []
+    if flip:
+        layers.append(keras.layers.RandomFlip(flip))
+    if rotation:
+        layers.append(keras.layers.RandomRotation(rotation))
+    if zoom:
+        layers.append(keras.layers.RandomZoom(zoom))
+    if contrast:
+        layers.append(keras.layers.RandomContrast(contrast))
+    if translation:
+        layers.append(keras.layers.RandomTranslation(translation, translation))
+    data_augmentation = keras.Sequential(layers)
 
     return data_augmentation
 
 
-data_augmentation = get_data_augmented(flip = config.model_cfg.flip, 
-                                       rotation = config.model_cfg.rotation, 
-                                       zoom = config.model_cfg.zoom)
+def get_augmentation_policy(name: t.Optional[str] = None) -> AugmentationPolicy:
+    """Look up an augmentation policy from config.yml, by default the configured one."""
+
+    name = name or config.model_cfg.augmentation_policy
+    if name == "default":
+        return AugmentationPolicy(flip = config.model_cfg.flip,
+                                  rotation = config.model_cfg.rotation,
+                                  zoom = config.model_cfg.zoom)
+    if name == "none":
+        return AugmentationPolicy()
+    if name not in config.model_cfg.augmentation_policies:
+        raise ValueError(f"Unknown augmentation policy {name!r}")
+
+    return config.model_cfg.augmentation_policies[name]
+
+
+def augment_dataset(dataset: tf.data.Dataset, policy: AugmentationPolicy) -> tf.data.Dataset:
+    """
+    Augment batched (image, label) pairs in the input pipeline.
+    Each batch is transformed as a whole, several batches in parallel, and
+    prefetching lets the next batches be prepared while the model trains.
+    """
+    augmentation = get_data_augmented(**policy.model_dump())
+    if not augmentation.layers:
+        return dataset.prefetch(tf.data.AUTOTUNE)
+
+    def augment(images, labels):
+        return augmentation(images, training = True), labels
+
+    return (dataset
+            .map(augment, num_parallel_calls = tf.data.AUTOTUNE, deterministic = False)
+            .prefetch(tf.data.AUTOTUNE))
+
+
+data_augmentation = get_data_augmented(**get_augmentation_policy().model_dump())
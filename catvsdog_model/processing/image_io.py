@@ -0,0 +1,76 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import io
+import typing as t
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image, UnidentifiedImageError
+
+
+class ImageRejected(ValueError):
+    """An uploaded image outside the serving limits; `reason` is a short label for metrics."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class ImageInfo(t.NamedTuple):
+    format: str
+    width: int
+    height: int
+    channels: int
+
+
+def probe_image(data: bytes) -> ImageInfo:
+    """
+    Format, dimensions and channel count of an encoded image, read from its
+    header only: PIL does not decode pixels until they are accessed.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return ImageInfo(img.format, img.width, img.height, len(img.getbands()))
+    except Image.DecompressionBombError as e:
+        raise ImageRejected("pixels", str(e))
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImageRejected("undecodable", f"Not a readable image: {e}")
+
+
+def check_image(info: ImageInfo, *, allowed_formats: t.Collection[str], allowed_channels: t.Collection[int],
+                max_side: int, max_pixels: int) -> None:
+    """Raise ImageRejected unless a probed image is within the given limits."""
+
+    if info.format not in allowed_formats:
+        raise ImageRejected("format", f"Unsupported image format {info.format}")
+    if info.channels not in allowed_channels:
+        raise ImageRejected("channels", f"Unsupported number of channels {info.channels}")
+    if min(info.width, info.height) < 1 or max(info.width, info.height) > max_side:
+        raise ImageRejected("dimensions", f"Image sides must be between 1 and {max_side} pixels, "
+                                          f"got {info.width}x{info.height}")
+    if info.width * info.height > max_pixels:
+        raise ImageRejected("pixels", f"Image has {info.width * info.height} pixels, the limit is {max_pixels}")
+
+
+def decode_image(data: bytes, *, image_size: t.Tuple[int, int]) -> np.ndarray:
+    """
+    Decode an already checked image to a (1, height, width, 3) model input,
+    with the same decoder and resize as `image_dataset_from_directory` in
+    training, so serving sees the pixels the model was trained on.
+    Grayscale, palette and alpha images are converted to RGB. Formats
+    TensorFlow cannot decode (WebP) are decoded by PIL, then resized alike.
+    """
+    try:
+        image = tf.io.decode_image(data, channels = 3, expand_animations = False)
+    except tf.errors.InvalidArgumentError:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                image = np.asarray(img.convert("RGB"))
+        except (UnidentifiedImageError, OSError) as e:
+            raise ImageRejected("undecodable", f"Could not decode image: {e}")
+    image = tf.image.resize(image, image_size, method = "bilinear")
+    return image.numpy()[np.newaxis]
@@ -0,0 +1,159 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import hashlib
+import io
+import json
+import os
+import typing as t
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+MANIFEST_VERSION = 1
+
+
+def iter_image_files(directory: Path) -> t.Iterator[os.DirEntry]:
+    """Walk `directory` once, yielding the directory entry of every image file."""
+
+    stack = [str(directory)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield entry
+
+
+def check_image(path: str) -> t.Tuple[str, t.Optional[str]]:
+    """
+    Read a file once, hash its content and fully decode it.
+    Returns the sha256 digest and the decode error, or None for a valid image.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+    except Exception as e:
+        return digest, f"{type(e).__name__}: {e}"
+
+    return digest, None
+
+
+def load_manifest(manifest_path: Path) -> t.Dict[str, dict]:
+    """Load a manifest written by `save_manifest`, or an empty one."""
+
+    if not Path(manifest_path).is_file():
+        return {}
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest["files"]
+
+
+def save_manifest(manifest: t.Dict[str, dict], manifest_path: Path) -> None:
+    manifest_path = Path(manifest_path)
+    manifest_path.parent.mkdir(parents = True, exist_ok = True)
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "files": manifest}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def update_manifest(split_dirs: t.Dict[str, Path], manifest_path: Path, *,
+                    workers: t.Optional[int] = None) -> t.Tuple[t.Dict[str, dict], t.Dict[str, int]]:
+    """
+    Bring the manifest of every image under `split_dirs` up to date.
+    Files whose size and mtime match the previous manifest keep their recorded
+    hash and check result; new or modified files are hashed and decoded in a
+    process pool. Returns the manifest and counts of checked/reused/removed files.
+    """
+    previous = load_manifest(manifest_path)
+    manifest, to_check = {}, []
+
+    for split, directory in split_dirs.items():
+        directory = Path(directory)
+        for entry in iter_image_files(directory):
+            stat = entry.stat()
+            path = Path(entry.path)
+            relative = path.relative_to(directory)
+            record = {"split": split,
+                      "label": relative.parts[0] if len(relative.parts) > 1 else None,
+                      "size": stat.st_size,
+                      "mtime_ns": stat.st_mtime_ns}
+
+            key = path.as_posix()
+            old = previous.get(key)
+            if old and old["size"] == record["size"] and old["mtime_ns"] == record["mtime_ns"]:
+                record.update(sha256 = old["sha256"], error = old["error"])
+            else:
+                to_check.append(key)
+            manifest[key] = record
+
+    if to_check:
+        with ProcessPoolExecutor(max_workers = workers) as pool:
+            results = pool.map(check_image, to_check, chunksize = max(1, min(256, len(to_check) // 64)))
+            for key, (digest, error) in zip(to_check, results):
+                manifest[key].update(sha256 = digest, error = error)
+
+    changes = {"checked": len(to_check),
+               "reused": len(manifest) - len(to_check),
+               "removed": len(previous.keys() - manifest.keys())}
+    return manifest, changes
+
+
+def quarantine_list(manifest: t.Dict[str, dict]) -> t.List[dict]:
+    """
+    Images the manifest records as failing to decode. The files stay where they
+    are, as the dataset is tracked by DVC; loaders skip them instead.
+    """
+    return [{"path": key, "split": record["split"], "error": record["error"]}
+            for key, record in sorted(manifest.items()) if record["error"]]
+
+
+def save_quarantine_list(quarantined: t.List[dict], quarantine_path: Path) -> None:
+    quarantine_path = Path(quarantine_path)
+    quarantine_path.parent.mkdir(parents = True, exist_ok = True)
+    tmp_path = quarantine_path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(quarantined, f, indent = 2)
+    os.replace(tmp_path, quarantine_path)
+
+
+def load_quarantined(quarantine_path: Path) -> t.Set[str]:
+    """Real paths of the images listed by `save_quarantine_list`, none if there is no list."""
+
+    if not Path(quarantine_path).is_file():
+        return set()
+    with open(quarantine_path) as f:
+        return {os.path.realpath(entry["path"]) for entry in json.load(f)}
+
+
+def manifest_stats(manifest: t.Dict[str, dict], split_dirs: t.Dict[str, Path]) -> t.Dict[str, dict]:
+    """Per-split image and per-class counts, leaving out images that failed to decode."""
+
+    stats = {split: {"num_images": 0, "path": str(directory), "classes": {}}
+             for split, directory in split_dirs.items()}
+    for record in manifest.values():
+        if record["error"]:
+            continue
+        split_stats = stats[record["split"]]
+        split_stats["num_images"] += 1
+        if record["label"] is not None:
+            split_stats["classes"][record["label"]] = split_stats["classes"].get(record["label"], 0) + 1
+
+    for split_stats in stats.values():
+        split_stats["classes"] = dict(sorted(split_stats["classes"].items()))
+        if not split_stats["classes"]:
+            del split_stats["classes"]
+
+    return stats
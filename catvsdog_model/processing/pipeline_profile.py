@@ -0,0 +1,125 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import math
+import time
+import typing as t
+
+import tensorflow as tf
+
+from catvsdog_model.config.core import AugmentationPolicy
+from catvsdog_model.evaluation import list_labelled_files
+from catvsdog_model.processing.features import get_data_augmented
+
+
+PIPELINE_STAGES = ("list", "read", "decode", "resize", "augment", "batch")
+# Stages that run as a single operation, without a parallelism setting
+SERIAL_STAGES = ("list",)
+
+
+def _count(dataset: tf.data.Dataset) -> int:
+    # Iterate inside the runtime, so Python overhead does not cap fast stages
+    return int(dataset.reduce(tf.constant(0, tf.int64), lambda count, _: count + 1))
+
+
+def _best_rate(run: t.Callable[[], t.Any], num_images: int, repeats: int) -> float:
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return num_images / max(best, 1e-9)
+
+
+def _cached(dataset: tf.data.Dataset) -> tf.data.Dataset:
+    dataset = dataset.cache()
+    _count(dataset)
+    return dataset
+
+
+def profile_stages(directory: Path, *, image_size: t.Tuple[int, int], batch_size: int,
+                   policy: AugmentationPolicy, parallelism: t.Sequence[int],
+                   max_images: t.Optional[int] = None, repeats: int = 2) -> t.Dict[str, t.Dict[int, float]]:
+    """
+    Images per second of each input pipeline stage on its own, at every
+    `num_parallel_calls` level in `parallelism`. The input of a stage is the
+    output of the stages before it, computed once and cached in memory, so
+    only the stage itself is timed. File reads go through the OS page cache
+    after the first pass, like later epochs of a training run.
+    """
+    start = time.perf_counter()
+    paths, _, _ = list_labelled_files(Path(directory))
+    list_rate = len(paths) / max(time.perf_counter() - start, 1e-9)
+    paths = paths[:max_images] if max_images else paths
+    num_images = len(paths)
+    if not num_images:
+        raise ValueError(f"No images found in {directory}")
+
+    def decode(data):
+        return tf.io.decode_image(data, channels = 3, expand_animations = False)
+
+    def resize(image):
+        image = tf.image.resize(image, image_size, method = "bilinear")
+        image.set_shape((*image_size, 3))
+        return image
+
+    augmentation = get_data_augmented(**policy.model_dump())
+
+    def augment(images):
+        return augmentation(images, training = True)
+
+    path_data = tf.data.Dataset.from_tensor_slices(paths)
+    encoded = _cached(path_data.map(tf.io.read_file))
+    decoded = _cached(encoded.map(decode))
+    resized = _cached(decoded.map(resize))
+    batched = _cached(resized.batch(batch_size))
+
+    stages = {
+        "read": lambda p: path_data.map(tf.io.read_file, num_parallel_calls = p),
+        "decode": lambda p: encoded.map(decode, num_parallel_calls = p),
+        "resize": lambda p: decoded.map(resize, num_parallel_calls = p),
+        "augment": lambda p: batched.map(augment, num_parallel_calls = p),
+        "batch": lambda p: resized.batch(batch_size, num_parallel_calls = p),
+    }
+    if not augmentation.layers:
+        del stages["augment"]
+
+    profile = {"list": {1: list_rate}}
+    for stage, build in stages.items():
+        profile[stage] = {p: _best_rate(lambda: _count(build(p)), num_images, repeats) for p in parallelism}
+    return profile
+
+
+def analyze_profile(profile: t.Dict[str, t.Dict[int, float]], *, target: t.Optional[float] = None,
+                    tolerance: float = 0.9) -> dict:
+    """
+    Summarize a `profile_stages` result. The pipeline runs its stages
+    concurrently, so its sustainable throughput is that of the slowest stage
+    at its best setting. For every stage the suggested parallelism is the
+    lowest level reaching `tolerance` of its best rate, and the cores it
+    needs to feed `target` images/sec (the sustainable throughput by default)
+    are estimated from its single-threaded rate.
+    """
+    best = {stage: max(rates.values()) for stage, rates in profile.items()}
+    limiting_stage = min(best, key = best.get)
+    sustainable = best[limiting_stage]
+    target = target or sustainable
+
+    stages = {}
+    for stage, rates in profile.items():
+        suggested = min(p for p, rate in rates.items() if rate >= tolerance * best[stage])
+        single = rates.get(1, min(rates.values()))
+        stages[stage] = {"images_per_sec": {str(p): rate for p, rate in sorted(rates.items())},
+                         "best_images_per_sec": best[stage],
+                         "suggested_parallelism": None if stage in SERIAL_STAGES else suggested,
+                         "cores_for_target": None if stage in SERIAL_STAGES else round(target / single, 2)}
+
+    return {"limiting_stage": limiting_stage,
+            "max_sustainable_images_per_sec": sustainable,
+            "target_images_per_sec": target,
+            "target_reachable": sustainable >= target,
+            "cores_for_target": math.ceil(sum(stage["cores_for_target"] or 0 for stage in stages.values())),
+            "stages": stages}
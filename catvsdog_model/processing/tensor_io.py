@@ -0,0 +1,110 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import struct
+import typing as t
+
+import numpy as np
+
+# Multi-tensor format: a header, one shape record per tensor, then the uint8
+# payloads back to back in C order
+#   header: magic b"CVDT", format version (u8), reserved (u8), tensor count (u16)
+#   shape record: rank (u8) followed by that many u32 dimensions
+# All integers are little-endian.
+TENSOR_MAGIC = b"CVDT"
+TENSOR_FORMAT_VERSION = 1
+TENSORS_CONTENT_TYPE = "application/vnd.catvsdog.tensors"
+_HEADER = struct.Struct("<4sBBH")
+
+
+class TensorFormatError(ValueError):
+    """A raw tensor body that is malformed or does not match the model input."""
+
+
+def _batch_shape(shape: t.Sequence[int], input_shape: t.Sequence[int]) -> t.Tuple[int, ...]:
+    shape, input_shape = tuple(shape), tuple(input_shape)
+    if shape == input_shape:
+        return (1, *shape)
+    if len(shape) == len(input_shape) + 1 and shape[1:] == input_shape and shape[0] > 0:
+        return shape
+    raise TensorFormatError(f"Tensor shape {shape} does not match the model input {input_shape} "
+                            f"or a batch of it")
+
+
+def parse_shape(header: str) -> t.Tuple[int, ...]:
+    """Shape from a comma-separated header value such as "4,180,180,3"."""
+
+    try:
+        shape = tuple(int(dim) for dim in header.split(","))
+    except ValueError:
+        raise TensorFormatError(f"Invalid tensor shape {header!r}")
+    if any(dim < 0 for dim in shape):
+        raise TensorFormatError(f"Invalid tensor shape {header!r}")
+    return shape
+
+
+def view_tensor(body: t.Union[bytes, bytearray, memoryview], shape: t.Sequence[int], *,
+                input_shape: t.Sequence[int]) -> np.ndarray:
+    """
+    A raw uint8 body of the given `shape` as a (batch, *input_shape) array.
+    The array is a view of `body`, not a copy.
+    """
+    shape = _batch_shape(shape, input_shape)
+    expected = int(np.prod(shape))
+    if len(body) != expected:
+        raise TensorFormatError(f"Body has {len(body)} bytes, shape {shape} needs {expected}")
+    return np.frombuffer(body, dtype = np.uint8).reshape(shape)
+
+
+def encode_tensors(tensors: t.Sequence[np.ndarray]) -> bytes:
+    """Pack uint8 arrays into the multi-tensor format."""
+
+    if not 0 < len(tensors) < 2 ** 16:
+        raise TensorFormatError(f"Expected between 1 and {2 ** 16 - 1} tensors, got {len(tensors)}")
+    parts = [_HEADER.pack(TENSOR_MAGIC, TENSOR_FORMAT_VERSION, 0, len(tensors))]
+    for tensor in tensors:
+        if tensor.dtype != np.uint8:
+            raise TensorFormatError(f"Only uint8 tensors are supported, got {tensor.dtype}")
+        parts.append(struct.pack(f"<B{tensor.ndim}I", tensor.ndim, *tensor.shape))
+    parts.extend(np.ascontiguousarray(tensor).data for tensor in tensors)
+    return b"".join(parts)
+
+
+def decode_tensors(body: t.Union[bytes, bytearray, memoryview], *,
+                   input_shape: t.Sequence[int]) -> t.List[np.ndarray]:
+    """
+    Tensors of a multi-tensor body, each as a (batch, *input_shape) uint8
+    array viewing `body` without copying.
+    """
+    body = memoryview(body)
+    if len(body) < _HEADER.size:
+        raise TensorFormatError("Body is shorter than the tensor header")
+    magic, version, _, count = _HEADER.unpack_from(body)
+    if magic != TENSOR_MAGIC:
+        raise TensorFormatError("Body does not start with the tensor format magic")
+    if version != TENSOR_FORMAT_VERSION:
+        raise TensorFormatError(f"Unsupported tensor format version {version}")
+
+    offset, shapes = _HEADER.size, []
+    for _ in range(count):
+        if offset >= len(body):
+            raise TensorFormatError("Body ends inside the shape records")
+        rank = body[offset]
+        end = offset + 1 + 4 * rank
+        if end > len(body):
+            raise TensorFormatError("Body ends inside the shape records")
+        shapes.append(_batch_shape(struct.unpack_from(f"<{rank}I", body, offset + 1), input_shape))
+        offset = end
+
+    sizes = [int(np.prod(shape)) for shape in shapes]
+    if offset + sum(sizes) != len(body):
+        raise TensorFormatError(f"Body has {len(body) - offset} payload bytes, the shapes need {sum(sizes)}")
+
+    tensors = []
+    for shape, size in zip(shapes, sizes):
+        tensors.append(np.frombuffer(body, dtype = np.uint8, count = size, offset = offset).reshape(shape))
+        offset += size
+    return tensors
@@ -0,0 +1,112 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import typing as t
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+
+@keras.utils.register_keras_serializable(package = "catvsdog_model")
+class FilterGroupLasso(keras.regularizers.Regularizer):
+    """
+    Sum of the L2 norms of the output filters of a conv kernel. Unlike plain
+    L1/L2 it drives whole filters towards zero, so fine-tuning with it leaves
+    less for the next pruning step to remove.
+    """
+
+    def __init__(self, strength: float = 1e-4):
+        self.strength = strength
+
+    def __call__(self, kernel):
+        norms = tf.sqrt(tf.reduce_sum(tf.square(kernel), axis = [0, 1, 2]) + 1e-12)
+        return self.strength * tf.reduce_sum(norms)
+
+    def get_config(self):
+        return {"strength": self.strength}
+
+
+def filter_importance(layer: keras.layers.Conv2D) -> np.ndarray:
+    """L1 norm of each output filter of a Conv2D layer."""
+
+    return np.abs(layer.get_weights()[0]).sum(axis = (0, 1, 2))
+
+
+def _filters_to_keep(layer, fraction, min_filters):
+    importance = filter_importance(layer)
+    count = max(min(min_filters, len(importance)), int(round(len(importance) * (1 - fraction))))
+    # Keep the original filter order so the surviving weights line up with the next layer
+    return np.sort(np.argsort(-importance, kind = "stable")[:count])
+
+
+def prune_filters(model: keras.Model, fraction: float, *, min_filters: int = 8,
+                  kernel_regularizer: t.Optional[keras.regularizers.Regularizer] = None) -> keras.Model:
+    """
+    Rebuild `model` without the `fraction` of filters with the lowest L1 norm
+    in every Conv2D layer (never fewer than `min_filters`), slicing the input
+    channels of the layers that consume them. The result is physically smaller,
+    not a masked copy. `kernel_regularizer` replaces the conv regularizers, so
+    `prune_filters(model, 0.0)` strips the one used while fine-tuning.
+    The returned model is not compiled.
+
+    Only plain layer chains are supported, as built by the baseline
+    architecture of `create_model`.
+    """
+    if not 0 <= fraction < 1:
+        raise ValueError(f"fraction must be in [0, 1), got {fraction}")
+
+    inputs = keras.Input(shape = model.input_shape[1:])
+    x = inputs
+    # Indices of the original channels still present in `x`, None when all are
+    channels = None
+    # (height, width, channels) of the original features when `x` is flattened conv output
+    flattened = None
+
+    for layer in model.layers[1:]:
+        if isinstance(layer.input, (list, tuple)):
+            raise ValueError(f"Cannot prune through {layer.__class__.__name__} layer {layer.name!r}: "
+                             "only plain layer chains are supported")
+        config = layer.get_config()
+        weights = layer.get_weights()
+        next_channels = channels
+
+        if isinstance(layer, keras.layers.Conv2D):
+            keep = _filters_to_keep(layer, fraction, min_filters)
+            config["filters"] = len(keep)
+            config["kernel_regularizer"] = kernel_regularizer
+            kernel = weights[0] if channels is None else weights[0][:, :, channels, :]
+            weights = [kernel[..., keep]] + [bias[keep] for bias in weights[1:]]
+            next_channels = keep
+        elif isinstance(layer, keras.layers.BatchNormalization):
+            weights = [w if channels is None else w[channels] for w in weights]
+        elif isinstance(layer, keras.layers.Dense):
+            kernel = weights[0]
+            if channels is not None and flattened is not None:
+                kernel = kernel.reshape(*flattened, -1)[:, :, channels, :].reshape(-1, kernel.shape[-1])
+            elif channels is not None:
+                kernel = kernel[channels]
+            weights = [kernel] + weights[1:]
+            next_channels, flattened = None, None
+        elif weights:
+            raise ValueError(f"Cannot prune through {layer.__class__.__name__} layer {layer.name!r}")
+
+        if isinstance(layer, keras.layers.Flatten):
+            flattened = tuple(layer.input.shape[1:])
+
+        new_layer = layer.__class__.from_config(config)
+        x = new_layer(x)
+        if weights:
+            new_layer.set_weights(weights)
+        channels = next_channels
+
+    return keras.Model(inputs = inputs, outputs = x, name = model.name)
+
+
+def conv_filters(model: keras.Model) -> t.List[int]:
+    """Number of filters of every Conv2D layer, in order."""
+
+    return [layer.filters for layer in model.layers if isinstance(layer, keras.layers.Conv2D)]
@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import tempfile
+import typing as t
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.evaluation import StreamingMetrics
+
+
+QUANTIZATION_MODES = ("float16", "int8")
+
+
+def calibration_data(dataset: tf.data.Dataset, num_samples: int) -> t.Callable[[], t.Iterator[t.List[np.ndarray]]]:
+    """Representative dataset for int8 calibration: the first `num_samples` images of `dataset`, one at a time."""
+
+    def generate():
+        seen = 0
+        for images, _ in dataset:
+            for image in images.numpy():
+                if seen == num_samples:
+                    return
+                yield [image[None].astype(np.float32)]
+                seen += 1
+
+    return generate
+
+
+def convert_to_tflite(model: keras.Model, *, mode: str,
+                      representative_data: t.Optional[t.Callable] = None) -> bytes:
+    """
+    Post-training quantization of `model` to a TFLite flatbuffer.
+    float16 stores the weights as float16; int8 quantizes weights and
+    activations, with activation ranges calibrated on `representative_data`.
+    Inputs and outputs stay float32 in both cases.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode {mode!r}, expected one of {QUANTIZATION_MODES}")
+    if mode == "int8" and representative_data is None:
+        raise ValueError("int8 quantization needs representative data for calibration")
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        # TFLiteConverter.from_keras_model does not handle Keras 3 models, so go through a SavedModel
+        model.export(export_dir, verbose = False)
+        converter = tf.lite.TFLiteConverter.from_saved_model(export_dir)
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if mode == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        else:
+            converter.representative_dataset = representative_data
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        return converter.convert()
+
+
+class TFLitePredictor:
+    """
+    Batch inference with a TFLite model, called like `keras_predictor`.
+    The input tensor is resized whenever the batch size changes.
+    """
+
+    def __init__(self, model: t.Union[Path, str, bytes], *, num_threads: int = 1):
+        content = model if isinstance(model, bytes) else Path(model).read_bytes()
+        self.interpreter = tf.lite.Interpreter(model_content = content, num_threads = num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+
+    def __call__(self, images: np.ndarray) -> np.ndarray:
+        images = np.asarray(images, dtype = np.float32)
+        if images.shape[0] != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input["index"], images.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = images.shape[0]
+        self.interpreter.set_tensor(self._input["index"], images)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output["index"]).copy()
+
+
+def evaluate_predictor(predict: t.Callable[[np.ndarray], np.ndarray], dataset: tf.data.Dataset, *,
+                       num_classes: int = 2) -> StreamingMetrics:
+    """`evaluate_streaming` for any batch prediction function, such as a `TFLitePredictor`."""
+
+    metrics = StreamingMetrics(num_classes = num_classes)
+    for images, labels in dataset:
+        metrics.update(labels.numpy(), predict(images.numpy()))
+    return metrics
@@ -0,0 +1,119 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import queue
+import random
+import threading
+import time
+import typing as t
+
+import numpy as np
+from tensorflow import keras
+
+from catvsdog_model.latency import keras_predictor
+
+
+class ShadowRunner:
+    """
+    Shadow inference: a sampled `fraction` of served images is also scored by
+    a candidate model, on a background thread, and compared with the primary
+    model's predictions.
+
+    The candidate's operations run on the same TensorFlow thread pools as the
+    primary model's, so it is kept off the busy path by shedding: work is
+    dropped, never queued behind, when `max_pending` batches are already
+    waiting or the caller reports `max_primary_in_flight` primary requests.
+    `on_result` is called on the worker thread for every scored batch.
+    """
+
+    def __init__(self, candidate: t.Union[keras.Model, t.Callable[[np.ndarray], np.ndarray]], *,
+                 fraction: float, max_pending: int, max_primary_in_flight: t.Optional[int] = None,
+                 on_result: t.Optional[t.Callable[[dict], None]] = None, seed: t.Optional[int] = None):
+        if not 0 <= fraction <= 1:
+            raise ValueError(f"fraction must be between 0 and 1, got {fraction}")
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be at least 1, got {max_pending}")
+        self._predict = keras_predictor(candidate) if isinstance(candidate, keras.Model) else candidate
+        self.fraction = fraction
+        self.max_primary_in_flight = max_primary_in_flight
+        self.on_result = on_result
+        self._rng = random.Random(seed)
+        self._queue = queue.Queue(maxsize = max_pending)
+        self._lock = threading.Lock()
+        self.sampled = self.shed = self.errors = 0
+        self.images = self.agreements = 0
+        self._worker = threading.Thread(target = self._run, name = "shadow-inference", daemon = True)
+        self._worker.start()
+
+    def submit(self, images: np.ndarray, primary_probabilities: np.ndarray, *, primary_in_flight: int = 0) -> str:
+        """
+        Queue `images` for the candidate, without waiting for it. Returns
+        "skipped" when not sampled, "shed" when dropped under load and
+        "queued" otherwise.
+        """
+        if self._rng.random() >= self.fraction:
+            return "skipped"
+        with self._lock:
+            self.sampled += 1
+        if self.max_primary_in_flight is not None and primary_in_flight >= self.max_primary_in_flight:
+            return self._shed()
+        try:
+            self._queue.put_nowait((np.asarray(images, dtype = np.float32),
+                                    np.asarray(primary_probabilities).reshape(-1)))
+        except queue.Full:
+            return self._shed()
+        return "queued"
+
+    def _shed(self) -> str:
+        with self._lock:
+            self.shed += 1
+        return "shed"
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                images, primary = item
+                start = time.perf_counter()
+                candidate = self._predict(images).reshape(-1)
+                latency_ms = (time.perf_counter() - start) * 1000
+                agreements = int(np.sum((candidate > 0.5) == (primary > 0.5)))
+                with self._lock:
+                    self.images += len(candidate)
+                    self.agreements += agreements
+                if self.on_result is not None:
+                    self.on_result({"images": len(candidate), "agreements": agreements, "latency_ms": latency_ms})
+            except Exception as e:
+                with self._lock:
+                    self.errors += 1
+                print(f"Shadow inference failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    @property
+    def agreement_rate(self) -> float:
+        return self.agreements / self.images if self.images else 0.0
+
+    @property
+    def pending(self) -> int:
+        """Number of batches waiting for the candidate."""
+        return self._queue.qsize()
+
+    def pending_batches(self) -> t.List[t.Tuple[np.ndarray, np.ndarray]]:
+        """A copy of the (images, primary probabilities) batches waiting for the candidate."""
+        with self._queue.mutex:
+            return [item for item in self._queue.queue if item is not None]
+
+    def join(self) -> None:
+        """Wait until all queued shadow work is done."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Finish queued shadow work and stop the worker thread."""
+        self._queue.put(None)
+        self._worker.join()
@@ -0,0 +1,128 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import json
+import os
+import resource
+import time
+import typing as t
+
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from tensorflow import keras
+
+
+def process_rss_mb() -> float:
+    """Current resident memory of this process, or the peak where /proc is not available."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        scale = 2 ** 20 if sys.platform == "darwin" else 2 ** 10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+class TrainingTelemetry(keras.callbacks.Callback):
+    """
+    Per-epoch training throughput, step time distribution, input stalls and
+    process CPU/RSS.
+
+    Input stalls are only measured on a dataset passed through `instrument`,
+    which stamps the time each batch leaves the input pipeline. The time a
+    step spent waiting is that stamp minus the start of the step; steps whose
+    batch was ready early (prefetched) count as zero.
+    """
+
+    def __init__(self, metrics_dir: Path = Path("metrics"), *, log_to_mlflow: bool = False):
+        super().__init__()
+        self.metrics_dir = Path(metrics_dir)
+        self.log_to_mlflow = log_to_mlflow
+        self.history = []
+        self._deliveries = []
+        self._instrumented = False
+
+    def instrument(self, dataset: tf.data.Dataset) -> tf.data.Dataset:
+        """Pass `(images, labels)` batches through unchanged, recording when and how many images arrive."""
+
+        def record(batch_size):
+            self._deliveries.append((time.perf_counter(), int(batch_size)))
+            return np.float32(0)
+
+        def stamp(images, labels):
+            token = tf.py_function(record, [tf.shape(images)[0]], tf.float32)
+            with tf.control_dependencies([token]):
+                return tf.identity(images), tf.identity(labels)
+
+        self._instrumented = True
+        return dataset.map(stamp)
+
+    def on_epoch_begin(self, epoch, logs = None):
+        self._deliveries.clear()
+        self._begins, self._ends = [], []
+        self._epoch_start = time.perf_counter()
+        self._cpu_start = sum(os.times()[:2])
+
+    def on_train_batch_begin(self, batch, logs = None):
+        self._begins.append(time.perf_counter())
+
+    def on_train_batch_end(self, batch, logs = None):
+        self._ends.append(time.perf_counter())
+
+    def on_epoch_end(self, epoch, logs = None):
+        wall = time.perf_counter() - self._epoch_start
+        train_seconds = (self._ends[-1] - self._epoch_start) if self._ends else wall
+        steps = len(self._ends)
+        step_ms = (np.array(self._ends) - np.array(self._begins[:steps])) * 1000
+
+        record = {"epoch": epoch + 1,
+                  "steps": steps,
+                  "step_time_p50_ms": float(np.median(step_ms)) if steps else None,
+                  "step_time_p95_ms": float(np.percentile(step_ms, 95)) if steps else None,
+                  "step_time_max_ms": float(step_ms.max()) if steps else None,
+                  "cpu_percent": 100 * (sum(os.times()[:2]) - self._cpu_start) / wall,
+                  "rss_mb": process_rss_mb()}
+
+        if self._instrumented:
+            deliveries = self._deliveries[:steps]
+            images = sum(batch_size for _, batch_size in deliveries)
+            delivered = np.array([stamp for stamp, _ in deliveries])
+            wait_ms = np.clip((delivered - np.array(self._begins[:len(deliveries)])) * 1000,
+                              0, step_ms[:len(deliveries)])
+            record.update({"images_per_sec": images / train_seconds,
+                           "input_wait_ms": float(wait_ms.sum()),
+                           "input_wait_fraction": float(wait_ms.sum() / max(step_ms.sum(), 1e-9))})
+        self.history.append(record)
+
+        if self.log_to_mlflow:
+            import mlflow
+            mlflow.log_metrics({f"telemetry_{key}": value for key, value in record.items()
+                                if key != "epoch" and value is not None}, step = epoch)
+
+    def save_metrics(self) -> t.Optional[dict]:
+        """Write the per-epoch table (plots) and a summary (metrics) to `metrics_dir`."""
+
+        if not self.history:
+            return None
+        self.metrics_dir.mkdir(parents = True, exist_ok = True)
+        history = pd.DataFrame(self.history)
+        history.to_csv(self.metrics_dir / "training_telemetry.csv", index = False)
+
+        # The first epoch includes tracing and warm-up, so it is left out of the summary when possible
+        steady = history.iloc[1:] if len(history) > 1 else history
+        summary = {"epochs": len(history),
+                   "step_time_p50_ms": float(steady["step_time_p50_ms"].median()),
+                   "step_time_p95_ms": float(steady["step_time_p95_ms"].median()),
+                   "cpu_percent": float(steady["cpu_percent"].mean()),
+                   "peak_rss_mb": float(history["rss_mb"].max())}
+        if "images_per_sec" in history:
+            summary.update({"images_per_sec": float(steady["images_per_sec"].mean()),
+                            "input_wait_fraction": float(steady["input_wait_fraction"].mean())})
+        with open(self.metrics_dir / "training_telemetry.json", "w") as f:
+            json.dump(summary, f, indent = 2)
+        return summary
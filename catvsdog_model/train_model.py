@@ -4,17 +4,27 @@ file = Path(__file__).resolve()
 parent, root = file.parent, file.parents[1]
 sys.path.append(str(root))
 
+import json
+import typing as t
 import pandas as pd
 
-from catvsdog_model.config.core import config
+from catvsdog_model import __version__ as _version
+from catvsdog_model.config.core import CHECKPOINT_DIR, ROOT, TRAINED_MODEL_DIR, config
 from catvsdog_model.model import classifier
-from catvsdog_model.processing.data_manager import load_train_dataset, load_validation_dataset, load_test_dataset, callbacks_and_save_model
+from catvsdog_model.cascade import build_first_stage
+from catvsdog_model.checkpointing import fit_with_resume
+from catvsdog_model.distillation import Distiller, StudentCheckpoint, build_student, compare_models
+from catvsdog_model.processing.data_manager import load_train_dataset, load_validation_dataset, load_test_dataset, callbacks_and_save_model, load_model
+from catvsdog_model.processing.data_manager import checkpoint_callbacks
 
 
-def run_training() -> None:
+def run_training(*, fine_tune_from: t.Optional[str] = None, learning_rate: t.Optional[float] = None) -> None:
     
     """
     Train the model.
+    An interrupted run resumes from its last training-state checkpoint.
+    With `fine_tune_from` set to a model version, training continues from that
+    saved model on the current datasets instead of from random weights.
     """
     train_data = load_train_dataset()
     val_data = load_validation_dataset()
@@ -26,19 +36,123 @@ def run_training() -> None:
     mlflow.set_experiment("Cat-vs-Dog Classification")
     mlflow.tensorflow.autolog()
 
+    model = classifier
+    if fine_tune_from:
+        # Load before callbacks_and_save_model() prunes older model versions
+        model = load_model(file_name = f"{config.app_cfg.model_save_file}{fine_tune_from}", fast = False)
+        if learning_rate:
+            model.optimizer.learning_rate = learning_rate
 
     # Model fitting
-    classifier.fit(train_data,
-                   epochs = config.model_cfg.epochs,
-                   validation_data = val_data,
-                   callbacks = callbacks_and_save_model(),
-                   verbose = config.model_cfg.verbose)
+    fit_with_resume(model, train_data,
+                    epochs = config.model_cfg.epochs,
+                    validation_data = val_data,
+                    callbacks = callbacks_and_save_model(),
+                    verbose = config.model_cfg.verbose,
+                    save_every_n_batches = config.model_cfg.checkpoint_every_n_batches,
+                    fine_tune_from = fine_tune_from)
 
     # Calculate the score/error
-    test_loss, test_acc = classifier.evaluate(test_data)
+    test_loss, test_acc = model.evaluate(test_data)
     print("Loss:", test_loss)
     print("Accuracy:", test_acc)
 
+
+def run_distillation(*, teacher_version: t.Optional[str] = None) -> dict:
+
+    """
+    Distil a saved model into the compact student configured under
+    `distillation` in config.yml.
+    The teacher (the current version by default) stays frozen. The student is
+    saved as `<student_save_file><version>.keras`, loadable with `load_model`,
+    and a teacher/student comparison is written to metrics/distillation_report.json.
+    """
+    distillation_cfg = config.model_cfg.distillation
+    teacher_version = teacher_version or _version
+    teacher = load_model(file_name = f"{config.app_cfg.model_save_file}{teacher_version}")
+
+    train_data = load_train_dataset()
+    val_data = load_validation_dataset()
+    test_data = load_test_dataset()
+
+    student = build_student()
+    distiller = Distiller(student, teacher,
+                          temperature = distillation_cfg.temperature,
+                          alpha = distillation_cfg.alpha)
+    distiller.compile(optimizer = config.model_cfg.optimizer, metrics = [config.model_cfg.accuracy_metric])
+
+    student_path = TRAINED_MODEL_DIR / f"{config.app_cfg.student_save_file}{_version}.keras"
+    fit_with_resume(distiller, train_data,
+                    epochs = distillation_cfg.epochs,
+                    validation_data = val_data,
+                    callbacks = [StudentCheckpoint(student_path,
+                                                   monitor = config.model_cfg.monitor,
+                                                   save_best_only = config.model_cfg.save_best_only)],
+                    verbose = config.model_cfg.verbose,
+                    checkpoint_dir = CHECKPOINT_DIR / "distillation",
+                    save_every_n_batches = config.model_cfg.checkpoint_every_n_batches,
+                    fine_tune_from = f"distill-{teacher_version}")
+
+    student = load_model(file_name = student_path.stem)
+    report = {"teacher_version": teacher_version,
+              "student_version": _version,
+              **compare_models({"teacher": teacher, "student": student}, test_data)}
+    report["accuracy_drop"] = report["teacher"]["test_accuracy"] - report["student"]["test_accuracy"]
+    report["speedup"] = report["teacher"]["latency_ms"]["p50_ms"] / report["student"]["latency_ms"]["p50_ms"]
+
+    report_path = ROOT / "metrics" / "distillation_report.json"
+    report_path.parent.mkdir(exist_ok = True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent = 2)
+
+    for name in ["teacher", "student"]:
+        print(f"{name}: {report[name]['parameters']:,} parameters, "
+              f"accuracy {report[name]['test_accuracy']:.4f}, {report[name]['latency_ms']['p50_ms']:.2f} ms")
+    print(f"Saved student to {student_path}, report to {report_path}")
+    return report
+
+
+def run_cascade_training() -> None:
+
+    """
+    Train the tiny first-stage model of cascade inference, configured under
+    `cascade` in config.yml, on the same data as the full model.
+    It is saved as `<cascade_save_file><version>.keras` with its fast-loading
+    artifact; scripts/evaluate_cascade.py measures the cascade on the test set.
+    """
+    cascade_cfg = config.model_cfg.cascade
+    train_data = load_train_dataset()
+    val_data = load_validation_dataset()
+
+    first_stage = build_first_stage()
+    first_stage_path = TRAINED_MODEL_DIR / f"{config.app_cfg.cascade_save_file}{_version}.keras"
+    fit_with_resume(first_stage, train_data,
+                    epochs = cascade_cfg.epochs,
+                    validation_data = val_data,
+                    callbacks = checkpoint_callbacks(first_stage_path),
+                    verbose = config.model_cfg.verbose,
+                    checkpoint_dir = CHECKPOINT_DIR / "cascade",
+                    save_every_n_batches = config.model_cfg.checkpoint_every_n_batches)
+
+    print(f"Saved first-stage model ({first_stage.count_params():,} parameters) to {first_stage_path}")
+
     
 if __name__ == "__main__":
-    run_training()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description = "Train the cat vs dog classifier")
+    parser.add_argument("--fine-tune-from", help = "version of a saved model to continue training from")
+    parser.add_argument("--learning-rate", type = float, help = "learning rate for fine-tuning")
+    parser.add_argument("--distill", action = "store_true",
+                        help = "train the compact student from a saved model instead")
+    parser.add_argument("--teacher-version", help = "version of the teacher model, default the current one")
+    parser.add_argument("--cascade", action = "store_true",
+                        help = "train the first-stage model of cascade inference instead")
+    args = parser.parse_args()
+
+    if args.distill:
+        run_distillation(teacher_version = args.teacher_version)
+    elif args.cascade:
+        run_cascade_training()
+    else:
+        run_training(fine_tune_from = args.fine_tune_from, learning_rate = args.learning_rate)
\ No newline at end of file
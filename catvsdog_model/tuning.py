@@ -0,0 +1,164 @@
+import sys
+from pathlib import Path
+file = Path(__file__).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+import fcntl
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import time
+import typing as t
+
+import numpy as np
+import yaml
+
+
+def sample_trials(search_space: t.Dict[str, t.Any], num_trials: int, *, seed: int = 0) -> t.List[dict]:
+    """
+    Draw `num_trials` random configurations from `search_space`, a mapping of
+    dotted params.yaml keys to either a list of choices or a range
+    `{low, high}` with optional `log: true` (log-uniform) or `int: true`.
+    """
+    rng = random.Random(seed)
+    trials = []
+    for _ in range(num_trials):
+        trial = {}
+        for key, space in search_space.items():
+            if isinstance(space, list):
+                trial[key] = rng.choice(space)
+            elif space.get("int"):
+                trial[key] = rng.randint(int(space["low"]), int(space["high"]))
+            elif space.get("log"):
+                trial[key] = float(math.exp(rng.uniform(math.log(space["low"]), math.log(space["high"]))))
+            else:
+                trial[key] = rng.uniform(float(space["low"]), float(space["high"]))
+        trials.append(trial)
+    return trials
+
+
+class ASHAScheduler:
+    """
+    Asynchronous successive halving, in its early-stopping form.
+    A trial reports its metric when it reaches a rung (min_epochs * factor^k
+    epochs) and is stopped unless it is in the top 1/factor of the results
+    recorded at that rung so far. Rung results live in a JSON file guarded by an
+    exclusive lock, so trials running in separate processes decide for
+    themselves without waiting for each other or a driver.
+    """
+
+    def __init__(self, state_file: Path, *, min_epochs: int, max_epochs: int,
+                 reduction_factor: int = 3, mode: str = "max"):
+        if mode not in ("max", "min"):
+            raise ValueError(f"mode must be 'max' or 'min', got {mode!r}")
+        self.state_file = Path(state_file)
+        self.reduction_factor = reduction_factor
+        self.mode = mode
+        self.rungs = []
+        epochs = min_epochs
+        while epochs < max_epochs:
+            self.rungs.append(epochs)
+            epochs *= reduction_factor
+
+    def report(self, trial_id: str, epoch: int, value: float) -> bool:
+        """Record `value` after `epoch` epochs; returns False if the trial should stop."""
+
+        if epoch not in self.rungs:
+            return True
+
+        self.state_file.parent.mkdir(parents = True, exist_ok = True)
+        with open(self.state_file, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            content = f.read()
+            state = json.loads(content) if content else {}
+            recorded = state.setdefault(str(epoch), {})
+            recorded[trial_id] = value
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+
+        values = np.array(list(recorded.values()), dtype = np.float64)
+        if self.mode == "min":
+            values, value = -values, -value
+        cutoff = np.nanpercentile(values, (1 - 1 / self.reduction_factor) * 100)
+        return bool(value >= cutoff)
+
+
+def make_optimizer(name: str, learning_rate: float):
+    """
+    The Keras optimizer `name` with `learning_rate`, built the same way for
+    search trials and for the DVC train stage, so an exported best
+    configuration trains like its trial.
+    """
+    from tensorflow import keras
+
+    return keras.optimizers.get({"class_name": name, "config": {"learning_rate": learning_rate}})
+
+
+def set_params_values(params_path: Path, values: t.Dict[str, t.Any]) -> None:
+    """
+    Overwrite values of dotted keys in params.yaml in place, keeping comments,
+    ordering and line endings of the rest of the file.
+    """
+    with open(params_path, newline = "") as f:
+        lines = f.readlines()
+
+    for dotted, value in values.items():
+        start, indent = 0, -1
+        for key in dotted.split("."):
+            child_indent = None
+            for i in range(start, len(lines)):
+                text = lines[i].rstrip("\r\n")
+                if not text.strip() or text.lstrip().startswith("#"):
+                    continue
+                line_indent = len(text) - len(text.lstrip())
+                if line_indent <= indent:
+                    raise KeyError(f"{dotted} not found in {params_path}")
+                child_indent = line_indent if child_indent is None else child_indent
+                if line_indent == child_indent and text.lstrip().startswith(f"{key}:"):
+                    start, indent = i, line_indent
+                    break
+            else:
+                raise KeyError(f"{dotted} not found in {params_path}")
+            start += 1
+
+        i = start - 1
+        ending = lines[i][len(lines[i].rstrip("\r\n")):]
+        match = re.match(r"^(\s*[^:]+:\s*)(.*?)(\s+#.*)?$", lines[i].rstrip("\r\n"))
+        scalar = yaml.safe_dump(value, default_flow_style = True).strip().removesuffix("...").strip()
+        lines[i] = f"{match.group(1)}{scalar}{match.group(3) or ''}{ending}"
+
+    with open(params_path, "w", newline = "") as f:
+        f.writelines(lines)
+
+
+def run_trial_processes(commands: t.Sequence[t.List[str]], *, max_concurrent: int, threads_per_trial: int,
+                        poll_interval: float = 0.5) -> t.List[int]:
+    """
+    Run trial commands with at most `max_concurrent` alive at once, capping the
+    TensorFlow thread pools of each so concurrent trials share the core budget
+    instead of oversubscribing it. Returns the exit code of every command.
+    """
+    env = {**os.environ,
+           "TF_NUM_INTRAOP_THREADS": str(threads_per_trial),
+           "TF_NUM_INTEROP_THREADS": str(max(1, threads_per_trial // 2)),
+           "OMP_NUM_THREADS": str(threads_per_trial)}
+    pending = list(enumerate(commands))
+    running, return_codes = {}, [None] * len(commands)
+
+    while pending or running:
+        while pending and len(running) < max_concurrent:
+            index, command = pending.pop(0)
+            running[index] = subprocess.Popen(command, env = env)
+        for index, process in list(running.items()):
+            if process.poll() is not None:
+                return_codes[index] = process.returncode
+                del running[index]
+        time.sleep(poll_interval if running else 0)
+
+    return return_codes
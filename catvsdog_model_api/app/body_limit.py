@@ -0,0 +1,45 @@
+from typing import Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    """
+    Limit request bodies while they are received, before Starlette parses or
+    spools them. `limit_for(path)` is the byte limit of a path, or None for no
+    limit. Limited requests must declare a Content-Length: without one they
+    are rejected with 411, and over the limit with 413, before any of the body
+    is read. The bytes received are counted too.
+    """
+
+    def __init__(self, app, limit_for: Callable[[str], Optional[int]]):
+        self.app = app
+        self.limit_for = limit_for
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limit_for(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if not content_length.isdigit():
+            response = JSONResponse({"detail": "Uploads must declare a Content-Length"}, status_code=411)
+            return await response(scope, receive, send)
+        if int(content_length) > limit:
+            response = JSONResponse({"detail": f"Request body is over the limit of {limit} bytes"}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # An HTTPException, so FastAPI reports it as is instead of as a body parsing error
+                    raise HTTPException(status_code=413, detail=f"Request body is over the limit of {limit} bytes")
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -20,6 +20,65 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str = "Cats & Dogs Image Classification API"
 
+    # Upload limits, before any pixels are decoded: request bodies must declare a
+    # Content-Length and are cut off while received (multipart uploads may hold
+    # MAX_BATCH_SIZE files of MAX_UPLOAD_BYTES), then each file and image header
+    # is checked
+    MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_CHUNK_BYTES: int = 64 * 1024
+    MAX_IMAGE_SIDE: int = 8000
+    MAX_IMAGE_PIXELS: int = 40_000_000
+    ALLOWED_IMAGE_FORMATS: List[str] = ["JPEG", "PNG", "GIF", "BMP", "WEBP"]
+    # 1 for grayscale and palette images, 3 for RGB, 4 for RGBA/CMYK
+    ALLOWED_IMAGE_CHANNELS: List[int] = [1, 3, 4]
+
+    # Largest batch accepted by the batch and raw tensor endpoints
+    MAX_BATCH_SIZE: int = 64
+    # Images per model call; larger request batches are scored in several calls
+    INFERENCE_BATCH_SIZE: int = 32
+
+    # Runtime profiles written by `python -m catvsdog_model.autotune`, one per
+    # CPU limit and model; the one for this machine sets the TensorFlow thread
+    # pools and INFERENCE_BATCH_SIZE / JOB_BATCH_SIZE. Settings given in the
+    # environment win over the profile. The directory may be shared storage, so
+    # a new pod reuses a profile another pod tuned for the same limit
+    RUNTIME_PROFILE_DIR: str = "runtime_profiles"
+
+    # Bulk scoring jobs: SQLite state and extracted archives live under JOBS_DIR.
+    # JOB_WORKERS threads score jobs in one API worker process; images claimed by
+    # a process that stopped are claimed again after JOB_LEASE_SECONDS
+    JOBS_DIR: str = "jobs"
+    JOB_WORKERS: int = 1
+    JOB_LEASE_SECONDS: float = 600.0
+    # Manifest jobs may only name images under this directory; they are
+    # rejected while it is unset
+    JOB_SOURCE_ROOT: str = ""
+    JOB_BATCH_SIZE: int = 64
+    MAX_JOB_IMAGES: int = 100_000
+    MAX_JOB_UPLOAD_BYTES: int = 2 * 1024 * 1024 * 1024
+
+    # Embedding index: saved under EMBEDDING_INDEX_DIR every EMBEDDING_SAVE_SECONDS
+    # when it changed, and at shutdown, by the one worker process allowed to
+    # write it; memory-mapped at startup. It is clustered into EMBEDDING_NLIST
+    # lists once it holds EMBEDDING_TRAIN_SIZE vectors, and searched exactly
+    # before that. Uploads that would take it over EMBEDDING_MAX_SIZE are rejected
+    EMBEDDING_INDEX_DIR: str = "embeddings"
+    EMBEDDING_NLIST: int = 64
+    EMBEDDING_NPROBE: int = 8
+    EMBEDDING_TRAIN_SIZE: int = 2048
+    EMBEDDING_SAVE_SECONDS: float = 30.0
+    EMBEDDING_MAX_SIZE: int = 200_000
+    # Neighbours at least this similar are reported as duplicates, with their stored prediction
+    DUPLICATE_SIMILARITY: float = 0.98
+
+    # /debug/memory: only registered, and tracemalloc only started, when enabled.
+    # Requests must send the token in an X-Debug-Token header
+    DEBUG_MEMORY_ENABLED: bool = False
+    DEBUG_MEMORY_TOKEN: str = ""
+    DEBUG_MEMORY_TRACE_FRAMES: int = 1
+    # Largest `top` a report may ask for
+    DEBUG_MEMORY_MAX_TOP: int = 100
+
     class Config:
         case_sensitive = True
 
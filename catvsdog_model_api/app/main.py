@@ -4,30 +4,59 @@ file = Path(__file__).resolve()
 parent, root = file.parent, file.parents[1]
 sys.path.append(str(root))
 #print(sys.path)
-from typing import Any
+from typing import Any, List, Optional
+import csv
+import fcntl
+import io
+import json
+import os
+import secrets
+import shutil
+import threading
 import time
+import uuid
 
-from fastapi import FastAPI, Request, APIRouter, File, UploadFile
+from fastapi import FastAPI, Request, APIRouter, File, UploadFile, BackgroundTasks, HTTPException, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
+from app.body_limit import BodySizeLimitMiddleware
 from app import __version__, schemas
 
 import numpy as np
-from PIL import Image
 import tensorflow as tf
 from tensorflow import keras
 
 import sys
 sys.path.append("..")
-from catvsdog_model.predict import make_prediction
+from catvsdog_model.autotune import apply_profile_threads, load_profile, profile_is_current, profile_path
+
+# Tuned runtime profile: the thread pools must be sized before catvsdog_model.predict loads the model
+runtime_profile = load_profile(profile_path(settings.RUNTIME_PROFILE_DIR))
+if runtime_profile is not None and not profile_is_current(runtime_profile):
+    print(f"Runtime profile {profile_path(settings.RUNTIME_PROFILE_DIR)} was tuned for another CPU limit or model, "
+          f"using defaults")
+    runtime_profile = None
+if runtime_profile is not None:
+    apply_profile_threads(runtime_profile)
+    for name in ('INFERENCE_BATCH_SIZE', 'JOB_BATCH_SIZE'):
+        if name not in os.environ:
+            setattr(settings, name, runtime_profile['batch_size'])
+
+from catvsdog_model.predict import clf_model, make_prediction, shadow, submit_shadow
 from catvsdog_model import __version__ as model_version
+from catvsdog_model.config.core import config as model_config
+from catvsdog_model.processing.image_io import ImageRejected, check_image, decode_image, probe_image
+from catvsdog_model.embeddings import IVFIndex, embedding_model
+from catvsdog_model.jobs import JobStore, JobWorker, extract_archive, read_manifest, resolve_sources
+from catvsdog_model.processing.tensor_io import (TENSORS_CONTENT_TYPE, TensorFormatError, decode_tensors,
+                                                 parse_shape, view_tensor)
 
 # Prometheus metrics
 from prometheus_client import Counter, Histogram, Gauge, Info, generate_latest, CONTENT_TYPE_LATEST
 from prometheus_fastapi_instrumentator import Instrumentator
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse
 
 app = FastAPI(
     title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -52,16 +81,90 @@ prediction_latency = Histogram(
     buckets=[0.1, 0.25, 0.5, 0.75, 1.0, 2.0, 5.0]
 )
 
+# Cascade inference: images answered by each stage (escalation rate = full / all)
+# and time spent in each stage
+cascade_stage_predictions = Counter(
+    'catvsdog_cascade_predictions_total',
+    'Number of images answered by each cascade stage',
+    ['stage']
+)
+
+cascade_stage_latency = Histogram(
+    'catvsdog_cascade_stage_latency_seconds',
+    'Time spent in each cascade stage',
+    ['stage'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+# Shadow inference: model inference time of the primary and candidate models,
+# and how often the candidate agrees with the primary label
+model_inference_latency = Histogram(
+    'catvsdog_model_inference_latency_seconds',
+    'Model inference time per request, by model',
+    ['model'],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+)
+
+shadow_requests = Counter(
+    'catvsdog_shadow_requests_total',
+    'Requests considered for shadow inference, by outcome (skipped, queued, shed)',
+    ['outcome']
+)
+
+shadow_images = Counter(
+    'catvsdog_shadow_images_total',
+    'Images scored by the shadow candidate'
+)
+
+shadow_agreements = Counter(
+    'catvsdog_shadow_agreements_total',
+    'Shadow images where the candidate label matches the primary label'
+)
+
+shadow_agreement_rate = Gauge(
+    'catvsdog_shadow_agreement_rate',
+    'Fraction of shadow images where the candidate agrees with the primary model'
+)
+
 image_processing_errors = Counter(
     'catvsdog_image_processing_errors_total',
     'Total number of image processing errors'
 )
 
+image_rejections = Counter(
+    'catvsdog_image_rejections_total',
+    'Uploads rejected before decoding, by reason',
+    ['reason']
+)
+
 active_predictions = Gauge(
     'catvsdog_active_predictions',
     'Number of predictions currently being processed'
 )
 
+# Bulk scoring jobs
+job_images = Counter(
+    'catvsdog_job_images_total',
+    'Job images processed by the job workers, by outcome (done, failed)',
+    ['status']
+)
+
+job_batch_latency = Histogram(
+    'catvsdog_job_batch_seconds',
+    'Time to decode and score one job batch',
+    buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+job_backlog_images = Gauge(
+    'catvsdog_job_backlog_images',
+    'Job images waiting to be scored'
+)
+
+job_backlog_jobs = Gauge(
+    'catvsdog_job_backlog_jobs',
+    'Jobs not finished yet'
+)
+
 model_info = Info(
     'catvsdog_model',
     'Information about the deployed model'
@@ -73,6 +176,18 @@ model_info.info({
     'api_version': str(__version__)
 })
 
+runtime_profile_info = Info(
+    'catvsdog_runtime_profile',
+    'Runtime settings in use, and whether they come from a tuned profile'
+)
+runtime_profile_info.info({
+    'tuned': str(runtime_profile is not None).lower(),
+    'intra_op_threads': str(tf.config.threading.get_intra_op_parallelism_threads()),
+    'inter_op_threads': str(tf.config.threading.get_inter_op_parallelism_threads()),
+    'inference_batch_size': str(settings.INFERENCE_BATCH_SIZE),
+    'job_batch_size': str(settings.JOB_BATCH_SIZE)
+})
+
 # Initialize Prometheus instrumentator
 instrumentator = Instrumentator(
     should_group_status_codes=True,
@@ -91,20 +206,83 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
 filename = None
+in_flight_predictions = 0
 
-def preprocess_image(img):
-    if np.array(img).shape[2] == 3:
-        img = img.resize((180, 180))
-        return np.array(img).astype(int)
-    elif np.array(img).shape[2] == 4:
-        try:
-            img = img.resize((180, 180))
-            return np.array(img)[:-1].astype(int)
-        except Exception as e:
-            print("Unable to resize 'X,X,4' to '180,180,3':", e)
-    else:
-        print("Image channel is other than 3 or 4.")
-        return np.array(img).astype(int)
+
+def record_shadow_result(result):
+    """Called on the shadow worker thread for each batch scored by the candidate"""
+    model_inference_latency.labels(model='candidate').observe(result['latency_ms'] / 1000)
+    shadow_images.inc(result['images'])
+    shadow_agreements.inc(result['agreements'])
+    shadow_agreement_rate.set(shadow.agreement_rate)
+
+
+def run_shadow(data_in, results, primary_in_flight):
+    """
+    Background task: runs after the response has been sent. `primary_in_flight` is the
+    primary load sampled when the request arrived, as by now most of it has finished
+    """
+    outcome = submit_shadow(input_data=data_in, results=results, primary_in_flight=primary_in_flight)
+    shadow_requests.labels(outcome=outcome).inc()
+
+
+if shadow is not None:
+    shadow.on_result = record_shadow_result
+
+# HTTP status of each upload rejection reason
+REJECTION_STATUS = {'content_type': 415, 'format': 415, 'too_large': 413}
+
+
+# Room for the multipart boundaries and part headers around each file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def tensor_body_limit() -> int:
+    """Largest /predict/tensor body: a full batch plus the multi-tensor header and one shape record per image"""
+    return settings.MAX_BATCH_SIZE * (int(np.prod(model_config.model_cfg.input_shape)) + 64)
+
+
+def body_limit(path: str) -> Optional[int]:
+    """Request body limit of each upload route, enforced as the body is received"""
+    if path == '/predict/':
+        return settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+    if path in ('/predict/batch', '/embeddings', '/embeddings/index', '/embeddings/search'):
+        return settings.MAX_BATCH_SIZE * (settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES)
+    if path == '/predict/tensor':
+        return tensor_body_limit()
+    if path == '/jobs':
+        return settings.MAX_JOB_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+    return None
+
+
+app.add_middleware(BodySizeLimitMiddleware, limit_for=body_limit)
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """
+    Read one file of a multipart upload, rejecting it over MAX_UPLOAD_BYTES. The file is
+    already spooled by then; the request as a whole is limited while it is received
+    """
+    chunks, size = [], 0
+    while chunk := await file.read(settings.UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > settings.MAX_UPLOAD_BYTES:
+            raise ImageRejected('too_large', f"Upload is over the limit of {settings.MAX_UPLOAD_BYTES} bytes")
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+async def load_image(file: UploadFile) -> tuple:
+    """Validated upload bytes and model input, rejecting uploads outside the configured limits"""
+    if not (file.content_type or '').startswith('image/'):
+        raise ImageRejected('content_type', f"Expected an image upload, got {file.content_type}")
+    contents = await read_upload(file)
+    check_image(probe_image(contents),
+                allowed_formats=settings.ALLOWED_IMAGE_FORMATS,
+                allowed_channels=settings.ALLOWED_IMAGE_CHANNELS,
+                max_side=settings.MAX_IMAGE_SIDE,
+                max_pixels=settings.MAX_IMAGE_PIXELS)
+    return contents, decode_image(contents, image_size=tuple(model_config.model_cfg.image_size))
 
 
 @app.get("/")
@@ -113,38 +291,408 @@ async def root(request: Request):
 
 
 @app.post("/predict/")
-async def create_upload_files(request: Request, file: UploadFile = File(...)):
-    global filename
+async def create_upload_files(request: Request, background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    global filename, in_flight_predictions
     active_predictions.inc()
+    in_flight_predictions += 1
+    primary_in_flight = in_flight_predictions
     start_time = time.time()
 
     try:
-        if 'image' in file.content_type:
-            contents = await file.read()
-            filename = 'app/static/' + file.filename
-            with open(filename, 'wb') as f:
-                f.write(contents)
+        try:
+            contents, data_in = await load_image(file)
+        except ImageRejected as e:
+            image_rejections.labels(reason=e.reason).inc()
+            raise HTTPException(status_code=REJECTION_STATUS.get(e.reason, 422), detail=str(e))
 
-        img = Image.open(filename)
-        img = preprocess_image(img)
-        data_in = img.reshape(-1, 180, 180, 3)
+        filename = 'app/static/' + Path(file.filename).name
+        with open(filename, 'wb') as f:
+            f.write(contents)
 
+        inference_start = time.perf_counter()
         results = make_prediction(input_data = data_in)
+        model_inference_latency.labels(model='primary').observe(time.perf_counter() - inference_start)
+        if shadow is not None:
+            background_tasks.add_task(run_shadow, data_in, results, primary_in_flight)
         y_pred, conf = results['predictions'][0]
 
         # Record metrics
         prediction_counter.labels(prediction_class=y_pred).inc()
         prediction_confidence.observe(conf)
+        if 'stages' in results:
+            for stage in results['stages']:
+                cascade_stage_predictions.labels(stage=stage).inc()
+            for stage, latency_ms in results['latency_ms'].items():
+                if stage == 'first' or 'full' in results['stages']:
+                    cascade_stage_latency.labels(stage=stage).observe(latency_ms / 1000)
 
         return templates.TemplateResponse("predict.html", {"request": request,
                                                            "result": y_pred,
-                                                           "filename": '../static/'+file.filename,})
+                                                           "filename": '../static/'+Path(filename).name,})
+    except HTTPException:
+        raise
+    except Exception as e:
+        image_processing_errors.inc()
+        raise e
+    finally:
+        prediction_latency.observe(time.time() - start_time)
+        active_predictions.dec()
+        in_flight_predictions -= 1
+
+
+def predict_batch(data_in, background_tasks: BackgroundTasks, primary_in_flight: int) -> dict:
+    """Predictions for a batch of images, as returned by the batch endpoints"""
+    inference_start = time.perf_counter()
+    results = make_prediction(input_data = data_in, batch_size = settings.INFERENCE_BATCH_SIZE)
+    model_inference_latency.labels(model='primary').observe(time.perf_counter() - inference_start)
+    if shadow is not None:
+        background_tasks.add_task(run_shadow, data_in, results, primary_in_flight)
+
+    predictions = []
+    for label, conf in results['predictions']:
+        prediction_counter.labels(prediction_class=label).inc()
+        prediction_confidence.observe(float(conf))
+        predictions.append({'label': label, 'confidence': float(conf)})
+    return {'version': results['version'], 'predictions': predictions}
+
+
+async def load_images(files: List[UploadFile]) -> np.ndarray:
+    """One batch of validated uploads; a rejected file rejects the whole request"""
+    if len(files) > settings.MAX_BATCH_SIZE:
+        image_rejections.labels(reason='batch_size').inc()
+        raise HTTPException(status_code=413, detail=f"Batch of {len(files)} is over the limit of {settings.MAX_BATCH_SIZE}")
+    images = []
+    for index, file in enumerate(files):
+        try:
+            images.append((await load_image(file))[1])
+        except ImageRejected as e:
+            image_rejections.labels(reason=e.reason).inc()
+            raise HTTPException(status_code=REJECTION_STATUS.get(e.reason, 422), detail=f"File {index}: {e}")
+    return np.concatenate(images)
+
+
+@app.post("/predict/batch", response_model=schemas.BatchPredictionResults)
+async def predict_files(background_tasks: BackgroundTasks, files: List[UploadFile] = File(...)) -> dict:
+    """
+    Predict on several uploaded image files in one batch, returning predictions in upload order.
+    Every file goes through the same limits as /predict/, and one rejected file rejects the request.
+    """
+    global in_flight_predictions
+    active_predictions.inc()
+    in_flight_predictions += 1
+    primary_in_flight = in_flight_predictions
+    start_time = time.time()
+
+    try:
+        return predict_batch(await load_images(files), background_tasks, primary_in_flight)
+    except HTTPException:
+        raise
+    except Exception as e:
+        image_processing_errors.inc()
+        raise e
+    finally:
+        prediction_latency.observe(time.time() - start_time)
+        active_predictions.dec()
+        in_flight_predictions -= 1
+
+
+async def read_body(request: Request, max_bytes: int) -> bytearray:
+    """Read a request body in chunks, stopping as soon as it exceeds max_bytes"""
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Request body is over the limit of {max_bytes} bytes")
+
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Request body is over the limit of {max_bytes} bytes")
+    return body
+
+
+@app.post("/predict/tensor", response_model=schemas.BatchPredictionResults)
+async def predict_tensor(request: Request, background_tasks: BackgroundTasks) -> dict:
+    """
+    Predict on already decoded uint8 frames, skipping image decoding. The body is either
+    raw application/octet-stream bytes shaped by the X-Tensor-Shape header
+    (e.g. "4,180,180,3", or one image without the batch size), or the multi-tensor
+    format of catvsdog_model.processing.tensor_io. Predictions are returned in order.
+    """
+    global in_flight_predictions
+    active_predictions.inc()
+    in_flight_predictions += 1
+    primary_in_flight = in_flight_predictions
+    start_time = time.time()
+
+    try:
+        input_shape = model_config.model_cfg.input_shape
+        body = await read_body(request, tensor_body_limit())
+
+        content_type = request.headers.get('content-type', '').split(';')[0].strip()
+        try:
+            if content_type == TENSORS_CONTENT_TYPE:
+                tensors = decode_tensors(body, input_shape=input_shape)
+            elif content_type == 'application/octet-stream':
+                if 'x-tensor-shape' not in request.headers:
+                    raise TensorFormatError("Raw tensor bodies need an X-Tensor-Shape header")
+                tensors = [view_tensor(body, parse_shape(request.headers['x-tensor-shape']), input_shape=input_shape)]
+            else:
+                raise HTTPException(status_code=415, detail=f"Unsupported content type {content_type}")
+        except TensorFormatError as e:
+            image_rejections.labels(reason='tensor').inc()
+            raise HTTPException(status_code=422, detail=str(e))
+
+        batch_size = sum(len(tensor) for tensor in tensors)
+        if batch_size > settings.MAX_BATCH_SIZE:
+            image_rejections.labels(reason='tensor').inc()
+            raise HTTPException(status_code=413, detail=f"Batch of {batch_size} is over the limit of {settings.MAX_BATCH_SIZE}")
+        # A single tensor is passed on as the view of the request body; several are joined into one batch
+        return predict_batch(tensors[0] if len(tensors) == 1 else np.concatenate(tensors), background_tasks,
+                             primary_in_flight)
+    except HTTPException:
+        raise
     except Exception as e:
         image_processing_errors.inc()
         raise e
     finally:
         prediction_latency.observe(time.time() - start_time)
         active_predictions.dec()
+        in_flight_predictions -= 1
+
+
+def predict_job_batch(images):
+    """(label, confidence) pairs for a job batch"""
+    return make_prediction(input_data = images, batch_size = settings.INFERENCE_BATCH_SIZE)['predictions']
+
+
+def record_job_batch(batch):
+    """Called on a job worker thread after each batch"""
+    job_images.labels(status='done').inc(batch['images'])
+    job_images.labels(status='failed').inc(batch['failed'])
+    job_batch_latency.observe(batch['seconds'])
+
+
+job_store = JobStore(Path(settings.JOBS_DIR) / "jobs.sqlite3", lease_seconds=settings.JOB_LEASE_SECONDS)
+# Every uvicorn worker process imports this module; the lock file makes one of them run the job workers
+job_worker = JobWorker(job_store, predict_job_batch,
+                       image_size=tuple(model_config.model_cfg.image_size),
+                       batch_size=settings.JOB_BATCH_SIZE,
+                       num_workers=settings.JOB_WORKERS,
+                       on_batch=record_job_batch,
+                       lock_path=Path(settings.JOBS_DIR) / "worker.lock")
+# Read from the store when metrics are scraped
+job_backlog_images.set_function(lambda: job_store.backlog()['images'])
+job_backlog_jobs.set_function(lambda: job_store.backlog()['jobs'])
+
+
+@app.on_event("startup")
+def start_job_worker():
+    # Jobs interrupted by a restart are picked up again from the store once their claims' leases run out
+    job_worker.start()
+
+
+@app.on_event("shutdown")
+def stop_job_worker():
+    job_worker.stop()
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(file: UploadFile = File(...)) -> dict:
+    """
+    Queue a bulk scoring job. The upload is either a manifest of image paths under the
+    server's JOB_SOURCE_ROOT (.json list or .txt, one path per line) or a zip/tar archive
+    of images.
+    Returns the job id to poll with GET /jobs/{job_id}.
+    """
+    # The upload is already spooled to a temporary file; it is read from there, never joined in memory
+    upload = file.file
+    size = upload.seek(0, io.SEEK_END)
+    upload.seek(0)
+    if size > settings.MAX_JOB_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload is over the limit of {settings.MAX_JOB_UPLOAD_BYTES} bytes")
+
+    archive_dir = None
+    try:
+        if Path(file.filename or '').suffix.lower() in ('.json', '.txt'):
+            if not settings.JOB_SOURCE_ROOT:
+                raise HTTPException(status_code=403, detail="Manifest jobs are disabled on this server")
+            if size > settings.MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Manifest is over the limit of {settings.MAX_UPLOAD_BYTES} bytes")
+            sources = resolve_sources(read_manifest(upload.read()), Path(settings.JOB_SOURCE_ROOT))
+            if len(sources) > settings.MAX_JOB_IMAGES:
+                raise ValueError(f"Manifest has more than {settings.MAX_JOB_IMAGES} images")
+        else:
+            archive_dir = Path(settings.JOBS_DIR) / "archives" / uuid.uuid4().hex
+            sources = extract_archive(upload, archive_dir, max_images=settings.MAX_JOB_IMAGES,
+                                      max_member_bytes=settings.MAX_UPLOAD_BYTES)
+        job_id = job_store.create_job(sources)
+    except (ValueError, UnicodeDecodeError) as e:
+        if archive_dir is not None:
+            shutil.rmtree(archive_dir, ignore_errors=True)
+        raise HTTPException(status_code=422, detail=str(e))
+    return {'job_id': job_id, 'status': 'queued', 'total': len(sources)}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> dict:
+    """Status and progress of a job"""
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
+
+
+@app.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str, format: str = 'json'):
+    """Per-image results of a job so far, as JSON or as a CSV download (?format=csv)"""
+    if job_store.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    results = job_store.results(job_id)
+    if format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=['idx', 'source', 'status', 'label', 'confidence', 'error'])
+        writer.writeheader()
+        writer.writerows(results)
+        return Response(content=buffer.getvalue(), media_type='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename="{job_id}.csv"'})
+    return JSONResponse({'job_id': job_id, 'results': results})
+
+
+# Image embeddings: the features entering the classification head, with the
+# prediction from the same forward pass. Search only needs the embeddings, so
+# it skips the head
+embedder = embedding_model(clf_model, with_predictions=True)
+search_embedder = embedding_model(clf_model)
+embedding_index_dir = Path(settings.EMBEDDING_INDEX_DIR)
+if (embedding_index_dir / "index.json").exists():
+    embedding_index = IVFIndex.load(embedding_index_dir)
+    labels_path = embedding_index_dir / "labels.json"
+    embedding_labels = json.loads(labels_path.read_text()) if labels_path.exists() else {}
+else:
+    embedding_index = IVFIndex(embedder.outputs[0].shape[-1], nlist=settings.EMBEDDING_NLIST,
+                               nprobe=settings.EMBEDDING_NPROBE)
+    embedding_labels = {}
+
+# One process writes the index: the one holding the lock file. Others serve searches
+# from the index as it was saved when they started
+embedding_index_dir.mkdir(parents=True, exist_ok=True)
+embedding_writer_lock = open(embedding_index_dir / "writer.lock", "a")
+try:
+    fcntl.flock(embedding_writer_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    embedding_writer = True
+except BlockingIOError:
+    embedding_writer = False
+# Guards the index and labels between requests and the background save
+embedding_lock = threading.Lock()
+embedding_unsaved = 0
+embedding_saver_stop = threading.Event()
+
+
+def save_embedding_index():
+    """Write the index and its labels if they changed since the last save"""
+    global embedding_unsaved
+    with embedding_lock:
+        if not embedding_unsaved:
+            return
+        # Labels first: index.json marks a complete save, and labels of vectors it lacks are unused
+        with open(embedding_index_dir / "labels.json.tmp", "w") as f:
+            json.dump(embedding_labels, f)
+        os.replace(embedding_index_dir / "labels.json.tmp", embedding_index_dir / "labels.json")
+        embedding_index.save(embedding_index_dir)
+        embedding_unsaved = 0
+
+
+def save_embedding_index_periodically():
+    while not embedding_saver_stop.wait(settings.EMBEDDING_SAVE_SECONDS):
+        try:
+            save_embedding_index()
+        except OSError as e:
+            print(f"Could not save the embedding index: {e}")
+
+
+embedding_saver = threading.Thread(target=save_embedding_index_periodically, name="embedding-index-saver",
+                                   daemon=True)
+
+
+@app.on_event("startup")
+def start_embedding_saver():
+    if embedding_writer:
+        embedding_saver.start()
+
+
+@app.on_event("shutdown")
+def stop_embedding_saver():
+    if embedding_writer:
+        embedding_saver_stop.set()
+        embedding_saver.join()
+        save_embedding_index()
+
+
+def embed(images):
+    """Embeddings and (label, confidence) predictions of a batch"""
+    embeddings, probabilities = embedder.predict_on_batch(images)
+    predictions = [(model_config.model_cfg.label_mappings[int(p + 0.5)], float(max(p, 1 - p)))
+                   for p in np.asarray(probabilities).reshape(-1)]
+    return np.asarray(embeddings), predictions
+
+
+@app.post("/embeddings")
+async def get_embeddings(files: List[UploadFile] = File(...)) -> dict:
+    """Embeddings of uploaded images, with their predictions"""
+    embeddings, predictions = embed(await load_images(files))
+    return {'version': model_version,
+            'embeddings': embeddings.tolist(),
+            'predictions': [{'label': label, 'confidence': conf} for label, conf in predictions]}
+
+
+@app.post("/embeddings/index")
+async def index_images(files: List[UploadFile] = File(...)) -> dict:
+    """
+    Add uploaded images to the embedding index with their predictions; returns their ids.
+    The index is saved every EMBEDDING_SAVE_SECONDS and at shutdown.
+    """
+    global embedding_unsaved
+    if not embedding_writer:
+        raise HTTPException(status_code=503, detail="The embedding index is written by another worker process")
+    index_full = HTTPException(status_code=507,
+                               detail=f"The embedding index is limited to {settings.EMBEDDING_MAX_SIZE} images")
+    if len(embedding_index) + len(files) > settings.EMBEDDING_MAX_SIZE:
+        raise index_full
+    embeddings, predictions = embed(await load_images(files))
+    with embedding_lock:
+        # Checked again: other requests may have filled the index while these images were embedded
+        if len(embedding_index) + len(embeddings) > settings.EMBEDDING_MAX_SIZE:
+            raise index_full
+        ids = embedding_index.add(embeddings)
+        for image_id, file, (label, conf) in zip(ids, files, predictions):
+            embedding_labels[str(image_id)] = {'label': label, 'confidence': conf, 'source': file.filename}
+        if not embedding_index.is_trained and len(embedding_index) >= settings.EMBEDDING_TRAIN_SIZE:
+            embedding_index.build()
+        embedding_unsaved += len(ids)
+        size = len(embedding_index)
+    return {'ids': ids.tolist(), 'size': size}
+
+
+@app.post("/embeddings/search")
+async def search_images(k: int = 5, files: List[UploadFile] = File(...)) -> dict:
+    """
+    Nearest indexed images of each upload. When the nearest one is a near duplicate, its
+    stored prediction is returned as `cached_prediction`, so callers can reuse it instead
+    of calling /predict. Only the embedding part of the model runs.
+    """
+    embeddings = np.asarray(search_embedder.predict_on_batch(await load_images(files)))
+    with embedding_lock:
+        ids, similarities = embedding_index.search(embeddings, k=k)
+    results = []
+    for row_ids, row_similarities in zip(ids, similarities):
+        neighbours = [{'id': int(i), 'similarity': float(s), **embedding_labels.get(str(i), {})}
+                      for i, s in zip(row_ids, row_similarities) if i >= 0]
+        duplicate = neighbours[0] if neighbours and neighbours[0]['similarity'] >= settings.DUPLICATE_SIMILARITY else None
+        results.append({'neighbours': neighbours,
+                        'duplicate_of': duplicate['id'] if duplicate else None,
+                        'cached_prediction': {'label': duplicate['label'], 'confidence': duplicate['confidence']}
+                                             if duplicate and 'label' in duplicate else None})
+    return {'version': model_version, 'results': results}
 
 
 @app.get("/metrics")
@@ -167,6 +715,45 @@ def health() -> dict:
     return health.dict()
 
 
+# Memory introspection. When disabled, neither the route nor tracemalloc exist,
+# so pods pay nothing for it
+if settings.DEBUG_MEMORY_ENABLED:
+    if not settings.DEBUG_MEMORY_TOKEN:
+        raise RuntimeError("DEBUG_MEMORY_ENABLED requires a DEBUG_MEMORY_TOKEN")
+
+    from catvsdog_model import predict as predict_module
+    from catvsdog_model.memory import HeapProfiler, memory_report
+
+    heap_profiler = HeapProfiler(frames=settings.DEBUG_MEMORY_TRACE_FRAMES)
+    # Snapshot 1 is the heap after startup, the baseline for leak hunting; it is never evicted
+    heap_profiler.snapshot()
+
+    @app.get("/debug/memory")
+    def debug_memory(request: Request, top: int = Query(min(20, settings.DEBUG_MEMORY_MAX_TOP), ge=1, le=settings.DEBUG_MEMORY_MAX_TOP),
+                     diff_from: Optional[int] = None) -> dict:
+        """
+        Process RSS, top Python allocation sites (with growth since snapshot `diff_from`),
+        TensorFlow allocator statistics, loaded models, in-process caches and upload directories.
+        Every call takes a new heap snapshot; the last few are kept for diffs.
+        """
+        if not secrets.compare_digest(request.headers.get('x-debug-token', ''), settings.DEBUG_MEMORY_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid debug token")
+        try:
+            return memory_report(
+                models={'classifier': clf_model,
+                        'cascade_first_stage': getattr(predict_module, 'first_stage', None),
+                        'shadow_candidate': getattr(predict_module, 'candidate', None)},
+                caches={'embedding_index': embedding_index,
+                        'embedding_labels': embedding_labels,
+                        'shadow_queue': shadow.pending_batches() if shadow is not None else None},
+                directories={'static': Path('app/static'),
+                             'jobs': Path(settings.JOBS_DIR),
+                             'embeddings': embedding_index_dir},
+                heap=heap_profiler, limit=top, diff_from=diff_from)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
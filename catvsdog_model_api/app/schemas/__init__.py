@@ -1,2 +1,2 @@
 from .health import Health
-from .predict import PredictionResults
+from .predict import Prediction, PredictionResults, BatchPredictionResults
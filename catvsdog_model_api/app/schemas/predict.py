@@ -7,3 +7,13 @@ class PredictionResults(BaseModel):
     version: str
     #predictions: Optional[List[int]]
     predictions: Optional[str]
+
+
+class Prediction(BaseModel):
+    label: str
+    confidence: float
+
+
+class BatchPredictionResults(BaseModel):
+    version: str
+    predictions: List[Prediction]
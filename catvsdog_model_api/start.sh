@@ -0,0 +1,12 @@
+#!/bin/sh
+# Container entrypoint: tune a runtime profile if there is none for this CPU
+# limit and model, then serve. The API itself reads the profile's thread pool
+# and batch settings at startup.
+PROFILE_DIR="${RUNTIME_PROFILE_DIR:-runtime_profiles}"
+
+python -m catvsdog_model.autotune --if-missing --profile-dir "$PROFILE_DIR" \
+    || echo "Runtime autotuning failed, serving with default settings"
+
+# One worker: the API keeps per-process state (embedding index, shadow
+# comparison counts, Prometheus metrics) that several workers would split
+exec uvicorn app.main:app --host 0.0.0.0 --port 8001 --workers 1
@@ -0,0 +1,5 @@
+from catvsdog_client._base import CatvsdogError, Prediction
+from catvsdog_client.aio import AsyncClient
+from catvsdog_client.client import Client
+
+__version__ = "0.0.1"
@@ -0,0 +1,105 @@
+import mimetypes
+import random
+import typing as t
+from pathlib import Path
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+# Overloaded or rate-limited server: worth retrying after a pause
+RETRY_STATUS = (429, 503)
+
+# An image is a file path, the encoded bytes of an image file, or a decoded
+# (height, width, 3) uint8 array sent through the raw tensor endpoint
+Image = t.Union[str, Path, bytes, np.ndarray]
+
+_SIGNATURES = [(b"\xff\xd8", "image/jpeg"), (b"\x89PNG", "image/png"), (b"GIF8", "image/gif"), (b"BM", "image/bmp")]
+
+
+class Prediction(t.NamedTuple):
+    label: str
+    confidence: float
+
+
+class CatvsdogError(Exception):
+    """A request the API rejected, or that still failed after all retries."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(f"HTTP {status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """A session keeping up to `pool_size` connections alive for reuse."""
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def make_batches(images: t.Sequence[Image], batch_size: int) -> t.List[t.Tuple[t.List[int], t.List[Image]]]:
+    """
+    Split images into (indices, images) batches of at most `batch_size`.
+    Arrays and encoded files go to different endpoints, so a batch holds only one kind.
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+    files = [index for index, image in enumerate(images) if not isinstance(image, np.ndarray)]
+    arrays = [index for index, image in enumerate(images) if isinstance(image, np.ndarray)]
+    batches = []
+    for group in (files, arrays):
+        for start in range(0, len(group), batch_size):
+            indices = group[start:start + batch_size]
+            batches.append((indices, [images[index] for index in indices]))
+    return batches
+
+
+def _content_type(data: bytes, name: str) -> str:
+    guessed = mimetypes.guess_type(name)[0]
+    if guessed and guessed.startswith("image/"):
+        return guessed
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return next((content_type for signature, content_type in _SIGNATURES if data.startswith(signature)), "image/jpeg")
+
+
+def build_request(images: t.Sequence[Image]) -> t.Tuple[str, dict]:
+    """Endpoint path and `requests` keyword arguments for one batch."""
+
+    if isinstance(images[0], np.ndarray):
+        batch = np.stack([np.asarray(image, dtype = np.uint8) for image in images])
+        return "/predict/tensor", {"data": batch.tobytes(),
+                                   "headers": {"Content-Type": "application/octet-stream",
+                                               "X-Tensor-Shape": ",".join(map(str, batch.shape))}}
+
+    files = []
+    for index, image in enumerate(images):
+        if isinstance(image, bytes):
+            data, name = image, f"image{index}"
+        else:
+            data, name = Path(image).read_bytes(), Path(image).name
+        files.append(("files", (name, data, _content_type(data, name))))
+    return "/predict/batch", {"files": files}
+
+
+def parse_response(response: requests.Response) -> t.List[Prediction]:
+    if response.status_code != 200:
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise CatvsdogError(response.status_code, str(detail))
+    return [Prediction(p["label"], p["confidence"]) for p in response.json()["predictions"]]
+
+
+def retry_delay(response: t.Optional[requests.Response], attempt: int, backoff: float) -> float:
+    """Seconds to wait before retry number `attempt + 1`: the server's Retry-After, or jittered exponential backoff."""
+
+    retry_after = response.headers.get("Retry-After", "") if response is not None else ""
+    if retry_after.replace(".", "", 1).isdigit():
+        return float(retry_after)
+    return backoff * 2 ** attempt * random.uniform(0.5, 1.0)
@@ -0,0 +1,84 @@
+import asyncio
+import typing as t
+
+import requests
+
+from catvsdog_client._base import (RETRY_STATUS, Image, Prediction, build_request, make_batches, make_session,
+                                   parse_response, retry_delay)
+
+
+class AsyncClient:
+    """
+    asyncio client for the Cats & Dogs API, with the batching, retries and
+    connection pooling of `Client`.
+
+    Each HTTP call runs on a worker thread over the shared keep-alive session,
+    so the client needs no asyncio HTTP library. A semaphore bounds the number
+    of requests in flight to `max_concurrency`.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:8001", *, batch_size: int = 16, max_concurrency: int = 4,
+                 max_retries: int = 3, backoff: float = 0.5, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = make_session(max_concurrency)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _post(self, images: t.Sequence[Image]) -> t.List[Prediction]:
+        async with self._semaphore:
+            path, kwargs = await asyncio.to_thread(build_request, images)
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await asyncio.to_thread(self.session.post, self.base_url + path,
+                                                       timeout = self.timeout, **kwargs)
+                except requests.ConnectionError:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(retry_delay(None, attempt, self.backoff))
+                    continue
+                if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                    await asyncio.sleep(retry_delay(response, attempt, self.backoff))
+                    continue
+                return parse_response(response)
+
+    async def predict(self, image: Image) -> Prediction:
+        """Prediction for one image."""
+        return (await self._post([image]))[0]
+
+    async def iter_predictions(self, images: t.Iterable[Image]) -> t.AsyncIterator[t.Tuple[int, Prediction]]:
+        """(index, prediction) pairs, yielded batch by batch as requests complete."""
+
+        async def run(indices, batch):
+            return indices, await self._post(batch)
+
+        tasks = [asyncio.ensure_future(run(indices, batch)) for indices, batch in make_batches(list(images), self.batch_size)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, predictions = await next_done
+                for pair in zip(indices, predictions):
+                    yield pair
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def predict_many(self, images: t.Iterable[Image]) -> t.List[Prediction]:
+        """Predictions for all images, in input order."""
+
+        images = list(images)
+        predictions = [None] * len(images)
+        async for index, prediction in self.iter_predictions(images):
+            predictions[index] = prediction
+        return predictions
+
+    async def close(self) -> None:
+        self.session.close()
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
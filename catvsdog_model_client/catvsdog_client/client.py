@@ -0,0 +1,78 @@
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from catvsdog_client._base import (RETRY_STATUS, Image, Prediction, build_request, make_batches, make_session,
+                                   parse_response, retry_delay)
+
+
+class Client:
+    """
+    Synchronous client for the Cats & Dogs API.
+
+    Image lists are split into batch requests of `batch_size`, sent by up to
+    `max_concurrency` threads over a pool of keep-alive connections. Requests
+    answered with 429 or 503, or failing to connect, are retried up to
+    `max_retries` times with exponential backoff starting at `backoff` seconds.
+    """
+
+    def __init__(self, base_url: str = "http://localhost:8001", *, batch_size: int = 16, max_concurrency: int = 4,
+                 max_retries: int = 3, backoff: float = 0.5, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = make_session(max_concurrency)
+
+    def _post(self, images: t.Sequence[Image]) -> t.List[Prediction]:
+        path, kwargs = build_request(images)
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(self.base_url + path, timeout = self.timeout, **kwargs)
+            except requests.ConnectionError:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(retry_delay(None, attempt, self.backoff))
+                continue
+            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                time.sleep(retry_delay(response, attempt, self.backoff))
+                continue
+            return parse_response(response)
+
+    def predict(self, image: Image) -> Prediction:
+        """Prediction for one image."""
+        return self._post([image])[0]
+
+    def iter_predictions(self, images: t.Iterable[Image]) -> t.Iterator[t.Tuple[int, Prediction]]:
+        """(index, prediction) pairs, yielded batch by batch as requests complete."""
+
+        batches = make_batches(list(images), self.batch_size)
+        pool = ThreadPoolExecutor(max_workers = self.max_concurrency)
+        try:
+            futures = {pool.submit(self._post, batch): indices for indices, batch in batches}
+            for future in as_completed(futures):
+                yield from zip(futures[future], future.result())
+        finally:
+            pool.shutdown(wait = True, cancel_futures = True)
+
+    def predict_many(self, images: t.Iterable[Image]) -> t.List[Prediction]:
+        """Predictions for all images, in input order."""
+
+        images = list(images)
+        predictions = [None] * len(images)
+        for index, prediction in self.iter_predictions(images):
+            predictions[index] = prediction
+        return predictions
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,100 @@
+"""
+Input pipeline bottleneck analyzer
+Benchmarks each stage of the training input pipeline (file listing, read,
+decode, resize, augmentation, batching) in isolation at several parallelism
+levels, names the limiting stage and suggests parallelism settings and the
+number of cores needed to feed training
+"""
+import sys
+import os
+import json
+import argparse
+from pathlib import Path
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.config.core import DATASET_DIR, config
+from catvsdog_model.processing.features import get_augmentation_policy
+from catvsdog_model.processing.pipeline_profile import analyze_profile, profile_stages
+
+
+def default_parallelism():
+    """1, 2, 4, ... up to the number of cores"""
+    levels, level = [], 1
+    while level < (os.cpu_count() or 1):
+        levels.append(level)
+        level *= 2
+    return levels + [os.cpu_count() or 1]
+
+
+def training_throughput():
+    """Images/sec measured by the training telemetry, if a run recorded it"""
+    telemetry_file = Path("metrics") / "training_telemetry.json"
+    if telemetry_file.exists():
+        return json.loads(telemetry_file.read_text()).get("images_per_sec")
+    return None
+
+
+def analyze_input_pipeline(split=None, parallelism=None, max_images=512, policy=None, target=None):
+    """
+    Profile the pipeline stages and write the analysis to metrics/
+    """
+    directory = DATASET_DIR / (split or config.app_cfg.train_path)
+    parallelism = sorted(set(parallelism or default_parallelism()))
+    augmentation_policy = get_augmentation_policy(policy)
+    target = target or training_throughput()
+
+    print(f"Profiling input pipeline on {directory}")
+    print(f"  image size {config.model_cfg.image_size}, batch size {config.model_cfg.batch_size}, "
+          f"augmentation policy {policy or config.model_cfg.augmentation_policy}")
+    print(f"  parallelism levels {parallelism}, up to {max_images} images")
+
+    profile = profile_stages(directory,
+                             image_size=tuple(config.model_cfg.image_size),
+                             batch_size=config.model_cfg.batch_size,
+                             policy=augmentation_policy,
+                             parallelism=parallelism,
+                             max_images=max_images)
+    analysis = analyze_profile(profile, target=target)
+
+    print(f"\n   {'stage':<10}" + "".join(f"{f'p={p}':>10}" for p in parallelism) + f"{'suggested':>11}{'cores':>8}")
+    for stage, result in analysis['stages'].items():
+        rates = "".join(f"{result['images_per_sec'].get(str(p), float('nan')):>10.0f}" for p in parallelism)
+        suggested = result['suggested_parallelism'] if result['suggested_parallelism'] is not None else '-'
+        cores = f"{result['cores_for_target']:.2f}" if result['cores_for_target'] is not None else '-'
+        print(f"   {stage:<10}{rates}{suggested:>11}{cores:>8}")
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    report_file = metrics_dir / "input_pipeline_profile.json"
+    with open(report_file, 'w') as f:
+        json.dump({"directory": str(directory), "parallelism": parallelism, **analysis}, f, indent=2)
+    print(f"\n✓ Saved input pipeline profile to {report_file}")
+
+    print(f"\n📊 Limiting stage: {analysis['limiting_stage']}, "
+          f"max sustainable {analysis['max_sustainable_images_per_sec']:.0f} images/sec")
+    if target:
+        verdict = "can" if analysis['target_reachable'] else "cannot"
+        print(f"   The pipeline {verdict} sustain the target of {analysis['target_images_per_sec']:.0f} images/sec")
+    print(f"   Input processing needs about {analysis['cores_for_target']} cores "
+          f"for {analysis['target_images_per_sec']:.0f} images/sec, "
+          f"on top of the cores running the model")
+    return analysis
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark input pipeline stages in isolation")
+    parser.add_argument("--split", default=None, help="dataset directory under datasets/data, train by default")
+    parser.add_argument("--parallelism", type=int, nargs="+", default=None,
+                        help="num_parallel_calls levels, powers of two up to the core count by default")
+    parser.add_argument("--max-images", type=int, default=512, help="images to profile, 0 for all")
+    parser.add_argument("--policy", default=None, help="augmentation policy, the configured one by default")
+    parser.add_argument("--target", type=float, default=None,
+                        help="images/sec to feed, the training telemetry throughput by default")
+    args = parser.parse_args()
+
+    analyze_input_pipeline(split=args.split, parallelism=args.parallelism, max_images=args.max_images or None,
+                           policy=args.policy, target=args.target)
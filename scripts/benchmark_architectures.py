@@ -0,0 +1,101 @@
+"""
+Architecture variant benchmark
+Compares parameter count, CPU inference latency and validation accuracy of
+the backbone/head variants available in create_model
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.config.core import config
+from catvsdog_model.latency import keras_predictor, measure_latency
+from catvsdog_model.model import create_model
+from catvsdog_model.processing.data_manager import load_train_dataset, load_validation_dataset
+
+# (name, architecture, head, width_multiplier, depth_multiplier)
+VARIANTS = [
+    ("baseline", "baseline", "flatten", 1.0, 1.0),
+    ("baseline_gap", "baseline", "gap", 1.0, 1.0),
+    ("baseline_gap_w0.5", "baseline", "gap", 0.5, 1.0),
+    ("inverted_residual", "inverted_residual", "gap", 1.0, 1.0),
+    ("inverted_residual_w0.5", "inverted_residual", "gap", 0.5, 1.0),
+    ("inverted_residual_w0.5_d0.5", "inverted_residual", "gap", 0.5, 0.5),
+]
+
+
+def measure_model_latency(model, batch_size, runs):
+    """Median and 95th percentile latency of one forward pass, in milliseconds"""
+    images = np.random.uniform(0, 255, size=(batch_size, *config.model_cfg.input_shape)).astype(np.float32)
+    latency = measure_latency(keras_predictor(model), images, runs=runs)
+    return latency["p50_ms"], latency["p95_ms"]
+
+
+def benchmark_variant(name, architecture, head, width_multiplier, depth_multiplier, epochs, steps, runs):
+    model = create_model(input_shape=config.model_cfg.input_shape,
+                         optimizer=config.model_cfg.optimizer,
+                         loss=config.model_cfg.loss,
+                         metrics=[config.model_cfg.accuracy_metric],
+                         architecture=architecture,
+                         head=head,
+                         width_multiplier=width_multiplier,
+                         depth_multiplier=depth_multiplier)
+
+    result = {"architecture": architecture, "head": head,
+              "width_multiplier": width_multiplier, "depth_multiplier": depth_multiplier,
+              "parameters": int(model.count_params())}
+    result["latency_ms_p50"], result["latency_ms_p95"] = measure_model_latency(model, 1, runs)
+    batch_p50, _ = measure_model_latency(model, config.model_cfg.batch_size, max(3, runs // 10))
+    result["images_per_sec"] = round(config.model_cfg.batch_size / batch_p50 * 1000, 2)
+
+    if epochs:
+        train_data = load_train_dataset()
+        if steps:
+            train_data = train_data.take(steps)
+        model.fit(train_data, epochs=epochs, verbose=0)
+        _, result["val_accuracy"] = model.evaluate(load_validation_dataset(), verbose=0)
+
+    return result
+
+
+def run_benchmark(epochs=3, steps=None, runs=50, names=None):
+    """
+    Benchmark the selected variants
+    """
+    results = {}
+    for name, *variant in VARIANTS:
+        if names and name not in names:
+            continue
+        print(f"Benchmarking {name}...")
+        results[name] = benchmark_variant(name, *variant, epochs=epochs, steps=steps, runs=runs)
+        summary = results[name]
+        print(f"  ✓ {summary['parameters']:,} parameters, {summary['latency_ms_p50']:.2f} ms p50 latency, "
+              f"{summary['images_per_sec']} images/sec"
+              + (f", val accuracy {summary['val_accuracy']:.4f}" if "val_accuracy" in summary else ""))
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    results_file = metrics_dir / "architecture_benchmark.json"
+    with open(results_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Saved benchmark results to {results_file}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark model architecture variants")
+    parser.add_argument("--epochs", type=int, default=3, help="training epochs per variant, 0 skips accuracy")
+    parser.add_argument("--steps", type=int, default=None, help="limit batches per epoch")
+    parser.add_argument("--runs", type=int, default=50, help="timed forward passes per variant")
+    parser.add_argument("--variants", nargs="+", default=None, choices=[v[0] for v in VARIANTS],
+                        help="variants to benchmark, default all")
+    args = parser.parse_args()
+
+    run_benchmark(epochs=args.epochs, steps=args.steps, runs=args.runs, names=args.variants)
@@ -0,0 +1,101 @@
+"""
+Augmentation placement benchmark
+Compares training throughput with augmentation inside the model against
+augmentation as a parallel map in the tf.data input pipeline
+"""
+import sys
+import time
+import json
+import argparse
+from pathlib import Path
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.config.core import config
+from catvsdog_model.model import create_model
+from catvsdog_model.processing.data_manager import load_train_dataset
+from catvsdog_model.processing.features import augment_dataset, get_augmentation_policy
+
+
+class ThroughputCallback(keras.callbacks.Callback):
+    """Record images/sec for every epoch"""
+
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self.images_per_sec = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+        self._batches = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._batches += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        self.images_per_sec.append(self._batches * self.batch_size / elapsed)
+
+
+def measure(placement, policy_name, epochs, steps):
+    """Train briefly with the given placement and return images/sec after warm-up"""
+    raw_data = load_train_dataset(augmentation_policy="none")
+    if steps:
+        raw_data = raw_data.take(steps)
+
+    if placement == "pipeline":
+        train_data = augment_dataset(raw_data.cache(), get_augmentation_policy(policy_name))
+    else:
+        train_data = raw_data.cache().prefetch(tf.data.AUTOTUNE)
+
+    model = create_model(input_shape=config.model_cfg.input_shape,
+                         optimizer=config.model_cfg.optimizer,
+                         loss=config.model_cfg.loss,
+                         metrics=[config.model_cfg.accuracy_metric],
+                         augment=placement == "model",
+                         augmentation_policy=policy_name)
+
+    throughput = ThroughputCallback(config.model_cfg.batch_size)
+    model.fit(train_data, epochs=epochs, callbacks=[throughput], verbose=0)
+
+    # The first epoch includes graph tracing and filling the cache
+    return max(throughput.images_per_sec[1:] or throughput.images_per_sec)
+
+
+def run_benchmark(epochs=3, steps=None, policy_name=None):
+    """
+    Benchmark both augmentation placements
+    """
+    results = {"policy": policy_name or config.model_cfg.augmentation_policy}
+    for placement in ["model", "pipeline"]:
+        print(f"Benchmarking augmentation placement: {placement}...")
+        results[f"{placement}_images_per_sec"] = round(measure(placement, policy_name, epochs, steps), 2)
+        print(f"  ✓ {results[f'{placement}_images_per_sec']} images/sec")
+
+    results["speedup"] = round(results["pipeline_images_per_sec"] / results["model_images_per_sec"], 3)
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    results_file = metrics_dir / "augmentation_benchmark.json"
+    with open(results_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✓ Saved benchmark results to {results_file}")
+    print(f"   Pipeline / model throughput: {results['speedup']}x")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark augmentation placement")
+    parser.add_argument("--epochs", type=int, default=3, help="epochs per placement, the first is warm-up")
+    parser.add_argument("--steps", type=int, default=None, help="limit batches per epoch")
+    parser.add_argument("--policy", default=None, help="augmentation policy from config.yml")
+    args = parser.parse_args()
+
+    run_benchmark(epochs=args.epochs, steps=args.steps, policy_name=args.policy)
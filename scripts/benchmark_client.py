@@ -0,0 +1,113 @@
+"""
+Client SDK benchmark
+Compares the throughput of the naive client loop (a new connection and one
+/predict/ request per image) with the SDK's pooled, batched and concurrent
+sync and asyncio clients, against a running API server
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+import requests
+import yaml
+
+# Add project root and the client package to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+sys.path.append(str(root / "catvsdog_model_client"))
+
+from catvsdog_client import AsyncClient, Client
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = root / "params.yaml"
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def naive_loop(url, paths):
+    """One request per image, each on a new connection"""
+    for path in paths:
+        with open(path, 'rb') as f:
+            response = requests.post(f"{url}/predict/", files={"file": (path.name, f, "image/jpeg")})
+        response.raise_for_status()
+
+
+def sdk_sync(url, paths, batch_size, concurrency):
+    with Client(url, batch_size=batch_size, max_concurrency=concurrency) as client:
+        client.predict_many(paths)
+
+
+def sdk_async(url, paths, batch_size, concurrency):
+    async def run():
+        async with AsyncClient(url, batch_size=batch_size, max_concurrency=concurrency) as client:
+            await client.predict_many(paths)
+    asyncio.run(run())
+
+
+def benchmark_client(url="http://localhost:8001", num_images=256, batch_size=16, concurrency=4):
+    """
+    Time each client on the same test images and write the throughputs to metrics/
+    """
+    requests.get(f"{url}/health", timeout=5).raise_for_status()
+
+    params = load_params()
+    paths = sorted(p for p in Path(params['data']['test_path']).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    paths = (paths * (num_images // max(len(paths), 1) + 1))[:num_images]
+    if not paths:
+        raise SystemExit(f"No test images in {params['data']['test_path']}")
+    print(f"Benchmarking clients against {url} on {len(paths)} images "
+          f"(batch size {batch_size}, concurrency {concurrency})")
+
+    # Warm up the server's inference function before timing
+    sdk_sync(url, paths[:batch_size], batch_size, 1)
+
+    runs = {
+        "naive_loop": lambda: naive_loop(url, paths),
+        "sdk_sync": lambda: sdk_sync(url, paths, batch_size, concurrency),
+        "sdk_async": lambda: sdk_async(url, paths, batch_size, concurrency),
+    }
+    results = {}
+    for name, run in runs.items():
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        results[name] = {"seconds": seconds, "images_per_sec": len(paths) / seconds}
+        print(f"✓ {name}: {results[name]['images_per_sec']:.1f} images/sec")
+
+    baseline = results["naive_loop"]["images_per_sec"]
+    for result in results.values():
+        result["speedup"] = result["images_per_sec"] / baseline
+
+    report = {"url": url, "images": len(paths), "batch_size": batch_size, "concurrency": concurrency,
+              "clients": results}
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    report_file = metrics_dir / "client_benchmark.json"
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Saved client benchmark to {report_file}")
+
+    print("\n📊 Throughput versus the naive loop:")
+    for name, result in results.items():
+        print(f"   {name:<12} {result['images_per_sec']:>8.1f} images/sec  {result['speedup']:.2f}x")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the client SDK against the naive request loop")
+    parser.add_argument("--url", default="http://localhost:8001", help="base URL of a running API server")
+    parser.add_argument("--images", type=int, default=256, help="images per client, test images are repeated as needed")
+    parser.add_argument("--batch-size", type=int, default=16, help="images per SDK request")
+    parser.add_argument("--concurrency", type=int, default=4, help="SDK requests in flight")
+    args = parser.parse_args()
+
+    benchmark_client(url=args.url, num_images=args.images, batch_size=args.batch_size,
+                     concurrency=args.concurrency)
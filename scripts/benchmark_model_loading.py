@@ -0,0 +1,122 @@
+"""
+Model loading benchmark
+Compares load time and peak memory of the `.keras` file and the fast-loading
+artifact, each loaded in a fresh process as on a serving replica cold start.
+Memory is read from /proc, so the benchmark runs on Linux only
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import time
+from pathlib import Path
+import yaml
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+FORMATS = ("keras", "fast")
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = root / "params.yaml"
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def memory_kib(field):
+    """VmRSS (current) or VmHWM (peak) resident memory of this process, in KiB"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1])
+
+
+def measure(model_format, file_name):
+    """
+    Load the model once in this process and print the load time and the peak
+    RSS growth it caused, in a JSON line
+    """
+    import numpy as np
+    from catvsdog_model.processing.data_manager import load_model
+
+    # Reset the peak to the current RSS, so the import peak is not counted
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    rss_before = memory_kib("VmRSS")
+    start = time.perf_counter()
+    model = load_model(file_name=file_name, fast=model_format == "fast")
+    load_ms = (time.perf_counter() - start) * 1000
+    peak_after = memory_kib("VmHWM")
+
+    # First prediction, which builds the inference function
+    start = time.perf_counter()
+    model.predict(np.zeros((1, *model.input_shape[1:]), dtype=np.float32), verbose=0)
+    first_predict_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({"load_ms": load_ms,
+                      "first_predict_ms": first_predict_ms,
+                      "peak_rss_mb": memory_kib("VmHWM") / 1024,
+                      "load_peak_rss_mb": (peak_after - rss_before) / 1024}))
+
+
+def benchmark(runs=5):
+    """
+    Load each format `runs` times in new processes and report the medians
+    """
+    from catvsdog_model.processing.data_manager import TRAINED_MODEL_DIR, fast_artifact_paths, save_fast_artifact
+    from tensorflow import keras
+
+    params = load_params()
+    file_name = f"{params['versioning']['model_prefix']}{params['versioning']['version']}"
+    model_path = TRAINED_MODEL_DIR / f"{file_name}.keras"
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model not found at {model_path}")
+
+    config_path, weights_path = fast_artifact_paths(model_path)
+    if not config_path.exists() or config_path.stat().st_mtime_ns < model_path.stat().st_mtime_ns:
+        save_fast_artifact(keras.models.load_model(model_path), model_path)
+        print(f"✓ Wrote fast artifact {config_path.name}")
+
+    results = {}
+    for model_format in FORMATS:
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, str(file), "--measure", model_format, file_name],
+                                    capture_output=True, text=True, check=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        results[model_format] = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+        size = model_path.stat().st_size if model_format == "keras" else \
+            config_path.stat().st_size + weights_path.stat().st_size
+        results[model_format]["size_mb"] = size / 1e6
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    report_file = metrics_dir / "model_loading_benchmark.json"
+    with open(report_file, 'w') as f:
+        json.dump({"runs": runs, "formats": results}, f, indent=2)
+    print(f"✓ Saved loading benchmark to {report_file}")
+
+    print("\n📊 Summary (median of {} cold loads):".format(runs))
+    print(f"   {'format':<8}{'size MB':>10}{'load ms':>10}{'1st predict ms':>16}{'load RSS MB':>13}")
+    for model_format, result in results.items():
+        print(f"   {model_format:<8}{result['size_mb']:>10.2f}{result['load_ms']:>10.1f}"
+              f"{result['first_predict_ms']:>16.1f}{result['load_peak_rss_mb']:>13.1f}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare .keras and fast-loading artifact load time and memory")
+    parser.add_argument("--runs", type=int, default=5, help="cold loads per format")
+    parser.add_argument("--measure", nargs=2, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+    else:
+        benchmark(runs=args.runs)
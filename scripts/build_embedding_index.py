@@ -0,0 +1,113 @@
+"""
+Embedding index bulk build
+Embeds every image of a dataset split with the trained model, builds the
+IVF index served by the API's /embeddings endpoints, and reports its recall
+and query latency against exact search
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+import yaml
+import numpy as np
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.config.core import config
+from catvsdog_model.embeddings import IVFIndex, embedding_model
+from catvsdog_model.evaluation import list_labelled_files, load_eval_dataset
+from catvsdog_model.processing.data_manager import load_model
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = root / "params.yaml"
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def embed_directory(model, directory, image_size, batch_size):
+    """Embeddings, probabilities and paths of every image under directory"""
+    paths, labels, _ = list_labelled_files(Path(directory))
+    dataset = load_eval_dataset(paths, labels, image_size=image_size, batch_size=batch_size)
+    embedder = embedding_model(model, with_predictions=True)
+    embeddings, probabilities = [], []
+    for images, _ in dataset:
+        batch_embeddings, batch_probabilities = embedder.predict_on_batch(images)
+        embeddings.append(np.asarray(batch_embeddings))
+        probabilities.append(np.asarray(batch_probabilities).reshape(-1))
+    return np.concatenate(embeddings), np.concatenate(probabilities), paths
+
+
+def evaluate_index(index, vectors, k=10, queries=200, seed=42):
+    """Recall@k of the index against exact search, and mean query latency"""
+    exact = IVFIndex(index.dim, nlist=1, nprobe=1).build(vectors)
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)]
+
+    start = time.perf_counter()
+    found, _ = index.search(sample, k=k)
+    query_ms = (time.perf_counter() - start) * 1000 / len(sample)
+    expected, _ = exact.search(sample, k=k)
+    recall = np.mean([len(set(f[f >= 0]) & set(e[e >= 0])) / max((e >= 0).sum(), 1)
+                      for f, e in zip(found, expected)])
+    return {"recall_at_k": float(recall), "k": k, "query_ms": query_ms}
+
+
+def build_embedding_index(split=None, output_dir="catvsdog_model_api/embeddings", nlist=64, nprobe=8):
+    """
+    Embed a split, build and save the index with the stored predictions, and write a report to metrics/
+    """
+    params = load_params()
+    version = params['versioning']['version']
+    model = load_model(file_name=f"{config.app_cfg.model_save_file}{version}")
+    directory = Path(params['data'][f"{split or 'train'}_path"])
+
+    print(f"Embedding images in {directory}")
+    start = time.perf_counter()
+    vectors, probabilities, paths = embed_directory(model, directory, tuple(params['preprocessing']['image_size']),
+                                                    params['preprocessing']['batch_size'])
+    embed_seconds = time.perf_counter() - start
+    print(f"✓ Embedded {len(paths)} images ({vectors.shape[1]} dimensions) in {embed_seconds:.1f}s")
+
+    start = time.perf_counter()
+    index = IVFIndex(vectors.shape[1], nlist=nlist, nprobe=min(nprobe, nlist)).build(vectors)
+    build_seconds = time.perf_counter() - start
+    output_dir = Path(output_dir)
+    index.save(output_dir)
+    labels = {str(i): {"label": config.model_cfg.label_mappings[int(p + 0.5)],
+                       "confidence": float(max(p, 1 - p)),
+                       "source": path}
+              for i, (p, path) in enumerate(zip(probabilities, paths))}
+    (output_dir / "labels.json").write_text(json.dumps(labels))
+    print(f"✓ Saved index ({'IVF' if index.is_trained else 'exact, fewer images than lists'}) to {output_dir}")
+
+    report = {"images": len(paths), "dimensions": int(vectors.shape[1]), "nlist": nlist, "nprobe": index.nprobe,
+              "trained": index.is_trained, "embed_seconds": embed_seconds, "build_seconds": build_seconds,
+              **evaluate_index(index, vectors)}
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    report_file = metrics_dir / "embedding_index_report.json"
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Saved index report to {report_file}")
+
+    print(f"\n📊 Recall@{report['k']}: {report['recall_at_k']:.3f}, "
+          f"query latency {report['query_ms']:.2f} ms, build {build_seconds:.2f}s")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk build the embedding index served by the API")
+    parser.add_argument("--split", default=None, choices=["train", "validation", "test"], help="split to index, train by default")
+    parser.add_argument("--output-dir", default="catvsdog_model_api/embeddings", help="index directory")
+    parser.add_argument("--nlist", type=int, default=64, help="number of IVF lists")
+    parser.add_argument("--nprobe", type=int, default=8, help="lists searched per query")
+    args = parser.parse_args()
+
+    build_embedding_index(split=args.split, output_dir=args.output_dir, nlist=args.nlist, nprobe=args.nprobe)
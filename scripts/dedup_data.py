@@ -0,0 +1,121 @@
+"""
+Near-duplicate detection for DVC pipeline
+Finds exact and near-duplicate images within and across splits and writes a
+deduplicated copy of the dataset as symlinks
+"""
+import sys
+import os
+import json
+import shutil
+import argparse
+from pathlib import Path
+from collections import Counter
+import yaml
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.processing.manifest import load_manifest
+from catvsdog_model.processing.dedup import find_duplicates
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = root / "params.yaml"
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def write_filtered_split(manifest, split_dirs, dropped, output_dir):
+    """Link every kept image into output_dir/<split>/<class>/<file>"""
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+
+    for key, entry in manifest.items():
+        if entry["error"] or key in dropped:
+            continue
+        source = Path(key)
+        target = output_dir / entry["split"] / source.relative_to(split_dirs[entry["split"]])
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            target.symlink_to(source.absolute())
+        except OSError:
+            # If symlink fails (e.g., on Windows), copy instead
+            shutil.copy2(source, target)
+
+
+def dedup_data(max_distance=None):
+    """
+    Detect duplicates from the dataset manifest written by prepare_data
+    """
+    params = load_params()
+    dedup_params = params['dedup']
+    max_distance = dedup_params['max_distance'] if max_distance is None else max_distance
+
+    split_dirs = {
+        "train": Path(params['data']['train_path']),
+        "validation": Path(params['data']['validation_path']),
+        "test": Path(params['data']['test_path']),
+    }
+    manifest_path = Path(params['data']['manifest_path'])
+    manifest = load_manifest(manifest_path)
+    if not manifest:
+        raise FileNotFoundError(f"No dataset manifest at {manifest_path}, run prepare_data first")
+    print(f"✓ Loaded manifest with {len(manifest)} images")
+
+    # Perceptual hashes are cached by content hash, so only new images are decoded
+    cache_path = Path(dedup_params['hash_cache'])
+    hash_cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+    num_cached = len(hash_cache)
+
+    groups = find_duplicates(manifest, max_distance=max_distance,
+                             workers=dedup_params['workers'] or None, hash_cache=hash_cache)
+    print(f"✓ Hashed {len(hash_cache) - num_cached} new images ({num_cached} cached)")
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(hash_cache))
+    os.replace(tmp_path, cache_path)
+
+    dropped = {key for group in groups for key in group["drop"]}
+    dropped_per_split = Counter(manifest[key]["split"] for key in dropped)
+    summary = {
+        "max_distance": max_distance,
+        "num_images": sum(1 for entry in manifest.values() if not entry["error"]),
+        "duplicate_groups": len(groups),
+        "cross_split_groups": sum(group["cross_split"] for group in groups),
+        "num_dropped": len(dropped),
+        "dropped_per_split": {split: dropped_per_split.get(split, 0) for split in split_dirs},
+    }
+
+    output_dir = Path(dedup_params['output_dir'])
+    write_filtered_split(manifest, split_dirs, dropped, output_dir / "filtered")
+
+    report_file = output_dir / "report.json"
+    with open(report_file, 'w') as f:
+        json.dump({"summary": summary, "groups": groups}, f, indent=2)
+    print(f"✓ Saved duplicate report to {report_file}")
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    with open(metrics_dir / "dedup_metrics.json", 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    print(f"  - duplicate groups: {summary['duplicate_groups']} ({summary['cross_split_groups']} across splits)")
+    for split_name, count in summary["dropped_per_split"].items():
+        print(f"    • {split_name}: {count} dropped")
+    print(f"\n✅ Deduplicated dataset written to {output_dir / 'filtered'}")
+
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate images in the dataset")
+    parser.add_argument("--max-distance", type=int, default=None,
+                        help="Hamming distance between 64-bit hashes, overrides params.yaml")
+    args = parser.parse_args()
+
+    dedup_data(max_distance=args.max_distance)
@@ -0,0 +1,101 @@
+"""
+Cascade inference evaluation
+Measures the escalation rate, per-stage latency and accuracy impact of cascade
+inference on the test set, at the configured threshold and over a sweep
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+import yaml
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.cascade import sweep_thresholds
+from catvsdog_model.config.core import config
+from catvsdog_model.evaluation import list_labelled_files, load_eval_dataset, predict_probabilities
+from catvsdog_model.latency import keras_predictor, measure_latency
+from catvsdog_model.processing.data_manager import load_model
+
+THRESHOLDS = [0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 0.99]
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = root / "params.yaml"
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def evaluate_cascade(runs=50):
+    """
+    Evaluate both stages on the test set and the cascade at each threshold
+    """
+    params = load_params()
+    version = params['versioning']['version']
+    full = load_model(file_name=f"{config.app_cfg.model_save_file}{version}")
+    first_stage = load_model(file_name=f"{config.app_cfg.cascade_save_file}{version}")
+
+    paths, labels, class_names = list_labelled_files(Path(params['data']['test_path']))
+    dataset = load_eval_dataset(paths, labels, image_size=tuple(params['preprocessing']['image_size']),
+                                batch_size=params['preprocessing']['batch_size'])
+    print(f"Evaluating cascade on {len(paths)} test images")
+    first_probabilities = predict_probabilities(first_stage, dataset)
+    full_probabilities = predict_probabilities(full, dataset)
+
+    # Single-image latency of each stage, as served by the API
+    image = np.random.uniform(0, 255, size=(1, *config.model_cfg.input_shape)).astype(np.float32)
+    latency = {"first": measure_latency(keras_predictor(first_stage), image, runs=runs),
+               "full": measure_latency(keras_predictor(full), image, runs=runs)}
+
+    threshold = config.model_cfg.cascade.threshold
+    curve = sweep_thresholds(labels, first_probabilities, full_probabilities, sorted(set(THRESHOLDS + [threshold])))
+    for point in curve:
+        # Every image pays for the first stage, escalated ones for the full model too
+        point["expected_latency_ms"] = latency["first"]["p50_ms"] + point["escalation_rate"] * latency["full"]["p50_ms"]
+    configured = next(point for point in curve if point["threshold"] == threshold)
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    curve_file = metrics_dir / "cascade_curve.csv"
+    pd.DataFrame(curve).to_csv(curve_file, index=False)
+    print(f"✓ Saved threshold sweep to {curve_file}")
+
+    report = {
+        "threshold": threshold,
+        "escalation_rate": configured["escalation_rate"],
+        "cascade_accuracy": configured["accuracy"],
+        "full_accuracy": configured["accuracy"] + configured["accuracy_drop"],
+        "first_stage_accuracy": float(np.mean((first_probabilities > 0.5) == np.asarray(labels))),
+        "accuracy_drop": configured["accuracy_drop"],
+        "first_stage_parameters": int(first_stage.count_params()),
+        "full_parameters": int(full.count_params()),
+        "latency_ms": latency,
+        "expected_latency_ms": configured["expected_latency_ms"],
+        "speedup": latency["full"]["p50_ms"] / configured["expected_latency_ms"],
+    }
+    report_file = metrics_dir / "cascade_report.json"
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Saved cascade report to {report_file}")
+
+    print(f"\n📊 Threshold {threshold}:")
+    print(f"   Escalation rate: {report['escalation_rate'] * 100:.1f}%")
+    print(f"   Accuracy: {report['cascade_accuracy']:.4f} (full model {report['full_accuracy']:.4f})")
+    print(f"   Latency: first stage {latency['first']['p50_ms']:.2f} ms, full {latency['full']['p50_ms']:.2f} ms, "
+          f"expected {report['expected_latency_ms']:.2f} ms ({report['speedup']:.2f}x)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline evaluation of cascade inference")
+    parser.add_argument("--runs", type=int, default=50, help="timed runs per latency measurement")
+    args = parser.parse_args()
+
+    evaluate_cascade(runs=args.runs)
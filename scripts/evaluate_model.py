@@ -6,7 +6,6 @@ import sys
 from pathlib import Path
 import yaml
 import json
-import numpy as np
 import matplotlib
 matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
@@ -17,9 +16,20 @@ file = Path(__file__).resolve()
 root = file.parents[1]
 sys.path.append(str(root))
 
-import tensorflow as tf
 from tensorflow import keras
-from sklearn.metrics import confusion_matrix, classification_report
+
+from catvsdog_model.processing.manifest import load_manifest, load_quarantined
+from catvsdog_model.evaluation import (
+    PredictionCache,
+    list_labelled_files,
+    load_eval_dataset,
+    content_hashes,
+    evaluation_fingerprint,
+    evaluate_streaming,
+    evaluate_sharded,
+    evaluate_cached,
+    evaluate_cached_sharded,
+)
 
 
 def load_params():
@@ -30,20 +40,38 @@ def load_params():
     return params
 
 
-def load_test_data(params):
-    """Load test dataset"""
-    test_path = Path(params['data']['test_path'])
-    image_size = tuple(params['preprocessing']['image_size'])
-    batch_size = params['preprocessing']['batch_size']
+def evaluate_with_cache(params, model_path, paths, labels, class_names, num_shards):
+    """
+    Reuse cached per-example predictions for this model and preprocessing,
+    running inference only on test images without one. Cached and new
+    predictions are added to the metrics a batch at a time
+    """
+    preprocessing = {key: value for key, value in params['preprocessing'].items() if key != 'batch_size'}
+    fingerprint = evaluation_fingerprint(model_path, preprocessing)
+    cache = PredictionCache(Path(params['evaluate']['cache_dir']), fingerprint)
 
-    test_dataset = keras.preprocessing.image_dataset_from_directory(
-        test_path,
-        image_size=image_size,
-        batch_size=batch_size,
-        shuffle=False
-    )
+    hashes = content_hashes(paths, load_manifest(Path(params['data']['manifest_path'])))
+    missing = cache.missing(hashes)
+    print(f"  Prediction cache {fingerprint}: {len(paths) - len(missing)} cached, {len(missing)} to predict")
 
-    return test_dataset
+    image_size = tuple(params['preprocessing']['image_size'])
+    batch_size = params['preprocessing']['batch_size']
+    num_shards = min(num_shards, len(missing))
+    if num_shards > 1:
+        print(f"  Sharding across {num_shards} processes")
+        metrics = evaluate_cached_sharded(model_path, paths, labels, hashes, cache, image_size=image_size,
+                                          batch_size=batch_size, num_shards=num_shards,
+                                          num_classes=len(class_names))
+    else:
+        model = None
+        if missing:
+            print(f"Loading model from {model_path}...")
+            model = keras.models.load_model(model_path)
+        metrics = evaluate_cached(model, paths, labels, hashes, cache, image_size=image_size,
+                                  batch_size=batch_size, num_classes=len(class_names))
+    if missing:
+        cache.save()
+    return metrics
 
 
 def evaluate_model():
@@ -60,40 +88,41 @@ def evaluate_model():
     if not model_path.exists():
         raise FileNotFoundError(f"Model not found at {model_path}")
 
-    print(f"Loading model from {model_path}...")
-    model = keras.models.load_model(model_path)
-
     # Load test data
     print("Loading test data...")
-    test_dataset = load_test_data(params)
+    paths, labels, class_names = list_labelled_files(Path(params['data']['test_path']),
+                                                     load_quarantined(Path(params['data']['quarantine_file'])))
+    image_size = tuple(params['preprocessing']['image_size'])
+    batch_size = params['preprocessing']['batch_size']
+    num_shards = min(params['evaluate']['num_shards'], len(paths)) or 1
+    print(f"Found {len(paths)} files belonging to {len(class_names)} classes.")
 
-    # Evaluate model
+    # Evaluate model: a single pass accumulating loss and the confusion matrix
     print("Evaluating model...")
-    test_loss, test_accuracy = model.evaluate(test_dataset)
-
+    cache_dir = params['evaluate']['cache_dir']
+    if cache_dir:
+        metrics = evaluate_with_cache(params, model_path, paths, labels, class_names, num_shards)
+    elif num_shards > 1:
+        print(f"  Sharding across {num_shards} processes")
+        metrics = evaluate_sharded(model_path, paths, labels, image_size=image_size,
+                                   batch_size=batch_size, num_shards=num_shards,
+                                   num_classes=len(class_names))
+    else:
+        print(f"Loading model from {model_path}...")
+        model = keras.models.load_model(model_path)
+        test_dataset = load_eval_dataset(paths, labels, image_size=image_size, batch_size=batch_size)
+        metrics = evaluate_streaming(model, test_dataset, num_classes=len(class_names))
+
+    test_loss, test_accuracy = metrics.loss, metrics.accuracy
     print(f"\nTest Results:")
     print(f"  Loss: {test_loss:.4f}")
     print(f"  Accuracy: {test_accuracy:.4f}")
 
-    # Get predictions
-    print("\nGenerating predictions...")
-    y_true = []
-    y_pred = []
-
-    for images, labels in test_dataset:
-        predictions = model.predict(images, verbose=0)
-        y_true.extend(labels.numpy())
-        y_pred.extend((predictions > 0.5).astype(int).flatten())
-
-    y_true = np.array(y_true)
-    y_pred = np.array(y_pred)
-
     # Confusion matrix
-    cm = confusion_matrix(y_true, y_pred)
+    cm = metrics.confusion
 
     # Classification report
-    class_names = ['cat', 'dog']
-    report = classification_report(y_true, y_pred, target_names=class_names, output_dict=True)
+    report = metrics.classification_report(class_names)
 
     # Save evaluation metrics
     metrics_dir = Path("metrics")
@@ -102,22 +131,9 @@ def evaluate_model():
     evaluation_metrics = {
         "test_loss": float(test_loss),
         "test_accuracy": float(test_accuracy),
-        "total_samples": int(len(y_true)),
-        "correct_predictions": int(np.sum(y_true == y_pred)),
-        "per_class_metrics": {
-            "cat": {
-                "precision": float(report['cat']['precision']),
-                "recall": float(report['cat']['recall']),
-                "f1-score": float(report['cat']['f1-score']),
-                "support": int(report['cat']['support'])
-            },
-            "dog": {
-                "precision": float(report['dog']['precision']),
-                "recall": float(report['dog']['recall']),
-                "f1-score": float(report['dog']['f1-score']),
-                "support": int(report['dog']['support'])
-            }
-        }
+        "total_samples": metrics.total,
+        "correct_predictions": metrics.correct,
+        "per_class_metrics": {name: report[name] for name in class_names}
     }
 
     metrics_file = metrics_dir / "evaluation_metrics.json"
@@ -13,6 +13,14 @@ file = Path(__file__).resolve()
 root = file.parents[1]
 sys.path.append(str(root))
 
+from catvsdog_model.processing.manifest import (
+    update_manifest,
+    quarantine_list,
+    save_quarantine_list,
+    save_manifest,
+    manifest_stats,
+)
+
 
 def load_params():
     """Load parameters from params.yaml"""
@@ -24,56 +32,64 @@ def load_params():
 
 def prepare_data():
     """
-    Prepare data for training by validating paths and copying to processed directory
+    Prepare data for training: update the dataset manifest, list the images
+    that cannot be decoded for the loaders to skip and link the splits into
+    the processed directory
     """
     params = load_params()
 
     # Get paths from parameters
-    train_path = Path(params['data']['train_path'])
-    val_path = Path(params['data']['validation_path'])
-    test_path = Path(params['data']['test_path'])
+    split_dirs = {
+        "train": Path(params['data']['train_path']),
+        "validation": Path(params['data']['validation_path']),
+        "test": Path(params['data']['test_path']),
+    }
 
     # Output directory
     processed_dir = Path("data/processed")
     processed_dir.mkdir(parents=True, exist_ok=True)
 
     # Validate that source directories exist
-    for path_name, path in [("train", train_path), ("validation", val_path), ("test", test_path)]:
+    for path_name, path in split_dirs.items():
         if not path.exists():
             raise FileNotFoundError(f"{path_name} directory not found at {path}")
         print(f"✓ Found {path_name} data at {path}")
 
+    # Hash and decode new or modified files, reuse the manifest for the rest
+    manifest_path = Path(params['data']['manifest_path'])
+    workers = params['data']['scan_workers'] or None
+    manifest, changes = update_manifest(split_dirs, manifest_path, workers=workers)
+    print(f"✓ Manifest: {changes['checked']} checked, {changes['reused']} unchanged, "
+          f"{changes['removed']} removed")
+
+    save_manifest(manifest, manifest_path)
+    # The dataset is tracked by DVC, so unreadable images are listed, not moved
+    quarantined = quarantine_list(manifest)
+    quarantine_file = Path(params['data']['quarantine_file'])
+    save_quarantine_list(quarantined, quarantine_file)
+    if quarantined:
+        print(f"⚠ Quarantined {len(quarantined)} unreadable images, see {quarantine_file}")
+        for entry in quarantined:
+            print(f"    • {entry['path']}: {entry['error']}")
+
     # Count images in each split
-    stats = {}
-    for split_name, split_path in [("train", train_path), ("validation", val_path), ("test", test_path)]:
-        # Count files
-        image_files = list(split_path.rglob("*.jpg")) + list(split_path.rglob("*.jpeg")) + list(split_path.rglob("*.png"))
-        stats[split_name] = {
-            "num_images": len(image_files),
-            "path": str(split_path)
-        }
-
-        # Count per class if subdirectories exist
-        subdirs = [d for d in split_path.iterdir() if d.is_dir()]
-        if subdirs:
-            stats[split_name]["classes"] = {}
-            for subdir in subdirs:
-                class_images = list(subdir.glob("*.jpg")) + list(subdir.glob("*.jpeg")) + list(subdir.glob("*.png"))
-                stats[split_name]["classes"][subdir.name] = len(class_images)
-
-        print(f"  - {split_name}: {stats[split_name]['num_images']} images")
-        if "classes" in stats[split_name]:
-            for class_name, count in stats[split_name]["classes"].items():
-                print(f"    • {class_name}: {count}")
+    stats = manifest_stats(manifest, split_dirs)
+    for split_name, split_stats in stats.items():
+        print(f"  - {split_name}: {split_stats['num_images']} images")
+        for class_name, count in split_stats.get("classes", {}).items():
+            print(f"    • {class_name}: {count}")
 
     # Create symbolic links or copy data to processed directory
-    for split_name in ["train", "validation", "test"]:
+    for split_name, source in split_dirs.items():
         target = processed_dir / split_name
-        if target.exists():
+        if target.is_symlink() and target.resolve() == source.resolve():
+            continue
+        if target.is_symlink():
+            target.unlink()
+        elif target.exists():
             shutil.rmtree(target)
 
         # Create symbolic link to original data
-        source = Path(stats[split_name]["path"])
         try:
             target.symlink_to(source.absolute(), target_is_directory=True)
             print(f"✓ Created symlink: {target} -> {source}")
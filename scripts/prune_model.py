@@ -0,0 +1,131 @@
+"""
+Structured pruning for the DVC pipeline
+Iteratively removes the conv filters with the lowest L1 norm from the trained
+model, fine-tuning with a filter group-lasso penalty between steps, and records
+a latency/accuracy curve of the physically smaller models
+"""
+import sys
+import json
+import shutil
+import argparse
+from pathlib import Path
+import yaml
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+from tensorflow import keras
+
+from catvsdog_model.config.core import config
+from catvsdog_model.evaluation import evaluate_streaming
+from catvsdog_model.latency import keras_predictor, measure_latency
+from catvsdog_model.pruning import FilterGroupLasso, conv_filters, prune_filters
+from catvsdog_model.tuning import make_optimizer
+from catvsdog_model.processing.data_manager import load_train_dataset, load_validation_dataset
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = root / "params.yaml"
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def measure_step(step, model, val_data, runs):
+    """One point of the latency/accuracy curve"""
+    images = np.random.uniform(0, 255, size=(1, *config.model_cfg.input_shape)).astype(np.float32)
+    latency = measure_latency(keras_predictor(model), images, runs=runs)
+    metrics = evaluate_streaming(model, val_data)
+    return {
+        "step": step,
+        "parameters": int(model.count_params()),
+        "conv_filters": conv_filters(model),
+        "latency_p50_ms": latency["p50_ms"],
+        "latency_p95_ms": latency["p95_ms"],
+        "val_loss": metrics.loss,
+        "val_accuracy": metrics.accuracy,
+    }
+
+
+def prune_model(steps=None):
+    """
+    Prune, fine-tune and save one model per step
+    """
+    params = load_params()
+    prune = params['prune']
+    steps = steps or prune['steps']
+
+    version = params['versioning']['version']
+    model_prefix = params['versioning']['model_prefix']
+    model_path = root / f"catvsdog_model/trained_models/{model_prefix}{version}.keras"
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model not found at {model_path}")
+
+    output_dir = root / prune['output_dir']
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+
+    batch_size = params['preprocessing']['batch_size']
+    train_data = load_train_dataset(batch_size=batch_size)
+    val_data = load_validation_dataset(batch_size=batch_size)
+
+    model = keras.models.load_model(model_path)
+    curve = [measure_step(0, model, val_data, prune['latency_runs'])]
+    print(f"Step 0: {curve[0]['parameters']:,} parameters, val_accuracy {curve[0]['val_accuracy']:.4f}")
+
+    regularizer = FilterGroupLasso(prune['group_lasso']) if prune['group_lasso'] > 0 else None
+    for step in range(1, steps + 1):
+        model = prune_filters(model, prune['fraction_per_step'], min_filters=prune['min_filters'],
+                              kernel_regularizer=regularizer)
+        model.compile(optimizer=make_optimizer(params['train']['optimizer'], prune['learning_rate']), loss=config.model_cfg.loss, metrics=[config.model_cfg.accuracy_metric])
+        model.fit(train_data, validation_data=val_data, epochs=prune['fine_tune_epochs'],
+                  verbose=params['train']['verbose'])
+
+        # Saved without the fine-tuning penalty, loadable like any trained model
+        export = prune_filters(model, 0.0, min_filters=prune['min_filters'])
+        export.compile(optimizer=config.model_cfg.optimizer, loss=config.model_cfg.loss,
+                       metrics=[config.model_cfg.accuracy_metric])
+        step_path = output_dir / f"{model_prefix}{version}.pruned{step}.keras"
+        export.save(step_path)
+
+        point = measure_step(step, export, val_data, prune['latency_runs'])
+        point["path"] = str(step_path.relative_to(root))
+        curve.append(point)
+        print(f"Step {step}: filters {point['conv_filters']}, {point['parameters']:,} parameters, "
+              f"p50 {point['latency_p50_ms']:.2f} ms, val_accuracy {point['val_accuracy']:.4f}")
+
+    # Fastest step whose accuracy stays within the allowed drop
+    max_drop = prune['max_accuracy_drop']
+    eligible = [point for point in curve if curve[0]['val_accuracy'] - point['val_accuracy'] <= max_drop]
+    recommended = min(eligible, key=lambda point: point['latency_p50_ms'])
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    curve_file = metrics_dir / "pruning_curve.csv"
+    pd.DataFrame(curve).drop(columns=["conv_filters", "path"], errors="ignore").to_csv(curve_file, index=False)
+    print(f"\n✓ Saved latency/accuracy curve to {curve_file}")
+
+    report_file = metrics_dir / "pruning_report.json"
+    with open(report_file, 'w') as f:
+        json.dump({"recommended_step": recommended['step'], "max_accuracy_drop": max_drop, "steps": curve},
+                  f, indent=2)
+    print(f"✓ Saved pruning report to {report_file}")
+
+    print(f"\n✅ Recommended step {recommended['step']}: "
+          f"{recommended['latency_p50_ms']:.2f} ms vs {curve[0]['latency_p50_ms']:.2f} ms, "
+          f"val_accuracy {recommended['val_accuracy']:.4f} vs {curve[0]['val_accuracy']:.4f}")
+    return curve
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Iterative structured filter pruning")
+    parser.add_argument("--steps", type=int, default=None, help="overrides prune.steps")
+    args = parser.parse_args()
+
+    prune_model(steps=args.steps)
@@ -0,0 +1,150 @@
+"""
+Post-training quantization for the DVC pipeline
+Converts the evaluated model to float16 and int8 TFLite artifacts, calibrating
+int8 on a sample of the validation split, re-evaluates them on the test set and
+only publishes artifacts whose accuracy drop stays within the configured limit
+"""
+import sys
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+import yaml
+import numpy as np
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+from tensorflow import keras
+
+from catvsdog_model.evaluation import list_labelled_files, load_eval_dataset
+from catvsdog_model.latency import keras_predictor, measure_latency
+from catvsdog_model.quantization import (
+    TFLitePredictor,
+    calibration_data,
+    convert_to_tflite,
+    evaluate_predictor,
+)
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = root / "params.yaml"
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def timed(load):
+    """Result of `load()` and how long it took, in milliseconds"""
+    start = time.perf_counter()
+    result = load()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def quantize_model(modes=None):
+    """
+    Quantize, evaluate and publish the model artifacts
+    """
+    params = load_params()
+    quantize = params['quantize']
+    modes = modes or quantize['modes']
+
+    version = params['versioning']['version']
+    model_prefix = params['versioning']['model_prefix']
+    model_path = root / f"catvsdog_model/trained_models/{model_prefix}{version}.keras"
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model not found at {model_path}")
+
+    image_size = tuple(params['preprocessing']['image_size'])
+    batch_size = params['preprocessing']['batch_size']
+
+    # Calibration sample of the validation split
+    val_paths, val_labels, _ = list_labelled_files(Path(params['data']['validation_path']))
+    rng = np.random.default_rng(quantize['seed'])
+    sample = rng.permutation(len(val_paths))[:quantize['calibration_samples']]
+    calibration_dataset = load_eval_dataset([val_paths[i] for i in sample], [val_labels[i] for i in sample],
+                                            image_size=image_size, batch_size=batch_size)
+    print(f"Calibrating on {len(sample)} of {len(val_paths)} validation images")
+
+    test_paths, test_labels, class_names = list_labelled_files(Path(params['data']['test_path']))
+    test_dataset = load_eval_dataset(test_paths, test_labels, image_size=image_size, batch_size=batch_size)
+    print(f"Evaluating on {len(test_paths)} test images")
+
+    latency_input = np.random.uniform(0, 255, size=(1, *image_size, 3)).astype(np.float32)
+    runs = quantize['latency_runs']
+
+    # Reference: the Keras model as evaluate_model sees it
+    model, load_ms = timed(lambda: keras.models.load_model(model_path))
+    predict = keras_predictor(model)
+    metrics = evaluate_predictor(predict, test_dataset, num_classes=len(class_names))
+    baseline_accuracy = metrics.accuracy
+    report = {
+        "keras": {
+            "path": str(model_path.relative_to(root)),
+            "size_bytes": model_path.stat().st_size,
+            "load_ms": load_ms,
+            "latency_ms": measure_latency(predict, latency_input, runs=runs),
+            "test_loss": metrics.loss,
+            "test_accuracy": baseline_accuracy,
+        }
+    }
+    print(f"  keras: accuracy {baseline_accuracy:.4f}, {model_path.stat().st_size / 1e6:.2f} MB")
+
+    output_dir = root / quantize['output_dir']
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+
+    for mode in modes:
+        print(f"\nQuantizing to {mode}...")
+        content = convert_to_tflite(model, mode=mode,
+                                    representative_data=calibration_data(calibration_dataset, len(sample)))
+        artifact_path = output_dir / f"{model_prefix}{version}.{mode}.tflite"
+        artifact_path.write_bytes(content)
+        predictor, load_ms = timed(lambda: TFLitePredictor(artifact_path, num_threads=quantize['num_threads']))
+        metrics = evaluate_predictor(predictor, test_dataset, num_classes=len(class_names))
+        accuracy_drop = baseline_accuracy - metrics.accuracy
+        published = accuracy_drop <= quantize['max_accuracy_drop']
+        if not published:
+            artifact_path.unlink()
+
+        report[mode] = {
+            "path": str(artifact_path.relative_to(root)) if published else None,
+            "published": published,
+            "size_bytes": len(content),
+            "load_ms": load_ms,
+            "latency_ms": measure_latency(predictor, latency_input, runs=runs),
+            "test_loss": metrics.loss,
+            "test_accuracy": metrics.accuracy,
+            "accuracy_drop": accuracy_drop,
+        }
+        status = f"✓ published to {artifact_path}" if published else \
+            f"✗ not published, accuracy drop {accuracy_drop:.4f} > {quantize['max_accuracy_drop']}"
+        print(f"  {mode}: accuracy {metrics.accuracy:.4f}, {len(content) / 1e6:.2f} MB - {status}")
+
+    metrics_dir = Path("metrics")
+    metrics_dir.mkdir(exist_ok=True)
+    report_file = metrics_dir / "quantization_report.json"
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Saved quantization report to {report_file}")
+
+    print("\n📊 Summary:")
+    print(f"   {'artifact':<10}{'size MB':>10}{'load ms':>10}{'p50 ms':>10}{'accuracy':>10}")
+    for name, entry in report.items():
+        print(f"   {name:<10}{entry['size_bytes'] / 1e6:>10.2f}{entry['load_ms']:>10.1f}"
+              f"{entry['latency_ms']['p50_ms']:>10.2f}{entry['test_accuracy']:>10.4f}")
+
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Post-training quantization with an accuracy guard")
+    parser.add_argument("--modes", nargs="+", default=None, help="overrides quantize.modes")
+    args = parser.parse_args()
+
+    quantize_model(modes=args.modes)
@@ -2,6 +2,8 @@
 Enhanced training script for DVC pipeline
 Extends the original train_model.py with DVC-compatible metrics tracking
 """
+import functools
+import os
 import sys
 from pathlib import Path
 import yaml
@@ -15,13 +17,19 @@ sys.path.append(str(root))
 
 try:
     from catvsdog_model.config.core import config
-    from catvsdog_model.model import classifier
-    from catvsdog_model.processing.data_manager import (
-        load_train_dataset,
-        load_validation_dataset,
-        load_test_dataset,
-        callbacks_and_save_model
+    from catvsdog_model.distributed import (
+        get_strategy,
+        is_chief,
+        global_batch_size,
+        shard_dataset,
+        fit_distributed,
+        evaluate_distributed,
+        launch_local_workers
     )
+    from catvsdog_model.checkpointing import fit_with_resume
+    from catvsdog_model.tuning import make_optimizer
+    from catvsdog_model.telemetry import TrainingTelemetry
+    from catvsdog_model.processing.manifest import load_quarantined
 except ImportError as e:
     print(f"Import error: {e}")
     print("Make sure you're running from the project root directory")
@@ -82,28 +90,88 @@ def run_training() -> None:
     Train the model with DVC metrics tracking
     """
     params = load_params()
+    dist_params = params.get('distributed', {})
+    strategy_name = dist_params.get('strategy', 'default')
+
+    # Without a cluster spec, a multi-worker run spawns its workers on localhost
+    if strategy_name == 'multi_worker_mirrored' and 'TF_CONFIG' not in os.environ:
+        num_workers = dist_params.get('num_workers', 2)
+        print(f"Launching {num_workers} local training workers...")
+        sys.exit(launch_local_workers(command=[sys.executable, str(file)],
+                                      num_workers=num_workers,
+                                      base_port=dist_params.get('base_port', 23456)))
+
+    # The strategy must exist before any TensorFlow op runs, and importing
+    # catvsdog_model.model or the data manager builds Keras layers
+    strategy = get_strategy(strategy_name)
+    chief = is_chief(strategy)
+    batch_size = global_batch_size(params['preprocessing']['batch_size'], strategy)
+
+    from catvsdog_model.model import create_model
+    from catvsdog_model.processing.data_manager import (
+        load_train_dataset,
+        load_validation_dataset,
+        load_test_dataset,
+        callbacks_and_save_model,
+        load_model
+    )
+
+    fine_tune_from = params['train'].get('fine_tune_from') or None
+    with strategy.scope():
+        if fine_tune_from:
+            # Load before callbacks_and_save_model() prunes older model versions
+            model = load_model(file_name=f"{config.app_cfg.model_save_file}{fine_tune_from}", fast=False)
+            model.optimizer.learning_rate = params['train']['fine_tune_learning_rate']
+        else:
+            # train.optimizer and train.learning_rate, e.g. as exported by tune_hyperparameters.py
+            model = create_model(input_shape=config.model_cfg.input_shape,
+                                 optimizer=make_optimizer(params['train']['optimizer'],
+                                                          params['train']['learning_rate']),
+                                 loss=config.model_cfg.loss,
+                                 metrics=[config.model_cfg.accuracy_metric],
+                                 augmentation_policy=params['augmentation']['policy'])
 
     print("Loading datasets...")
-    train_data = load_train_dataset()
-    val_data = load_validation_dataset()
-    test_data = load_test_dataset()
+    # Images prepare_data found undecodable stay in the dataset and are skipped here
+    quarantined = load_quarantined(Path(params['data']['quarantine_file']))
+    train_data = shard_dataset(load_train_dataset(batch_size=batch_size,
+                                                  augmentation_policy=params['augmentation']['policy'],
+                                                  exclude=quarantined))
+    val_data = shard_dataset(load_validation_dataset(batch_size=batch_size, exclude=quarantined))
+    test_data = shard_dataset(load_test_dataset(batch_size=batch_size, exclude=quarantined))
 
     # Initialize DVC metrics callback
     dvc_metrics = DVCMetricsCallback()
 
     # MLFlow tracking (if enabled)
-    if params.get('mlflow', {}).get('tracking_uri'):
+    mlflow_enabled = False
+    if chief and params.get('mlflow', {}).get('tracking_uri'):
         try:
             import mlflow
             mlflow.set_tracking_uri(params['mlflow']['tracking_uri'])
             mlflow.set_experiment(params['mlflow']['experiment_name'])
             mlflow.tensorflow.autolog()
+            mlflow_enabled = True
             print("✓ MLflow tracking enabled")
         except Exception as e:
             print(f"⚠ MLflow tracking disabled: {e}")
 
+    # Throughput, step times, input stalls and CPU/RSS per epoch
+    telemetry = None
+    if params['callbacks']['telemetry']['enabled']:
+        telemetry = TrainingTelemetry(log_to_mlflow=mlflow_enabled)
+        # Last stage of the input pipeline, so batch stamps mark when the model receives them
+        train_data = telemetry.instrument(train_data)
+
     # Get training callbacks
-    model_callbacks = callbacks_and_save_model()
+    checkpoint_params = params['callbacks']['model_checkpoint']
+    early_stopping = params['callbacks']['early_stopping']
+    model_callbacks = callbacks_and_save_model(is_chief=chief,
+                                               async_checkpoint=checkpoint_params.get('async', True),
+                                               monitor=checkpoint_params['monitor'],
+                                               save_best_only=checkpoint_params['save_best_only'],
+                                               early_stopping_patience=early_stopping['patience']
+                                               if early_stopping['enabled'] else 0)
 
     # Add custom callback for DVC metrics
     import tensorflow as tf
@@ -117,28 +185,55 @@ def run_training() -> None:
             self.dvc_metrics.on_epoch_end(epoch, logs)
 
     model_callbacks.append(DVCCallback(dvc_metrics))
+    if telemetry:
+        model_callbacks.append(telemetry)
 
     # Train model
     print(f"\nTraining model for {params['train']['epochs']} epochs...")
     print(f"Optimizer: {params['train']['optimizer']}")
-    print(f"Batch size: {params['preprocessing']['batch_size']}")
+    print(f"Strategy: {strategy_name} ({strategy.num_replicas_in_sync} replicas)")
+    print(f"Batch size: {params['preprocessing']['batch_size']} per replica, {batch_size} global")
+
+    if fine_tune_from:
+        print(f"Fine-tuning from model version {fine_tune_from}")
+
+    if strategy_name == 'default':
+        fit_fn = model.fit
+    else:
+        fit_fn = functools.partial(fit_distributed, model, strategy)
 
-    history = classifier.fit(
+    history = fit_with_resume(
+        model,
         train_data,
+        fit_fn=fit_fn,
         epochs=params['train']['epochs'],
         validation_data=val_data,
         callbacks=model_callbacks,
-        verbose=params['train']['verbose']
+        verbose=params['train']['verbose'],
+        save_every_n_batches=params['callbacks']['training_state']['every_n_batches'],
+        fine_tune_from=fine_tune_from,
+        is_chief=chief
     )
 
     # Evaluate on test set
     print("\nEvaluating on test set...")
-    test_loss, test_acc = classifier.evaluate(test_data)
+    if strategy_name == 'default':
+        test_loss, test_acc = model.evaluate(test_data)
+    else:
+        test_loss, test_acc = evaluate_distributed(model, strategy, test_data)
     print(f"Test Loss: {test_loss:.4f}")
     print(f"Test Accuracy: {test_acc:.4f}")
 
     # Save DVC metrics
-    dvc_metrics.save_metrics()
+    if chief:
+        dvc_metrics.save_metrics()
+        if telemetry:
+            summary = telemetry.save_metrics()
+            if summary:
+                print(f"✓ Saved training telemetry to {telemetry.metrics_dir / 'training_telemetry.json'}")
+                if 'images_per_sec' in summary:
+                    print(f"   {summary['images_per_sec']:.1f} images/sec, "
+                          f"{summary['input_wait_fraction'] * 100:.1f}% of step time waiting on input")
 
     print("\n✅ Training complete!")
 
@@ -0,0 +1,200 @@
+"""
+Hyperparameter search for the DVC pipeline
+Runs random trials from the search space in params.yaml as concurrent
+processes within a core budget, stops weak trials early with asynchronous
+successive halving (ASHA) and exports the best configuration to params.yaml
+"""
+import sys
+import os
+import json
+import time
+import shutil
+import argparse
+from pathlib import Path
+import yaml
+import pandas as pd
+
+# Add project root to path
+file = Path(__file__).resolve()
+root = file.parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.tuning import (
+    ASHAScheduler,
+    make_optimizer,
+    sample_trials,
+    set_params_values,
+    run_trial_processes,
+)
+from train_with_dvc import DVCMetricsCallback
+
+
+def load_params():
+    """Load parameters from params.yaml"""
+    params_path = root / "params.yaml"
+    with open(params_path, 'r') as f:
+        params = yaml.safe_load(f)
+    return params
+
+
+def make_scheduler(tuning, output_dir):
+    return ASHAScheduler(output_dir / "rungs.json",
+                         min_epochs=tuning['min_epochs'],
+                         max_epochs=tuning['max_epochs'],
+                         reduction_factor=tuning['reduction_factor'],
+                         mode=tuning['mode'])
+
+
+def run_trial(trial_dir):
+    """
+    Train one trial configuration, reporting every epoch to the scheduler
+    """
+    trial_dir = Path(trial_dir)
+    trial = json.loads((trial_dir / "trial.json").read_text())
+    tuning = trial['tuning']
+    settings = {**trial['defaults'], **trial['config']}
+
+    import tensorflow as tf
+    from catvsdog_model.config.core import config
+    from catvsdog_model.model import create_model
+    from catvsdog_model.processing.data_manager import load_train_dataset, load_validation_dataset
+
+    model = create_model(input_shape=config.model_cfg.input_shape,
+                         optimizer=make_optimizer(settings['train.optimizer'], settings['train.learning_rate']),
+                         loss=config.model_cfg.loss,
+                         metrics=[config.model_cfg.accuracy_metric],
+                         augmentation_policy=settings['augmentation.policy'])
+
+    batch_size = int(settings['preprocessing.batch_size'])
+    train_data = load_train_dataset(batch_size=batch_size, augmentation_policy=settings['augmentation.policy'])
+    val_data = load_validation_dataset(batch_size=batch_size)
+
+    scheduler = make_scheduler(tuning, trial_dir.parent)
+    dvc_metrics = DVCMetricsCallback(metrics_dir=trial_dir)
+
+    class TrialCallback(tf.keras.callbacks.Callback):
+        """Collect DVC epoch metrics and stop when the scheduler prunes the trial"""
+
+        pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            dvc_metrics.on_epoch_end(epoch, logs)
+            if not scheduler.report(trial_dir.name, epoch + 1, float(logs[tuning['metric']])):
+                print(f"✂ {trial_dir.name} pruned after epoch {epoch + 1}")
+                self.pruned = True
+                self.model.stop_training = True
+
+    trial_callback = TrialCallback()
+    start = time.perf_counter()
+    model.fit(train_data, validation_data=val_data, epochs=tuning['max_epochs'],
+              callbacks=[trial_callback], verbose=0)
+
+    dvc_metrics.save_metrics()
+    with open(trial_dir / "result.json", 'w') as f:
+        json.dump({"status": "pruned" if trial_callback.pruned else "completed",
+                   "train_seconds": round(time.perf_counter() - start, 2)}, f, indent=2)
+
+
+def summarize_trial(trial_dir, tuning):
+    """One row of the trials table"""
+    trial = json.loads((trial_dir / "trial.json").read_text())
+    row = {"trial": trial_dir.name, **trial['config']}
+
+    result_file = trial_dir / "result.json"
+    history_file = trial_dir / "training_history.csv"
+    if not result_file.exists() or not history_file.exists():
+        return {**row, "status": "failed"}
+
+    history = pd.read_csv(history_file)
+    metric = history[tuning['metric']]
+    best_index = metric.idxmax() if tuning['mode'] == 'max' else metric.idxmin()
+    return {**row,
+            **json.loads(result_file.read_text()),
+            "epochs_trained": len(history),
+            "best_epoch": int(history.loc[best_index, "epoch"]),
+            f"best_{tuning['metric']}": float(metric[best_index])}
+
+
+def tune(num_trials=None, export=True):
+    """
+    Run the search and write the trials table
+    """
+    params = load_params()
+    tuning = params['tuning']
+    num_trials = num_trials or tuning['num_trials']
+
+    output_dir = Path(tuning['output_dir'])
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+
+    # Trial values override these params.yaml values
+    defaults = {
+        'train.optimizer': params['train']['optimizer'],
+        'train.learning_rate': params['train']['learning_rate'],
+        'preprocessing.batch_size': params['preprocessing']['batch_size'],
+        'augmentation.policy': params['augmentation']['policy'],
+    }
+
+    max_cores = tuning['max_cores'] or os.cpu_count()
+    threads_per_trial = min(tuning['cores_per_trial'], max_cores)
+    max_concurrent = max(1, max_cores // threads_per_trial)
+    scheduler = make_scheduler(tuning, output_dir)
+    print(f"Running {num_trials} trials, {max_concurrent} at a time with {threads_per_trial} threads each")
+    print(f"Rungs at epochs {scheduler.rungs}, up to {tuning['max_epochs']} epochs")
+
+    commands = []
+    for index, config in enumerate(sample_trials(tuning['search_space'], num_trials, seed=tuning['seed'])):
+        trial_dir = output_dir / f"trial_{index:03d}"
+        trial_dir.mkdir()
+        with open(trial_dir / "trial.json", 'w') as f:
+            json.dump({"config": config, "defaults": defaults, "tuning": tuning}, f, indent=2)
+        commands.append([sys.executable, str(file), "--run-trial", str(trial_dir)])
+
+    start = time.perf_counter()
+    run_trial_processes(commands, max_concurrent=max_concurrent, threads_per_trial=threads_per_trial)
+    elapsed = time.perf_counter() - start
+
+    trials = pd.DataFrame([summarize_trial(trial_dir, tuning) for trial_dir in sorted(output_dir.glob("trial_*"))])
+    trials_file = output_dir / "trials.csv"
+    trials.to_csv(trials_file, index=False)
+    print(f"\n✓ Saved trials table to {trials_file} ({elapsed:.1f}s)")
+    print(trials.to_string(index=False))
+
+    score_column = f"best_{tuning['metric']}"
+    finished = trials[trials["status"] != "failed"] if "status" in trials else trials.iloc[0:0]
+    if finished.empty:
+        print("\n⚠ No trial finished, params.yaml left unchanged")
+        return trials
+
+    best = finished.loc[finished[score_column].idxmax() if tuning['mode'] == 'max'
+                        else finished[score_column].idxmin()]
+    best_config = {key: best[key].item() if hasattr(best[key], 'item') else best[key]
+                   for key in tuning['search_space']}
+    best_config['train.epochs'] = int(best["best_epoch"])
+
+    with open(output_dir / "best_config.json", 'w') as f:
+        json.dump({"trial": best["trial"], score_column: float(best[score_column]), "params": best_config},
+                  f, indent=2)
+    print(f"\n✅ Best trial {best['trial']}: {score_column} = {best[score_column]:.4f}")
+
+    if export:
+        set_params_values(root / "params.yaml", best_config)
+        print("✓ Exported best configuration to params.yaml:")
+        for key, value in best_config.items():
+            print(f"    • {key}: {value}")
+
+    return trials
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter search with ASHA pruning")
+    parser.add_argument("--num-trials", type=int, default=None, help="overrides tuning.num_trials")
+    parser.add_argument("--no-export", action="store_true", help="leave params.yaml unchanged")
+    parser.add_argument("--run-trial", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_trial:
+        run_trial(args.run_trial)
+    else:
+        tune(num_trials=args.num_trials, export=not args.no_export)
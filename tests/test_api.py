@@ -0,0 +1,331 @@
+"""
+Endpoint tests for the serving API, run in-process with FastAPI's TestClient
+"""
+import asyncio
+import io
+import sys
+import time
+import zipfile
+from pathlib import Path
+import numpy as np
+import pytest
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("pydantic_settings")
+pytest.importorskip("prometheus_fastapi_instrumentator")
+
+from fastapi.testclient import TestClient
+from PIL import Image
+from tensorflow import keras
+
+from catvsdog_model import __version__ as _version
+from catvsdog_model.config.core import config
+from catvsdog_model.processing import data_manager
+from catvsdog_model.processing.tensor_io import TENSORS_CONTENT_TYPE, encode_tensors
+
+TOKEN = "debug-token"
+# Small limits, so every rejection path can be reached with small requests
+SETTINGS = {
+    "MAX_BATCH_SIZE": "4",
+    "MAX_UPLOAD_BYTES": "100000",
+    "MAX_JOB_UPLOAD_BYTES": "1000000",
+    "EMBEDDING_MAX_SIZE": "3",
+    "EMBEDDING_SAVE_SECONDS": "3600",
+    "DEBUG_MEMORY_ENABLED": "true",
+    "DEBUG_MEMORY_TOKEN": TOKEN,
+    "DEBUG_MEMORY_MAX_TOP": "10",
+}
+INPUT_SHAPE = tuple(config.model_cfg.input_shape)
+LABELS = set(config.model_cfg.label_mappings.values())
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    """The API, serving a tiny model from a scratch working directory"""
+    workdir = tmp_path_factory.mktemp("api")
+    (workdir / "app" / "static").mkdir(parents=True)
+    (workdir / "app" / "templates").symlink_to(root / "catvsdog_model_api" / "app" / "templates")
+    model_dir = workdir / "trained_models"
+    model_dir.mkdir()
+    inputs = keras.Input(INPUT_SHAPE)
+    features = keras.layers.GlobalAveragePooling2D()(keras.layers.Rescaling(1 / 255)(inputs))
+    model = keras.Model(inputs, keras.layers.Dense(1, activation="sigmoid")(features))
+    model.save(model_dir / f"{config.app_cfg.model_save_file}{_version}.keras")
+
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in SETTINGS.items():
+            patch.setenv(name, value)
+        patch.chdir(workdir)
+        patch.syspath_prepend(str(root / "catvsdog_model_api"))
+        patch.setattr(data_manager, "TRAINED_MODEL_DIR", model_dir)
+        from app import main
+        with TestClient(main.app) as client:
+            yield client
+        # DEBUG_MEMORY_ENABLED started tracemalloc, which would slow down the rest of the suite
+        main.heap_profiler.stop()
+
+
+def png(seed, size=(32, 32)):
+    """Encoded PNG of random pixels"""
+    pixels = np.random.default_rng(seed).integers(0, 256, (*size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def image_files(*seeds):
+    return [("files", (f"{seed}.png", png(seed), "image/png")) for seed in seeds]
+
+
+def archive(*seeds):
+    """Zip of random PNGs"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zipped:
+        for seed in seeds:
+            zipped.writestr(f"{seed}.png", png(seed))
+    return buffer.getvalue()
+
+
+def frames(batch_size, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (batch_size, *INPUT_SHAPE), dtype=np.uint8)
+
+
+class TestBodySizeLimit:
+    """Test that request bodies are limited before they reach the routes"""
+
+    def test_missing_content_length(self, client):
+        """Test that a streamed upload without a Content-Length is rejected"""
+        response = client.post("/predict/tensor", content=iter([frames(1).tobytes()]),
+                               headers={"Content-Type": "application/octet-stream",
+                                        "X-Tensor-Shape": ",".join(map(str, INPUT_SHAPE))})
+        assert response.status_code == 411
+
+    def test_declared_length_over_limit(self, client):
+        """Test that a body declared over the route's limit is rejected before it is read"""
+        response = client.post("/predict/tensor", content=frames(5).tobytes(),
+                               headers={"Content-Type": "application/octet-stream",
+                                        "X-Tensor-Shape": ",".join(map(str, (5, *INPUT_SHAPE)))})
+        assert response.status_code == 413
+
+    def test_received_bytes_are_counted(self, client):
+        """Test that a body longer than its Content-Length is cut off at the limit"""
+        from fastapi import HTTPException
+        from app.body_limit import BodySizeLimitMiddleware
+
+        async def app(scope, receive, send):
+            while (await receive()).get("more_body"):
+                pass
+
+        messages = [{"type": "http.request", "body": b"x" * 8, "more_body": True} for _ in range(2)]
+
+        async def receive():
+            return messages.pop(0)
+
+        scope = {"type": "http", "method": "POST", "path": "/upload", "headers": [(b"content-length", b"4")]}
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(BodySizeLimitMiddleware(app, limit_for=lambda path: 10)(scope, receive, None))
+        assert error.value.status_code == 413
+
+    def test_other_requests_are_not_limited(self, client):
+        """Test that GET requests and routes without a limit pass through"""
+        assert client.get("/health").status_code == 200
+
+
+class TestTensorEndpoint:
+    """Test /predict/tensor"""
+
+    def test_raw_tensor(self, client):
+        """Test a raw uint8 batch shaped by the X-Tensor-Shape header"""
+        response = client.post("/predict/tensor", content=frames(2).tobytes(),
+                               headers={"Content-Type": "application/octet-stream",
+                                        "X-Tensor-Shape": ",".join(map(str, (2, *INPUT_SHAPE)))})
+        assert response.status_code == 200
+        predictions = response.json()["predictions"]
+        assert len(predictions) == 2
+        assert {prediction["label"] for prediction in predictions} <= LABELS
+
+    def test_multi_tensor(self, client):
+        """Test that several tensors are scored as one batch, in order"""
+        response = client.post("/predict/tensor", content=encode_tensors([frames(1), frames(2, seed=1)]),
+                               headers={"Content-Type": TENSORS_CONTENT_TYPE})
+        assert response.status_code == 200
+        assert len(response.json()["predictions"]) == 3
+
+    @pytest.mark.parametrize("headers, status", [
+        ({"Content-Type": "application/octet-stream"}, 422),
+        ({"Content-Type": "application/octet-stream", "X-Tensor-Shape": "1,10,10,3"}, 422),
+        ({"Content-Type": "text/plain"}, 415),
+    ])
+    def test_rejected(self, client, headers, status):
+        """Test a missing or wrong shape and an unsupported content type"""
+        response = client.post("/predict/tensor", content=frames(1).tobytes(), headers=headers)
+        assert response.status_code == status
+
+
+class TestPredictBatch:
+    """Test /predict/batch"""
+
+    def test_predictions_in_upload_order(self, client):
+        """Test that each uploaded image gets a prediction, in order"""
+        response = client.post("/predict/batch", files=image_files(0, 1))
+        assert response.status_code == 200
+        predictions = response.json()["predictions"]
+        assert len(predictions) == 2
+        assert {prediction["label"] for prediction in predictions} <= LABELS
+
+        single = client.post("/predict/batch", files=image_files(1)).json()["predictions"][0]
+        assert single["label"] == predictions[1]["label"]
+        assert single["confidence"] == pytest.approx(predictions[1]["confidence"], abs=1e-5)
+
+    def test_batch_over_limit(self, client):
+        """Test that more files than MAX_BATCH_SIZE are rejected"""
+        response = client.post("/predict/batch", files=image_files(*range(5)))
+        assert response.status_code == 413
+
+    def test_file_over_limit(self, client):
+        """Test that one file over MAX_UPLOAD_BYTES rejects the whole request"""
+        large = ("files", ("large.png", png(2, size=(256, 256)), "image/png"))
+        assert len(large[1][1]) > int(SETTINGS["MAX_UPLOAD_BYTES"])
+        response = client.post("/predict/batch", files=image_files(0) + [large])
+        assert response.status_code == 413
+
+    @pytest.mark.parametrize("upload, status", [
+        (("notes.txt", b"not an image", "text/plain"), 415),
+        (("fake.png", b"not an image", "image/png"), 422),
+    ])
+    def test_rejected_file(self, client, upload, status):
+        """Test that an unsupported content type or undecodable image is rejected"""
+        response = client.post("/predict/batch", files=image_files(0) + [("files", upload)])
+        assert response.status_code == status
+        assert response.json()["detail"].startswith("File 1")
+
+
+class TestJobs:
+    """Test the bulk scoring job routes"""
+
+    def wait_for(self, client, job_id, timeout=60):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] == "done" or time.monotonic() > deadline:
+                return job
+            time.sleep(0.1)
+
+    def test_archive_job(self, client):
+        """Test that an archive is queued, scored and its results downloaded as JSON and CSV"""
+        response = client.post("/jobs", files={"file": ("images.zip", archive(0, 1), "application/zip")})
+        assert response.status_code == 202
+        submitted = response.json()
+        assert submitted["status"] == "queued"
+        assert submitted["total"] == 2
+
+        assert self.wait_for(client, submitted["job_id"])["status"] == "done"
+        results = client.get(f"/jobs/{submitted['job_id']}/results").json()["results"]
+        assert [result["status"] for result in results] == ["done", "done"]
+        assert {result["label"] for result in results} <= LABELS
+
+        csv = client.get(f"/jobs/{submitted['job_id']}/results", params={"format": "csv"})
+        assert csv.headers["content-type"].startswith("text/csv")
+        lines = csv.text.splitlines()
+        assert lines[0] == "idx,source,status,label,confidence,error"
+        assert len(lines) == 3
+
+    def test_manifest_disabled(self, client):
+        """Test that manifest jobs are refused without a JOB_SOURCE_ROOT"""
+        response = client.post("/jobs", files={"file": ("images.json", b'["a.png"]', "application/json")})
+        assert response.status_code == 403
+
+    def test_invalid_archive(self, client):
+        """Test that an upload that is not an archive is rejected"""
+        response = client.post("/jobs", files={"file": ("images.zip", b"not a zip", "application/zip")})
+        assert response.status_code == 422
+
+    def test_upload_over_limit(self, client):
+        """Test that an upload over MAX_JOB_UPLOAD_BYTES is rejected by the route"""
+        upload = b"x" * (int(SETTINGS["MAX_JOB_UPLOAD_BYTES"]) + 1)
+        response = client.post("/jobs", files={"file": ("images.zip", upload, "application/zip")})
+        assert response.status_code == 413
+
+    def test_unknown_job(self, client):
+        """Test that unknown job ids are not found"""
+        assert client.get("/jobs/missing").status_code == 404
+        assert client.get("/jobs/missing/results").status_code == 404
+
+
+class TestEmbeddings:
+    """Test the embedding routes"""
+
+    def test_embeddings(self, client):
+        """Test that each image gets an embedding and a prediction"""
+        response = client.post("/embeddings", files=image_files(0, 1))
+        assert response.status_code == 200
+        body = response.json()
+        assert np.asarray(body["embeddings"]).shape == (2, 3)
+        assert {prediction["label"] for prediction in body["predictions"]} <= LABELS
+
+    def test_index_and_search(self, client):
+        """Test that indexed images are found again, with their stored prediction"""
+        response = client.post("/embeddings/index", files=image_files(10, 11))
+        assert response.status_code == 200
+        indexed = response.json()
+        assert indexed["size"] == 2
+
+        response = client.post("/embeddings/search", params={"k": 2}, files=image_files(11))
+        assert response.status_code == 200
+        result = response.json()["results"][0]
+        assert result["duplicate_of"] == indexed["ids"][1]
+        assert result["cached_prediction"]["label"] in LABELS
+        assert "prediction" not in result
+        assert len(result["neighbours"]) == 2
+
+        # EMBEDDING_MAX_SIZE is 3
+        response = client.post("/embeddings/index", files=image_files(12, 13))
+        assert response.status_code == 507
+
+    def test_batch_over_limit(self, client):
+        """Test that the embedding routes share the batch limit"""
+        for path in ("/embeddings", "/embeddings/search"):
+            assert client.post(path, files=image_files(*range(5))).status_code == 413
+
+
+class TestDebugMemory:
+    """Test /debug/memory"""
+
+    @pytest.mark.parametrize("headers", [{}, {"X-Debug-Token": "wrong"}])
+    def test_token_required(self, client, headers):
+        """Test that the route is refused without the debug token"""
+        assert client.get("/debug/memory", headers=headers).status_code == 403
+
+    def test_report(self, client):
+        """Test that a report has the heap, models and caches"""
+        response = client.get("/debug/memory", params={"top": 3}, headers={"X-Debug-Token": TOKEN})
+        assert response.status_code == 200
+        report = response.json()
+        assert len(report["heap"]["top"]) <= 3
+        assert "classifier" in report["models"]
+        assert "embedding_index" in report["caches"]
+
+    def test_diff_from_baseline(self, client):
+        """Test that the startup snapshot can still be diffed against after many reports"""
+        for _ in range(7):
+            client.get("/debug/memory", params={"top": 1}, headers={"X-Debug-Token": TOKEN})
+        response = client.get("/debug/memory", params={"top": 1, "diff_from": 1}, headers={"X-Debug-Token": TOKEN})
+        assert response.status_code == 200
+        assert response.json()["heap"]["diff_from"] == 1
+        assert "growth" in response.json()["heap"]
+
+    def test_unknown_snapshot(self, client):
+        """Test that a diff from an evicted or unknown snapshot is not found"""
+        response = client.get("/debug/memory", params={"diff_from": 9999}, headers={"X-Debug-Token": TOKEN})
+        assert response.status_code == 404
+
+    @pytest.mark.parametrize("top", [0, int(SETTINGS["DEBUG_MEMORY_MAX_TOP"]) + 1])
+    def test_top_out_of_range(self, client, top):
+        """Test that `top` is bounded by DEBUG_MEMORY_MAX_TOP"""
+        response = client.get("/debug/memory", params={"top": top}, headers={"X-Debug-Token": TOKEN})
+        assert response.status_code == 422
@@ -0,0 +1,123 @@
+"""
+Unit tests for asynchronous model checkpointing
+"""
+import pytest
+import sys
+import threading
+import zipfile
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from tensorflow import keras
+
+from catvsdog_model.processing.data_manager import (
+    AsyncModelCheckpoint,
+    FastArtifactCheckpoint,
+    checkpoint_callbacks,
+    fast_artifact_paths,
+    load_fast_artifact,
+)
+
+
+def make_model():
+    keras.utils.set_random_seed(0)
+    model = keras.Sequential([keras.Input((8,)), keras.layers.Dense(4, activation="relu"),
+                              keras.layers.Dense(1, activation="sigmoid")])
+    model.compile(optimizer="rmsprop", loss="binary_crossentropy", metrics=["accuracy"])
+    return model
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(16, 8)).astype(np.float32), rng.integers(0, 2, size=16)
+
+
+class BlockingCheckpoint(AsyncModelCheckpoint):
+    """Holds its first write until `release` is set"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writing, self.release = threading.Event(), threading.Event()
+
+    def _write(self, weights, optimizer_state):
+        self.writing.set()
+        self.release.wait()
+        super()._write(weights, optimizer_state)
+
+
+class TestAsyncModelCheckpoint:
+    """Test the background checkpoint writer"""
+
+    def test_saves_model_and_fast_artifact(self, tmp_path, data):
+        """Test that the final weights and optimizer state are saved compressed, with the fast artifact"""
+        model = make_model()
+        model_path = tmp_path / "model.keras"
+        checkpoint = AsyncModelCheckpoint(model_path, monitor="loss", save_best_only=False)
+        model.fit(*data, epochs=3, verbose=0, callbacks=[checkpoint])
+
+        assert checkpoint.stats["saves"] == 3
+        assert checkpoint.stats["written"] + checkpoint.stats["superseded"] == 3
+        with zipfile.ZipFile(model_path) as archive:
+            assert all(info.compress_type == zipfile.ZIP_DEFLATED for info in archive.infolist())
+        saved = keras.models.load_model(model_path)
+        for saved_weight, weight in zip(saved.get_weights(), model.get_weights()):
+            np.testing.assert_array_equal(saved_weight, weight)
+        assert int(saved.optimizer.iterations.numpy()) == int(model.optimizer.iterations.numpy())
+        np.testing.assert_allclose(load_fast_artifact(model_path).predict(data[0], verbose=0),
+                                   model.predict(data[0], verbose=0), rtol=1e-6)
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_save_best_only(self, tmp_path):
+        """Test that only improvements of the monitored value are saved"""
+        checkpoint = AsyncModelCheckpoint(tmp_path / "model.keras", monitor="val_loss", compression_level=0)
+        checkpoint.set_model(make_model())
+        checkpoint.on_train_begin()
+        for epoch, val_loss in enumerate([0.7, 0.8, 0.6]):
+            checkpoint.on_epoch_end(epoch, {"val_loss": val_loss})
+        checkpoint.on_train_end()
+        assert checkpoint.stats["saves"] == 2
+        assert checkpoint.best == 0.6
+
+    def test_pending_snapshots_are_superseded(self, tmp_path):
+        """Test that snapshots queued behind a slow write are replaced by the newest"""
+        model = make_model()
+        checkpoint = BlockingCheckpoint(tmp_path / "model.keras", monitor="loss", save_best_only=False,
+                                        max_pending=2)
+        checkpoint.set_model(model)
+        checkpoint.on_train_begin()
+        checkpoint.on_epoch_end(0)
+        assert checkpoint.writing.wait(10)
+        checkpoint.on_epoch_end(1)
+        model.layers[0].kernel.assign(np.ones((8, 4), dtype=np.float32))
+        checkpoint.on_epoch_end(2)
+        assert checkpoint._queue.qsize() == 2
+        checkpoint.release.set()
+        checkpoint.on_train_end()
+
+        assert checkpoint.stats == {**checkpoint.stats, "saves": 3, "written": 2, "superseded": 1}
+        saved = keras.models.load_model(tmp_path / "model.keras")
+        np.testing.assert_array_equal(saved.layers[0].kernel.numpy(), np.ones((8, 4)))
+
+    def test_write_error_is_raised(self, tmp_path, data):
+        """Test that a failed background write surfaces on the training thread"""
+        (tmp_path / "file").write_text("")
+        checkpoint = AsyncModelCheckpoint(tmp_path / "file" / "model.keras", monitor="loss")
+        with pytest.raises(RuntimeError, match="Writing checkpoint"):
+            make_model().fit(*data, epochs=1, verbose=0, callbacks=[checkpoint])
+
+    def test_checkpoint_callbacks(self, tmp_path):
+        """Test the synchronous and asynchronous checkpoint callback lists"""
+        model_path = tmp_path / "model.keras"
+        assert [type(c) for c in checkpoint_callbacks(model_path, async_checkpoint=True)] == [AsyncModelCheckpoint]
+        assert [type(c) for c in checkpoint_callbacks(model_path, async_checkpoint=False)] == \
+            [keras.callbacks.ModelCheckpoint, FastArtifactCheckpoint]
+        assert len(checkpoint_callbacks(model_path, write_fast_artifact=False, async_checkpoint=False)) == 1
+        for async_checkpoint in (True, False):
+            checkpoint = checkpoint_callbacks(model_path, async_checkpoint=async_checkpoint,
+                                              monitor="val_accuracy", save_best_only=False)[0]
+            assert (checkpoint.monitor, checkpoint.save_best_only) == ("val_accuracy", False)
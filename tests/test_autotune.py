@@ -0,0 +1,120 @@
+"""
+Unit tests for the runtime performance autotuner
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model import autotune
+from catvsdog_model.autotune import (MAX_SERVING_WORKERS, PROFILE_FORMAT_VERSION, available_cpus, choose_profile,
+                                     ensure_profile, load_profile, profile_is_current, profile_path, save_profile,
+                                     sweep_configs)
+
+
+def result(workers, batch_size, throughput, p99_ms):
+    return {"workers": workers, "intra_op_threads": 1, "inter_op_threads": 1, "batch_size": batch_size,
+            "throughput_images_per_second": throughput, "p50_ms": p99_ms / 2, "p99_ms": p99_ms}
+
+
+class TestAvailableCpus:
+    """Test reading the CPU limit from cgroups"""
+
+    def test_cgroup_v2_quota(self, tmp_path):
+        """Test a cgroup v2 quota of half a CPU"""
+        (tmp_path / "cpu.max").write_text("50000 100000\n")
+        assert available_cpus(tmp_path) == 0.5
+
+    def test_cgroup_v1_quota(self, tmp_path):
+        """Test a cgroup v1 quota"""
+        (tmp_path / "cpu").mkdir()
+        (tmp_path / "cpu" / "cpu.cfs_quota_us").write_text("25000\n")
+        (tmp_path / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+        assert available_cpus(tmp_path) == 0.25
+
+    def test_no_quota(self, tmp_path):
+        """Test that without a quota the CPU affinity is used"""
+        (tmp_path / "cpu.max").write_text("max 100000\n")
+        assert available_cpus(tmp_path) == available_cpus(tmp_path / "missing") >= 1
+
+
+class TestSweep:
+    """Test the configurations measured and the one chosen"""
+
+    def test_default_configs_split_the_budget(self):
+        """Test that by default workers x intra-op threads use all CPUs"""
+        configs = sweep_configs(4, inter_op_threads=(1,), max_workers=4)
+        assert [(c["workers"], c["intra_op_threads"]) for c in configs] == [(1, 4), (2, 2), (4, 1)]
+        assert len(sweep_configs(0.5)) == 2
+
+    def test_workers_are_capped(self):
+        """Test that no setup has more workers than the API can serve with"""
+        configs = sweep_configs(4, workers=[1, 2, 4], inter_op_threads=(1,))
+        assert {c["workers"] for c in configs} == {MAX_SERVING_WORKERS}
+
+    def test_explicit_configs_stay_within_budget(self):
+        """Test that explicit combinations over the CPU budget are dropped"""
+        configs = sweep_configs(2, workers=[1, 2], intra_op_threads=[1, 2], inter_op_threads=(1,), max_workers=2)
+        assert [(c["workers"], c["intra_op_threads"]) for c in configs] == [(1, 1), (1, 2), (2, 1)]
+
+    def test_choose_best_throughput_within_budget(self):
+        """Test that the fastest result within the p99 budget wins"""
+        results = [result(1, 8, 40, 200), result(2, 32, 90, 700), result(2, 16, 70, 450)]
+        assert choose_profile(results, max_p99_ms=500)["batch_size"] == 16
+
+    def test_choose_lowest_p99_over_budget(self):
+        """Test that the lowest p99 is chosen when no result meets the budget"""
+        results = [result(1, 8, 40, 900), result(1, 1, 10, 600)]
+        assert choose_profile(results, max_p99_ms=500)["batch_size"] == 1
+
+
+class TestProfile:
+    """Test saving, loading and staleness of the runtime profile"""
+
+    def test_round_trip_and_staleness(self, tmp_path):
+        """Test that a profile is current only for its CPU limit and model"""
+        profile = {"version": PROFILE_FORMAT_VERSION, "machine": {"cpus": 2.0, "model": "model_v1"},
+                   **result(2, 16, 70, 450)}
+        save_profile(profile, tmp_path / "profile.json")
+        loaded = load_profile(tmp_path / "profile.json")
+        assert loaded == profile
+        assert profile_is_current(loaded, cpus=2.0, model="model_v1")
+        assert not profile_is_current(loaded, cpus=4.0, model="model_v1")
+        assert not profile_is_current(loaded, cpus=2.0, model="model_v2")
+        assert not profile_is_current(None, cpus=2.0, model="model_v1")
+
+    def test_unreadable_profiles(self, tmp_path):
+        """Test that missing, invalid and other-version profiles load as None"""
+        assert load_profile(tmp_path / "missing.json") is None
+        (tmp_path / "invalid.json").write_text("{")
+        assert load_profile(tmp_path / "invalid.json") is None
+        (tmp_path / "old.json").write_text('{"version": 0}')
+        assert load_profile(tmp_path / "old.json") is None
+
+    def test_profiles_keyed_by_cpus_and_model(self):
+        """Test that each CPU limit and model has its own profile file"""
+        paths = {profile_path("profiles", cpus=cpus, model=model)
+                 for cpus, model in [(1.0, "model_v1"), (2.0, "model_v1"), (1.0, "model_v2")]}
+        assert len(paths) == 3
+        assert profile_path("profiles", cpus=0.5, model="model_v1") == Path("profiles/profile-0.5cpu-model_v1.json")
+
+    def test_tune_only_on_a_miss(self, tmp_path, monkeypatch):
+        """Test that a stored profile is reused and a missing one is tuned once"""
+        calls = []
+
+        def fake_tune(*, output, **kwargs):
+            calls.append(output)
+            profile = {"version": PROFILE_FORMAT_VERSION, "machine": {"cpus": 2.0, "model": "model_v1"},
+                       **result(1, 16, 70, 450)}
+            save_profile(profile, output)
+            return profile
+
+        monkeypatch.setattr(autotune, "tune", fake_tune)
+        monkeypatch.setattr(autotune, "available_cpus", lambda: 2.0)
+        monkeypatch.setattr(autotune, "serving_model_file", lambda: "model_v1")
+        assert ensure_profile(tmp_path)["batch_size"] == 16
+        assert ensure_profile(tmp_path)["batch_size"] == 16
+        assert calls == [profile_path(tmp_path, cpus=2.0, model="model_v1")]
@@ -0,0 +1,116 @@
+"""
+Unit tests for cascade inference
+"""
+import pytest
+import subprocess
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from tensorflow import keras
+
+from catvsdog_model.cascade import CascadeClassifier, build_first_stage, confidence, sweep_thresholds
+
+
+def make_model(scale):
+    """Sigmoid of `scale` times the first input feature"""
+    model = keras.Sequential([keras.Input((2,)), keras.layers.Dense(1, activation="sigmoid")])
+    model.set_weights([np.array([[scale], [0.0]], dtype=np.float32), np.zeros(1, dtype=np.float32)])
+    return model
+
+
+class TestCascadeClassifier:
+    """Test two-stage inference"""
+
+    def test_escalates_uncertain_images_only(self):
+        """Test that only images below the confidence threshold reach the full model"""
+        first_stage, full = make_model(1.0), make_model(-1.0)
+        cascade = CascadeClassifier(first_stage, full, threshold=0.9)
+        # Logits 5 and -5 are confident, 0.1 is not
+        images = np.array([[5.0, 0.0], [0.1, 0.0], [-5.0, 0.0]], dtype=np.float32)
+
+        result = cascade.predict(images)
+
+        np.testing.assert_array_equal(result["escalated"], [False, True, False])
+        expected_first = first_stage(images).numpy().reshape(-1)
+        expected_full = full(images).numpy().reshape(-1)
+        np.testing.assert_allclose(result["probabilities"],
+                                   [expected_first[0], expected_full[1], expected_first[2]], rtol=1e-6)
+        assert result["latency_ms"]["first"] > 0 and result["latency_ms"]["full"] > 0
+
+    def test_no_escalation_skips_full_model(self):
+        """Test that confident batches never run the full model"""
+        cascade = CascadeClassifier(make_model(1.0), make_model(-1.0), threshold=0.9)
+        result = cascade.predict(np.array([[5.0, 0.0], [-6.0, 0.0]], dtype=np.float32))
+        assert not result["escalated"].any()
+        assert result["latency_ms"]["full"] == 0.0
+
+    def test_escalation_rate(self):
+        """Test the running escalation rate over several requests"""
+        cascade = CascadeClassifier(make_model(1.0), make_model(1.0), threshold=0.9)
+        assert cascade.escalation_rate == 0.0
+        cascade.predict(np.array([[5.0, 0.0], [0.0, 0.0]], dtype=np.float32))
+        cascade.predict(np.array([[0.0, 0.0], [0.2, 0.0]], dtype=np.float32))
+        assert cascade.escalation_rate == pytest.approx(0.75)
+
+    def test_batch_size(self):
+        """Test that a large batch is scored in chunks with the same results"""
+        first_stage, full = make_model(1.0), make_model(-1.0)
+        images = np.array([[5.0, 0.0], [0.1, 0.0], [-5.0, 0.0], [0.2, 0.0], [6.0, 0.0]], dtype=np.float32)
+        whole = CascadeClassifier(first_stage, full, threshold=0.9).predict(images)
+        cascade = CascadeClassifier(first_stage, full, threshold=0.9)
+
+        chunked = cascade.predict(images, batch_size=2)
+
+        np.testing.assert_allclose(chunked["probabilities"], whole["probabilities"], rtol=1e-6)
+        np.testing.assert_array_equal(chunked["escalated"], whole["escalated"])
+        assert cascade.images == 5 and cascade.escalations == 2
+
+    def test_invalid_threshold(self):
+        """Test that thresholds outside [0.5, 1] are rejected"""
+        with pytest.raises(ValueError):
+            CascadeClassifier(make_model(1.0), make_model(1.0), threshold=0.3)
+
+
+class TestSweepThresholds:
+    """Test the offline threshold sweep"""
+
+    def test_sweep(self):
+        """Test escalation rate and accuracy at each threshold"""
+        labels = np.array([1, 0, 1, 0])
+        first = np.array([0.97, 0.4, 0.3, 0.02])   # confidences 0.97, 0.6, 0.7, 0.98
+        full = np.array([0.9, 0.1, 0.8, 0.2])      # always right
+
+        low, high = sweep_thresholds(labels, first, full, [0.65, 0.99])
+
+        assert low["escalation_rate"] == pytest.approx(0.25)
+        assert low["accuracy"] == pytest.approx(0.75)
+        assert low["accuracy_drop"] == pytest.approx(0.25)
+        assert high["escalation_rate"] == pytest.approx(1.0)
+        assert high["accuracy"] == pytest.approx(1.0)
+        assert high["accuracy_drop"] == pytest.approx(0.0)
+
+    def test_confidence(self):
+        """Test confidence of sigmoid outputs"""
+        np.testing.assert_allclose(confidence([0.1, 0.5, 0.8]), [0.9, 0.5, 0.8])
+
+
+class TestFirstStage:
+    """Test the configured first-stage model"""
+
+    def test_import_does_not_build_classifier(self):
+        """Test that importing the cascade for serving does not build the training model"""
+        code = "import sys, catvsdog_model.cascade; print('catvsdog_model.model' in sys.modules)"
+        output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+        assert output.stdout.strip().splitlines()[-1] == "False"
+
+    def test_much_smaller_than_full_model(self):
+        """Test that the first stage is a small fraction of the classifier"""
+        from catvsdog_model.model import classifier
+        first_stage = build_first_stage(augment=False)
+        assert first_stage.output_shape == classifier.output_shape
+        assert first_stage.count_params() < classifier.count_params() / 10
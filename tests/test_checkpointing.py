@@ -0,0 +1,171 @@
+"""
+Unit tests for resumable training checkpoints
+"""
+import pytest
+import sys
+import json
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.checkpointing import (
+    METADATA_FILE,
+    TrainingState,
+    TrainingStateCheckpoint,
+    restore_training_state,
+    fit_with_resume,
+)
+
+
+def make_model():
+    model = keras.Sequential([keras.Input((4,)), keras.layers.Dense(1, activation="sigmoid")])
+    model.compile(optimizer="rmsprop", loss="binary_crossentropy", metrics=["accuracy"])
+    return model
+
+
+def make_dataset(num_batches=4, batch_size=4):
+    x = np.random.rand(num_batches * batch_size, 4).astype(np.float32)
+    y = np.random.randint(0, 2, size=(num_batches * batch_size,)).astype(np.float32)
+    return tf.data.Dataset.from_tensor_slices((x, y)).batch(batch_size)
+
+
+class Interrupt(keras.callbacks.Callback):
+    """Simulate a preempted pod by failing at a given epoch and batch"""
+
+    def __init__(self, epoch, batch):
+        super().__init__()
+        self.epoch, self.batch = epoch, batch
+        self._current_epoch = 0
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._current_epoch = epoch
+
+    def on_train_batch_end(self, batch, logs=None):
+        if (self._current_epoch, batch) == (self.epoch, self.batch):
+            raise KeyboardInterrupt
+
+
+class BatchCounter(keras.callbacks.Callback):
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.batches += 1
+
+
+class TestTrainingStateCheckpoint:
+    """Test saving and restoring the full training state"""
+
+    def test_state_round_trip(self, tmp_path):
+        """Test that weights, optimizer state and position are restored"""
+        model = make_model()
+        model.fit(make_dataset(), epochs=1, verbose=0)
+        checkpoint = TrainingStateCheckpoint(tmp_path)
+        checkpoint.set_model(model)
+        checkpoint.save(TrainingState(epoch=3, batch=2))
+
+        restored = make_model()
+        state = restore_training_state(restored, tmp_path)
+        assert state == TrainingState(epoch=3, batch=2)
+        assert int(restored.optimizer.iterations.numpy()) == int(model.optimizer.iterations.numpy())
+        for original, loaded in zip(model.get_weights(), restored.get_weights()):
+            np.testing.assert_allclose(original, loaded)
+
+    def test_random_layer_state_round_trip(self, tmp_path):
+        """Test that the seed state of augmentation and dropout layers is restored"""
+        def make_random_model():
+            model = keras.Sequential([keras.Input((4, 4, 3)), keras.layers.RandomFlip(), keras.layers.Flatten(),
+                                      keras.layers.Dropout(0.5), keras.layers.Dense(1, activation="sigmoid")])
+            model.compile(optimizer="rmsprop", loss="binary_crossentropy")
+            return model
+
+        model = make_random_model()
+        model.fit(np.random.rand(8, 4, 4, 3), np.random.randint(0, 2, 8), batch_size=4, epochs=1, verbose=0)
+        checkpoint = TrainingStateCheckpoint(tmp_path)
+        checkpoint.set_model(model)
+        checkpoint.save(TrainingState(epoch=1, batch=0))
+
+        restored = make_random_model()
+        restore_training_state(restored, tmp_path)
+        states = [variable.numpy() for variable in model.non_trainable_variables]
+        assert len(states) == 2
+        for original, loaded in zip(states, [variable.numpy() for variable in restored.non_trainable_variables]):
+            np.testing.assert_array_equal(original, loaded)
+
+    def test_no_checkpoint(self, tmp_path):
+        """Test that a missing checkpoint means a fresh start"""
+        assert restore_training_state(make_model(), tmp_path) is None
+
+    def test_checkpoint_from_other_run_is_ignored(self, tmp_path):
+        """Test that a fine-tune run does not resume a from-scratch checkpoint"""
+        model = make_model()
+        checkpoint = TrainingStateCheckpoint(tmp_path)
+        checkpoint.set_model(model)
+        checkpoint.save(TrainingState(epoch=1, batch=0))
+        assert restore_training_state(make_model(), tmp_path, fine_tune_from="0.0.1") is None
+
+    def test_non_chief_does_not_write(self, tmp_path):
+        """Test that only the chief writes checkpoints"""
+        checkpoint = TrainingStateCheckpoint(tmp_path / "state", is_chief=False)
+        checkpoint.set_model(make_model())
+        checkpoint.save(TrainingState(epoch=1, batch=0))
+        assert not (tmp_path / "state").exists()
+
+
+class TestFitWithResume:
+    """Test automatic resume after an interruption"""
+
+    def test_resume_after_epoch(self, tmp_path):
+        """Test that an interrupted run continues from the last completed epoch"""
+        model, dataset = make_model(), make_dataset()
+        with pytest.raises(KeyboardInterrupt):
+            fit_with_resume(model, dataset, epochs=4, checkpoint_dir=tmp_path,
+                            callbacks=[Interrupt(epoch=2, batch=1)], verbose=0)
+        assert json.loads((tmp_path / METADATA_FILE).read_text())["epoch"] == 2
+
+        history = fit_with_resume(make_model(), dataset, epochs=4, checkpoint_dir=tmp_path, verbose=0)
+        assert len(history.history["loss"]) == 2
+        assert not tmp_path.exists(), "Checkpoint should be removed after a completed run"
+
+    def test_resume_mid_epoch(self, tmp_path):
+        """Test that a run interrupted mid-epoch skips the batches it already trained on"""
+        model, dataset = make_model(), make_dataset(num_batches=4)
+        with pytest.raises(KeyboardInterrupt):
+            fit_with_resume(model, dataset, epochs=2, checkpoint_dir=tmp_path, save_every_n_batches=1,
+                            callbacks=[Interrupt(epoch=1, batch=2)], verbose=0)
+        # The interrupt fires before batch 2 is checkpointed
+        assert json.loads((tmp_path / METADATA_FILE).read_text())["batch"] == 2
+
+        counter = BatchCounter()
+        fit_with_resume(make_model(), dataset, epochs=2, checkpoint_dir=tmp_path, save_every_n_batches=1,
+                        callbacks=[counter], verbose=0)
+        assert counter.batches == 2
+
+    def test_resume_keeps_best(self, tmp_path):
+        """Test that a resumed run does not replace a better checkpoint or restart early-stopping patience"""
+        best_path = tmp_path / "best.keras"
+        model, dataset = make_model(), make_dataset()
+        model.save(best_path)
+        saved = best_path.read_bytes()
+
+        # The interrupted run had reached a loss no later epoch can beat
+        previous = [keras.callbacks.ModelCheckpoint(best_path, monitor="loss", save_best_only=True),
+                    keras.callbacks.EarlyStopping(monitor="loss", patience=2)]
+        previous[0].best, previous[1].best, previous[1].wait = 0.0, 0.0, 1
+        checkpoint = TrainingStateCheckpoint(tmp_path / "state", callbacks=previous)
+        checkpoint.set_model(model)
+        checkpoint.save(TrainingState(epoch=1, batch=0))
+
+        history = fit_with_resume(make_model(), dataset, epochs=4, checkpoint_dir=tmp_path / "state", verbose=0,
+                                  callbacks=[keras.callbacks.ModelCheckpoint(best_path, monitor="loss",
+                                                                             save_best_only=True),
+                                             keras.callbacks.EarlyStopping(monitor="loss", patience=2)])
+        assert best_path.read_bytes() == saved
+        assert len(history.history["loss"]) == 1, "Patience should carry over from the interrupted run"
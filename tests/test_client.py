@@ -0,0 +1,173 @@
+"""
+Unit tests for the Python client SDK
+"""
+import asyncio
+import json
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import numpy as np
+import pytest
+
+# Add the client package to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root / "catvsdog_model_client"))
+
+from catvsdog_client import AsyncClient, CatvsdogError, Client, Prediction
+from catvsdog_client._base import make_batches
+
+
+class FakeAPI(BaseHTTPRequestHandler):
+    """
+    Answers the batch endpoints like the API. The confidence of each image is
+    read from its content, so tests can check that results come back in order:
+    encoded files carry a b"img-<n>" marker, arrays are filled with n.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, payload, headers=()):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.requests.append(self.path)
+            server.connections.add(self.client_address)
+            fail = server.failures > 0
+            server.failures -= fail
+        if fail:
+            return self.reply(503, {"detail": "busy"}, [("Retry-After", "0")])
+
+        if self.path == "/predict/batch":
+            values = [int(n) for n in re.findall(rb"img-(\d+)", body)]
+        elif self.path == "/predict/tensor":
+            shape = [int(dim) for dim in self.headers["X-Tensor-Shape"].split(",")]
+            values = np.frombuffer(body, dtype=np.uint8).reshape(shape)[:, 0, 0, 0].tolist()
+        else:
+            return self.reply(404, {"detail": "Not Found"})
+        if any(value == 99 for value in values):
+            return self.reply(422, {"detail": "File 0: Unsupported image format"})
+        self.reply(200, {"version": "0.0.1",
+                         "predictions": [{"label": "dog", "confidence": value / 100} for value in values]})
+
+
+@pytest.fixture
+def api():
+    """A fake API server on a free local port"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAPI)
+    server.lock, server.requests, server.connections, server.failures = threading.Lock(), [], set(), 0
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def encoded(n):
+    """Bytes of a fake PNG file carrying marker n"""
+    return b"\x89PNG" + f"img-{n}".encode()
+
+
+class TestBatching:
+    """Test splitting image lists into requests"""
+
+    def test_batches_do_not_mix_kinds(self):
+        """Test chunk sizes and that arrays and files go in separate batches"""
+        images = [encoded(0), np.zeros((2, 2, 3), np.uint8), encoded(1), encoded(2)]
+        batches = make_batches(images, 2)
+        assert [indices for indices, _ in batches] == [[0, 2], [3], [1]]
+
+
+class TestClient:
+    """Test the synchronous client"""
+
+    def test_predict_many_in_order(self, api):
+        """Test that results are returned in input order across concurrent batch requests"""
+        with Client(api.url, batch_size=3, max_concurrency=2) as client:
+            predictions = client.predict_many([encoded(n) for n in range(10)])
+        assert [p.confidence for p in predictions] == [n / 100 for n in range(10)]
+        assert api.requests.count("/predict/batch") == 4
+
+    def test_connections_are_reused(self, api):
+        """Test that keep-alive connections are pooled instead of opened per request"""
+        with Client(api.url, batch_size=1, max_concurrency=2) as client:
+            client.predict_many([encoded(n) for n in range(12)])
+        assert len(api.requests) == 12
+        assert len(api.connections) <= 2
+
+    def test_arrays_use_tensor_endpoint(self, tmp_path, api):
+        """Test that decoded arrays and file paths can be mixed"""
+        path = tmp_path / "cat.png"
+        path.write_bytes(encoded(7))
+        images = [np.full((4, 4, 3), 5, np.uint8), path, np.full((4, 4, 3), 9, np.uint8)]
+        with Client(api.url) as client:
+            predictions = client.predict_many(images)
+        assert [p.confidence for p in predictions] == [0.05, 0.07, 0.09]
+        assert sorted(api.requests) == ["/predict/batch", "/predict/tensor"]
+
+    def test_retries_on_503(self, api):
+        """Test that overloaded responses are retried"""
+        api.failures = 2
+        with Client(api.url, backoff=0) as client:
+            assert client.predict(encoded(3)) == Prediction("dog", 0.03)
+        assert len(api.requests) == 3
+
+    def test_gives_up_after_max_retries(self, api):
+        """Test that the last error is raised when retries run out"""
+        api.failures = 5
+        with Client(api.url, max_retries=1, backoff=0) as client:
+            with pytest.raises(CatvsdogError) as error:
+                client.predict(encoded(3))
+        assert error.value.status == 503
+        assert len(api.requests) == 2
+
+    def test_rejections_are_not_retried(self, api):
+        """Test that client errors raise immediately with the server detail"""
+        with Client(api.url, backoff=0) as client:
+            with pytest.raises(CatvsdogError, match="Unsupported image format"):
+                client.predict(encoded(99))
+        assert len(api.requests) == 1
+
+    def test_streaming(self, api):
+        """Test that iter_predictions yields every index once"""
+        with Client(api.url, batch_size=2) as client:
+            pairs = list(client.iter_predictions([encoded(n) for n in range(5)]))
+        assert sorted(index for index, _ in pairs) == list(range(5))
+
+
+class TestAsyncClient:
+    """Test the asyncio client"""
+
+    def test_predict_many_with_retries(self, api):
+        """Test ordered results, batching and retries"""
+        api.failures = 1
+
+        async def run():
+            async with AsyncClient(api.url, batch_size=4, max_concurrency=3, backoff=0) as client:
+                return await client.predict_many([encoded(n) for n in range(10)])
+
+        predictions = asyncio.run(run())
+        assert [p.confidence for p in predictions] == [n / 100 for n in range(10)]
+        assert len(api.requests) == 4
+
+    def test_streaming(self, api):
+        """Test that predictions stream as batches complete"""
+        async def run():
+            async with AsyncClient(api.url, batch_size=2) as client:
+                return [pair async for pair in client.iter_predictions([encoded(n) for n in range(5)])]
+
+        assert sorted(index for index, _ in asyncio.run(run())) == list(range(5))
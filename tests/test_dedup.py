@@ -0,0 +1,99 @@
+"""
+Unit tests for near-duplicate detection
+"""
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from PIL import Image
+
+from catvsdog_model.processing.manifest import update_manifest
+from catvsdog_model.processing.dedup import (
+    dhash,
+    hamming_distance,
+    HammingIndex,
+    group_near_duplicates,
+    find_duplicates,
+)
+
+
+def smooth_image(seed, size=(120, 100)):
+    """A low-frequency image, so resized copies keep the same structure"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(6, 6, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize(size, Image.BICUBIC)
+
+
+class TestHamming:
+    """Test hashing and Hamming radius search"""
+
+    def test_dhash_survives_resize_and_recompression(self, tmp_path):
+        """Test that a resized, recompressed copy stays within a few bits"""
+        image = smooth_image(0)
+        image.save(tmp_path / "original.jpg", quality=95)
+        image.resize((60, 50)).save(tmp_path / "copy.jpg", quality=60)
+        smooth_image(1).save(tmp_path / "other.jpg")
+
+        original = dhash(str(tmp_path / "original.jpg"))
+        assert hamming_distance(np.array([dhash(str(tmp_path / "copy.jpg"))]), original)[0] <= 4
+        assert hamming_distance(np.array([dhash(str(tmp_path / "other.jpg"))]), original)[0] > 10
+
+    def test_hamming_distance(self):
+        """Test the vectorised popcount against Python's"""
+        values = np.random.default_rng(0).integers(0, 2 ** 63, size=100, dtype=np.uint64)
+        expected = [bin(int(v) ^ 12345).count("1") for v in values]
+        assert hamming_distance(values, 12345).tolist() == expected
+
+    def test_index_matches_brute_force(self):
+        """Test that query and pairs find exactly the hashes within the radius"""
+        rng = np.random.default_rng(0)
+        hashes = rng.integers(0, 2 ** 63, size=500, dtype=np.uint64)
+        hashes[250:] = hashes[:250] ^ (np.uint64(1) << rng.integers(0, 64, size=250).astype(np.uint64))
+        index = HammingIndex(hashes, max_distance=3)
+
+        brute = {(i, j) for i in range(500) for j in np.nonzero(hamming_distance(hashes, hashes[i]) <= 3)[0]
+                 if j > i}
+        assert set(map(tuple, index.pairs().tolist())) == brute
+        assert set(index.query(hashes[7]).tolist()) == {7} | {j for i, j in brute if i == 7} | \
+            {i for i, j in brute if j == 7}
+
+    def test_invalid_radius(self):
+        """Test that a radius beyond the hash length is rejected"""
+        with pytest.raises(ValueError):
+            HammingIndex([0], max_distance=64)
+
+    def test_group_near_duplicates(self):
+        """Test that chains of near hashes are grouped transitively"""
+        groups = group_near_duplicates([0b0, 0b1, 0b11, 0xFFFF0000, 0xFFFF0000], max_distance=1)
+        assert sorted(sorted(group) for group in groups) == [[0, 1, 2], [3, 4]]
+
+
+class TestFindDuplicates:
+    """Test duplicate groups over a dataset manifest"""
+
+    def test_cross_split_duplicates(self, tmp_path):
+        """Test that exact and near copies are grouped and the evaluation copy is kept"""
+        split_dirs = {"train": tmp_path / "train", "test": tmp_path / "test"}
+        for directory in split_dirs.values():
+            (directory / "cat").mkdir(parents=True)
+        smooth_image(0).save(split_dirs["train"] / "cat" / "a.jpg", quality=95)
+        smooth_image(0).resize((60, 50)).save(split_dirs["test"] / "cat" / "a_small.jpg", quality=60)
+        smooth_image(1).save(split_dirs["train"] / "cat" / "b.jpg")
+        (split_dirs["train"] / "cat" / "b_copy.jpg").write_bytes((split_dirs["train"] / "cat" / "b.jpg").read_bytes())
+        smooth_image(2).save(split_dirs["train"] / "cat" / "c.jpg")
+
+        manifest, _ = update_manifest(split_dirs, tmp_path / "manifest.json", workers=1)
+        hash_cache = {}
+        groups = find_duplicates(manifest, max_distance=4, workers=1, hash_cache=hash_cache)
+
+        by_keep = {Path(group["keep"]).name: group for group in groups}
+        assert set(by_keep) == {"a_small.jpg", "b.jpg"}
+        assert by_keep["a_small.jpg"]["cross_split"]
+        assert [Path(key).name for key in by_keep["b.jpg"]["drop"]] == ["b_copy.jpg"]
+        # One perceptual hash per distinct content
+        assert len(hash_cache) == 4
@@ -0,0 +1,115 @@
+"""
+Unit tests for knowledge distillation
+"""
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.config.core import config
+from catvsdog_model.distillation import Distiller, StudentCheckpoint, build_student
+from catvsdog_model.processing.data_manager import load_fast_artifact
+
+
+def make_model(units=1):
+    model = keras.Sequential([keras.Input((4,)), keras.layers.Dense(units, activation="sigmoid")])
+    model.compile(optimizer="rmsprop", loss="binary_crossentropy", metrics=["accuracy"])
+    return model
+
+
+def make_dataset():
+    x = np.random.rand(32, 4).astype(np.float32)
+    y = np.random.randint(0, 2, size=(32,)).astype(np.float32)
+    return x, y
+
+
+class TestDistiller:
+    """Test the distillation loss and training loop"""
+
+    def test_hard_label_loss_only(self):
+        """Test that alpha=1 reduces to plain binary cross-entropy"""
+        student, teacher = make_model(), make_model()
+        distiller = Distiller(student, teacher, temperature=4.0, alpha=1.0)
+        x, y = make_dataset()
+        y_pred = student(x)
+
+        expected = keras.losses.binary_crossentropy(y[:, None], y_pred)
+        loss = distiller.compute_loss(x=x, y=y, y_pred=y_pred)
+        assert float(loss) == pytest.approx(float(tf.reduce_mean(expected)), rel=1e-5)
+
+    def test_matching_teacher_has_minimal_soft_loss(self):
+        """Test that a student identical to the teacher has a lower soft loss than a different one"""
+        teacher = make_model()
+        same, different = make_model(), make_model()
+        same.set_weights(teacher.get_weights())
+        different.set_weights([w + 1.0 for w in teacher.get_weights()])
+        x, y = make_dataset()
+
+        def soft_loss(student):
+            distiller = Distiller(student, teacher, temperature=2.0, alpha=0.0)
+            return float(distiller.compute_loss(x=x, y=y, y_pred=student(x)))
+
+        assert soft_loss(same) < soft_loss(different)
+
+    def test_teacher_is_frozen(self):
+        """Test that fitting the distiller only updates the student"""
+        student, teacher = make_model(), make_model()
+        teacher_weights = [w.copy() for w in teacher.get_weights()]
+        student_weights = [w.copy() for w in student.get_weights()]
+
+        distiller = Distiller(student, teacher)
+        distiller.compile(optimizer="rmsprop", metrics=["accuracy"])
+        x, y = make_dataset()
+        history = distiller.fit(x, y, epochs=2, batch_size=8, verbose=0)
+
+        assert "accuracy" in history.history
+        for before, after in zip(teacher_weights, teacher.get_weights()):
+            np.testing.assert_array_equal(before, after)
+        assert any(not np.array_equal(before, after) for before, after in zip(student_weights, student.get_weights()))
+
+
+class TestStudentArtifact:
+    """Test the exported student model"""
+
+    def test_student_checkpoint_saves_servable_model(self, tmp_path):
+        """Test that the saved file is the student alone and loads without the distiller"""
+        student, teacher = make_model(), make_model()
+        distiller = Distiller(student, teacher)
+        distiller.compile(optimizer="rmsprop", metrics=["accuracy"])
+        x, y = make_dataset()
+        distiller.fit(x, y, epochs=1, validation_data=(x, y), verbose=0,
+                      callbacks=[StudentCheckpoint(tmp_path / "student.keras")])
+
+        loaded = keras.models.load_model(tmp_path / "student.keras")
+        np.testing.assert_allclose(loaded.predict(x, verbose=0), student.predict(x, verbose=0), rtol=1e-5)
+
+    def test_student_checkpoint_writes_fast_artifact(self, tmp_path):
+        """Test that the student's fast artifact is written and no temporary file is left behind"""
+        student, teacher = make_model(), make_model()
+        distiller = Distiller(student, teacher)
+        distiller.compile(optimizer="rmsprop", metrics=["accuracy"])
+        x, y = make_dataset()
+        distiller.fit(x, y, epochs=2, validation_data=(x, y), verbose=0,
+                      callbacks=[StudentCheckpoint(tmp_path / "student.keras", save_best_only=False)])
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["student.fast.bin", "student.fast.json",
+                                                                    "student.keras"]
+        fast = load_fast_artifact(tmp_path / "student.keras")
+        np.testing.assert_allclose(fast.predict(x, verbose=0), student.predict(x, verbose=0), rtol=1e-5)
+
+    def test_build_student_uses_distillation_config(self):
+        """Test that the student follows the distillation settings and is smaller than the classifier"""
+        from catvsdog_model.model import classifier
+
+        student = build_student()
+        layer_types = [type(layer).__name__ for layer in student.layers]
+        if config.model_cfg.distillation.architecture == "inverted_residual":
+            assert "DepthwiseConv2D" in layer_types
+        assert student.count_params() < classifier.count_params()
@@ -0,0 +1,186 @@
+"""
+Unit tests for data-parallel training helpers
+"""
+import pytest
+import sys
+import json
+import socket
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.distributed import (
+    STRATEGIES,
+    get_strategy,
+    is_chief,
+    global_batch_size,
+    shard_dataset,
+    build_tf_config,
+    launch_local_workers,
+    fit_distributed,
+    evaluate_distributed,
+)
+
+
+class TestStrategySelection:
+    """Test strategy construction and chief election"""
+
+    def test_default_strategy(self):
+        """Test that the default strategy has a single replica"""
+        strategy = get_strategy("default")
+        assert strategy.num_replicas_in_sync == 1
+
+    def test_unknown_strategy_raises(self):
+        """Test that an unknown strategy name is rejected"""
+        with pytest.raises(ValueError):
+            get_strategy("parameter_server")
+
+    def test_known_strategies(self):
+        """Test that params.yaml choices are all listed"""
+        assert set(STRATEGIES) == {"default", "mirrored", "multi_worker_mirrored"}
+
+    def test_single_process_is_chief(self):
+        """Test that a non-clustered run is its own chief"""
+        assert is_chief(get_strategy("default"))
+        assert is_chief(None)
+
+    def test_global_batch_size(self):
+        """Test that the global batch scales with replica count"""
+        assert global_batch_size(32, get_strategy("default")) == 32
+
+
+class TestLocalCluster:
+    """Test localhost cluster configuration"""
+
+    def test_build_tf_config(self):
+        """Test that each worker gets the shared cluster and its own index"""
+        tf_config = json.loads(build_tf_config(3, 1, base_port=30000))
+        assert tf_config["cluster"]["worker"] == ["localhost:30000", "localhost:30001", "localhost:30002"]
+        assert tf_config["task"] == {"type": "worker", "index": 1}
+
+    def test_launch_local_workers(self, tmp_path):
+        """Test that one process is launched per worker with its own TF_CONFIG"""
+        script = ("import json, os, pathlib, sys; "
+                  "index = json.loads(os.environ['TF_CONFIG'])['task']['index']; "
+                  f"pathlib.Path(r'{tmp_path}', str(index)).touch()")
+        return_code = launch_local_workers(command=[sys.executable, "-c", script], num_workers=3)
+        assert return_code == 0
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["0", "1", "2"]
+
+    def test_launch_local_workers_reports_failure(self):
+        """Test that a failing worker fails the launch"""
+        return_code = launch_local_workers(command=[sys.executable, "-c", "raise SystemExit(3)"], num_workers=2)
+        assert return_code == 3
+
+
+class TestDistributedFit:
+    """Test the custom data-parallel training loop"""
+
+    def test_fit_and_evaluate_distributed(self):
+        """Test that the loop trains, logs epochs and evaluates"""
+        strategy = get_strategy("mirrored")
+        with strategy.scope():
+            model = keras.Sequential([keras.Input((4,)), keras.layers.Dense(1, activation="sigmoid")])
+            model.compile(optimizer="rmsprop", loss="binary_crossentropy", metrics=["accuracy"])
+
+        x = np.random.rand(32, 4).astype(np.float32)
+        y = np.random.randint(0, 2, size=(32,)).astype(np.int32)
+        dataset = shard_dataset(tf.data.Dataset.from_tensor_slices((x, y)).batch(8))
+
+        history = fit_distributed(model, strategy, dataset, epochs=2, validation_data=dataset, verbose=0)
+        assert len(history.history["loss"]) == 2
+        assert "val_accuracy" in history.history
+
+        loss, accuracy = evaluate_distributed(model, strategy, dataset)
+        assert not np.isnan(loss)
+        assert 0.0 <= accuracy <= 1.0
+
+
+# Trains the same tiny model on every worker of a localhost cluster and writes
+# what that worker saw to <output dir>/<worker index>.json
+WORKER_SCRIPT = """
+import json, os, sys
+sys.path.append(sys.argv[2])
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from catvsdog_model.distributed import get_strategy, is_chief, shard_dataset, fit_distributed
+
+strategy = get_strategy("multi_worker_mirrored")
+keras.utils.set_random_seed(0)
+with strategy.scope():
+    model = keras.Sequential([keras.Input((4,)), keras.layers.Dense(1, activation="sigmoid")])
+    model.compile(optimizer="rmsprop", loss="binary_crossentropy", metrics=["accuracy"])
+
+rng = np.random.default_rng(0)
+x = rng.random((40, 4), dtype=np.float32)
+y = rng.integers(0, 2, 40).astype(np.int32)
+dataset = shard_dataset(tf.data.Dataset.from_tensor_slices((x, y)).batch(8 * strategy.num_replicas_in_sync))
+
+class StepCounter(keras.callbacks.Callback):
+    def __init__(self):
+        super().__init__()
+        self.steps = 0
+        self.expected = None
+
+    def on_train_begin(self, logs=None):
+        self.expected = self.params.get("steps")
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.steps += 1
+
+counter = StepCounter()
+history = fit_distributed(model, strategy, dataset, epochs=2, callbacks=[counter], verbose=0)
+index = json.loads(os.environ["TF_CONFIG"])["task"]["index"]
+with open(os.path.join(sys.argv[1], f"{index}.json"), "w") as f:
+    json.dump({"chief": is_chief(strategy), "replicas": strategy.num_replicas_in_sync,
+               "steps": counter.steps, "expected_steps": counter.expected, "loss": history.history["loss"],
+               "weights": [w.tolist() for w in model.get_weights()]}, f)
+"""
+
+
+def free_port_pair():
+    """A port whose successor is free too, for a two-worker localhost cluster"""
+    for _ in range(20):
+        with socket.socket() as first:
+            first.bind(("localhost", 0))
+            port = first.getsockname()[1]
+            with socket.socket() as second:
+                try:
+                    second.bind(("localhost", port + 1))
+                except OSError:
+                    continue
+        return port
+    pytest.skip("No pair of free localhost ports")
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+class TestMultiWorkerTraining:
+    """Test training on a real two-worker localhost cluster"""
+
+    def test_two_workers(self, tmp_path):
+        """Test that both workers train in lockstep, each running its share of the steps"""
+        script = tmp_path / "worker.py"
+        script.write_text(WORKER_SCRIPT)
+        return_code = launch_local_workers(command=[sys.executable, str(script), str(tmp_path), str(root)],
+                                           num_workers=2, base_port=free_port_pair())
+        assert return_code == 0
+
+        results = [json.loads((tmp_path / f"{index}.json").read_text()) for index in range(2)]
+        assert [result["chief"] for result in results] == [True, False]
+        for result in results:
+            assert result["replicas"] == 2
+            # 3 global batches of 16 per epoch, each split across both workers
+            assert result["expected_steps"] == 3
+            assert result["steps"] == 2 * 3
+            assert len(result["loss"]) == 2
+        assert results[0]["loss"] == results[1]["loss"]
+        for first, second in zip(results[0]["weights"], results[1]["weights"]):
+            np.testing.assert_allclose(first, second)
@@ -0,0 +1,129 @@
+"""
+Unit tests for image embeddings and the vector index
+"""
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.embeddings import IVFIndex, embedding_model, normalize
+from catvsdog_model.model import create_model
+
+
+def clustered(n, dim=16, clusters=8, seed=0):
+    """Unit vectors around a few random centres"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    return normalize(centres[rng.integers(clusters, size=n)] + 0.1 * rng.normal(size=(n, dim)))
+
+
+class TestEmbeddingModel:
+    """Test extraction of the penultimate features"""
+
+    def test_embeddings_and_predictions(self):
+        """Test that embeddings are the head input and predictions match the classifier"""
+        model = create_model([32, 32, 3], "rmsprop", "binary_crossentropy", ["accuracy"], augment=False,
+                             architecture="inverted_residual", head="gap", width_multiplier=0.25,
+                             depth_multiplier=0.5)
+        images = np.random.default_rng(0).uniform(0, 255, size=(3, 32, 32, 3)).astype(np.float32)
+
+        embeddings, predictions = embedding_model(model, with_predictions=True).predict_on_batch(images)
+
+        assert embeddings.shape == (3, model.layers[-1].kernel.shape[0])
+        np.testing.assert_allclose(predictions, model.predict_on_batch(images), rtol=1e-5)
+        np.testing.assert_allclose(embedding_model(model).predict_on_batch(images), embeddings, rtol=1e-5)
+
+
+class TestIVFIndex:
+    """Test the approximate nearest neighbour index"""
+
+    def test_exact_before_build(self):
+        """Test that an unbuilt index searches every vector"""
+        vectors = clustered(50)
+        index = IVFIndex(16, nlist=8, nprobe=1)
+        ids = index.add(vectors)
+        assert list(ids) == list(range(50))
+        found, scores = index.search(vectors[:5], k=1)
+        assert list(found[:, 0]) == list(range(5))
+        np.testing.assert_allclose(scores[:, 0], 1.0, rtol=1e-5)
+
+    def test_build_recall(self):
+        """Test that probing a few lists finds most exact neighbours, and all lists finds every one"""
+        vectors = clustered(2000)
+        queries = clustered(50, seed=1)
+        exact, _ = IVFIndex(16, nlist=1, nprobe=1).build(vectors).search(queries, k=10)
+
+        index = IVFIndex(16, nlist=16, nprobe=4).build(vectors)
+        assert index.is_trained and len(index) == 2000
+        found, _ = index.search(queries, k=10)
+        recall = np.mean([len(set(f) & set(e)) / 10 for f, e in zip(found, exact)])
+        assert recall > 0.9
+
+        index.nprobe = 16
+        found, _ = index.search(queries, k=10)
+        assert all(set(f) == set(e) for f, e in zip(found, exact))
+
+    def test_add_after_build(self):
+        """Test that added vectors are searchable and keep their ids"""
+        index = IVFIndex(16, nlist=4, nprobe=4).build(clustered(100))
+        new = clustered(3, seed=5)
+        ids = index.add(new, ids=[1000, 1001, 1002])
+        found, _ = index.search(new, k=1)
+        assert list(found[:, 0]) == [1000, 1001, 1002]
+        with pytest.raises(ValueError):
+            index.add(new[:1], ids=[1000])
+
+    def test_add_buffers_until_merge(self):
+        """Test that added vectors wait in tail buffers, searchable, until the tail is full or saved"""
+        index = IVFIndex(16, nlist=4, nprobe=4, max_tail=10).build(clustered(100))
+        grouped = index.vectors
+        new = clustered(8, seed=6)
+        ids = index.add(new)
+        assert index.vectors is grouped and len(index) == 108
+        assert list(index.search(new, k=1)[0][:, 0]) == list(ids)
+
+        index.add(clustered(3, seed=7))
+        assert len(index.vectors) == len(index) == 111
+        assert list(index.search(new, k=1)[0][:, 0]) == list(ids)
+
+    def test_save_merges_tail(self, tmp_path):
+        """Test that saving writes the buffered vectors too"""
+        index = IVFIndex(16, nlist=4, nprobe=4).build(clustered(100))
+        new = clustered(5, seed=8)
+        ids = index.add(new)
+        index.save(tmp_path / "index")
+        loaded = IVFIndex.load(tmp_path / "index")
+        assert len(loaded) == 105
+        assert list(loaded.search(new, k=1)[0][:, 0]) == list(ids)
+        assert list(loaded.add(new[:1])) == [105]
+
+    def test_missing_neighbours(self):
+        """Test that k larger than the index is padded"""
+        index = IVFIndex(16, nlist=2, nprobe=1)
+        index.add(clustered(2))
+        found, scores = index.search(clustered(1, seed=3), k=4)
+        assert list(found[0, 2:]) == [-1, -1]
+        assert np.isneginf(scores[0, 2:]).all()
+
+    def test_save_and_memory_mapped_load(self, tmp_path):
+        """Test that a saved index loads memory-mapped with the same results, and still accepts vectors"""
+        vectors = clustered(500)
+        index = IVFIndex(16, nlist=8, nprobe=2).build(vectors)
+        index.save(tmp_path / "index")
+
+        loaded = IVFIndex.load(tmp_path / "index")
+
+        assert isinstance(loaded.vectors, np.memmap)
+        np.testing.assert_array_equal(loaded.search(vectors[:20], k=5)[0], index.search(vectors[:20], k=5)[0])
+        loaded.add(clustered(1, seed=9))
+        loaded.save(tmp_path / "index")
+        assert len(IVFIndex.load(tmp_path / "index")) == 501
+
+    def test_invalid_parameters(self):
+        """Test nlist/nprobe validation"""
+        with pytest.raises(ValueError):
+            IVFIndex(16, nlist=4, nprobe=5)
@@ -0,0 +1,177 @@
+"""
+Unit tests for the streaming evaluator
+"""
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+import tensorflow as tf
+from tensorflow import keras
+from PIL import Image
+
+from catvsdog_model.evaluation import (
+    StreamingMetrics,
+    PredictionCache,
+    content_hashes,
+    evaluation_fingerprint,
+    file_sha256,
+    list_labelled_files,
+    load_eval_dataset,
+    evaluate_streaming,
+    evaluate_cached,
+)
+
+
+class TestStreamingMetrics:
+    """Test incremental loss, confusion matrix and per-class metrics"""
+
+    def test_matches_batch_computation(self):
+        """Test that batch-by-batch updates equal a single computation"""
+        rng = np.random.default_rng(0)
+        y_true = rng.integers(0, 2, size=100)
+        y_prob = rng.random(100)
+
+        metrics = StreamingMetrics()
+        for start in range(0, 100, 16):
+            metrics.update(y_true[start:start + 16], y_prob[start:start + 16])
+
+        expected_loss = keras.losses.binary_crossentropy(y_true.astype(np.float32)[:, None],
+                                                         y_prob.astype(np.float32)[:, None])
+        assert metrics.total == 100
+        assert metrics.loss == pytest.approx(float(np.mean(expected_loss)), rel=1e-5)
+        assert metrics.accuracy == pytest.approx(np.mean((y_prob > 0.5) == y_true))
+        assert metrics.confusion[1, 1] == np.sum((y_prob > 0.5) & (y_true == 1))
+
+    def test_merge_shards(self):
+        """Test that merged shard statistics equal a single pass"""
+        rng = np.random.default_rng(1)
+        y_true, y_prob = rng.integers(0, 2, size=50), rng.random(50)
+
+        whole = StreamingMetrics()
+        whole.update(y_true, y_prob)
+        first, second = StreamingMetrics(), StreamingMetrics()
+        first.update(y_true[:20], y_prob[:20])
+        second.update(y_true[20:], y_prob[20:])
+        merged = StreamingMetrics.from_dict(first.to_dict()).merge(second)
+
+        np.testing.assert_array_equal(merged.confusion, whole.confusion)
+        assert merged.loss == pytest.approx(whole.loss)
+
+    def test_classification_report(self):
+        """Test precision, recall and F1 against hand-computed values"""
+        metrics = StreamingMetrics()
+        metrics.update([0, 0, 0, 1, 1, 1], [0.1, 0.2, 0.9, 0.8, 0.7, 0.3])
+        report = metrics.classification_report(["cat", "dog"])
+
+        assert report["cat"]["precision"] == pytest.approx(2 / 3)
+        assert report["dog"]["recall"] == pytest.approx(2 / 3)
+        assert report["cat"]["support"] == 3
+        assert report["accuracy"] == pytest.approx(4 / 6)
+        assert report["macro avg"]["f1-score"] == pytest.approx(2 / 3)
+
+
+class TestStreamingEvaluation:
+    """Test the single-pass evaluation loop"""
+
+    def test_file_order_matches_keras(self, tmp_path):
+        """Test that files and labels come in image_dataset_from_directory order"""
+        for label in ["dog", "cat"]:
+            (tmp_path / label).mkdir()
+            for i in range(3):
+                Image.new("RGB", (10, 10)).save(tmp_path / label / f"{i}.jpg")
+
+        paths, labels, class_names = list_labelled_files(tmp_path)
+        keras_dataset = keras.preprocessing.image_dataset_from_directory(tmp_path, image_size=(8, 8),
+                                                                         shuffle=False)
+        assert class_names == keras_dataset.class_names
+        assert paths == keras_dataset.file_paths
+        assert labels == [0, 0, 0, 1, 1, 1]
+
+        images, _ = next(iter(load_eval_dataset(paths, labels, image_size=(8, 8), batch_size=6)))
+        keras_images, _ = next(iter(keras_dataset))
+        np.testing.assert_allclose(images.numpy(), keras_images.numpy())
+
+    def test_matches_keras_evaluate(self):
+        """Test that loss and accuracy match model.evaluate"""
+        model = keras.Sequential([keras.Input((4,)), keras.layers.Dense(1, activation="sigmoid")])
+        model.compile(optimizer="rmsprop", loss="binary_crossentropy", metrics=["accuracy"])
+        x = np.random.rand(40, 4).astype(np.float32)
+        y = np.random.randint(0, 2, size=(40,)).astype(np.int32)
+        dataset = tf.data.Dataset.from_tensor_slices((x, y)).batch(16)
+
+        loss, accuracy = model.evaluate(dataset, verbose=0)
+        metrics = evaluate_streaming(model, dataset)
+        assert metrics.loss == pytest.approx(loss, rel=1e-4)
+        assert metrics.accuracy == pytest.approx(accuracy)
+
+
+class TestPredictionCache:
+    """Test reuse of per-example predictions"""
+
+    def test_cache_round_trip(self, tmp_path):
+        """Test that saved predictions are found again and only new hashes are missing"""
+        cache = PredictionCache(tmp_path, "abc")
+        cache.update(["h1", "h2"], [0.25, 0.75])
+        cache.save()
+
+        reloaded = PredictionCache(tmp_path, "abc")
+        assert len(reloaded) == 2
+        assert reloaded.missing(["h2", "h3", "h1"]) == [1]
+        np.testing.assert_allclose(reloaded.lookup(["h2", "h1"]), [0.75, 0.25])
+        assert len(PredictionCache(tmp_path, "other")) == 0
+
+    def test_fingerprint_depends_on_model_and_preprocessing(self, tmp_path):
+        """Test that a different model file or image size changes the fingerprint"""
+        (tmp_path / "a.keras").write_bytes(b"weights a")
+        (tmp_path / "b.keras").write_bytes(b"weights b")
+        preprocessing = {"image_size": [180, 180]}
+
+        fingerprint = evaluation_fingerprint(tmp_path / "a.keras", preprocessing)
+        assert fingerprint == evaluation_fingerprint(tmp_path / "a.keras", dict(preprocessing))
+        assert fingerprint != evaluation_fingerprint(tmp_path / "b.keras", preprocessing)
+        assert fingerprint != evaluation_fingerprint(tmp_path / "a.keras", {"image_size": [160, 160]})
+
+    def test_content_hashes_use_manifest(self, tmp_path):
+        """Test that manifest hashes are used only while size and mtime match"""
+        image = tmp_path / "cat" / "0.jpg"
+        image.parent.mkdir()
+        image.write_bytes(b"image")
+        stat = image.stat()
+        manifest = {image.as_posix(): {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": "cached"}}
+
+        assert content_hashes([str(image)], manifest) == ["cached"]
+        image.write_bytes(b"changed image")
+        assert content_hashes([str(image)], manifest) == [file_sha256(image)]
+
+    def test_evaluate_cached_matches_streaming(self, tmp_path):
+        """Test that partly cached evaluation matches a full pass and fills the cache"""
+        rng = np.random.default_rng(0)
+        for label in ("cat", "dog"):
+            (tmp_path / "images" / label).mkdir(parents=True)
+            for i in range(5):
+                pixels = rng.integers(0, 256, (10, 10, 3), dtype=np.uint8)
+                Image.fromarray(pixels).save(tmp_path / "images" / label / f"{i}.png")
+        paths, labels, _ = list_labelled_files(tmp_path / "images")
+        hashes = content_hashes(paths)
+        model = keras.Sequential([keras.Input((8, 8, 3)), keras.layers.Flatten(),
+                                  keras.layers.Dense(1, activation="sigmoid")])
+        dataset = load_eval_dataset(paths, labels, image_size=(8, 8), batch_size=3)
+        expected = evaluate_streaming(model, dataset)
+
+        cache = PredictionCache(tmp_path / "cache", "abc")
+        first = load_eval_dataset(paths[:4], labels[:4], image_size=(8, 8), batch_size=3)
+        cache.update(hashes[:4], model.predict(first, verbose=0).reshape(-1))
+        metrics = evaluate_cached(model, paths, labels, hashes, cache, image_size=(8, 8), batch_size=3)
+        assert cache.missing(hashes) == []
+        np.testing.assert_array_equal(metrics.confusion, expected.confusion)
+        assert metrics.loss == pytest.approx(expected.loss, rel=1e-5)
+
+        # Everything cached: no model is needed
+        metrics = evaluate_cached(None, paths, labels, hashes, cache, image_size=(8, 8), batch_size=3)
+        np.testing.assert_array_equal(metrics.confusion, expected.confusion)
+        assert metrics.loss == pytest.approx(expected.loss, rel=1e-5)
@@ -0,0 +1,113 @@
+"""
+Unit tests for the fast-loading model artifact
+"""
+import pytest
+import sys
+import os
+import json
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from tensorflow import keras
+
+from catvsdog_model.model import create_model
+from catvsdog_model.processing import data_manager
+from catvsdog_model.processing.data_manager import (
+    FastArtifactCheckpoint,
+    fast_artifact_paths,
+    load_fast_artifact,
+    load_model,
+    save_fast_artifact,
+)
+
+
+def make_model(augment=True):
+    keras.utils.set_random_seed(0)
+    return create_model(input_shape=(96, 96, 3), optimizer="rmsprop", loss="binary_crossentropy",
+                        metrics=["accuracy"], augment=augment, width_multiplier=0.25)
+
+
+@pytest.fixture
+def images():
+    return np.random.default_rng(0).uniform(0, 255, size=(4, 96, 96, 3)).astype(np.float32)
+
+
+class TestFastArtifact:
+    """Test writing and reading the fast artifact"""
+
+    def test_round_trip(self, tmp_path, images):
+        """Test that the fast artifact predicts like the original model, without augmentation layers"""
+        model = make_model(augment=True)
+        model_path = tmp_path / "model_v1.keras"
+        config_path, weights_path = save_fast_artifact(model, model_path)
+
+        assert (config_path.name, weights_path.name) == ("model_v1.fast.json", "model_v1.fast.bin")
+        loaded = load_fast_artifact(model_path)
+        assert not any(isinstance(layer, keras.Sequential) for layer in loaded.layers)
+        np.testing.assert_allclose(loaded.predict(images, verbose=0), model.predict(images, verbose=0), rtol=1e-6)
+
+    def test_weights_are_aligned(self, tmp_path):
+        """Test that every weight starts on a 64-byte boundary of the blob"""
+        config_path, weights_path = save_fast_artifact(make_model(augment=False), tmp_path / "model.keras")
+        layout = json.loads(config_path.read_text())["weights"]
+        assert all(entry["offset"] % 64 == 0 for entry in layout)
+        assert not list(tmp_path.glob("*.tmp"))
+
+    def test_load_model_prefers_fresh_fast_artifact(self, tmp_path, monkeypatch, images):
+        """Test that load_model uses the fast artifact unless it is older than the .keras file"""
+        monkeypatch.setattr(data_manager, "TRAINED_MODEL_DIR", tmp_path)
+        model = make_model(augment=False)
+        model_path = tmp_path / "model_v1.keras"
+        model.save(model_path)
+        keras_predictions = model.predict(images, verbose=0)
+        # Different weights in the fast artifact tell the two formats apart
+        model.set_weights([weight * 0.5 for weight in model.get_weights()])
+        config_path, _ = save_fast_artifact(model, model_path)
+        fast_predictions = model.predict(images, verbose=0)
+
+        def predictions(**kwargs):
+            return load_model(file_name="model_v1", **kwargs).predict(images, verbose=0)
+
+        np.testing.assert_allclose(predictions(), fast_predictions, rtol=1e-6)
+        np.testing.assert_allclose(predictions(fast=False), keras_predictions, rtol=1e-6)
+
+        stale = model_path.stat().st_mtime_ns - 10 ** 9
+        os.utime(config_path, ns=(stale, stale))
+        np.testing.assert_allclose(predictions(), keras_predictions, rtol=1e-6)
+
+
+class TestFastArtifactCheckpoint:
+    """Test the training callback"""
+
+    def test_written_after_checkpoint(self, tmp_path, images):
+        """Test that the artifact follows the weights saved by ModelCheckpoint"""
+        model = make_model(augment=False)
+        model_path = tmp_path / "model.keras"
+        labels = np.array([0, 1, 0, 1])
+        model.fit(images, labels, epochs=2, verbose=0,
+                  callbacks=[keras.callbacks.ModelCheckpoint(model_path, monitor="loss", save_best_only=False),
+                             FastArtifactCheckpoint(model_path)])
+
+        config_path, _ = fast_artifact_paths(model_path)
+        assert config_path.exists()
+        saved = keras.models.load_model(model_path)
+        np.testing.assert_allclose(load_fast_artifact(model_path).predict(images, verbose=0),
+                                   saved.predict(images, verbose=0), rtol=1e-6)
+
+    def test_not_rewritten_without_new_checkpoint(self, tmp_path):
+        """Test that epochs without a new .keras file do not rewrite the artifact"""
+        model = make_model(augment=False)
+        model_path = tmp_path / "model.keras"
+        model.save(model_path)
+        callback = FastArtifactCheckpoint(model_path)
+        callback.set_model(model)
+
+        callback.on_epoch_end(0)
+        config_path, _ = fast_artifact_paths(model_path)
+        written = config_path.stat().st_mtime_ns
+        callback.on_epoch_end(1)
+        assert config_path.stat().st_mtime_ns == written
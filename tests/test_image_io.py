@@ -0,0 +1,102 @@
+"""
+Unit tests for upload image validation
+"""
+import io
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.processing.image_io import ImageInfo, ImageRejected, check_image, decode_image, probe_image
+
+LIMITS = dict(allowed_formats=["JPEG", "PNG"], allowed_channels=[1, 3, 4], max_side=1000, max_pixels=500_000)
+
+
+def encode(mode, size, fmt):
+    """Encoded image bytes"""
+    buffer = io.BytesIO()
+    Image.new(mode, size, color=0).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+class TestProbeImage:
+    """Test header probing"""
+
+    @pytest.mark.parametrize("mode,fmt,channels", [("RGB", "JPEG", 3), ("RGBA", "PNG", 4),
+                                                   ("L", "PNG", 1), ("P", "GIF", 1)])
+    def test_probe(self, mode, fmt, channels):
+        """Test format, size and channels read from the header"""
+        assert probe_image(encode(mode, (40, 30), fmt)) == ImageInfo(fmt, 40, 30, channels)
+
+    def test_probe_reads_header_only(self):
+        """Test that a truncated file still probes: pixels are not decoded"""
+        data = encode("RGB", (300, 200), "PNG")
+        assert probe_image(data[:100]).width == 300
+
+    def test_undecodable(self):
+        """Test that non-image bytes are rejected"""
+        with pytest.raises(ImageRejected) as error:
+            probe_image(b"not an image at all")
+        assert error.value.reason == "undecodable"
+
+
+class TestCheckImage:
+    """Test limits on probed images"""
+
+    def test_within_limits(self):
+        """Test that a normal image passes"""
+        check_image(ImageInfo("JPEG", 640, 480, 3), **LIMITS)
+
+    @pytest.mark.parametrize("info,reason", [
+        (ImageInfo("TIFF", 64, 64, 3), "format"),
+        (ImageInfo("PNG", 64, 64, 2), "channels"),
+        (ImageInfo("PNG", 1200, 10, 3), "dimensions"),
+        (ImageInfo("PNG", 0, 10, 3), "dimensions"),
+        (ImageInfo("PNG", 1000, 1000, 3), "pixels"),
+    ])
+    def test_rejections(self, info, reason):
+        """Test the reason reported for each limit"""
+        with pytest.raises(ImageRejected) as error:
+            check_image(info, **LIMITS)
+        assert error.value.reason == reason
+
+
+class TestDecodeImage:
+    """Test decoding to model input"""
+
+    @pytest.mark.parametrize("mode,fmt", [("RGB", "JPEG"), ("RGBA", "PNG"), ("L", "PNG"), ("P", "GIF")])
+    def test_decode_to_rgb(self, mode, fmt):
+        """Test that every supported mode becomes a single RGB image of the model size"""
+        images = decode_image(encode(mode, (400, 300), fmt), image_size=(180, 160))
+        assert images.shape == (1, 180, 160, 3)
+        assert images.dtype == np.float32
+
+    @pytest.mark.parametrize("fmt,suffix", [("JPEG", "jpg"), ("PNG", "png")])
+    def test_matches_training_preprocessing(self, tmp_path, fmt, suffix):
+        """Test that serving decodes and resizes exactly like the training datasets"""
+        from keras.utils import image_dataset_from_directory
+        pixels = np.random.default_rng(0).integers(0, 256, size=(300, 400, 3), dtype=np.uint8)
+        (tmp_path / "cats").mkdir()
+        Image.fromarray(pixels).save(tmp_path / "cats" / f"image.{suffix}", format=fmt)
+
+        dataset = image_dataset_from_directory(tmp_path, image_size=(180, 160), batch_size=1, shuffle=False)
+        training = next(iter(dataset))[0].numpy()
+        serving = decode_image((tmp_path / "cats" / f"image.{suffix}").read_bytes(), image_size=(180, 160))
+        np.testing.assert_array_equal(serving, training)
+
+    def test_webp(self):
+        """Test that formats TensorFlow cannot decode are still served"""
+        images = decode_image(encode("RGB", (400, 300), "WEBP"), image_size=(180, 160))
+        assert images.shape == (1, 180, 160, 3)
+
+    def test_truncated_image(self):
+        """Test that a truncated image is rejected when decoded"""
+        data = encode("RGB", (300, 200), "PNG")
+        with pytest.raises(ImageRejected) as error:
+            decode_image(data[:200], image_size=(180, 180))
+        assert error.value.reason == "undecodable"
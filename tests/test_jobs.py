@@ -0,0 +1,221 @@
+"""
+Unit tests for the bulk job queue
+"""
+import io
+import json
+import pytest
+import sys
+import tarfile
+import zipfile
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.jobs import JobStore, JobWorker, extract_archive, read_manifest, resolve_sources
+
+
+def write_images(directory, count):
+    """PNG files whose red channel encodes their number"""
+    paths = []
+    for n in range(count):
+        path = directory / f"img{n}.png"
+        Image.new("RGB", (20, 16), color=(n * 10, 0, 0)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def fake_predict(images):
+    """Confidence from the red channel, so results can be matched to images"""
+    return [("dog", image[0, 0, 0] / 255) for image in images]
+
+
+class TestJobStore:
+    """Test persistent job state"""
+
+    def test_claim_and_record(self, tmp_path):
+        """Test batch claims, progress and completion"""
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        job_id = store.create_job(["a", "b", "c"])
+        assert store.get_job(job_id)["status"] == "queued"
+
+        claimed_job, items = store.claim(2)
+        assert claimed_job == job_id and items == [(0, "a"), (1, "b")]
+        assert store.get_job(job_id)["status"] == "running"
+        store.record(job_id, [(0, "cat", 0.9)], [(1, "broken")])
+        assert store.backlog() == {"jobs": 1, "images": 1}
+
+        _, items = store.claim(2)
+        store.record(job_id, [(2, "dog", 0.8)])
+        job = store.get_job(job_id)
+        assert (job["status"], job["done"], job["failed"]) == ("done", 2, 1)
+        assert [result["status"] for result in store.results(job_id)] == ["done", "failed", "done"]
+        assert store.claim(2) == (None, [])
+
+    def test_jobs_resume_after_restart(self, tmp_path):
+        """Test that images claimed by a stopped process are claimed again once their lease runs out"""
+        path = tmp_path / "jobs.sqlite3"
+        store = JobStore(path)
+        job_id = store.create_job(["a", "b", "c"])
+        _, items = store.claim(2)
+        store.record(job_id, [(0, "cat", 0.9)])
+        store.claim(2)  # the process stops before recording these
+        store.close()
+
+        store = JobStore(path, lease_seconds=0)
+        assert store.backlog()["images"] == 2
+        assert store.claim(10) == (job_id, [(1, "b"), (2, "c")])
+        assert store.results(job_id)[0]["label"] == "cat"
+
+    def test_live_claims_are_kept(self, tmp_path):
+        """Test that a second process neither takes over live claims nor double counts lost ones"""
+        path = tmp_path / "jobs.sqlite3"
+        first = JobStore(path)
+        job_id = first.create_job(["a", "b"])
+        assert first.claim(1) == (job_id, [(0, "a")])
+
+        second = JobStore(path)
+        assert second.claim(10) == (job_id, [(1, "b")])
+        assert second.claim(10) == (None, [])
+
+        # After the first claim's lease runs out, another process scores the image again
+        third = JobStore(path, lease_seconds=0)
+        assert third.claim(10) == (job_id, [(0, "a"), (1, "b")])
+        third.record(job_id, [(0, "cat", 0.9), (1, "dog", 0.8)])
+        first.record(job_id, [(0, "dog", 0.6)])
+        second.record(job_id, [(1, "cat", 0.7)])
+        job = first.get_job(job_id)
+        assert (job["status"], job["done"]) == ("done", 2)
+        assert [result["label"] for result in first.results(job_id)] == ["cat", "dog"]
+
+    def test_oldest_job_first(self, tmp_path):
+        """Test that jobs are processed in submission order"""
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        first = store.create_job(["a"])
+        store.create_job(["b"])
+        assert store.claim(10)[0] == first
+
+    def test_empty_job(self, tmp_path):
+        """Test that jobs without images are rejected"""
+        with pytest.raises(ValueError):
+            JobStore(tmp_path / "jobs.sqlite3").create_job([])
+
+
+class TestJobWorker:
+    """Test batch scoring of job images"""
+
+    def test_run_batches(self, tmp_path):
+        """Test that images are scored in batches and results stored in order"""
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        paths = write_images(tmp_path, 5)
+        job_id = store.create_job(paths + [str(tmp_path / "missing.png")])
+        batches = []
+        worker = JobWorker(store, fake_predict, image_size=(8, 8), batch_size=4, on_batch=batches.append)
+
+        while worker.run_batch():
+            pass
+
+        results = store.results(job_id)
+        assert [result["confidence"] for result in results[:5]] == pytest.approx([n * 10 / 255 for n in range(5)])
+        assert results[5]["status"] == "failed"
+        assert [(batch["images"], batch["failed"]) for batch in batches] == [(4, 0), (1, 1)]
+        assert store.get_job(job_id)["status"] == "done"
+
+    def test_worker_threads(self, tmp_path):
+        """Test that started workers finish queued jobs"""
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        job_id = store.create_job(write_images(tmp_path, 6))
+        worker = JobWorker(store, fake_predict, image_size=(8, 8), batch_size=2, num_workers=2, poll_interval=0.01)
+        worker.start()
+        try:
+            for _ in range(500):
+                if store.get_job(job_id)["status"] == "done":
+                    break
+                worker._stop.wait(0.01)
+        finally:
+            worker.stop()
+        assert store.get_job(job_id)["done"] == 6
+
+    def test_one_process_runs_workers(self, tmp_path):
+        """Test that workers sharing a lock file run one at a time, and the next takes over"""
+        store = JobStore(tmp_path / "jobs.sqlite3")
+        lock_path = tmp_path / "worker.lock"
+        first = JobWorker(store, fake_predict, image_size=(8, 8), poll_interval=0.01, lock_path=lock_path)
+        second = JobWorker(store, fake_predict, image_size=(8, 8), poll_interval=0.01, lock_path=lock_path)
+        first.start()
+        second.start()
+        try:
+            assert first.is_active and not second.is_active
+            first.stop()
+            for _ in range(500):
+                if second.is_active:
+                    break
+                second._stop.wait(0.01)
+            assert second.is_active
+        finally:
+            first.stop()
+            second.stop()
+
+
+class TestSubmission:
+    """Test manifests and archives"""
+
+    def test_manifests(self):
+        """Test JSON and text manifests"""
+        assert read_manifest(json.dumps(["a.jpg", "b.jpg"]).encode()) == ["a.jpg", "b.jpg"]
+        assert read_manifest(json.dumps({"images": ["a.jpg"]}).encode()) == ["a.jpg"]
+        assert read_manifest(b"# images\na.jpg\n\nb.jpg\n") == ["a.jpg", "b.jpg"]
+        with pytest.raises(ValueError):
+            read_manifest(b'{"images": [1, 2]}')
+
+    def test_sources_stay_under_root(self, tmp_path):
+        """Test that manifest paths resolve under the source root and escapes are rejected"""
+        (tmp_path / "images").mkdir()
+        (tmp_path / "images" / "link").symlink_to(tmp_path)
+        root = tmp_path / "images"
+        assert resolve_sources(["a.jpg", str(root / "b" / "c.jpg")], root) == \
+            [str(root / "a.jpg"), str(root / "b" / "c.jpg")]
+        for path in ["../secret.jpg", "/etc/passwd", "link/secret.jpg"]:
+            with pytest.raises(ValueError, match="outside"):
+                resolve_sources(["a.jpg", path], root)
+
+    @pytest.mark.parametrize("kind", ["zip", "tar"])
+    def test_extract_archive(self, tmp_path, kind):
+        """Test that only safe image members are extracted, in order"""
+        members = {"cats/1.jpg": b"one", "notes.txt": b"skip", "../evil.png": b"bad", "dogs/2.PNG": b"two"}
+        buffer = io.BytesIO()
+        if kind == "zip":
+            with zipfile.ZipFile(buffer, "w") as archive:
+                for name, data in members.items():
+                    archive.writestr(name, data)
+        else:
+            with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+                for name, data in members.items():
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    archive.addfile(info, io.BytesIO(data))
+
+        paths = extract_archive(buffer, tmp_path / "out", max_images=10, max_member_bytes=100)
+
+        assert [Path(path).read_bytes() for path in paths] == [b"one", b"two"]
+        assert all(Path(path).parent == tmp_path / "out" for path in paths)
+        with pytest.raises(ValueError):
+            extract_archive(buffer, tmp_path / "more", max_images=1, max_member_bytes=100)
+
+    def test_large_member_rejected(self, tmp_path):
+        """Test that a member that decompresses past the limit is rejected"""
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("bomb.png", b"\0" * 1_000_000)
+        assert len(buffer.getvalue()) < 10_000
+        with pytest.raises(ValueError, match="over the limit"):
+            extract_archive(buffer, tmp_path / "out", max_images=10, max_member_bytes=100_000)
+        assert not list((tmp_path / "out").iterdir())
+
+    def test_not_an_archive(self, tmp_path):
+        """Test that other uploads are rejected"""
+        with pytest.raises(ValueError):
+            extract_archive(b"plain bytes", tmp_path, max_images=10, max_member_bytes=100)
@@ -0,0 +1,101 @@
+"""
+Unit tests for the dataset manifest and integrity check
+"""
+import pytest
+import sys
+import os
+from pathlib import Path
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from PIL import Image
+
+from catvsdog_model.processing.manifest import (
+    update_manifest,
+    save_manifest,
+    load_manifest,
+    quarantine_list,
+    save_quarantine_list,
+    load_quarantined,
+    manifest_stats,
+)
+from catvsdog_model.evaluation import list_labelled_files
+
+
+@pytest.fixture
+def split_dirs(tmp_path):
+    """A train split with two valid images per class and one corrupt file"""
+    train = tmp_path / "train"
+    for label in ["cat", "dog"]:
+        (train / label).mkdir(parents=True)
+        for i in range(2):
+            Image.new("RGB", (8, 8), color=(i * 100, 0, 0)).save(train / label / f"{i}.jpg")
+    (train / "cat" / "broken.jpg").write_bytes(b"not a jpeg")
+    return {"train": train}
+
+
+class TestManifest:
+    """Test incremental manifest updates"""
+
+    def test_integrity_check(self, split_dirs, tmp_path):
+        """Test that every image is hashed and corrupt files are flagged"""
+        manifest, changes = update_manifest(split_dirs, tmp_path / "manifest.json", workers=1)
+        assert changes == {"checked": 5, "reused": 0, "removed": 0}
+        broken = [key for key, record in manifest.items() if record["error"]]
+        assert broken == [(split_dirs["train"] / "cat" / "broken.jpg").as_posix()]
+        assert all(len(record["sha256"]) == 64 for record in manifest.values())
+
+    def test_unchanged_files_are_reused(self, split_dirs, tmp_path):
+        """Test that only new or modified files are checked again"""
+        manifest_path = tmp_path / "manifest.json"
+        manifest, _ = update_manifest(split_dirs, manifest_path, workers=1)
+        save_manifest(manifest, manifest_path)
+
+        modified = split_dirs["train"] / "dog" / "0.jpg"
+        Image.new("RGB", (16, 16)).save(modified)
+        os.utime(modified, ns=(0, 0))
+        (split_dirs["train"] / "dog" / "1.jpg").unlink()
+
+        updated, changes = update_manifest(split_dirs, manifest_path, workers=1)
+        assert changes == {"checked": 1, "reused": 3, "removed": 1}
+        assert updated[modified.as_posix()]["sha256"] != manifest[modified.as_posix()]["sha256"]
+
+    def test_save_and_load(self, split_dirs, tmp_path):
+        """Test that the manifest round-trips through disk"""
+        manifest, _ = update_manifest(split_dirs, tmp_path / "manifest.json", workers=1)
+        save_manifest(manifest, tmp_path / "manifest.json")
+        assert load_manifest(tmp_path / "manifest.json") == manifest
+        assert load_manifest(tmp_path / "missing.json") == {}
+
+
+class TestQuarantine:
+    """Test quarantine of unreadable images and manifest statistics"""
+
+    def test_quarantine_list(self, split_dirs, tmp_path):
+        """Test that corrupt files are listed but left in the dataset"""
+        manifest, _ = update_manifest(split_dirs, tmp_path / "manifest.json", workers=1)
+        quarantined = quarantine_list(manifest)
+
+        broken = split_dirs["train"] / "cat" / "broken.jpg"
+        assert [entry["path"] for entry in quarantined] == [broken.as_posix()]
+        assert broken.exists()
+        save_quarantine_list(quarantined, tmp_path / "quarantine.json")
+        assert load_quarantined(tmp_path / "quarantine.json") == {os.path.realpath(broken)}
+        assert load_quarantined(tmp_path / "missing.json") == set()
+
+    def test_loaders_skip_quarantined(self, split_dirs, tmp_path):
+        """Test that evaluation file lists leave out quarantined images"""
+        manifest, _ = update_manifest(split_dirs, tmp_path / "manifest.json", workers=1)
+        save_quarantine_list(quarantine_list(manifest), tmp_path / "quarantine.json")
+        paths, labels, _ = list_labelled_files(split_dirs["train"], load_quarantined(tmp_path / "quarantine.json"))
+        assert len(paths) == 4 and labels == [0, 0, 1, 1]
+        assert not any(path.endswith("broken.jpg") for path in paths)
+
+    def test_manifest_stats(self, split_dirs, tmp_path):
+        """Test per-split and per-class counts of decodable images"""
+        manifest, _ = update_manifest(split_dirs, tmp_path / "manifest.json", workers=1)
+        stats = manifest_stats(manifest, split_dirs)
+        assert stats["train"]["num_images"] == 4
+        assert stats["train"]["classes"] == {"cat": 2, "dog": 2}
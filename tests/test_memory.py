@@ -0,0 +1,95 @@
+"""
+Unit tests for memory introspection
+"""
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from tensorflow import keras
+
+from catvsdog_model.memory import (HeapProfiler, directory_size, memory_report, model_memory, nbytes,
+                                   process_memory, tensorflow_memory)
+
+
+class TestMemoryReport:
+    """Test the individual memory measurements"""
+
+    def test_process_memory(self):
+        """Test that resident memory is reported"""
+        memory = process_memory()
+        assert memory["rss_mb"] > 0
+
+    def test_model_memory(self):
+        """Test parameter count and weight size of a model"""
+        model = keras.Sequential([keras.Input((10,)), keras.layers.Dense(5)])
+        memory = model_memory(model)
+        assert memory["parameters"] == model.count_params() == 55
+        assert memory["weights_mb"] == pytest.approx(55 * 4 / 2 ** 20)
+
+    def test_nbytes(self, tmp_path):
+        """Test array memory of containers and objects, excluding memory-mapped arrays"""
+        mapped = np.lib.format.open_memmap(tmp_path / "a.npy", mode="w+", dtype=np.float32, shape=(100,))
+
+        class Cache:
+            def __init__(self):
+                self.vectors = np.zeros(10, dtype=np.float64)
+                self.mapped = mapped
+                self.name = "cache"
+
+        assert nbytes({"a": np.zeros(4, dtype=np.int32), "b": [np.zeros(2, dtype=np.int8)]}) == 18
+        assert nbytes(Cache()) == 80
+        assert nbytes(mapped[:10]) == 0
+
+    def test_directory_size(self, tmp_path):
+        """Test file count and size of a directory tree"""
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "a.jpg").write_bytes(b"x" * 1024)
+        (tmp_path / "sub" / "b.jpg").write_bytes(b"x" * 1024)
+        assert directory_size(tmp_path) == {"files": 2, "size_mb": 2048 / 2 ** 20}
+
+    def test_full_report(self, tmp_path):
+        """Test the combined report without a heap profiler"""
+        model = keras.Sequential([keras.Input((3,)), keras.layers.Dense(1)])
+        report = memory_report(models={"model": model, "missing": None}, caches={"labels": {"1": "cat"}},
+                               directories={"uploads": tmp_path, "absent": tmp_path / "absent"})
+        assert set(report) == {"pid", "process", "tensorflow", "models", "caches", "directories"}
+        assert list(report["models"]) == ["model"]
+        assert report["caches"]["labels"]["entries"] == 1
+        assert list(report["directories"]) == ["uploads"]
+        assert isinstance(tensorflow_memory(), dict)
+
+
+class TestHeapProfiler:
+    """Test tracemalloc snapshots and diffs"""
+
+    def test_growth_between_snapshots(self):
+        """Test that an allocation shows up as growth at its source line"""
+        profiler = HeapProfiler()
+        try:
+            baseline = profiler.snapshot()
+            retained = [bytes(1000) for _ in range(2000)]
+            report = profiler.report(limit=5, diff_from=baseline)
+        finally:
+            profiler.stop()
+
+        assert report["growth"][0]["location"].startswith(__file__)
+        assert report["growth"][0]["size_diff_kb"] > 1500
+        assert len(retained) == 2000
+
+    def test_keeps_last_snapshots(self):
+        """Test that old snapshots but the baseline are dropped and unknown ids are rejected"""
+        profiler = HeapProfiler(keep=2)
+        try:
+            ids = [profiler.snapshot() for _ in range(4)]
+            assert profiler.baseline == ids[0]
+            assert list(profiler.snapshots) == [ids[0], *ids[2:]]
+            assert profiler.report(diff_from=ids[0])["diff_from"] == ids[0]
+            with pytest.raises(KeyError):
+                profiler.report(diff_from=ids[1])
+        finally:
+            profiler.stop()
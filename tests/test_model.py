@@ -58,6 +58,92 @@ class TestModelArchitecture:
         assert test_model is not None
         assert list[int](test_model.input_shape[1:]) == config.model_cfg.input_shape
 
+    def test_create_model_without_augmentation(self):
+        """Test that models trained with pipeline augmentation carry no random layers"""
+        test_model = create_model(
+            input_shape=config.model_cfg.input_shape,
+            optimizer=config.model_cfg.optimizer,
+            loss=config.model_cfg.loss,
+            metrics=[config.model_cfg.accuracy_metric],
+            augment=False
+        )
+        layer_types = [type(layer).__name__ for layer in test_model.layers]
+        assert 'Sequential' not in layer_types
+        assert not any(name.startswith('Random') for name in layer_types)
+
+    def test_create_model_with_augmentation_policy(self):
+        """Test that in-model augmentation is built from the named policy"""
+        def augmentation_layers(policy):
+            test_model = create_model(
+                input_shape=config.model_cfg.input_shape,
+                optimizer=config.model_cfg.optimizer,
+                loss=config.model_cfg.loss,
+                metrics=[config.model_cfg.accuracy_metric],
+                augment=True,
+                augmentation_policy=policy
+            )
+            block = test_model.layers[1]
+            return [type(layer).__name__ for layer in block.layers] if block.__class__.__name__ == 'Sequential' else []
+
+        assert 'RandomContrast' in augmentation_layers('strong')
+        assert 'RandomContrast' not in augmentation_layers('default')
+        assert augmentation_layers('none') == []
+
+
+class TestArchitectureVariants:
+    """Test the configurable backbones and heads"""
+
+    def build(self, **kwargs):
+        return create_model(
+            input_shape=config.model_cfg.input_shape,
+            optimizer=config.model_cfg.optimizer,
+            loss=config.model_cfg.loss,
+            metrics=[config.model_cfg.accuracy_metric],
+            augment=False,
+            **kwargs
+        )
+
+    def test_default_is_baseline(self):
+        """Test that the default configuration keeps the original architecture"""
+        assert config.model_cfg.architecture == "baseline"
+        assert self.build().count_params() == self.build(architecture="baseline", head="flatten",
+                                                         width_multiplier=1.0, depth_multiplier=1.0).count_params()
+
+    @pytest.mark.parametrize("architecture", ["baseline", "inverted_residual"])
+    @pytest.mark.parametrize("head", ["flatten", "gap"])
+    def test_variant_predicts(self, architecture, head):
+        """Test that every variant maps a batch of images to probabilities"""
+        test_model = self.build(architecture=architecture, head=head)
+        predictions = test_model.predict(np.random.rand(2, *config.model_cfg.input_shape) * 255, verbose=0)
+        assert predictions.shape == (2, 1)
+        assert np.all((predictions >= 0) & (predictions <= 1))
+
+    def test_gap_head(self):
+        """Test that the GAP head replaces Flatten"""
+        layer_types = [type(layer).__name__ for layer in self.build(head="gap").layers]
+        assert 'GlobalAveragePooling2D' in layer_types
+        assert 'Flatten' not in layer_types
+
+    def test_inverted_residual_uses_depthwise_convolutions(self):
+        """Test that the inverted residual variant is built from depthwise-separable blocks"""
+        layer_types = [type(layer).__name__ for layer in self.build(architecture="inverted_residual").layers]
+        assert 'DepthwiseConv2D' in layer_types
+        assert 'Add' in layer_types
+
+    def test_multipliers_scale_model(self):
+        """Test that width and depth multipliers change the model size"""
+        for architecture in ["baseline", "inverted_residual"]:
+            full = self.build(architecture=architecture, head="gap").count_params()
+            assert self.build(architecture=architecture, head="gap", width_multiplier=0.5).count_params() < full
+            assert self.build(architecture=architecture, head="gap", depth_multiplier=2.0).count_params() > full
+
+    def test_unknown_variant_raises(self):
+        """Test that unknown architectures and heads are rejected"""
+        with pytest.raises(ValueError):
+            self.build(architecture="resnet")
+        with pytest.raises(ValueError):
+            self.build(head="attention")
+
 
 class TestModelPrediction:
     """Test model prediction capabilities"""
@@ -0,0 +1,92 @@
+"""
+Unit tests for the input pipeline profiler
+"""
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.config.core import AugmentationPolicy
+from catvsdog_model.processing.pipeline_profile import analyze_profile, profile_stages
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """A <class>/<image> directory with 6 small JPEGs per class"""
+    rng = np.random.default_rng(0)
+    for class_name in ("cat", "dog"):
+        (tmp_path / class_name).mkdir()
+        for i in range(6):
+            pixels = rng.integers(0, 256, size=(40, 50, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(tmp_path / class_name / f"{i}.jpg")
+    return tmp_path
+
+
+class TestProfileStages:
+    """Test timing each stage in isolation"""
+
+    def test_all_stages_at_each_level(self, image_dir):
+        """Test that every stage is timed at every parallelism level"""
+        profile = profile_stages(image_dir, image_size=(24, 24), batch_size=4,
+                                 policy=AugmentationPolicy(flip="horizontal"), parallelism=[1, 2], repeats=1)
+
+        assert list(profile) == ["list", "read", "decode", "resize", "augment", "batch"]
+        assert list(profile["list"]) == [1]
+        for stage in ("read", "decode", "resize", "augment", "batch"):
+            assert list(profile[stage]) == [1, 2]
+            assert all(rate > 0 for rate in profile[stage].values())
+
+    def test_no_augmentation_stage_without_policy(self, image_dir):
+        """Test that an empty augmentation policy skips the augment stage"""
+        profile = profile_stages(image_dir, image_size=(24, 24), batch_size=4,
+                                 policy=AugmentationPolicy(), parallelism=[1], max_images=5, repeats=1)
+        assert "augment" not in profile
+
+    def test_empty_directory(self, tmp_path):
+        """Test that a directory without images is rejected"""
+        (tmp_path / "cat").mkdir()
+        with pytest.raises(ValueError):
+            profile_stages(tmp_path, image_size=(24, 24), batch_size=4,
+                           policy=AugmentationPolicy(), parallelism=[1])
+
+
+class TestAnalyzeProfile:
+    """Test the bottleneck analysis"""
+
+    PROFILE = {
+        "list": {1: 100000.0},
+        "read": {1: 2000.0, 2: 3900.0, 4: 4000.0},
+        "decode": {1: 300.0, 2: 580.0, 4: 1100.0},
+        "augment": {1: 100.0, 2: 190.0, 4: 200.0},
+        "batch": {1: 5000.0, 2: 5000.0, 4: 5000.0},
+    }
+
+    def test_limiting_stage(self):
+        """Test that the slowest stage at its best setting limits the pipeline"""
+        analysis = analyze_profile(self.PROFILE)
+        assert analysis["limiting_stage"] == "augment"
+        assert analysis["max_sustainable_images_per_sec"] == 200.0
+        assert analysis["target_reachable"]
+
+    def test_suggested_parallelism(self):
+        """Test that the lowest level within tolerance of the best rate is suggested"""
+        stages = analyze_profile(self.PROFILE, tolerance=0.9)["stages"]
+        assert stages["read"]["suggested_parallelism"] == 2
+        assert stages["decode"]["suggested_parallelism"] == 4
+        assert stages["augment"]["suggested_parallelism"] == 2
+        assert stages["batch"]["suggested_parallelism"] == 1
+        assert stages["list"]["suggested_parallelism"] is None
+
+    def test_cores_for_target(self):
+        """Test the core estimate from single-threaded rates"""
+        analysis = analyze_profile(self.PROFILE, target=600.0)
+        assert not analysis["target_reachable"]
+        assert analysis["stages"]["augment"]["cores_for_target"] == pytest.approx(6.0)
+        assert analysis["stages"]["decode"]["cores_for_target"] == pytest.approx(2.0)
+        # 0.3 + 2 + 6 + 0.12 cores
+        assert analysis["cores_for_target"] == 9
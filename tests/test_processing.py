@@ -32,6 +32,31 @@ class TestDataAugmentation:
         except ImportError:
             pytest.skip("Data augmentation not available")
 
+    def test_augmentation_policies(self):
+        """Test that named policies resolve from config"""
+        from catvsdog_model.processing.features import get_augmentation_policy
+        default = get_augmentation_policy("default")
+        assert default.flip == config.model_cfg.flip
+        assert default.rotation == config.model_cfg.rotation
+        assert get_augmentation_policy("none").rotation == 0.0
+        for name in config.model_cfg.augmentation_policies:
+            assert get_augmentation_policy(name) is not None
+        with pytest.raises(ValueError):
+            get_augmentation_policy("does-not-exist")
+
+    def test_augment_dataset_preserves_batches(self):
+        """Test that pipeline augmentation keeps batch shapes and labels"""
+        import tensorflow as tf
+        from catvsdog_model.processing.features import augment_dataset, get_augmentation_policy
+        images = np.random.rand(8, *config.model_cfg.input_shape).astype(np.float32) * 255
+        labels = np.arange(8, dtype=np.int32) % 2
+        dataset = tf.data.Dataset.from_tensor_slices((images, labels)).batch(4)
+
+        augmented = list(augment_dataset(dataset, get_augmentation_policy("strong")))
+        assert len(augmented) == 2
+        assert augmented[0][0].shape == (4, *config.model_cfg.input_shape)
+        np.testing.assert_array_equal(augmented[0][1].numpy(), labels[:4])
+
 
 class TestDataManager:
     """Test data manager functionality"""
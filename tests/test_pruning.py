@@ -0,0 +1,91 @@
+"""
+Unit tests for structured filter pruning
+"""
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from tensorflow import keras
+
+from catvsdog_model.model import create_model
+from catvsdog_model.pruning import FilterGroupLasso, conv_filters, filter_importance, prune_filters
+
+
+def make_model(architecture="baseline", head="flatten"):
+    """A narrow model small enough to rebuild quickly"""
+    keras.utils.set_random_seed(0)
+    return create_model(input_shape=(96, 96, 3), optimizer="rmsprop", loss="binary_crossentropy",
+                        metrics=["accuracy"], augment=False, architecture=architecture, head=head,
+                        width_multiplier=0.25, depth_multiplier=1.0)
+
+
+def zero_lowest_filters(model, fraction):
+    """Zero the kernel and bias of the first `fraction` of filters of every Conv2D layer"""
+    for layer in model.layers:
+        if isinstance(layer, keras.layers.Conv2D):
+            kernel, bias = layer.get_weights()
+            count = int(kernel.shape[-1] * fraction)
+            kernel[..., :count] = 0
+            bias[:count] = 0
+            layer.set_weights([kernel, bias])
+
+
+@pytest.fixture
+def images():
+    return np.random.default_rng(0).uniform(0, 255, size=(4, 96, 96, 3)).astype(np.float32)
+
+
+class TestPruneFilters:
+    """Test physically removing conv filters"""
+
+    @pytest.mark.parametrize("head", ["flatten", "gap"])
+    def test_removing_zero_filters_keeps_predictions(self, head, images):
+        """Test that pruning filters with no output leaves predictions unchanged"""
+        model = make_model(head=head)
+        zero_lowest_filters(model, 0.5)
+
+        pruned = prune_filters(model, 0.5, min_filters=1)
+
+        assert conv_filters(pruned) == [n // 2 for n in conv_filters(model)]
+        assert pruned.count_params() < model.count_params()
+        np.testing.assert_allclose(pruned(images), model(images), atol=1e-3)
+
+    def test_keeps_most_important_filters(self):
+        """Test that the filters with the highest L1 norm survive"""
+        model = make_model()
+        first_conv = next(layer for layer in model.layers if isinstance(layer, keras.layers.Conv2D))
+        importance = filter_importance(first_conv)
+
+        pruned = prune_filters(model, 0.5, min_filters=1)
+        pruned_conv = next(layer for layer in pruned.layers if isinstance(layer, keras.layers.Conv2D))
+
+        expected = np.sort(importance)[len(importance) // 2:]
+        np.testing.assert_allclose(np.sort(filter_importance(pruned_conv)), expected, rtol=1e-6)
+
+    def test_min_filters(self):
+        """Test that no layer drops below min_filters"""
+        pruned = prune_filters(make_model(), 0.9, min_filters=8)
+        assert min(conv_filters(pruned)) == 8
+
+    def test_regularizer_added_and_stripped(self, images):
+        """Test that the group-lasso penalty is attached for fine-tuning and removed by a plain rebuild"""
+        model = make_model()
+        regularized = prune_filters(model, 0.0, kernel_regularizer=FilterGroupLasso(1e-3))
+        assert len(regularized.losses) == len(conv_filters(model))
+
+        stripped = prune_filters(regularized, 0.0)
+        assert not stripped.losses
+        assert conv_filters(stripped) == conv_filters(model)
+        np.testing.assert_allclose(stripped(images), model(images), atol=1e-5)
+
+    def test_invalid_inputs(self):
+        """Test that residual models and out-of-range fractions are rejected"""
+        with pytest.raises(ValueError):
+            prune_filters(make_model(), 1.0)
+        with pytest.raises(ValueError):
+            prune_filters(make_model(architecture="inverted_residual", head="gap"), 0.25)
@@ -0,0 +1,91 @@
+"""
+Unit tests for post-training quantization
+"""
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.quantization import (
+    TFLitePredictor,
+    calibration_data,
+    convert_to_tflite,
+    evaluate_predictor,
+)
+
+
+@pytest.fixture(scope="module")
+def small_model():
+    """A small conv model with the same input scaling and sigmoid output as the classifier"""
+    keras.utils.set_random_seed(0)
+    inputs = keras.Input((16, 16, 3))
+    x = keras.layers.Rescaling(1. / 255)(inputs)
+    x = keras.layers.Conv2D(8, 3, activation="relu")(x)
+    x = keras.layers.GlobalAveragePooling2D()(x)
+    outputs = keras.layers.Dense(1, activation="sigmoid")(x)
+    return keras.Model(inputs, outputs)
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    images = np.random.default_rng(0).uniform(0, 255, size=(20, 16, 16, 3)).astype(np.float32)
+    labels = np.arange(20) % 2
+    return tf.data.Dataset.from_tensor_slices((images, labels)).batch(8)
+
+
+class TestConversion:
+    """Test TFLite conversion and inference"""
+
+    @pytest.mark.parametrize("mode", ["float16", "int8"])
+    def test_predictions_close_to_keras(self, small_model, dataset, mode):
+        """Test that quantized predictions stay close to the Keras model"""
+        content = convert_to_tflite(small_model, mode=mode,
+                                    representative_data=calibration_data(dataset, 16))
+        predictor = TFLitePredictor(content)
+        images = next(iter(dataset))[0].numpy()
+
+        expected = small_model(images).numpy()
+        assert predictor(images).shape == expected.shape
+        np.testing.assert_allclose(predictor(images), expected, atol=0.05)
+
+    def test_batch_size_changes(self, small_model, dataset, tmp_path):
+        """Test that a predictor loaded from a file handles different batch sizes"""
+        path = tmp_path / "model.tflite"
+        path.write_bytes(convert_to_tflite(small_model, mode="float16"))
+        predictor = TFLitePredictor(path)
+        images = next(iter(dataset))[0].numpy()
+
+        assert predictor(images[:1]).shape == (1, 1)
+        assert predictor(images).shape == (8, 1)
+        assert predictor(images[:3]).shape == (3, 1)
+
+    def test_invalid_modes(self, small_model):
+        """Test that unknown modes and int8 without calibration data are rejected"""
+        with pytest.raises(ValueError):
+            convert_to_tflite(small_model, mode="int4")
+        with pytest.raises(ValueError):
+            convert_to_tflite(small_model, mode="int8")
+
+
+class TestCalibrationAndEvaluation:
+    """Test calibration sampling and evaluation of TFLite predictors"""
+
+    def test_calibration_data_yields_single_images(self, dataset):
+        """Test that calibration yields `num_samples` batch-1 float32 images"""
+        samples = list(calibration_data(dataset, 11)())
+        assert len(samples) == 11
+        assert all(sample[0].shape == (1, 16, 16, 3) and sample[0].dtype == np.float32 for sample in samples)
+        assert len(list(calibration_data(dataset, 100)())) == 20
+
+    def test_evaluate_predictor(self, dataset):
+        """Test that evaluation counts every example with the given prediction function"""
+        metrics = evaluate_predictor(lambda images: np.full((len(images), 1), 0.9), dataset)
+        assert metrics.total == 20
+        assert metrics.accuracy == pytest.approx(0.5)
@@ -0,0 +1,105 @@
+"""
+Unit tests for shadow inference
+"""
+import pytest
+import sys
+import threading
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from tensorflow import keras
+
+from catvsdog_model.shadow import ShadowRunner
+
+
+def make_model(scale):
+    """Sigmoid of `scale` times the first input feature"""
+    model = keras.Sequential([keras.Input((2,)), keras.layers.Dense(1, activation="sigmoid")])
+    model.set_weights([np.array([[scale], [0.0]], dtype=np.float32), np.zeros(1, dtype=np.float32)])
+    return model
+
+
+class TestShadowRunner:
+    """Test background scoring by a candidate model"""
+
+    def test_agreement_and_results(self):
+        """Test that sampled requests are scored and compared with the primary labels"""
+        results = []
+        runner = ShadowRunner(make_model(1.0), fraction=1.0, max_pending=4, on_result=results.append)
+        images = np.array([[2.0, 0.0], [-2.0, 0.0], [3.0, 0.0]], dtype=np.float32)
+
+        assert runner.submit(images, np.array([0.9, 0.8, 0.7])) == "queued"
+        runner.join()
+        runner.close()
+
+        assert runner.images == 3 and runner.agreements == 2
+        assert runner.agreement_rate == pytest.approx(2 / 3)
+        assert results[0]["images"] == 3 and results[0]["agreements"] == 2
+        assert results[0]["latency_ms"] > 0
+
+    def test_sampling_fraction(self):
+        """Test that only about `fraction` of requests are sampled"""
+        runner = ShadowRunner(lambda images: np.ones(len(images)), fraction=0.25, max_pending=1000, seed=0)
+        outcomes = [runner.submit(np.zeros((1, 2)), np.ones(1)) for _ in range(400)]
+        runner.join()
+        runner.close()
+        assert runner.sampled == outcomes.count("queued")
+        assert 60 < runner.sampled < 140
+        assert ShadowRunner(lambda images: images, fraction=0.0, max_pending=1).submit(np.zeros((1, 2)), np.ones(1)) == "skipped"
+
+    def test_shed_when_queue_full(self):
+        """Test that shadow work is dropped instead of queued behind a busy candidate"""
+        release = threading.Event()
+
+        def slow_candidate(images):
+            release.wait()
+            return np.ones(len(images))
+
+        runner = ShadowRunner(slow_candidate, fraction=1.0, max_pending=1)
+        outcomes = [runner.submit(np.zeros((1, 2)), np.ones(1)) for _ in range(5)]
+        assert runner.pending == len(runner.pending_batches()) <= 1
+        release.set()
+        runner.join()
+        assert runner.pending == 0
+        runner.close()
+        # One batch held by the worker at most, one waiting in the queue, the rest shed
+        assert outcomes.count("shed") >= 3
+        assert runner.shed == outcomes.count("shed")
+
+    def test_shed_under_primary_load(self):
+        """Test that shadow work is dropped while many primary requests are in flight"""
+        runner = ShadowRunner(lambda images: np.ones(len(images)), fraction=1.0, max_pending=4,
+                              max_primary_in_flight=2)
+        assert runner.submit(np.zeros((1, 2)), np.ones(1), primary_in_flight=2) == "shed"
+        assert runner.submit(np.zeros((1, 2)), np.ones(1), primary_in_flight=1) == "queued"
+        runner.join()
+        runner.close()
+        assert runner.images == 1
+
+    def test_candidate_errors_do_not_stop_worker(self):
+        """Test that a failing candidate is counted and later work still runs"""
+        calls = []
+
+        def flaky(images):
+            calls.append(len(images))
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return np.ones(len(images))
+
+        runner = ShadowRunner(flaky, fraction=1.0, max_pending=4)
+        runner.submit(np.zeros((1, 2)), np.ones(1))
+        runner.join()
+        runner.submit(np.zeros((1, 2)), np.ones(1))
+        runner.join()
+        runner.close()
+        assert runner.errors == 1 and runner.images == 1
+
+    @pytest.mark.parametrize("kwargs", [{"fraction": 1.5, "max_pending": 1}, {"fraction": 0.5, "max_pending": 0}])
+    def test_invalid_arguments(self, kwargs):
+        """Test argument validation"""
+        with pytest.raises(ValueError):
+            ShadowRunner(lambda images: images, **kwargs)
@@ -0,0 +1,98 @@
+"""
+Unit tests for training telemetry
+"""
+import pytest
+import sys
+import json
+import time
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+import tensorflow as tf
+from tensorflow import keras
+
+from catvsdog_model.telemetry import TrainingTelemetry, process_rss_mb
+
+
+def make_model():
+    model = keras.Sequential([keras.Input((8, 8, 3)), keras.layers.Conv2D(4, 3),
+                              keras.layers.GlobalAveragePooling2D(), keras.layers.Dense(1, activation="sigmoid")])
+    model.compile(optimizer="sgd", loss="binary_crossentropy")
+    return model
+
+
+def make_dataset(delay=0.0):
+    """10 batches of 4 images, each batch taking `delay` seconds to produce"""
+    images = np.random.rand(40, 8, 8, 3).astype(np.float32)
+    labels = np.random.randint(0, 2, size=(40,)).astype(np.float32)
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels)).batch(4)
+    if delay:
+        def slow(images, labels):
+            token = tf.py_function(lambda: time.sleep(delay) or np.float32(0), [], tf.float32)
+            with tf.control_dependencies([token]):
+                return tf.identity(images), tf.identity(labels)
+        dataset = dataset.map(slow)
+    return dataset
+
+
+class TestTrainingTelemetry:
+    """Test the telemetry callback"""
+
+    def test_instrument_passes_batches_through(self):
+        """Test that instrumentation leaves the data unchanged and records every batch"""
+        telemetry = TrainingTelemetry()
+        dataset = make_dataset()
+        telemetry.on_epoch_begin(0)
+        for (images, labels), (expected_images, expected_labels) in zip(telemetry.instrument(dataset), dataset):
+            np.testing.assert_array_equal(images, expected_images)
+            np.testing.assert_array_equal(labels, expected_labels)
+        assert [size for _, size in telemetry._deliveries] == [4] * 10
+
+    def test_epoch_records(self, tmp_path):
+        """Test per-epoch throughput, step time and resource fields"""
+        telemetry = TrainingTelemetry(tmp_path)
+        make_model().fit(telemetry.instrument(make_dataset()), epochs=2, verbose=0, callbacks=[telemetry])
+
+        assert [record["epoch"] for record in telemetry.history] == [1, 2]
+        record = telemetry.history[-1]
+        assert record["steps"] == 10
+        assert record["images_per_sec"] > 0
+        assert record["step_time_p50_ms"] <= record["step_time_p95_ms"] <= record["step_time_max_ms"]
+        assert 0 <= record["input_wait_fraction"] <= 1
+        assert record["rss_mb"] > 0
+
+    def test_detects_input_stall(self, tmp_path):
+        """Test that a slow input pipeline shows up as time waiting on input"""
+        telemetry = TrainingTelemetry(tmp_path)
+        make_model().fit(telemetry.instrument(make_dataset(delay=0.05)), epochs=2, verbose=0,
+                         callbacks=[telemetry])
+        assert telemetry.history[-1]["input_wait_fraction"] > 0.5
+
+    def test_uninstrumented_dataset(self, tmp_path):
+        """Test that without instrumentation only step times and resources are recorded"""
+        telemetry = TrainingTelemetry(tmp_path)
+        make_model().fit(make_dataset(), epochs=1, verbose=0, callbacks=[telemetry])
+        assert "images_per_sec" not in telemetry.history[0]
+        assert telemetry.history[0]["steps"] == 10
+
+    def test_save_metrics(self, tmp_path):
+        """Test the DVC metrics and plots files"""
+        telemetry = TrainingTelemetry(tmp_path)
+        assert telemetry.save_metrics() is None
+
+        make_model().fit(telemetry.instrument(make_dataset()), epochs=3, verbose=0, callbacks=[telemetry])
+        summary = telemetry.save_metrics()
+
+        assert (tmp_path / "training_telemetry.csv").read_text().startswith("epoch,")
+        assert json.loads((tmp_path / "training_telemetry.json").read_text()) == summary
+        # Warm-up epoch excluded from the averages
+        expected = np.mean([record["images_per_sec"] for record in telemetry.history[1:]])
+        assert summary["images_per_sec"] == pytest.approx(expected)
+
+    def test_process_rss(self):
+        """Test that resident memory is reported"""
+        assert process_rss_mb() > 0
@@ -0,0 +1,98 @@
+"""
+Unit tests for the raw tensor formats
+"""
+import pytest
+import struct
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+from catvsdog_model.processing.tensor_io import (TensorFormatError, decode_tensors, encode_tensors,
+                                                 parse_shape, view_tensor)
+
+INPUT_SHAPE = [8, 6, 3]
+
+
+def frames(batch, seed=0):
+    """Random uint8 frames of the test input shape"""
+    return np.random.default_rng(seed).integers(0, 256, size=(batch, *INPUT_SHAPE), dtype=np.uint8)
+
+
+class TestViewTensor:
+    """Test raw octet-stream bodies"""
+
+    def test_view_is_zero_copy(self):
+        """Test that the batch views the body"""
+        body = bytearray(frames(4).tobytes())
+        tensor = view_tensor(body, (4, 8, 6, 3), input_shape=INPUT_SHAPE)
+        assert tensor.shape == (4, 8, 6, 3)
+        body[0] = (body[0] + 1) % 256
+        assert tensor.flat[0] == body[0]
+
+    def test_single_image_gets_batch_axis(self):
+        """Test that one image without a batch size becomes a batch of one"""
+        image = frames(1)[0]
+        tensor = view_tensor(image.tobytes(), parse_shape("8,6,3"), input_shape=INPUT_SHAPE)
+        np.testing.assert_array_equal(tensor, image[np.newaxis])
+
+    @pytest.mark.parametrize("shape,size", [((2, 8, 6, 3), 8 * 6 * 3), ((2, 6, 8, 3), 2 * 8 * 6 * 3),
+                                            ((0, 8, 6, 3), 0), ((8, 6), 48)])
+    def test_rejects_mismatch(self, shape, size):
+        """Test strict validation of the shape and body length"""
+        with pytest.raises(TensorFormatError):
+            view_tensor(bytes(size), shape, input_shape=INPUT_SHAPE)
+
+    @pytest.mark.parametrize("header", ["4,a,6", "4,-8,6,3", ""])
+    def test_invalid_shape_header(self, header):
+        """Test that malformed shape headers are rejected"""
+        with pytest.raises(TensorFormatError):
+            parse_shape(header)
+
+
+class TestMultiTensor:
+    """Test the multi-tensor format"""
+
+    def test_round_trip(self):
+        """Test that encoded tensors decode to the same values, as views"""
+        tensors = [frames(1, seed=1), frames(3, seed=2), frames(1, seed=3)[0]]
+        body = encode_tensors(tensors)
+
+        decoded = decode_tensors(body, input_shape=INPUT_SHAPE)
+
+        assert [tensor.shape[0] for tensor in decoded] == [1, 3, 1]
+        np.testing.assert_array_equal(decoded[1], tensors[1])
+        np.testing.assert_array_equal(decoded[2][0], tensors[2])
+        assert all(not tensor.flags.owndata for tensor in decoded)
+
+    def test_encode_rejects_other_dtypes(self):
+        """Test that only uint8 tensors are packed"""
+        with pytest.raises(TensorFormatError):
+            encode_tensors([frames(1).astype(np.float32)])
+
+    @pytest.mark.parametrize("corrupt", [
+        lambda body: body[:-1],
+        lambda body: body + b"\0",
+        lambda body: b"XXXX" + body[4:],
+        lambda body: body[:4] + b"\x02" + body[5:],
+        lambda body: body[:10],
+    ])
+    def test_rejects_corrupt_bodies(self, corrupt):
+        """Test truncated, padded, foreign and future-version bodies"""
+        body = encode_tensors([frames(2)])
+        with pytest.raises(TensorFormatError):
+            decode_tensors(corrupt(body), input_shape=INPUT_SHAPE)
+
+    def test_rejects_wrong_input_shape(self):
+        """Test that tensors of another image size are rejected"""
+        with pytest.raises(TensorFormatError):
+            decode_tensors(encode_tensors([np.zeros((1, 6, 8, 3), dtype=np.uint8)]), input_shape=INPUT_SHAPE)
+
+    def test_header_layout(self):
+        """Test the documented header and shape record layout"""
+        body = encode_tensors([frames(2)])
+        assert struct.unpack_from("<4sBBH", body) == (b"CVDT", 1, 0, 1)
+        assert struct.unpack_from("<B4I", body, 8) == (4, 2, 8, 6, 3)
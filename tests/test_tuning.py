@@ -0,0 +1,132 @@
+"""
+Unit tests for the hyperparameter search helpers
+"""
+import pytest
+import sys
+from pathlib import Path
+
+# Add project root to path
+root = Path(__file__).parents[1]
+sys.path.append(str(root))
+
+import yaml
+
+from catvsdog_model.tuning import (
+    ASHAScheduler,
+    make_optimizer,
+    sample_trials,
+    set_params_values,
+    run_trial_processes,
+)
+
+SEARCH_SPACE = {
+    "train.optimizer": ["rmsprop", "adam"],
+    "train.learning_rate": {"low": 0.0001, "high": 0.01, "log": True},
+    "preprocessing.batch_size": {"low": 8, "high": 64, "int": True},
+}
+
+
+class TestSampling:
+    """Test trial configuration sampling"""
+
+    def test_sample_trials_in_range(self):
+        """Test that samples respect choices and bounds"""
+        trials = sample_trials(SEARCH_SPACE, 50, seed=0)
+        assert len(trials) == 50
+        for trial in trials:
+            assert trial["train.optimizer"] in ["rmsprop", "adam"]
+            assert 0.0001 <= trial["train.learning_rate"] <= 0.01
+            assert isinstance(trial["preprocessing.batch_size"], int)
+            assert 8 <= trial["preprocessing.batch_size"] <= 64
+
+    def test_sample_trials_seeded(self):
+        """Test that the same seed gives the same trials"""
+        assert sample_trials(SEARCH_SPACE, 5, seed=1) == sample_trials(SEARCH_SPACE, 5, seed=1)
+        assert sample_trials(SEARCH_SPACE, 5, seed=1) != sample_trials(SEARCH_SPACE, 5, seed=2)
+
+
+class TestASHAScheduler:
+    """Test asynchronous successive halving"""
+
+    def test_rungs(self, tmp_path):
+        """Test that rungs grow geometrically below max_epochs"""
+        scheduler = ASHAScheduler(tmp_path / "rungs.json", min_epochs=1, max_epochs=27, reduction_factor=3)
+        assert scheduler.rungs == [1, 3, 9]
+
+    def test_prunes_below_cutoff(self, tmp_path):
+        """Test that only the top 1/reduction_factor of a rung continue"""
+        scheduler = ASHAScheduler(tmp_path / "rungs.json", min_epochs=1, max_epochs=9, reduction_factor=3)
+        assert scheduler.report("a", 1, 0.6)
+        assert scheduler.report("b", 1, 0.9)
+        assert not scheduler.report("c", 1, 0.5)
+        assert scheduler.report("d", 1, 0.95)
+        # Epochs between rungs never stop a trial
+        assert scheduler.report("c", 2, 0.0)
+
+    def test_min_mode(self, tmp_path):
+        """Test that a lower metric is better in min mode"""
+        scheduler = ASHAScheduler(tmp_path / "rungs.json", min_epochs=1, max_epochs=9, mode="min")
+        assert scheduler.report("a", 1, 0.3)
+        assert not scheduler.report("b", 1, 0.7)
+
+    def test_state_shared_between_instances(self, tmp_path):
+        """Test that trials in other processes see each other's rung results"""
+        ASHAScheduler(tmp_path / "rungs.json", min_epochs=1, max_epochs=9).report("a", 1, 0.9)
+        scheduler = ASHAScheduler(tmp_path / "rungs.json", min_epochs=1, max_epochs=9)
+        assert not scheduler.report("b", 1, 0.1)
+
+
+class TestParamsExport:
+    """Test in-place updates of params.yaml"""
+
+    def test_set_params_values(self, tmp_path):
+        """Test that values change while comments and other keys are kept"""
+        params_file = tmp_path / "params.yaml"
+        params_file.write_bytes(b"# header\r\ntrain:\r\n  epochs: 10  # full run\r\n  optimizer: rmsprop\r\n"
+                                b"callbacks:\r\n  early_stopping:\r\n    patience: 5\r\n  epochs: 3\r\n")
+        set_params_values(params_file, {"train.epochs": 4, "train.optimizer": "adam",
+                                        "callbacks.early_stopping.patience": 2})
+
+        content = params_file.read_bytes()
+        assert b"  epochs: 4  # full run\r\n" in content
+        assert b"# header\r\n" in content
+        params = yaml.safe_load(content)
+        assert params["train"] == {"epochs": 4, "optimizer": "adam"}
+        assert params["callbacks"] == {"early_stopping": {"patience": 2}, "epochs": 3}
+
+    def test_missing_key(self, tmp_path):
+        """Test that an unknown key is reported"""
+        params_file = tmp_path / "params.yaml"
+        params_file.write_text("train:\n  epochs: 10\nmodel:\n  dropout_rate: 0.5\n")
+        with pytest.raises(KeyError):
+            set_params_values(params_file, {"train.dropout_rate": 0.1})
+
+    def test_exported_config_sets_train_optimizer(self, tmp_path):
+        """Test that an exported optimizer and learning rate are what the train stage builds"""
+        params_file = tmp_path / "params.yaml"
+        params_file.write_bytes((root / "params.yaml").read_bytes())
+        set_params_values(params_file, {"train.optimizer": "adam", "train.learning_rate": 0.005})
+
+        params = yaml.safe_load(params_file.read_text())
+        optimizer = make_optimizer(params["train"]["optimizer"], params["train"]["learning_rate"])
+        assert type(optimizer).__name__ == "Adam"
+        assert float(optimizer.learning_rate) == pytest.approx(0.005)
+
+
+class TestTrialProcesses:
+    """Test concurrent trial execution"""
+
+    def test_concurrency_limit_and_exit_codes(self, tmp_path):
+        """Test that all trials run, at most max_concurrent at a time"""
+        script = ("import os, pathlib, sys, time; "
+                  "assert os.environ['TF_NUM_INTRAOP_THREADS'] == '2'; "
+                  "start = time.time(); time.sleep(0.3); "
+                  f"pathlib.Path(r'{tmp_path}', sys.argv[1]).write_text(f'{{start}} {{time.time()}}'); "
+                  "sys.exit(int(sys.argv[1]) % 2)")
+        commands = [[sys.executable, "-c", script, str(i)] for i in range(4)]
+        return_codes = run_trial_processes(commands, max_concurrent=2, threads_per_trial=2, poll_interval=0.05)
+
+        assert return_codes == [0, 1, 0, 1]
+        spans = [tuple(map(float, (tmp_path / str(i)).read_text().split())) for i in range(4)]
+        overlapping = max(sum(start <= t < end for start, end in spans) for t, _ in spans)
+        assert overlapping <= 2